@@ -0,0 +1,207 @@
+import asyncio
+import time
+from collections import deque
+from datetime import date
+from functools import partial
+from .TDAsyncTransport import TDAsyncTransport
+from .TDCredentials import TDCredentials
+from .TDModels import Order, positions_from_account
+from .TDOrderTemplate import serialize_order
+from .TDRateLimiter import TDRateLimiter, PRIORITY_ACCOUNT, PRIORITY_ORDER
+from .TDAccountsAndTrading import (DATE_FORMAT, BulkOrderResult, TDAccountsAndTrading, TransactionCheckpoint,
+                                   cancelable_orders, order_id_from_location, transaction_windows)
+
+
+class AsyncTDAccountsAndTrading:
+    """An asyncio counterpart of TDAccountsAndTrading with the same method surface."""
+
+    def __init__(self, access_token, transport=None):
+        self.credentials = TDCredentials.wrap(access_token)  # 可傳入字串或共用的 TDCredentials
+        self.access_token = self.credentials.access_token
+        # 與 TDTransport.default() 一樣共用全域的 rate limiter
+        self.transport = transport or TDAsyncTransport(rate_limiter=TDRateLimiter.default())
+        self.base_url = "https://api.tdameritrade.com/v1"
+        self.headers = {
+            "Authorization": f"Bearer {self.access_token}",
+            "Content-Type": "application/json"
+        }
+        self.credentials.subscribe(self._on_token_refreshed)
+
+    def _on_token_refreshed(self, access_token):
+        self.access_token = access_token
+        self.headers["Authorization"] = f"Bearer {access_token}"
+
+    # 與同步版本使用相同的錯誤處理
+    _handle_response = TDAccountsAndTrading._handle_response
+
+    async def _request(self, method, endpoint, priority=PRIORITY_ACCOUNT, **kwargs):
+        response = await self.transport.request(method, endpoint, headers=self.headers, credentials=self.credentials,
+                                                priority=priority, **kwargs)
+        return self._handle_response(response)
+
+    async def _order_request(self, method, endpoint, **kwargs):
+        # 與同步版本的 TDTransport.for_orders() 相同，下單相關請求不重試
+        response = await self.transport.request(method, endpoint, headers=self.headers, credentials=self.credentials,
+                                                priority=PRIORITY_ORDER, retry=False, **kwargs)
+        result = self._handle_response(response)
+        if response.status_code == 201:
+            return order_id_from_location(response.headers.get("Location"))
+        return result
+
+    # Account Information
+    async def get_account(self, account_id, fields=None):
+        endpoint = f"{self.base_url}/accounts/{account_id}"
+        params = {"fields": fields} if fields else {}
+        return await self._request("GET", endpoint, params=params)
+
+    async def get_accounts(self, fields=None):
+        endpoint = f"{self.base_url}/accounts"
+        params = {"fields": fields} if fields else {}
+        return await self._request("GET", endpoint, params=params)
+
+    async def get_positions(self, account_id, typed=False):
+        account = await self.get_account(account_id, fields="positions")
+        if typed:
+            return positions_from_account(account)
+        return (account.get("securitiesAccount") or account).get("positions", [])
+
+    # Order Operations
+    async def place_order(self, account_id, order, **values):
+        endpoint = f"{self.base_url}/accounts/{account_id}/orders"
+        return await self._order_request("POST", endpoint, data=serialize_order(order, **values))
+
+    async def replace_order(self, account_id, order_id, order, **values):
+        endpoint = f"{self.base_url}/accounts/{account_id}/orders/{order_id}"
+        return await self._order_request("PUT", endpoint, data=serialize_order(order, **values))
+
+    async def get_order(self, account_id, order_id, typed=False):
+        endpoint = f"{self.base_url}/accounts/{account_id}/orders/{order_id}"
+        result = await self._order_request("GET", endpoint)
+        return Order.from_json(result) if typed else result
+
+    async def get_orders(self, account_id, max_results=None, from_entered_time=None, to_entered_time=None,
+                         status=None, typed=False):
+        endpoint = f"{self.base_url}/accounts/{account_id}/orders"
+        params = {
+            "maxResults": max_results,
+            "fromEnteredTime": from_entered_time,
+            "toEnteredTime": to_entered_time,
+            "status": status,
+        }
+        params = {key: value for key, value in params.items() if value is not None}
+        result = await self._order_request("GET", endpoint, params=params)
+        return Order.from_list(result) if typed else result
+
+    async def cancel_order(self, account_id, order_id):
+        endpoint = f"{self.base_url}/accounts/{account_id}/orders/{order_id}"
+        return await self._order_request("DELETE", endpoint)
+
+    # Bulk Order Operations
+    async def _bulk(self, calls, max_workers):
+        result = BulkOrderResult()
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def run(order_id, call):
+            async with semaphore:
+                t0 = time.perf_counter()
+                try:
+                    outcome = await call()
+                except Exception as e:
+                    outcome = e
+                return order_id, outcome, time.perf_counter() - t0
+
+        for order_id, outcome, latency in await asyncio.gather(*(run(i, c) for i, c in calls.items())):
+            result[order_id] = outcome
+            result.latencies[order_id] = latency
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    async def cancel_orders(self, account_id, order_ids, max_workers=16):
+        calls = {order_id: partial(self.cancel_order, account_id, order_id) for order_id in order_ids}
+        return await self._bulk(calls, max_workers)
+
+    async def cancel_all_orders(self, account_id, symbol=None, max_workers=16):
+        order_ids = cancelable_orders(await self.get_orders(account_id), symbol)
+        return await self.cancel_orders(account_id, order_ids, max_workers)
+
+    async def cancel_orders_by_symbol(self, account_id, symbol, max_workers=16):
+        return await self.cancel_all_orders(account_id, symbol, max_workers)
+
+    async def replace_orders(self, account_id, replacements, max_workers=16):
+        calls = {}
+        for order_id, order in dict(replacements).items():
+            values = {}
+            if isinstance(order, tuple):
+                order, values = order
+            calls[order_id] = partial(self.replace_order, account_id, order_id, order, **values)
+        return await self._bulk(calls, max_workers)
+
+    # Saved Order Operations
+    async def delete_saved_order(self, account_id, saved_order_id):
+        endpoint = f"{self.base_url}/accounts/{account_id}/savedorders/{saved_order_id}"
+        return await self._request("DELETE", endpoint, priority=PRIORITY_ORDER)
+
+    # Transaction History
+    async def get_transaction(self, accountId, transactionId):
+        endpoint = f"{self.base_url}/accounts/{accountId}/transactions/{transactionId}"
+        return await self._request("GET", endpoint)
+
+    async def get_transactions(self, accountId, type=None, symbol=None, startDate=None, endDate=None):
+        endpoint = f"{self.base_url}/accounts/{accountId}/transactions"
+        params = {
+            "type": type,
+            "symbol": symbol,
+            "startDate": startDate,
+            "endDate": endDate
+        }
+        params = {k: v for k, v in params.items() if v is not None}
+        return await self._request("GET", endpoint, params=params)
+
+    async def iter_transactions(self, accountId, startDate, endDate=None, type=None, symbol=None,
+                                window_days=30, prefetch=2, checkpoint=None):
+        """Async generator version of TDAccountsAndTrading.iter_transactions."""
+        windows = transaction_windows(startDate, endDate or date.today(), window_days)
+        if checkpoint is not None and not isinstance(checkpoint, TransactionCheckpoint):
+            checkpoint = TransactionCheckpoint(checkpoint)
+        key = TransactionCheckpoint.key(accountId, type, symbol)
+        if checkpoint is not None:
+            done = checkpoint.load(key)
+            if done:
+                windows = [w for w in windows if w[1] > done]
+        today = date.today().strftime(DATE_FORMAT)
+
+        def fetch(window):
+            return asyncio.ensure_future(self.get_transactions(
+                accountId, type=type, symbol=symbol, startDate=window[0], endDate=window[1]))
+
+        remaining = iter(windows)
+        pending = deque()
+        try:
+            for window in remaining:
+                pending.append((window, fetch(window)))
+                if len(pending) > prefetch:
+                    break
+            while pending:
+                window, task = pending.popleft()
+                transactions = await task
+                following = next(remaining, None)
+                if following is not None:
+                    pending.append((following, fetch(following)))
+                for transaction in transactions:
+                    yield transaction
+                del transactions
+                if checkpoint is not None and window[1] < today:
+                    checkpoint.save(key, window[1])
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    async def close(self):
+        await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import logging
+import time
+from .TDAsyncTransport import TDAsyncTransport
+from .TDCredentials import TDCredentials
+from .TDModels import Candle, LazyModels, Quote, loads, option_contracts
+from .TDRateLimiter import TDRateLimiter, PRIORITY_MARKET_DATA
+from .TDDataQuery import TDDataQuery, BulkQuoteResult, ChunkReport, chunk_symbols
+
+
+class AsyncTDDataQuery:
+    """An asyncio counterpart of TDDataQuery with the same method surface."""
+
+    BASE_URL = TDDataQuery.BASE_URL
+
+    def __init__(self, access_token, client_id, transport=None):
+        self.credentials = TDCredentials.wrap(access_token)  # 可傳入字串或共用的 TDCredentials
+        self.access_token = self.credentials.access_token
+        self.client_id = client_id
+        # 與 TDTransport.default() 一樣共用全域的 rate limiter
+        self.transport = transport or TDAsyncTransport(rate_limiter=TDRateLimiter.default())
+        self._headers = {
+            "Authorization": f"Bearer {self.access_token}"
+        }
+        self.credentials.subscribe(self._on_token_refreshed)
+        self._logger = logging.getLogger(__name__)
+
+    def _on_token_refreshed(self, access_token):
+        self.access_token = access_token
+        self._headers["Authorization"] = f"Bearer {access_token}"
+
+    async def _make_request(self, url, params=None):
+        if params is None:
+            params = {}
+        params["apikey"] = self.client_id
+        response = await self.transport.get(url, headers=self._headers, credentials=self.credentials, params=params,
+                                            priority=PRIORITY_MARKET_DATA)
+        self._logger.debug("狀態碼: %s", response.status_code)
+        response.raise_for_status()
+
+        try:
+            return loads(response.content)
+        except json.decoder.JSONDecodeError:
+            self._logger.error(f"無法從回應中解碼JSON。回應內容: {response.text}")
+            return {"error": "無效的JSON回應"}
+
+    async def search_instruments(self, symbol, projection, apikey=None):
+        valid_projections = ["symbol-search", "symbol-regex", "desc-search", "desc-regex", "fundamental"]
+        if projection not in valid_projections:
+            self._logger.error(f"無效的'projection'值。有效的選項是: {', '.join(valid_projections)}")
+            return {"error": "無效的'projection'值"}
+
+        if not symbol:
+            self._logger.error("必須提供'symbol'。")
+            return {"error": "缺少'symbol'參數"}
+
+        url = f"{self.BASE_URL}/instruments"
+        params = {
+            "symbol": symbol,
+            "projection": projection
+        }
+        if apikey:
+            params["apikey"] = apikey
+
+        return await self._make_request(url, params)
+
+    async def get_instrument_by_cusip(self, cusip):
+        url = f"{self.BASE_URL}/instruments/{cusip}"
+        return await self._make_request(url)
+
+    # Market Hours
+    async def get_market_hours(self, markets, date=None):
+        url = f"{self.BASE_URL}/marketdata/hours"
+        params = {
+            "markets": markets,
+            "date": date
+        }
+        return await self._make_request(url, params)
+
+    async def get_market_hours_for_specific_market(self, market, date=None):
+        url = f"{self.BASE_URL}/marketdata/{market}/hours"
+        params = {
+            "date": date
+        }
+        return await self._make_request(url, params)
+
+    # Movers
+    async def get_movers_for_index(self, index, direction=None, change=None):
+        url = f"{self.BASE_URL}/marketdata/{index}/movers"
+        params = {
+            "direction": direction,
+            "change": change
+        }
+        return await self._make_request(url, params)
+
+    # Option Chains
+    async def get_option_chain(self, symbol, typed=False, columnar=False, **kwargs):
+        url = f"{self.BASE_URL}/marketdata/chains"
+        params = {"symbol": symbol}
+        params.update(kwargs)
+        result = await self._make_request(url, params)
+        if columnar:
+            from .TDOptionChain import TDOptionChain
+            return TDOptionChain.from_chain(result)
+        return option_contracts(result) if typed else result
+
+    async def get_option_chains(self, symbols, max_workers=8, columnar=False, typed=False, **kwargs):
+        symbols = list(symbols)
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def fetch(symbol):
+            async with semaphore:
+                try:
+                    return await self.get_option_chain(symbol, typed=typed, columnar=columnar, **kwargs)
+                except Exception as e:
+                    self._logger.error(f"取得 {symbol} 選擇權鏈失敗: {e}")
+                    return e
+
+        return dict(zip(symbols, await asyncio.gather(*(fetch(symbol) for symbol in symbols))))
+
+    # Price History
+    async def get_price_history(self, symbol, columnar=False, typed=False, **kwargs):
+        url = f"{self.BASE_URL}/marketdata/{symbol}/pricehistory"
+        params = {"symbol": symbol}
+        params.update(kwargs)
+        result = await self._make_request(url, params)
+        # columnar=True 時回傳 TDCandles (連續的型別陣列)
+        if columnar and "candles" in result:
+            from .TDCandles import TDCandles  # 需要時才載入 numpy
+            return TDCandles.from_price_history(result)
+        if typed:
+            return Candle.from_list(result.get("candles"))
+        return result
+
+    # Quotes
+    async def get_quotes(self, symbols, typed=False):
+        if isinstance(symbols, list):
+            symbols = ','.join(symbols)
+        url = f"{self.BASE_URL}/marketdata/quotes"
+        params = {
+            "symbol": symbols
+        }
+        result = await self._make_request(url, params)
+        return LazyModels(result, Quote) if typed else result
+
+    async def get_quotes_bulk(self, symbols, chunk_size=None, max_workers=8, max_requests_per_second=None,
+                              typed=False):
+        chunks = chunk_symbols(symbols, chunk_size or TDDataQuery.MAX_SYMBOLS_PER_REQUEST,
+                               TDDataQuery.MAX_SYMBOL_PARAM_CHARS)
+        result = BulkQuoteResult(symbol for chunk in chunks for symbol in chunk)
+        if not chunks:
+            return result
+
+        started = time.perf_counter()
+        interval = 1.0 / max_requests_per_second if max_requests_per_second else 0.0
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def fetch(index, chunk):
+            delay = started + index * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with semaphore:
+                t0 = time.perf_counter()
+                try:
+                    quotes = await self.get_quotes(chunk)
+                    if typed:
+                        quotes = {symbol: Quote.from_json(quote) for symbol, quote in quotes.items()}
+                    return quotes, ChunkReport(len(chunk), time.perf_counter() - t0, None)
+                except Exception as e:
+                    self._logger.error(f"批次報價失敗 ({len(chunk)} 個代號): {e}")
+                    return {}, ChunkReport(len(chunk), time.perf_counter() - t0, e)
+
+        for quotes, report in await asyncio.gather(*(fetch(i, c) for i, c in enumerate(chunks))):
+            result.update(quotes)
+            result.chunks.append(report)
+
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    async def get_quote(self, symbol, typed=False):
+        url = f"{self.BASE_URL}/marketdata/{symbol}/quotes"
+        result = await self._make_request(url)
+        if typed:
+            return Quote.from_json(result.get(symbol) or next(iter(result.values()), {}))
+        return result
+
+    async def close(self):
+        await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -3,36 +3,44 @@ import time
 import urllib.parse
 import requests
 from datetime import datetime, timedelta
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from dotenv import load_dotenv
+from .TDBrowserPool import IN_DOCKER, create_chrome_driver, start_virtual_display
+from .TDCredentials import TDCredentials, TDTokenRefresher
+from .TDRateLimiter import PRIORITY_ORDER
+from .TDTokenStore import EnvTokenStore
+from .TDTransport import TDTransport
 
-# Check if we are in a Docker environment
-IN_DOCKER = os.environ.get('IN_DOCKER', 'False').lower() == 'true'
-
-if IN_DOCKER:
-    from pyvirtualdisplay import Display
+# selenium 與 pyvirtualdisplay 只在需要瀏覽器登入時才載入 (見 TDBrowserPool)，
+# 只用 HTTP 刷新 token 的短程式不必負擔它們的載入時間
 
 class TDAAuthentication:
 
-    def __init__(self, client_id, redirect_uri):
-        self.session = requests.Session()  # 使用Session來管理請求
+    TOKEN_ENDPOINT = "https://api.tdameritrade.com/v1/oauth2/token"
+    REFRESH_TOKEN_RENEWAL = timedelta(days=7)
+
+    def __init__(self, client_id, redirect_uri, transport=None, token_store=None):
+        self.transport = transport or TDTransport.default()  # 使用共用的連線池來管理請求
+        # 預設沿用 config/.env，多個行程共用同一個檔案時以檔案鎖保護
+        self.token_store = token_store or EnvTokenStore()
         self.client_id = client_id
         self.redirect_uri = redirect_uri
         self.base_url = "https://auth.tdameritrade.com"
-        self.token_endpoint = "https://api.tdameritrade.com/v1/oauth2/token"
+        self.token_endpoint = self.TOKEN_ENDPOINT
+        self.access_token = None
+        self.refresh_token = None
+        self.access_token_expiry = datetime.fromtimestamp(0)
+        self.refresh_token_expiry = datetime.fromtimestamp(0)
+        # 共用的憑證：傳給各個客戶端類別，token 刷新後會自動推送給它們
+        self.credentials = TDCredentials(None, refresher=self._refresh_credentials)
+        self._refresher = None
         
-        # Step 1: Load tokens from .env
+        # Step 1: Load tokens from the token store
         self.load_tokens_from_env()
 
         # Step 2: Check if the tokens are valid
         if self.is_access_token_expired():
             if self.refresh_token and not self.is_refresh_token_expired():
                 print("Refreshing access token...")
-                self.refresh_access_token()
+                self._refresh_credentials()
             else:
                 print("No valid access token found. Please authenticate.")
         else:
@@ -43,23 +51,33 @@ class TDAAuthentication:
         return auth_url
 
     def _initialize_selenium(self):
-        display = None
-        if IN_DOCKER:
-            display = Display(visible=0, size=(1600, 900))
-            display.start()
-
-        chrome_options = Options()
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--disable-webgl')
-        driver = webdriver.Chrome(options=chrome_options)
-
+        display = start_virtual_display()
+        driver = create_chrome_driver()
         return display, driver
 
-    def get_authentication_code(self, td_account_id, td_password):
+    def get_authentication_code(self, td_account_id, td_password, browser_pool=None):
+        """Log in through the browser and return the OAuth code.
+
+        With ``browser_pool`` a warm driver from a TDBrowserPool is reused
+        instead of starting a new Chrome.
+        """
+        if browser_pool is not None:
+            with browser_pool.driver() as driver:
+                return self._login_with_driver(driver, td_account_id, td_password)
+
         display, driver = self._initialize_selenium()
+        try:
+            return self._login_with_driver(driver, td_account_id, td_password)
+        finally:
+            driver.quit()
+            if display:
+                display.stop()
+
+    def _login_with_driver(self, driver, td_account_id, td_password):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+
         url = self.get_authentication_url()
         driver.get(url)
         
@@ -76,17 +94,16 @@ class TDAAuthentication:
         # 等待第二次accept按鈕出現並點擊
         WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.ID, 'accept'))).click()
         
+        # 等待導向 redirect_uri 後再讀取 code
+        WebDriverWait(driver, 10).until(EC.url_contains('code='))
         new_url = driver.current_url
-        auth_code = urllib.parse.unquote(new_url.split('code=')[1])
-        driver.quit()
-        if display:
-            display.stop()
-        return auth_code
+        return urllib.parse.unquote(new_url.split('code=')[1])
 
     def _post_request(self, data):
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
         try:
-            response = self.session.post(self.token_endpoint, headers=headers, data=data)
+            # 取得 token 和下單一樣優先，避免被行情請求卡住
+            response = self.transport.post(self.token_endpoint, headers=headers, data=data, priority=PRIORITY_ORDER)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
@@ -108,6 +125,7 @@ class TDAAuthentication:
             self.expires_in = tokens.get("expires_in")
             self.refresh_token_expires_in = tokens.get("refresh_token_expires_in")
             self.scope = tokens.get("scope")
+            self._update_expiry()
             self.save_tokens_to_env()
 
     def refresh_access_token(self):
@@ -123,6 +141,7 @@ class TDAAuthentication:
             # 檢查API是否返回了refresh_token_expires_in
             if "refresh_token_expires_in" in tokens:
                 self.refresh_token_expires_in = tokens["refresh_token_expires_in"]  # 更新refresh_token_expires_in屬性
+            self._update_expiry("refresh_token_expires_in" in tokens)
             self.save_tokens_to_env()  # 保存 tokens 到 .env 文件
 
     def refresh_all_tokens(self):
@@ -138,50 +157,70 @@ class TDAAuthentication:
             self.refresh_token = tokens["refresh_token"]
             self.expires_in = tokens["expires_in"]  # 更新expires_in屬性
             self.refresh_token_expires_in = tokens["refresh_token_expires_in"]  # 更新refresh_token_expires_in屬性
+            self._update_expiry()
             self.save_tokens_to_env()  # 保存 tokens 到 .env 文件
-    
-    def save_tokens_to_env(self):
-        """Save tokens and their expiration times to .env."""
-        env_path = os.path.join(os.path.dirname(__file__), 'config', '.env')
-        if not os.path.exists(env_path):
-            print(f".env file not found at {env_path}")
-            return
-
-        # 讀取原始.env文件的內容
-        with open(env_path, 'r') as f:
-            lines = f.readlines()
-
-        # 更新或添加新的token資訊
-        new_content = []
-        for line in lines:
-            if line.startswith("TDA_ACCESS_TOKEN="):
-                new_content.append(f"TDA_ACCESS_TOKEN={self.access_token}\n")
-            elif line.startswith("TDA_REFRESH_TOKEN="):
-                new_content.append(f"TDA_REFRESH_TOKEN={self.refresh_token}\n")
-            elif line.startswith("TDA_ACCESS_TOKEN_EXPIRY="):
-                new_content.append(f"TDA_ACCESS_TOKEN_EXPIRY={(datetime.now() + timedelta(seconds=self.expires_in)).isoformat()}\n")
-            elif hasattr(self, 'refresh_token_expires_in') and line.startswith("TDA_REFRESH_TOKEN_EXPIRY="):
-                new_content.append(f"TDA_REFRESH_TOKEN_EXPIRY={(datetime.now() + timedelta(seconds=self.refresh_token_expires_in)).isoformat()}\n")
+
+    def _update_expiry(self, refresh_token_renewed=True):
+        """Track the new expiry times in memory and push the token to every client."""
+        now = datetime.now()
+        self.access_token_expiry = now + timedelta(seconds=self.expires_in)
+        if refresh_token_renewed and getattr(self, "refresh_token_expires_in", None):
+            self.refresh_token_expiry = now + timedelta(seconds=self.refresh_token_expires_in)
+        self._publish_tokens()
+
+    def _publish_tokens(self):
+        # 以相對時間換算，避免 1970 年的預設值在 Windows 上 timestamp() 出錯
+        expires_at = time.time() + (self.access_token_expiry - datetime.now()).total_seconds()
+        self.credentials.update(self.access_token, expires_at)
+
+    def _refresh_credentials(self):
+        with self.token_store.lock():
+            # 其他行程可能已經刷新過，直接沿用檔案中的新 token
+            stale_token = self.access_token
+            if self.reload_tokens() and self.access_token != stale_token and not self.is_access_token_expired():
+                return
+            # refresh token 快到期時一併更新，避免需要重新登入
+            if self.refresh_token_expiry - datetime.now() < self.REFRESH_TOKEN_RENEWAL:
+                self.refresh_all_tokens()
             else:
-                new_content.append(line)
+                self.refresh_access_token()
 
-        # 寫回.env文件
-        with open(env_path, 'w') as f:
-            f.writelines(new_content)
+    def start_background_refresh(self, lead_time=300):
+        """Renew the access token in a daemon thread ``lead_time`` seconds before it expires."""
+        if self._refresher is None:
+            self._refresher = TDTokenRefresher(self.credentials, lead_time=lead_time)
+        return self._refresher.start()
+
+    def stop_background_refresh(self):
+        if self._refresher is not None:
+            self._refresher.stop()
+    
+    def save_tokens_to_env(self):
+        """Save tokens and their expiration times to the token store (config/.env by default)."""
+        self.token_store.save({
+            "access_token": self.access_token,
+            "refresh_token": self.refresh_token,
+            "access_token_expiry": self.access_token_expiry,
+            "refresh_token_expiry": self.refresh_token_expiry,
+        })
 
     def load_tokens_from_env(self):
-        """Load tokens and their expiration times from .env."""
-        env_path = os.path.join(os.path.dirname(__file__), 'config', '.env')
-        # Check if .env file exists
-        if not os.path.exists(env_path):
-            print(f".env file not found at {env_path}")
-            return
-
-        load_dotenv(env_path)
-        self.access_token = os.getenv("TDA_ACCESS_TOKEN")
-        self.refresh_token = os.getenv("TDA_REFRESH_TOKEN")
-        self.access_token_expiry = datetime.fromisoformat(os.getenv("TDA_ACCESS_TOKEN_EXPIRY", "1970-01-01T00:00:00"))
-        self.refresh_token_expiry = datetime.fromisoformat(os.getenv("TDA_REFRESH_TOKEN_EXPIRY", "1970-01-01T00:00:00"))
+        """Load tokens and their expiration times from the token store (config/.env by default)."""
+        if not os.path.exists(self.token_store.path):
+            print(f"Token file not found at {self.token_store.path}")
+        tokens = self.token_store.load()
+        self.access_token = tokens["access_token"]
+        self.refresh_token = tokens["refresh_token"]
+        self.access_token_expiry = tokens["access_token_expiry"]
+        self.refresh_token_expiry = tokens["refresh_token_expiry"]
+        self._publish_tokens()
+
+    def reload_tokens(self):
+        """Pick up tokens written by another process; returns True if the store had changed."""
+        if not self.token_store.changed():
+            return False
+        self.load_tokens_from_env()
+        return True
 
     def is_access_token_expired(self):
         # 提前5分鐘刷新令牌
@@ -193,12 +232,12 @@ class TDAAuthentication:
 
     def authenticate(self, td_account_id, td_password):
         """Authenticate and get tokens, either by refreshing or by logging in."""
+        self.reload_tokens()
         if self.refresh_token and not self.is_refresh_token_expired():
             if self.is_access_token_expired():
                 print("Refreshing access token...")
-                self.refresh_access_token()
+                self._refresh_credentials()
         else:
             print("Getting new tokens...")
             auth_code = self.get_authentication_code(td_account_id, td_password)
-            self.get_tokens(auth_code)
-            self.save_tokens_to_env()
\ No newline at end of file
+            self.get_tokens(auth_code)
\ No newline at end of file
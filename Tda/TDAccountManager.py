@@ -0,0 +1,215 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .TDAAuthentication import TDAAuthentication
+from .TDAccountsAndTrading import TDAccountsAndTrading
+from .TDCredentials import TDCredentials
+from .TDTokenStore import JsonTokenStore
+from .TDTransport import TDTransport
+from .TDUserSettings import TDUserSettings
+from .TDWatchlist import TDWatchlist
+
+
+class TDAccountSession:
+    """The clients of one account, all sharing its credentials and the manager's transport."""
+
+    def __init__(self, name, credentials, transport, account_id=None, auth=None, order_transport=None):
+        self.name = name
+        self.account_id = account_id or name
+        self.auth = auth
+        self.credentials = credentials
+        self.trading = TDAccountsAndTrading(credentials, transport=transport, order_transport=order_transport)
+        self.watchlist = TDWatchlist(credentials, transport=transport)
+        self.user_settings = TDUserSettings(credentials, transport=transport)
+
+    def __repr__(self):
+        return f"TDAccountSession({self.name!r}, account_id={self.account_id!r})"
+
+
+class TDAccountManager:
+    """Manages many accounts over one shared connection pool.
+
+    Each account gets its own token file under ``token_dir`` and its own
+    ``TDAccountSession``. ``map`` and the fan-out helpers call every account
+    in parallel and return ``{name: result}``; a failed call maps to its
+    exception instead of aborting the others. ``start_background_refresh``
+    runs a single scheduler thread that spreads refreshes over
+    ``refresh_spread`` seconds so accounts with the same expiry do not
+    refresh at once.
+    """
+
+    def __init__(self, client_id=None, redirect_uri=None, token_dir=None, transport=None, max_workers=8,
+                 refresh_lead_time=300, refresh_spread=120, max_refresh_workers=2, retry_interval=30,
+                 order_transport=None):
+        self.client_id = client_id
+        self.redirect_uri = redirect_uri
+        self.token_dir = token_dir
+        self.transport = transport or TDTransport.default()
+        # 下單不重試，與行情分開排隊 (見 TDTransport.for_orders)
+        self.order_transport = order_transport or self.transport.for_orders()
+        self.max_workers = max_workers
+        self.refresh_lead_time = refresh_lead_time
+        self.refresh_spread = refresh_spread
+        self.retry_interval = retry_interval
+        self.refreshes = 0
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="TDAccountManager")
+        self._refresh_executor = ThreadPoolExecutor(max_workers=max_refresh_workers,
+                                                    thread_name_prefix="TDAccountRefresh")
+        self._in_flight = set()
+        self._retry_at = {}
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._scheduler = None
+        self._logger = logging.getLogger(__name__)
+
+    # Accounts
+    def add_account(self, name, account_id=None, token_store=None):
+        """Register an account whose tokens live in ``token_store`` (default ``<token_dir>/<name>.json``)."""
+        if token_store is None:
+            if self.token_dir is None:
+                raise ValueError("TDAccountManager.add_account requires token_dir or token_store")
+            token_store = JsonTokenStore(os.path.join(self.token_dir, f"{name}.json"))
+        auth = TDAAuthentication(self.client_id, self.redirect_uri, transport=self.transport, token_store=token_store)
+        return self._register(TDAccountSession(name, auth.credentials, self.transport, account_id, auth,
+                                               self.order_transport))
+
+    def add_accounts(self, names):
+        """Register several accounts in parallel; expired tokens refresh concurrently."""
+        names = list(names)
+        return list(self._executor.map(self.add_account, names))
+
+    def add_credentials(self, name, credentials, account_id=None):
+        """Register an account whose tokens are managed elsewhere (a token string or TDCredentials)."""
+        credentials = TDCredentials.wrap(credentials)
+        return self._register(TDAccountSession(name, credentials, self.transport, account_id,
+                                               order_transport=self.order_transport))
+
+    def _register(self, session):
+        with self._lock:
+            if session.name in self._sessions:
+                raise ValueError(f"Account '{session.name}' is already registered")
+            self._sessions[session.name] = session
+        self._wake.set()
+        return session
+
+    def remove_account(self, name):
+        with self._lock:
+            return self._sessions.pop(name)
+
+    def __getitem__(self, name):
+        return self._sessions[name]
+
+    def __iter__(self):
+        return iter(list(self._sessions.values()))
+
+    def __len__(self):
+        return len(self._sessions)
+
+    @property
+    def accounts(self):
+        return list(self._sessions)
+
+    # Fan-out
+    def map(self, func, accounts=None):
+        """Call ``func(session)`` for every account in parallel; returns ``{name: result or exception}``."""
+        sessions = [self._sessions[name] for name in accounts] if accounts is not None else list(self)
+        futures = {session.name: self._executor.submit(func, session) for session in sessions}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                self._logger.error(f"帳戶 {name} 呼叫失敗: {e}")
+                results[name] = e
+        return results
+
+    def get_accounts(self, fields=None, accounts=None):
+        return self.map(lambda session: session.trading.get_accounts(fields), accounts)
+
+    def get_account(self, fields=None, accounts=None):
+        return self.map(lambda session: session.trading.get_account(session.account_id, fields), accounts)
+
+    def get_transactions(self, accounts=None, **kwargs):
+        return self.map(lambda session: session.trading.get_transactions(session.account_id, **kwargs), accounts)
+
+    def get_watchlists(self, accounts=None):
+        return self.map(lambda session: session.watchlist.get_watchlists_by_account(session.account_id), accounts)
+
+    # Token refresh scheduling
+    def _due_at(self, index, count, session):
+        expires_at = session.credentials.expires_at
+        if expires_at is None or not session.credentials.refreshable:
+            return None
+        # 依帳戶順序錯開刷新時間
+        offset = self.refresh_spread * index / count
+        due = expires_at - self.refresh_lead_time - offset
+        return max(due, self._retry_at.get(session.name, due))
+
+    def _refresh_session(self, session):
+        try:
+            if not session.credentials.refresh():
+                raise RuntimeError("token refresh returned no new token")
+            self._retry_at.pop(session.name, None)
+            self.refreshes += 1
+        except Exception as e:
+            self._logger.error(f"帳戶 {session.name} 刷新 token 失敗: {e}")
+            self._retry_at[session.name] = time.time() + self.retry_interval
+        finally:
+            with self._lock:
+                self._in_flight.discard(session.name)
+            self._wake.set()
+
+    def _schedule_once(self):
+        """Submit every due refresh and return the seconds until the next one (None if unknown)."""
+        now = time.time()
+        sessions = list(self)
+        next_due = None
+        for index, session in enumerate(sessions):
+            due = self._due_at(index, len(sessions), session)
+            if due is None:
+                continue
+            with self._lock:
+                if session.name in self._in_flight:
+                    continue
+                if due <= now:
+                    self._in_flight.add(session.name)
+            if due <= now:
+                self._refresh_executor.submit(self._refresh_session, session)
+            else:
+                next_due = due if next_due is None else min(next_due, due)
+        return None if next_due is None else next_due - now
+
+    def _run_scheduler(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            delay = self._schedule_once()
+            self._wake.wait(self.retry_interval if delay is None else min(delay, self.retry_interval))
+
+    def start_background_refresh(self):
+        if self._scheduler is None or not self._scheduler.is_alive():
+            self._stop.clear()
+            self._scheduler = threading.Thread(target=self._run_scheduler, name="TDAccountManagerRefresh",
+                                               daemon=True)
+            self._scheduler.start()
+        return self
+
+    def stop_background_refresh(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._scheduler is not None:
+            self._scheduler.join(timeout)
+
+    def close(self):
+        self.stop_background_refresh()
+        self._executor.shutdown(wait=True)
+        self._refresh_executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
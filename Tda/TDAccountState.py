@@ -0,0 +1,337 @@
+import logging
+import threading
+import xml.etree.ElementTree as ET
+from .TDModels import loads
+
+WORKING_STATUSES = {"AWAITING_PARENT_ORDER", "AWAITING_CONDITION", "AWAITING_MANUAL_REVIEW", "ACCEPTED",
+                    "AWAITING_UR_OUT", "PENDING_ACTIVATION", "QUEUED", "WORKING", "NEW", "AWAITING_RELEASE_TIME",
+                    "PENDING_CANCEL", "PENDING_REPLACE"}
+OPTION_MULTIPLIER = 100
+
+
+def _signed(instruction, quantity):
+    return -quantity if instruction and instruction.upper().startswith("SELL") else quantity
+
+
+def _legs(order):
+    return order.get("orderLegCollection") or []
+
+
+def _walk(orders):
+    """Yield every order and its nested child orders."""
+    stack = list(reversed(orders or []))
+    while stack:
+        order = stack.pop()
+        yield order
+        stack.extend(reversed(order.get("childOrderStrategies") or []))
+
+
+def _find(root, name):
+    # ACCT_ACTIVITY 的 XML 帶有命名空間，只比對本地名稱
+    for element in root.iter():
+        if element.tag.rsplit("}", 1)[-1] == name:
+            return element
+    return None
+
+
+def _text(root, name, parent=None):
+    """Text of the first ``name`` element, looked up under the first ``parent`` element if given."""
+    if parent is not None:
+        root = _find(root, parent)
+    element = _find(root, name) if root is not None else None
+    return None if element is None else (element.text or "").strip()
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_account_activity(item):
+    """Turn one decoded ACCT_ACTIVITY content item into a flat event dict (None for non-order messages)."""
+    message_type = item.get("messageType")
+    data = item.get("messageData")
+    if not data or message_type in ("SUBSCRIBED", "ERROR"):
+        return None
+    root = ET.fromstring(data)
+    security_type = (_text(root, "SecurityType") or "").lower()
+    return {
+        "type": message_type,
+        "account_id": item.get("accountNumber"),
+        "order_id": int(_text(root, "OrderKey") or 0) or None,
+        "original_order_id": int(_text(root, "OriginalOrderId") or 0) or None,
+        "symbol": _text(root, "Symbol"),
+        "asset_type": "OPTION" if "option" in security_type else "EQUITY",
+        "instruction": (_text(root, "OrderInstructions") or "").upper() or None,
+        "order_type": (_text(root, "OrderType") or "").upper() or None,
+        "quantity": _number(_text(root, "OriginalQuantity")),
+        "price": _number(_text(root, "Limit")),
+        "fill_quantity": _number(_text(root, "Quantity", "ExecutionInformation")),
+        "fill_price": _number(_text(root, "ExecutionPrice", "ExecutionInformation")),
+        "leaves_quantity": _number(_text(root, "LeavesQuantity", "ExecutionInformation")),
+    }
+
+
+class PositionState:
+    __slots__ = ("symbol", "asset_type", "quantity", "average_price")
+
+    def __init__(self, symbol, asset_type="EQUITY", quantity=0.0, average_price=0.0):
+        self.symbol = symbol
+        self.asset_type = asset_type
+        self.quantity = quantity  # 空單為負數
+        self.average_price = average_price
+
+    def apply_fill(self, quantity, price):
+        """Add a signed fill, keeping the average price of the open quantity."""
+        new_quantity = self.quantity + quantity
+        if self.quantity == 0 or (new_quantity != 0 and (self.quantity > 0) != (new_quantity > 0)):
+            # 新開倉或翻倉：以成交價為成本
+            self.average_price = price
+        elif abs(new_quantity) > abs(self.quantity):
+            self.average_price = (self.average_price * self.quantity + price * quantity) / new_quantity
+        self.quantity = new_quantity
+
+    def __repr__(self):
+        return f"PositionState({self.symbol!r}, quantity={self.quantity}, average_price={self.average_price})"
+
+
+class TDAccountState:
+    """An in-memory view of one account's positions, working orders and balances.
+
+    ``seed`` loads it once from ``get_account(fields="positions,orders")``;
+    after that fills and order events (from ``TDStreamer`` account activity
+    or from the caller's own order calls) update it incrementally, so
+    strategies read their state from dicts instead of the API.
+    ``reconcile`` re-reads the account and reports what had drifted.
+    """
+
+    def __init__(self, account_id, trading=None):
+        self.account_id = str(account_id)
+        self.trading = trading
+        self.positions = {}         # symbol -> PositionState
+        self.orders = {}            # order_id -> order dict (TD 格式)
+        self.balances = {}
+        self._working_by_symbol = {}  # symbol -> set(order_id)
+        self._lock = threading.RLock()
+        self._reconciler = None
+        self._stop = threading.Event()
+        self.events = 0
+        self._logger = logging.getLogger(__name__)
+
+    # Seeding
+    def seed(self, account=None):
+        """Load state from a ``get_account`` payload (fetched with ``trading`` when omitted)."""
+        if account is None:
+            if self.trading is None:
+                raise ValueError("TDAccountState.seed requires an account payload or a TDAccountsAndTrading")
+            account = self.trading.get_account(self.account_id, fields="positions,orders")
+        account = account.get("securitiesAccount") or account
+        positions = {}
+        for position in account.get("positions") or []:
+            instrument = position.get("instrument") or {}
+            quantity = (position.get("longQuantity") or 0) - (position.get("shortQuantity") or 0)
+            positions[instrument.get("symbol")] = PositionState(
+                instrument.get("symbol"), instrument.get("assetType", "EQUITY"), quantity,
+                position.get("averagePrice") or 0.0)
+        orders = {order["orderId"]: dict(order) for order in _walk(account.get("orderStrategies"))
+                  if "orderId" in order}
+        with self._lock:
+            self.positions = positions
+            self.orders = orders
+            self.balances = dict(account.get("currentBalances") or {})
+            self._working_by_symbol = {}
+            for order_id, order in orders.items():
+                self._index(order_id, order)
+        return self
+
+    def _index(self, order_id, order):
+        working = order.get("status") in WORKING_STATUSES
+        for leg in _legs(order):
+            symbol = (leg.get("instrument") or {}).get("symbol")
+            ids = self._working_by_symbol.setdefault(symbol, set())
+            if working:
+                ids.add(order_id)
+            else:
+                ids.discard(order_id)
+
+    # Queries
+    def quantity(self, symbol):
+        position = self.positions.get(symbol)
+        return position.quantity if position is not None else 0.0
+
+    def position(self, symbol):
+        return self.positions.get(symbol)
+
+    def order(self, order_id):
+        return self.orders.get(order_id)
+
+    def working_orders(self, symbol=None):
+        """Working orders (all, or those with a leg in ``symbol``)."""
+        with self._lock:
+            if symbol is not None:
+                return [self.orders[i] for i in sorted(self._working_by_symbol.get(symbol, ()))]
+            return [o for o in self.orders.values() if o.get("status") in WORKING_STATUSES]
+
+    def open_quantity(self, symbol):
+        """Signed quantity still to be filled by working orders in ``symbol``."""
+        total = 0.0
+        for order in self.working_orders(symbol):
+            remaining = order.get("remainingQuantity")
+            for leg in _legs(order):
+                if (leg.get("instrument") or {}).get("symbol") == symbol:
+                    total += _signed(leg.get("instruction"), remaining if remaining is not None else
+                                     leg.get("quantity") or 0)
+        return total
+
+    # Incremental updates
+    def order_placed(self, order_id, order, status="WORKING"):
+        """Record an order the caller placed (the dict or template-rendered body sent to TD)."""
+        if isinstance(order, (bytes, bytearray)):
+            order = loads(order)
+        with self._lock:
+            order = dict(order, orderId=order_id, status=status)
+            quantity = sum(leg.get("quantity") or 0 for leg in _legs(order)[:1])
+            order.setdefault("quantity", quantity)
+            order.setdefault("filledQuantity", 0.0)
+            order.setdefault("remainingQuantity", quantity)
+            self.orders[order_id] = order
+            self._index(order_id, order)
+            self.events += 1
+        return order
+
+    def order_status(self, order_id, status):
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                return None
+            order["status"] = status
+            self._index(order_id, order)
+            self.events += 1
+            return order
+
+    def order_canceled(self, order_id):
+        return self.order_status(order_id, "CANCELED")
+
+    def order_replaced(self, order_id, new_order_id, order):
+        with self._lock:
+            self.order_status(order_id, "REPLACED")
+            return self.order_placed(new_order_id, order)
+
+    def apply_fill(self, symbol, instruction, quantity, price, order_id=None, asset_type="EQUITY"):
+        """Apply an execution: move the position and cash, and advance the order's filled quantity."""
+        signed = _signed(instruction, quantity)
+        with self._lock:
+            position = self.positions.get(symbol)
+            if position is None:
+                position = self.positions[symbol] = PositionState(symbol, asset_type)
+            position.apply_fill(signed, price)
+            if position.quantity == 0:
+                del self.positions[symbol]
+            if "cashBalance" in self.balances:
+                multiplier = OPTION_MULTIPLIER if asset_type == "OPTION" else 1
+                self.balances["cashBalance"] -= signed * price * multiplier
+            order = self.orders.get(order_id) if order_id is not None else None
+            if order is not None:
+                order["filledQuantity"] = (order.get("filledQuantity") or 0) + quantity
+                remaining = order.get("remainingQuantity")
+                if remaining is not None:
+                    order["remainingQuantity"] = max(remaining - quantity, 0)
+                    if order["remainingQuantity"] == 0:
+                        order["status"] = "FILLED"
+                self._index(order_id, order)
+            self.events += 1
+        return position
+
+    def apply_event(self, event):
+        """Apply an event from ``parse_account_activity``."""
+        kind = event["type"]
+        order_id = event.get("order_id")
+        if kind in ("OrderFill", "OrderPartialFill"):
+            self.apply_fill(event["symbol"], event["instruction"] or "BUY", event["fill_quantity"] or 0,
+                            event["fill_price"] or 0.0, order_id, event["asset_type"])
+            if event.get("leaves_quantity") is not None and order_id in self.orders:
+                with self._lock:
+                    order = self.orders[order_id]
+                    order["remainingQuantity"] = event["leaves_quantity"]
+                    if event["leaves_quantity"] == 0:
+                        order["status"] = "FILLED"
+                    self._index(order_id, order)
+        elif kind in ("OrderEntryRequest", "OrderRoute", "OrderCancelReplaceRequest"):
+            if kind == "OrderCancelReplaceRequest" and event.get("original_order_id"):
+                self.order_status(event["original_order_id"], "REPLACED")
+            if order_id is not None and order_id not in self.orders:
+                leg = {"instruction": event["instruction"], "quantity": event["quantity"],
+                       "instrument": {"symbol": event["symbol"], "assetType": event["asset_type"]}}
+                order = {"orderType": event["order_type"], "orderLegCollection": [leg]}
+                if event.get("price") is not None:
+                    order["price"] = event["price"]
+                self.order_placed(order_id, order, status="QUEUED" if kind == "OrderEntryRequest" else "WORKING")
+            elif kind == "OrderRoute":
+                self.order_status(order_id, "WORKING")
+        elif kind == "UROUT":
+            self.order_canceled(order_id)
+        elif kind == "OrderCancelRequest":
+            self.order_status(order_id, "PENDING_CANCEL")
+        elif kind == "OrderRejection":
+            self.order_status(order_id, "REJECTED")
+
+    def handle_activity(self, message):
+        """A ``TDStreamer.add_handler("ACCT_ACTIVITY", ...)`` callback."""
+        for item in message.get("content", []):
+            if item.get("accountNumber") not in (None, self.account_id):
+                continue
+            try:
+                event = parse_account_activity(item)
+                if event is not None:
+                    self.apply_event(event)
+            except Exception as e:
+                self._logger.error(f"無法處理帳戶活動 {item.get('messageType')}: {e}")
+
+    def attach(self, streamer):
+        streamer.add_handler("ACCT_ACTIVITY", self.handle_activity)
+        return self
+
+    # Reconciliation
+    def snapshot(self):
+        with self._lock:
+            return {
+                "positions": {symbol: p.quantity for symbol, p in self.positions.items()},
+                "orders": {order_id: o.get("status") for order_id, o in self.orders.items()},
+            }
+
+    def reconcile(self, account=None):
+        """Re-seed from the API and return ``{"positions": ..., "orders": ...}`` as ``{key: (local, remote)}`` drift."""
+        before = self.snapshot()
+        self.seed(account)
+        after = self.snapshot()
+        drift = {}
+        for section in ("positions", "orders"):
+            keys = set(before[section]) | set(after[section])
+            drift[section] = {key: (before[section].get(key), after[section].get(key)) for key in keys
+                              if before[section].get(key) != after[section].get(key)}
+        if drift["positions"] or drift["orders"]:
+            self._logger.warning(f"帳戶 {self.account_id} 狀態與 API 不一致: {drift}")
+        return drift
+
+    def _run_reconciler(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.reconcile()
+            except Exception as e:
+                self._logger.error(f"帳戶 {self.account_id} 對帳失敗: {e}")
+
+    def start_reconciliation(self, interval=60):
+        """Reconcile in a daemon thread every ``interval`` seconds."""
+        if self._reconciler is None or not self._reconciler.is_alive():
+            self._stop.clear()
+            self._reconciler = threading.Thread(target=self._run_reconciler, args=(interval,),
+                                                name="TDAccountStateReconcile", daemon=True)
+            self._reconciler.start()
+        return self
+
+    def stop_reconciliation(self, timeout=None):
+        self._stop.set()
+        if self._reconciler is not None:
+            self._reconciler.join(timeout)
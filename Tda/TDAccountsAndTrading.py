@@ -1,54 +1,282 @@
-import requests
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from datetime import date, datetime, timedelta
+from .TDCredentials import TDCredentials
+from .TDMetrics import LatencyHistogram
+from .TDModels import Order, loads, positions_from_account
+from .TDOrderTemplate import serialize_order
+from .TDRateLimiter import PRIORITY_ACCOUNT, PRIORITY_ORDER
+from .TDTransport import TDTransport
+
+DATE_FORMAT = "%Y-%m-%d"  # get_transactions 的 startDate / endDate 格式
+ORDER_CALLS = ("place_order", "replace_order", "cancel_order", "get_order", "get_orders")
+
+
+class BulkOrderResult(dict):
+    """Per-order outcomes keyed by order id: the call's result, or the exception it raised."""
+
+    def __init__(self):
+        super().__init__()
+        self.latencies = {}
+        self.elapsed = 0.0
+
+    @property
+    def errors(self):
+        return {order_id: outcome for order_id, outcome in self.items() if isinstance(outcome, Exception)}
+
+    @property
+    def succeeded(self):
+        return [order_id for order_id, outcome in self.items() if not isinstance(outcome, Exception)]
+
+
+def order_symbols(order, children=False):
+    symbols = {(leg.get("instrument") or {}).get("symbol") for leg in order.get("orderLegCollection") or []}
+    if children:
+        for child in order.get("childOrderStrategies") or []:
+            symbols |= order_symbols(child, children=True)
+    return symbols
+
+
+def cancelable_orders(orders, symbol=None):
+    """Return the ids of cancelable orders (optionally for one symbol), parents before their children.
+
+    A cancelable parent covers its child orders, so they are not listed
+    separately; an OCO container has no legs and matches through its children.
+    """
+    order_ids = []
+    stack = list(reversed(orders or []))
+    while stack:
+        order = stack.pop()
+        matches = symbol is None or symbol in order_symbols(order, children=not order.get("orderLegCollection"))
+        if order.get("cancelable") and matches:
+            order_ids.append(order["orderId"])
+        else:
+            stack.extend(reversed(order.get("childOrderStrategies") or []))
+    return order_ids
+
+
+def order_id_from_location(location):
+    """TD returns a new order's id only in the Location header (``.../orders/<id>``)."""
+    if not location:
+        return None
+    order_id = location.rstrip("/").rsplit("/", 1)[-1]
+    return int(order_id) if order_id.isdigit() else order_id
+
+
+def to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, DATE_FORMAT).date()
+
+
+def transaction_windows(start_date, end_date, window_days=30):
+    """Split the inclusive date range into consecutive ``(startDate, endDate)`` strings."""
+    start, end = to_date(start_date), to_date(end_date)
+    windows = []
+    while start <= end:
+        stop = min(start + timedelta(days=window_days - 1), end)
+        windows.append((start.strftime(DATE_FORMAT), stop.strftime(DATE_FORMAT)))
+        start = stop + timedelta(days=1)
+    return windows
+
+
+class TransactionCheckpoint:
+    """Remembers, per account and filter, the last window that was fully exported."""
+
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def key(account_id, type=None, symbol=None):
+        return f"{account_id}|{type or ''}|{symbol or ''}"
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def load(self, key):
+        return self._read().get(key)
+
+    def save(self, key, through):
+        data = self._read()
+        data[key] = through
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
 
 class TDAccountsAndTrading:
-    def __init__(self, access_token):
-        self.access_token = access_token
+    def __init__(self, access_token, transport=None, order_transport=None):
+        self.credentials = TDCredentials.wrap(access_token)  # 可傳入字串或共用的 TDCredentials
+        self.access_token = self.credentials.access_token
+        self.transport = transport or TDTransport.default()
+        # 下單走不重試的 transport；預設由 transport 衍生，沿用它的 metrics、capture 與 rate limiter
+        self.order_transport = order_transport or self.transport.for_orders()
+        self.order_latency = {name: LatencyHistogram() for name in ORDER_CALLS}
+        self._logger = logging.getLogger(__name__)
         self.base_url = "https://api.tdameritrade.com/v1"
         self.headers = {
             "Authorization": f"Bearer {self.access_token}",
             "Content-Type": "application/json"
         }
+        self.credentials.subscribe(self._on_token_refreshed)
+
+    def _on_token_refreshed(self, access_token):
+        self.access_token = access_token
+        self.headers["Authorization"] = f"Bearer {access_token}"
 
     def _handle_response(self, response):
-        if response.status_code != 200:
-            error_msg = response.json().get("error", "Unknown error.")
+        if response.status_code not in (200, 201):
+            error_msg = (loads(response.content) if response.content else {}).get("error", "Unknown error.")
             raise Exception(f"API Error: {error_msg}")
-        return response.json()
+        # 下單、改單與取消成功時沒有回應內容
+        return loads(response.content) if response.content else None
+
+    def _request(self, method, endpoint, priority=PRIORITY_ACCOUNT, **kwargs):
+        response = self.transport.request(method, endpoint, headers=self.headers, credentials=self.credentials,
+                                          priority=priority, **kwargs)
+        return self._handle_response(response)
+
+    def _order_request(self, name, method, endpoint, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.order_transport.request(method, endpoint, headers=self.headers,
+                                                    credentials=self.credentials, priority=PRIORITY_ORDER, **kwargs)
+        finally:
+            if name is not None:
+                self.order_latency[name].record(time.perf_counter() - started)
+        result = self._handle_response(response)
+        if response.status_code == 201:
+            return order_id_from_location(response.headers.get("Location"))
+        return result
 
     # Account Information
     def get_account(self, account_id, fields=None):
         endpoint = f"{self.base_url}/accounts/{account_id}"
         params = {"fields": fields} if fields else {}
-        response = requests.get(endpoint, headers=self.headers, params=params)
-        return self._handle_response(response)
+        return self._request("GET", endpoint, params=params)
 
     def get_accounts(self, fields=None):
         endpoint = f"{self.base_url}/accounts"
         params = {"fields": fields} if fields else {}
-        response = requests.get(endpoint, headers=self.headers, params=params)
-        return self._handle_response(response)
+        return self._request("GET", endpoint, params=params)
+
+    def get_positions(self, account_id, typed=False):
+        account = self.get_account(account_id, fields="positions")
+        if typed:
+            return positions_from_account(account)
+        return (account.get("securitiesAccount") or account).get("positions", [])
 
     # Order Operations
-    # ... [Other methods, all using _handle_response]
+    def place_order(self, account_id, order, **values):
+        """Place an order (OrderTemplate plus slot values, dict or JSON bytes) and return its id."""
+        endpoint = f"{self.base_url}/accounts/{account_id}/orders"
+        return self._order_request("place_order", "POST", endpoint, data=serialize_order(order, **values))
+
+    def replace_order(self, account_id, order_id, order, **values):
+        """Replace a working order; TD cancels it and returns the id of the new order."""
+        endpoint = f"{self.base_url}/accounts/{account_id}/orders/{order_id}"
+        return self._order_request("replace_order", "PUT", endpoint, data=serialize_order(order, **values))
+
+    def get_order(self, account_id, order_id, typed=False):
+        endpoint = f"{self.base_url}/accounts/{account_id}/orders/{order_id}"
+        result = self._order_request("get_order", "GET", endpoint)
+        return Order.from_json(result) if typed else result
+
+    def get_orders(self, account_id, max_results=None, from_entered_time=None, to_entered_time=None, status=None,
+                   typed=False):
+        endpoint = f"{self.base_url}/accounts/{account_id}/orders"
+        params = {
+            "maxResults": max_results,
+            "fromEnteredTime": from_entered_time,
+            "toEnteredTime": to_entered_time,
+            "status": status,
+        }
+        params = {key: value for key, value in params.items() if value is not None}
+        result = self._order_request("get_orders", "GET", endpoint, params=params)
+        return Order.from_list(result) if typed else result
 
     def cancel_order(self, account_id, order_id):
         endpoint = f"{self.base_url}/accounts/{account_id}/orders/{order_id}"
-        response = requests.delete(endpoint, headers=self.headers)
-        return self._handle_response(response)
+        return self._order_request("cancel_order", "DELETE", endpoint)
+
+    # Bulk Order Operations
+    def _bulk(self, name, calls, max_workers):
+        """Run ``{order_id: callable}`` concurrently; the shared rate limiter still paces every request."""
+        result = BulkOrderResult()
+        if not calls:
+            return result
+        started = time.perf_counter()
+
+        def run(order_id, call):
+            t0 = time.perf_counter()
+            try:
+                outcome = call()
+            except Exception as e:
+                self._logger.error(f"{name} {order_id} 失敗: {e}")
+                outcome = e
+            return order_id, outcome, time.perf_counter() - t0
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(calls))) as executor:
+            for order_id, outcome, latency in executor.map(run, calls, calls.values()):
+                result[order_id] = outcome
+                result.latencies[order_id] = latency
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def cancel_orders(self, account_id, order_ids, max_workers=16):
+        """Cancel several orders at once; returns a BulkOrderResult of ``{order_id: None or exception}``."""
+        calls = {order_id: partial(self.cancel_order, account_id, order_id) for order_id in order_ids}
+        return self._bulk("cancel_order", calls, max_workers)
+
+    def cancel_all_orders(self, account_id, symbol=None, max_workers=16):
+        """Cancel every cancelable order of the account (only ``symbol``'s, if given)."""
+        order_ids = cancelable_orders(self.get_orders(account_id), symbol)
+        return self.cancel_orders(account_id, order_ids, max_workers)
+
+    def cancel_orders_by_symbol(self, account_id, symbol, max_workers=16):
+        return self.cancel_all_orders(account_id, symbol, max_workers)
+
+    def replace_orders(self, account_id, replacements, max_workers=16):
+        """Replace several orders at once.
+
+        ``replacements`` maps ``order_id`` to an order (dict, bytes or a rendered
+        template) or to ``(OrderTemplate, {slot: value})``. Returns a
+        BulkOrderResult of ``{old_order_id: new_order_id or exception}``.
+        """
+        calls = {}
+        for order_id, order in dict(replacements).items():
+            values = {}
+            if isinstance(order, tuple):
+                order, values = order
+            calls[order_id] = partial(self.replace_order, account_id, order_id, order, **values)
+        return self._bulk("replace_order", calls, max_workers)
+
+    def order_latency_snapshot(self):
+        """Return ``{call: {count, mean, min, max, p50, p90, p99}}`` for the order calls made so far."""
+        return {name: histogram.snapshot() for name, histogram in self.order_latency.items() if histogram.count}
 
     # Saved Order Operations
     # ... [Other methods, all using _handle_response]
 
     def delete_saved_order(self, account_id, saved_order_id):
         endpoint = f"{self.base_url}/accounts/{account_id}/savedorders/{saved_order_id}"
-        response = requests.delete(endpoint, headers=self.headers)
-        return self._handle_response(response)
+        return self._order_request(None, "DELETE", endpoint)
 
     # Transaction History
     def get_transaction(self, accountId, transactionId):
         endpoint = f"{self.base_url}/accounts/{accountId}/transactions/{transactionId}"
-        response = requests.get(endpoint, headers=self.headers)
-        return self._handle_response(response)
+        return self._request("GET", endpoint)
 
     def get_transactions(self, accountId, type=None, symbol=None, startDate=None, endDate=None):
         endpoint = f"{self.base_url}/accounts/{accountId}/transactions"
@@ -60,8 +288,54 @@ class TDAccountsAndTrading:
         }
         # Filter out None values
         params = {k: v for k, v in params.items() if v is not None}
-        response = requests.get(endpoint, headers=self.headers, params=params)
-        return self._handle_response(response)
+        return self._request("GET", endpoint, params=params)
+
+    def iter_transactions(self, accountId, startDate, endDate=None, type=None, symbol=None,
+                          window_days=30, prefetch=2, checkpoint=None):
+        """Yield transactions one at a time, window by window, oldest window first.
+
+        Up to ``prefetch`` windows are fetched ahead of the one being consumed,
+        so at most ``prefetch + 1`` windows are held in memory. ``checkpoint``
+        (a path or TransactionCheckpoint) skips windows already exported and
+        records each window once all of its transactions have been yielded;
+        windows reaching today are never recorded, as they may still grow.
+        """
+        windows = transaction_windows(startDate, endDate or date.today(), window_days)
+        if checkpoint is not None and not isinstance(checkpoint, TransactionCheckpoint):
+            checkpoint = TransactionCheckpoint(checkpoint)
+        key = TransactionCheckpoint.key(accountId, type, symbol)
+        if checkpoint is not None:
+            done = checkpoint.load(key)
+            if done:
+                windows = [w for w in windows if w[1] > done]
+        today = date.today().strftime(DATE_FORMAT)
+
+        def fetch(window):
+            return self.get_transactions(accountId, type=type, symbol=symbol, startDate=window[0], endDate=window[1])
+
+        remaining = iter(windows)
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=max(1, prefetch))
+        try:
+            for window in remaining:
+                pending.append((window, executor.submit(fetch, window)))
+                if len(pending) > prefetch:
+                    break
+            while pending:
+                window, future = pending.popleft()
+                transactions = future.result()
+                following = next(remaining, None)
+                if following is not None:
+                    pending.append((following, executor.submit(fetch, following)))
+                yield from transactions
+                del transactions
+                if checkpoint is not None and window[1] < today:
+                    checkpoint.save(key, window[1])
+        finally:
+            # 提前停止迭代時取消尚未開始的請求
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
 
 # Usage Example
 # auth = TDAAuthentication(client_id, redirect_uri)
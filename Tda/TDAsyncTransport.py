@@ -0,0 +1,160 @@
+import asyncio
+import time
+import aiohttp
+import requests
+from .TDModels import loads
+from .TDRateLimiter import PRIORITY_MARKET_DATA
+from .TDTransport import TDTransport, TransportStats
+
+
+class AsyncResponse:
+    """A fully-read response exposing the parts of ``requests.Response`` the clients use."""
+
+    def __init__(self, method, url, status_code, headers, content):
+        self.method = method
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return loads(self.content)
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+class TDAsyncTransport:
+    """A pooled aiohttp transport with bounded concurrency for the async clients."""
+
+    IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "PUT", "DELETE", "OPTIONS"])
+
+    def __init__(self, pool_size=100, max_concurrency=500, timeout=TDTransport.DEFAULT_TIMEOUT,
+                 max_retries=3, backoff_factor=0.3, rate_limiter=None, metrics=None, capture=None):
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics  # TDMetrics；None 時不記錄
+        self.capture = capture  # TDCapture；None 時不擷取
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.stats = TransportStats()
+        self.in_flight = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session = None
+
+    def _trace_config(self):
+        trace = aiohttp.TraceConfig()
+
+        async def on_reuse(session, context, params):
+            self.stats.record_checkout(True)
+
+        async def on_create(session, context, params):
+            self.stats.record_checkout(False)
+
+        trace.on_connection_reuseconn.append(on_reuse)
+        trace.on_connection_create_end.append(on_create)
+        return trace
+
+    def _get_session(self):
+        # aiohttp 的 session 必須在事件迴圈內建立
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=self.timeout, trace_configs=[self._trace_config()]
+            )
+        return self._session
+
+    async def request(self, method, url, params=None, priority=PRIORITY_MARKET_DATA, credentials=None, retry=True,
+                      **kwargs):
+        # retry=False 時不重試 5xx/429 (下單、改單與取消)
+        stale_token = credentials.access_token if credentials is not None else None
+        response = await self._send(method, url, params, priority, retry, kwargs)
+        if response.status_code == 401 and credentials is not None:
+            # 刷新是同步的 HTTP 呼叫，放到執行緒中避免阻塞事件迴圈
+            if await asyncio.to_thread(credentials.refresh, stale_token):
+                kwargs["headers"] = dict(kwargs.get("headers") or {}, Authorization=credentials.authorization_header())
+                if self.metrics is not None:
+                    self.metrics.record_retry(method, url)
+                response = await self._send(method, url, params, priority, retry, kwargs)
+        return response
+
+    async def _send(self, method, url, params, priority, retry, kwargs):
+        if params:
+            # aiohttp 不接受 None 參數，與 requests 一樣將其略過
+            params = {k: str(v) for k, v in params.items() if v is not None}
+        session = self._get_session()
+        metrics, capture = self.metrics, self.capture
+        started = time.perf_counter() if metrics is not None or capture is not None else 0.0
+        attempt = throttles = 0
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                while True:
+                    if self.rate_limiter is not None:
+                        await self.rate_limiter.acquire_async(priority)
+                    self.stats.record_request()
+                    async with session.request(method, url, params=params, **kwargs) as response:
+                        content = await response.read()
+                        result = AsyncResponse(method, str(response.url), response.status,
+                                               response.headers, content)
+                    if result.status_code == 429 and self.rate_limiter is not None:
+                        self.rate_limiter.throttled(result.headers.get("Retry-After"))
+                    if (not retry or result.status_code not in TDTransport.RETRY_STATUSES
+                            or method.upper() not in self.IDEMPOTENT_METHODS
+                            or attempt >= self.max_retries):
+                        if metrics is not None:
+                            metrics.record(method, url, result.status_code, time.perf_counter() - started,
+                                           len(content), retries=attempt, throttles=throttles)
+                        if capture is not None:
+                            capture.record(method, url, params, kwargs.get("json", kwargs.get("data")),
+                                           result.status_code, result.headers, content, time.perf_counter() - started)
+                        return result
+                    throttles += result.status_code == 429
+                    await asyncio.sleep(self._backoff(attempt, result))
+                    attempt += 1
+            except Exception:
+                if metrics is not None:
+                    metrics.record_failure(method, url, time.perf_counter() - started, retries=attempt)
+                raise
+            finally:
+                self.in_flight -= 1
+
+    def _backoff(self, attempt, response):
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff_factor * (2 ** attempt)
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url, **kwargs):
+        return await self.request("PUT", url, **kwargs)
+
+    async def patch(self, url, **kwargs):
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url, **kwargs):
+        return await self.request("DELETE", url, **kwargs)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
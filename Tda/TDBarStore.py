@@ -0,0 +1,261 @@
+import json
+import logging
+import mmap
+import os
+import re
+import sys
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from .TDCandles import TDCandles, COLUMNS, TYPECODES, np
+
+# frequency 字串，例如 "minute1"、"minute5"、"daily1"
+FREQUENCY_PATTERN = re.compile(r"^(minute|daily|weekly|monthly)(\d+)$")
+# 每次請求的最大時間範圍 (TD 對分鐘資料有範圍限制)
+MAX_WINDOW = {
+    "minute": timedelta(days=10),
+    "daily": timedelta(days=365 * 20),
+    "weekly": timedelta(days=365 * 20),
+    "monthly": timedelta(days=365 * 20),
+}
+BAR_LENGTH_MS = {"minute": 60 * 1000, "daily": 24 * 60 * 60 * 1000,
+                 "weekly": 7 * 24 * 60 * 60 * 1000, "monthly": 28 * 24 * 60 * 60 * 1000}
+
+
+def to_epoch_ms(value):
+    if value is None or isinstance(value, int):
+        return value
+    return int(value.timestamp() * 1000)
+
+
+class TDBarStore:
+    """An on-disk bar store keyed by symbol and frequency.
+
+    Each series is a directory of raw little-endian column files
+    (``datetime.bin`` as int64 epoch ms, the rest float64) plus a
+    ``meta.json`` holding the committed row count and the file generation.
+    Merges write a new generation and switch ``meta.json`` last. Reads are memory-mapped,
+    so opening years of minute bars costs no parsing or copying. ``sync``
+    downloads only the ranges missing on disk.
+    """
+
+    def __init__(self, root, data_query=None, max_workers=4):
+        self.root = root
+        self.data_query = data_query
+        self.max_workers = max_workers
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._logger = logging.getLogger(__name__)
+        os.makedirs(root, exist_ok=True)
+
+    # Paths and metadata
+    def _series_dir(self, symbol, frequency):
+        if not FREQUENCY_PATTERN.match(frequency):
+            raise ValueError(f"Invalid frequency '{frequency}', expected e.g. 'minute1' or 'daily1'")
+        return os.path.join(self.root, symbol.upper().replace("/", "_"), frequency)
+
+    def _lock(self, symbol, frequency):
+        key = (symbol.upper(), frequency)
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _read_meta(self, directory):
+        path = os.path.join(directory, "meta.json")
+        if not os.path.exists(path):
+            return {"count": 0, "first": None, "last": None}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_meta(self, directory, meta):
+        path = os.path.join(directory, "meta.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _column_path(directory, name, meta):
+        # 第 0 代沿用 close.bin；合併重寫後為 close.<generation>.bin
+        generation = meta.get("generation", 0)
+        return os.path.join(directory, f"{name}.bin" if not generation else f"{name}.{generation}.bin")
+
+    def info(self, symbol, frequency):
+        return self._read_meta(self._series_dir(symbol, frequency))
+
+    def symbols(self):
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+
+    # Writing
+    @staticmethod
+    def _encode(values, name):
+        data = array(TYPECODES[name], values)
+        if sys.byteorder != "little":
+            data.byteswap()
+        return data.tobytes()
+
+    def append(self, symbol, frequency, candles):
+        """Append candles newer than the stored range; older or duplicate rows are merged by rewrite."""
+        candles = sorted(candles, key=lambda c: c["datetime"])
+        if not candles:
+            return 0
+        directory = self._series_dir(symbol, frequency)
+        with self._lock(symbol, frequency):
+            os.makedirs(directory, exist_ok=True)
+            meta = self._read_meta(directory)
+            self._truncate_uncommitted(directory, meta)
+            if meta["last"] is not None and candles[0]["datetime"] <= meta["last"]:
+                return self._rewrite(symbol, directory, meta, candles)
+
+            for name in COLUMNS:
+                with open(self._column_path(directory, name, meta), "ab") as f:
+                    f.write(self._encode([c[name] for c in candles], name))
+            # meta 最後才更新，中途失敗的寫入會在下次被截掉
+            meta = dict(
+                meta,
+                count=meta["count"] + len(candles),
+                first=meta["first"] if meta["first"] is not None else candles[0]["datetime"],
+                last=candles[-1]["datetime"],
+            )
+            self._write_meta(directory, meta)
+            return len(candles)
+
+    def _truncate_uncommitted(self, directory, meta):
+        count = meta["count"]
+        for name in COLUMNS:
+            path = self._column_path(directory, name, meta)
+            if os.path.exists(path) and os.path.getsize(path) > count * 8:
+                with open(path, "r+b") as f:
+                    f.truncate(count * 8)
+
+    def _rewrite(self, symbol, directory, meta, candles):
+        existing = self.read(symbol, os.path.basename(directory)).to_price_history()["candles"]
+        merged = {c["datetime"]: c for c in existing}
+        added = sum(1 for c in candles if c["datetime"] not in merged)
+        merged.update((c["datetime"], c) for c in candles)
+        rows = [merged[key] for key in sorted(merged)]
+        # 寫入新一代的欄位檔，meta 切換後才生效；中途失敗時讀取端仍看到完整的舊資料
+        meta = dict(meta, count=len(rows), first=rows[0]["datetime"], last=rows[-1]["datetime"],
+                    generation=meta.get("generation", 0) + 1)
+        for name in COLUMNS:
+            with open(self._column_path(directory, name, meta), "wb") as f:
+                f.write(self._encode([c[name] for c in rows], name))
+        self._write_meta(directory, meta)
+        self._remove_stale(directory, meta)
+        return added
+
+    def _remove_stale(self, directory, meta):
+        current = {os.path.basename(self._column_path(directory, name, meta)) for name in COLUMNS}
+        for filename in os.listdir(directory):
+            if filename.endswith(".bin") and filename not in current:
+                try:
+                    os.remove(os.path.join(directory, filename))
+                except OSError as e:
+                    # Windows 上仍被 mmap 的舊檔無法刪除，留到下次重寫時再清理
+                    self._logger.debug(f"無法刪除舊的欄位檔 {filename}: {e}")
+
+    # Reading
+    def _map_column(self, directory, name, meta):
+        path, count = self._column_path(directory, name, meta), meta["count"]
+        if np is not None:
+            dtype = "<i8" if TYPECODES[name] == "q" else "<f8"
+            return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), count * 8, access=mmap.ACCESS_READ)
+        return memoryview(mapped).cast(TYPECODES[name])
+
+    def read(self, symbol, frequency, start=None, end=None):
+        """Return memory-mapped TDCandles, optionally limited to ``start <= datetime < end``."""
+        directory = self._series_dir(symbol, frequency)
+        for attempt in range(2):
+            meta = self._read_meta(directory)
+            if meta["count"] == 0:
+                return TDCandles.from_columns(symbol.upper(), **{name: [] for name in COLUMNS})
+            try:
+                candles = TDCandles(symbol.upper(), *(self._map_column(directory, name, meta) for name in COLUMNS))
+                break
+            except FileNotFoundError:
+                # 讀取 meta 之後剛好被重寫，改讀新一代的檔案
+                if attempt:
+                    raise
+        return candles.between(to_epoch_ms(start), to_epoch_ms(end))
+
+    # Synchronisation
+    def missing_ranges(self, symbol, frequency, start, end):
+        """Return the (start_ms, end_ms) ranges not yet on disk."""
+        start, end = to_epoch_ms(start), to_epoch_ms(end)
+        kind = FREQUENCY_PATTERN.match(frequency).group(1)
+        step = BAR_LENGTH_MS[kind]
+        meta = self.info(symbol, frequency)
+        # synced_from / synced_to 記錄已經查詢過的範圍，避免重複查詢沒有資料的區間 (例如週末)
+        lows = [v for v in (meta["first"], meta.get("synced_from")) if v is not None]
+        highs = [v for v in (meta["last"], meta.get("synced_to")) if v is not None]
+        if not lows:
+            return [(start, end)]
+        ranges = []
+        if start < min(lows):
+            ranges.append((start, min(lows) - 1))
+        if end > max(highs) + step:
+            ranges.append((max(highs) + 1, end))
+        return ranges
+
+    def _windows(self, frequency, ranges):
+        kind = FREQUENCY_PATTERN.match(frequency).group(1)
+        window = int(MAX_WINDOW[kind].total_seconds() * 1000)
+        for start, end in ranges:
+            while start <= end:
+                yield start, min(start + window - 1, end)
+                start += window
+
+    def _fetch(self, symbol, frequency, start, end):
+        kind, size = FREQUENCY_PATTERN.match(frequency).groups()
+        result = self.data_query.get_price_history(
+            symbol, frequencyType=kind, frequency=int(size), startDate=start, endDate=end,
+            periodType="day" if kind == "minute" else "year",
+        )
+        return [c for c in result.get("candles", []) if start <= c["datetime"] <= end]
+
+    def sync_symbol(self, symbol, frequency, start=None, end=None):
+        if start is None:
+            # 未指定起點時從已同步的範圍接續，只補上最新的資料
+            meta = self.info(symbol, frequency)
+            start = meta.get("synced_from") if meta.get("synced_from") is not None else meta["first"]
+            if start is None:
+                raise ValueError(f"No stored bars for {symbol} {frequency}; pass start for the first sync")
+        start = to_epoch_ms(start)
+        end = to_epoch_ms(end) if end is not None else int(datetime.now().timestamp() * 1000)
+        fetched = 0
+        for window_start, window_end in self._windows(frequency, self.missing_ranges(symbol, frequency, start, end)):
+            candles = self._fetch(symbol, frequency, window_start, window_end)
+            fetched += self.append(symbol, frequency, candles)
+
+        directory = self._series_dir(symbol, frequency)
+        with self._lock(symbol, frequency):
+            os.makedirs(directory, exist_ok=True)
+            meta = self._read_meta(directory)
+            meta["synced_from"] = min(v for v in (start, meta.get("synced_from")) if v is not None)
+            # 尚未收盤的最後一根 K 線下次仍要重新查詢
+            settled = min(end, int(datetime.now().timestamp() * 1000) - BAR_LENGTH_MS[FREQUENCY_PATTERN.match(frequency).group(1)])
+            meta["synced_to"] = max(v for v in (settled, meta.get("synced_to")) if v is not None)
+            self._write_meta(directory, meta)
+        return fetched
+
+    def sync(self, symbols, frequency, start=None, end=None):
+        """Download only the missing ranges for each symbol; returns new rows per symbol.
+
+        Without ``start`` each symbol continues from its stored range.
+        """
+        if self.data_query is None:
+            raise ValueError("TDBarStore.sync requires a TDDataQuery")
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {symbol: executor.submit(self.sync_symbol, symbol, frequency, start, end) for symbol in symbols}
+            for symbol, future in futures.items():
+                try:
+                    results[symbol] = future.result()
+                except Exception as e:
+                    self._logger.error(f"同步 {symbol} {frequency} 失敗: {e}")
+                    results[symbol] = e
+        return results
@@ -0,0 +1,182 @@
+import logging
+import os
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Check if we are in a Docker environment
+IN_DOCKER = os.environ.get('IN_DOCKER', 'False').lower() == 'true'
+
+
+def create_chrome_driver():
+    """Start a headless Chrome; selenium is imported here so it only loads when a browser is needed."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--disable-webgl')
+    return webdriver.Chrome(options=chrome_options)
+
+
+def start_virtual_display():
+    if not IN_DOCKER:
+        return None
+    from pyvirtualdisplay import Display
+    display = Display(visible=0, size=(1600, 900))
+    display.start()
+    return display
+
+
+class _PooledDriver:
+    __slots__ = ("driver", "uses")
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+
+
+class TDBrowserPool:
+    """Keeps warm browser drivers for ``TDAAuthentication.get_authentication_code``.
+
+    At most ``size`` drivers exist at once; a checkout waits for a free one.
+    Cookies and storage are wiped before a driver is handed to the next
+    account, and a driver is retired after ``max_uses`` logins or any error.
+    Under Docker one virtual display is shared by every driver.
+    """
+
+    def __init__(self, size=2, driver_factory=None, max_uses=50):
+        self.size = size
+        self.max_uses = max_uses
+        self.driver_factory = driver_factory or create_chrome_driver
+        self.created = 0
+        self.reused = 0
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._display = None
+        self._closed = False
+        self._logger = logging.getLogger(__name__)
+
+    def _new_driver(self):
+        with self._lock:
+            if self._display is None and self.driver_factory is create_chrome_driver:
+                self._display = start_virtual_display()
+            self.created += 1
+        return _PooledDriver(self.driver_factory())
+
+    def warm(self, count=None):
+        """Start up to ``count`` (default ``size``) idle drivers in parallel."""
+        count = min(count or self.size, self.size)
+        with self._lock:
+            missing = count - len(self._idle)
+        if missing <= 0:
+            return
+        with ThreadPoolExecutor(max_workers=missing) as executor:
+            entries = list(executor.map(lambda _: self._new_driver(), range(missing)))
+        with self._lock:
+            self._idle.extend(entries)
+
+    @staticmethod
+    def _reset(driver):
+        """Wipe everything the previous account left behind."""
+        origin = None
+        try:
+            parts = urllib.parse.urlsplit(driver.current_url)
+            if parts.scheme in ("http", "https"):
+                origin = f"{parts.scheme}://{parts.netloc}"
+        except Exception:
+            pass
+        if hasattr(driver, "execute_cdp_cmd"):
+            # delete_all_cookies 只清目前網域，改用 DevTools 清除全部
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            if origin:
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+        else:
+            driver.delete_all_cookies()
+        driver.get("about:blank")
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """Check out a clean driver; it returns to the pool when the block exits normally."""
+        if self._closed:
+            raise RuntimeError("TDBrowserPool is closed")
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("No browser available in TDBrowserPool")
+        entry = None
+        healthy = False
+        try:
+            with self._lock:
+                if self._idle:
+                    entry = self._idle.pop()
+                    self.reused += 1
+            if entry is None:
+                entry = self._new_driver()
+            entry.uses += 1
+            yield entry.driver
+            healthy = True
+        finally:
+            try:
+                if entry is not None:
+                    self._checkin(entry, healthy)
+            finally:
+                self._slots.release()
+
+    def _checkin(self, entry, healthy):
+        if healthy and not self._closed and entry.uses < self.max_uses:
+            try:
+                self._reset(entry.driver)
+                with self._lock:
+                    self._idle.append(entry)
+                return
+            except Exception as e:
+                self._logger.warning(f"重設瀏覽器失敗，改為關閉: {e}")
+        self._quit(entry)
+
+    def _quit(self, entry):
+        try:
+            entry.driver.quit()
+        except Exception as e:
+            self._logger.warning(f"關閉瀏覽器失敗: {e}")
+
+    def login(self, auth, td_account_id, td_password):
+        """Run one OAuth login with a pooled driver and return the authorization code."""
+        return auth.get_authentication_code(td_account_id, td_password, browser_pool=self)
+
+    def login_many(self, logins, max_workers=None):
+        """Run ``(auth, td_account_id, td_password)`` logins concurrently.
+
+        Returns ``{td_account_id: code}``; a failed login maps to its exception.
+        """
+        logins = list(logins)
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers or self.size) as executor:
+            futures = {account: executor.submit(self.login, auth, account, password)
+                       for auth, account, password in logins}
+            for account, future in futures.items():
+                try:
+                    results[account] = future.result()
+                except Exception as e:
+                    self._logger.error(f"帳戶 {account} 登入失敗: {e}")
+                    results[account] = e
+        return results
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+            display, self._display = self._display, None
+        for entry in idle:
+            self._quit(entry)
+        if display is not None:
+            display.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
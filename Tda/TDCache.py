@@ -0,0 +1,201 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# 各端點的預設存活時間 (秒)
+DEFAULT_TTLS = {
+    "market_hours": 6 * 60 * 60,
+    "instruments": 24 * 60 * 60,
+    "instrument_cusip": 7 * 24 * 60 * 60,
+}
+
+
+class MemoryCacheBackend:
+    """An in-process LRU store bounded by the total size of the cached payloads."""
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, payload = entry
+            if expires < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def set(self, key, payload, ttl):
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + ttl, payload)
+            self.size += len(payload)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _, payload = self._entries.pop(key)
+        self.size -= len(payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskCacheBackend:
+    """A persistent SQLite store so warm starts can skip the network."""
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, expires REAL, accessed REAL, size INTEGER, payload BLOB)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT expires, payload FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[0] < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+            return bytes(row[1])
+
+    def set(self, key, payload, ttl):
+        if len(payload) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, expires, accessed, size, payload) VALUES (?, ?, ?, ?, ?)",
+                (key, now + ttl, now, len(payload), payload),
+            )
+            self._evict()
+
+    def _evict(self):
+        self._conn.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 依最近存取時間淘汰最舊的項目 (LRU)
+        for key, size in self._conn.execute("SELECT key, size FROM cache ORDER BY accessed").fetchall():
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    @property
+    def size(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class TDCache:
+    """A response cache with per-endpoint TTLs and request coalescing.
+
+    Payloads are stored as JSON so every caller gets its own copy and the
+    backend can account for size exactly. Concurrent identical calls wait
+    on the single in-flight request instead of issuing their own.
+    """
+
+    def __init__(self, backend=None, ttls=None):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(endpoint, url, params=None):
+        items = sorted((k, str(v)) for k, v in (params or {}).items() if v is not None)
+        return json.dumps([endpoint, url, items], separators=(",", ":"))
+
+    def get_or_fetch(self, endpoint, url, params, fetch):
+        ttl = self.ttls.get(endpoint)
+        if not ttl:
+            return fetch()
+
+        key = self.make_key(endpoint, url, params)
+        payload = self.backend.get(key)
+        if payload is not None:
+            self.hits += 1
+            return json.loads(payload)
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            self.coalesced += 1
+            return json.loads(future.result())
+
+        self.misses += 1
+        try:
+            value = fetch()
+            payload = json.dumps(value, separators=(",", ":")).encode()
+            # 錯誤回應不快取
+            if not (isinstance(value, dict) and "error" in value):
+                self.backend.set(key, payload, ttl)
+            future.set_result(payload)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "entries": len(self.backend),
+            "bytes": self.backend.size,
+        }
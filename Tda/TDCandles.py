@@ -0,0 +1,119 @@
+import bisect
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # numpy 為可選套件，沒有時改用 array.array
+    np = None
+
+COLUMNS = ("datetime", "open", "high", "low", "close", "volume")
+# array.array 的型別代碼：datetime 為毫秒 (int64)，價格與成交量為 float64
+TYPECODES = {"datetime": "q", "open": "d", "high": "d", "low": "d", "close": "d", "volume": "d"}
+
+
+def _column(values, name):
+    if np is not None:
+        return np.asarray(values, dtype=np.int64 if TYPECODES[name] == "q" else np.float64)
+    return memoryview(array(TYPECODES[name], values))
+
+
+class TDCandles:
+    """Candles from ``get_price_history`` stored as contiguous typed columns.
+
+    Columns are NumPy arrays when NumPy is installed and ``memoryview``
+    over ``array.array`` otherwise; either way slicing never copies.
+    ``datetime`` holds epoch milliseconds and must be ascending.
+    """
+
+    __slots__ = ("symbol", "datetime", "open", "high", "low", "close", "volume")
+
+    def __init__(self, symbol, datetime, open, high, low, close, volume):
+        self.symbol = symbol
+        self.datetime = datetime
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    @classmethod
+    def from_columns(cls, symbol, **columns):
+        return cls(symbol, *(_column(columns[name], name) for name in COLUMNS))
+
+    @classmethod
+    def from_price_history(cls, payload):
+        candles = payload.get("candles") or []
+        columns = {name: [candle[name] for candle in candles] for name in COLUMNS}
+        return cls.from_columns(payload.get("symbol"), **columns)
+
+    def __len__(self):
+        return len(self.datetime)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TDCandles(self.symbol, *(getattr(self, name)[index] for name in COLUMNS))
+        return {name: getattr(self, name)[index] for name in COLUMNS}
+
+    def columns(self):
+        return {name: getattr(self, name) for name in COLUMNS}
+
+    def _search(self, value, side):
+        if np is not None:
+            return int(np.searchsorted(self.datetime, value, side=side))
+        search = bisect.bisect_left if side == "left" else bisect.bisect_right
+        return search(self.datetime, value)
+
+    def between(self, start=None, end=None):
+        """Return a zero-copy view of candles with ``start <= datetime < end`` (epoch ms)."""
+        lo = 0 if start is None else self._search(start, "left")
+        hi = len(self) if end is None else self._search(end, "left")
+        return self[lo:hi]
+
+    def resample(self, minutes, offset_ms=0):
+        """Aggregate into coarser bars of ``minutes`` each, aligned to ``offset_ms``.
+
+        Each output bar is stamped with the start of its bucket.
+        """
+        if len(self) == 0:
+            return self
+        size = int(minutes * 60 * 1000)
+        if np is not None:
+            buckets = (self.datetime - offset_ms) // size
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            ends = np.r_[starts[1:], len(buckets)] - 1
+            return TDCandles(
+                self.symbol,
+                buckets[starts] * size + offset_ms,
+                self.open[starts],
+                np.maximum.reduceat(self.high, starts),
+                np.minimum.reduceat(self.low, starts),
+                self.close[ends],
+                np.add.reduceat(self.volume, starts),
+            )
+
+        out = {name: [] for name in COLUMNS}
+        current = None
+        for i in range(len(self)):
+            bucket = (self.datetime[i] - offset_ms) // size
+            if bucket != current:
+                current = bucket
+                out["datetime"].append(bucket * size + offset_ms)
+                out["open"].append(self.open[i])
+                out["high"].append(self.high[i])
+                out["low"].append(self.low[i])
+                out["close"].append(self.close[i])
+                out["volume"].append(self.volume[i])
+            else:
+                out["high"][-1] = max(out["high"][-1], self.high[i])
+                out["low"][-1] = min(out["low"][-1], self.low[i])
+                out["close"][-1] = self.close[i]
+                out["volume"][-1] += self.volume[i]
+        return TDCandles.from_columns(self.symbol, **out)
+
+    def to_price_history(self):
+        """Rebuild the raw ``get_price_history`` shape."""
+        candles = [
+            {name: (int(v) if name == "datetime" else float(v)) for name, v in zip(COLUMNS, row)}
+            for row in zip(*(getattr(self, name) for name in COLUMNS))
+        ]
+        return {"symbol": self.symbol, "empty": not candles, "candles": candles}
@@ -0,0 +1,438 @@
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from bisect import bisect_left
+from collections import deque, namedtuple
+from itertools import accumulate
+from urllib.parse import parse_qsl, urlencode, urlsplit
+import requests
+from requests.structures import CaseInsensitiveDict
+from .TDBarStore import to_epoch_ms
+from .TDMetrics import endpoint_name
+from .TDRateLimiter import PRIORITY_MARKET_DATA
+from .TDTransport import TransportStats
+
+# 日誌中每個區塊：magic、壓縮後長度、筆數、第一筆與最後一筆的時間 (epoch ms)、crc32
+BLOCK = struct.Struct("<4sIIqqI")
+BLOCK_MAGIC = b"TDCB"
+# 區塊內每筆紀錄：時間、耗時 (µs)、狀態碼，以及 method/url/request/headers/content 的長度
+RECORD = struct.Struct("<qIHHIIII")
+# 索引中每個區塊：位移、總長度、筆數、時間範圍、端點數，後接各端點名稱 (<H 長度 + UTF-8)
+INDEX = struct.Struct("<QIIqqH")
+NAME_LENGTH = struct.Struct("<H")
+# OAuth 授權碼與 token 在寫入日誌前以 REDACTED 取代
+SECRET_FIELDS = frozenset(["code", "access_token", "refresh_token"])
+REDACTED = "REDACTED"
+
+
+def _redact_fields(payload):
+    return {k: REDACTED if k in SECRET_FIELDS else v for k, v in payload.items()}
+
+
+def redact_body(body):
+    """Replace OAuth codes and tokens in a request body (a dict, form-encoded or JSON text)."""
+    if isinstance(body, dict):
+        return body if SECRET_FIELDS.isdisjoint(body) else _redact_fields(body)
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+    if not isinstance(body, str) or not any(field in body for field in SECRET_FIELDS):
+        return body
+    if body.lstrip().startswith("{"):
+        try:
+            return redact_body(json.loads(body))
+        except ValueError:
+            return REDACTED
+    return urlencode([(k, REDACTED if k in SECRET_FIELDS else v) for k, v in parse_qsl(body, keep_blank_values=True)])
+
+
+def redact_content(content):
+    """Replace the tokens in a token response; other responses are returned unchanged."""
+    if not content or (b'"access_token"' not in content and b'"refresh_token"' not in content):
+        return content
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        return REDACTED.encode()
+    if not isinstance(payload, dict):
+        return REDACTED.encode()
+    return json.dumps(_redact_fields(payload)).encode()
+
+
+def encode_body(body):
+    """Canonical text of a request body, so captured and live requests compare equal."""
+    if body is None or isinstance(body, str):
+        return body
+    if isinstance(body, bytes):
+        return body.decode("utf-8", errors="replace")
+    return json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class CapturedExchange(namedtuple("CapturedExchange", ["timestamp", "elapsed", "method", "url", "params", "body",
+                                                       "status", "headers", "content"])):
+    """One request/response pair; ``timestamp`` is when the response arrived (epoch ms)."""
+
+    __slots__ = ()
+
+    @property
+    def endpoint(self):
+        return endpoint_name(self.method, self.url)
+
+    def response(self):
+        """Rebuild the ``requests.Response`` the client originally received."""
+        response = requests.Response()
+        response.status_code = self.status
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.content
+        response.url = self.url
+        response.encoding = "utf-8"
+        return response
+
+
+CaptureBlock = namedtuple("CaptureBlock", ["offset", "length", "count", "first", "last", "endpoints"])
+
+
+def _encode_block(records):
+    parts = []
+    endpoints = set()
+    for timestamp, seconds, method, url, params, body, status, headers, content in records:
+        method_bytes, url_bytes = method.encode(), url.encode()
+        request = json.dumps({"params": params, "body": body}, default=str).encode()
+        header_bytes = json.dumps(headers).encode()
+        content = content or b""
+        parts.append(RECORD.pack(timestamp, min(int(seconds * 1e6), 0xFFFFFFFF), status, len(method_bytes),
+                                 len(url_bytes), len(request), len(header_bytes), len(content)))
+        parts += (method_bytes, url_bytes, request, header_bytes, content)
+        endpoints.add(endpoint_name(method, url))
+    return b"".join(parts), endpoints
+
+
+def _decode_block(payload):
+    view = memoryview(payload)
+    position = 0
+    while position < len(view):
+        timestamp, micros, status, *lengths = RECORD.unpack_from(view, position)
+        position += RECORD.size
+        fields = []
+        for length in lengths:
+            fields.append(view[position:position + length])
+            position += length
+        method, url, request, headers, content = fields
+        request = json.loads(bytes(request))
+        yield CapturedExchange(timestamp, micros / 1e6, str(method, "utf-8"), str(url, "utf-8"), request["params"],
+                               request["body"], status, json.loads(bytes(headers)), bytes(content))
+
+
+def _encode_index_entry(block):
+    names = sorted(block.endpoints)
+    parts = [INDEX.pack(block.offset, block.length, block.count, block.first, block.last, len(names))]
+    for name in names:
+        encoded = name.encode()
+        parts += (NAME_LENGTH.pack(len(encoded)), encoded)
+    return b"".join(parts)
+
+
+class TDCapture:
+    """Appends every request/response seen by a transport to a compressed, append-only log.
+
+    Pass it as ``TDTransport(capture=...)`` / ``TDAsyncTransport(capture=...)``
+    (or set ``transport.capture`` on a running one) and every client using
+    that transport is captured. ``record`` only appends to an in-memory
+    queue; a background thread batches the records into zlib-compressed
+    blocks and writes them, with one index entry per block in
+    ``path + ".idx"``, so the request path never waits on compression or
+    disk. If the writer falls ``max_pending`` records behind, new records
+    are dropped and counted in ``dropped`` rather than blocking.
+
+    Request headers are never captured, and OAuth codes and tokens in
+    request bodies and token responses (``SECRET_FIELDS``) are replaced
+    with ``"REDACTED"`` before they are queued.
+    """
+
+    def __init__(self, path, block_records=256, flush_interval=0.5, level=6, max_pending=100000):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.block_records = block_records
+        self.flush_interval = flush_interval
+        self.level = level
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.blocks_written = 0
+        self._pending = deque()
+        self._wake = threading.Event()
+        self._closed = False
+        self._logger = logging.getLogger(__name__)
+        self._log = open(path, "ab")
+        self._index = open(self.index_path, "ab")
+        self._offset = self._log.tell()
+        self._thread = threading.Thread(target=self._run, name="TDCaptureWriter", daemon=True)
+        self._thread.start()
+
+    def record(self, method, url, params, body, status, headers, content, seconds):
+        """Queue one exchange; called by the transport after each response."""
+        if self._closed:
+            return
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        # 參數與 body 在此複製，避免呼叫端之後修改
+        self._pending.append((int(time.time() * 1000), seconds, method.upper(), url, dict(params) if params else None,
+                              encode_body(redact_body(body)), status, dict(headers), redact_content(content)))
+        if len(self._pending) >= self.block_records:
+            self._wake.set()
+
+    def flush(self, timeout=None):
+        """Wait until everything recorded so far is on disk."""
+        done = threading.Event()
+        self._pending.append(done)
+        self._wake.set()
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            closing = self._closed
+            self._drain()
+            if closing:
+                break
+        self._log.close()
+        self._index.close()
+
+    def _drain(self):
+        batch = []
+        while self._pending:
+            item = self._pending.popleft()
+            if isinstance(item, threading.Event):
+                self._write(batch)
+                batch = []
+                item.set()
+                continue
+            batch.append(item)
+            if len(batch) >= self.block_records:
+                self._write(batch)
+                batch = []
+        self._write(batch)
+
+    def _write(self, records):
+        if not records:
+            return
+        try:
+            payload, endpoints = _encode_block(records)
+            compressed = zlib.compress(payload, self.level)
+            first, last = records[0][0], records[-1][0]
+            header = BLOCK.pack(BLOCK_MAGIC, len(compressed), len(records), first, last, zlib.crc32(compressed))
+            self._log.write(header + compressed)
+            self._log.flush()
+            block = CaptureBlock(self._offset, BLOCK.size + len(compressed), len(records), first, last, endpoints)
+            self._offset += block.length
+            self._index.write(_encode_index_entry(block))
+            self._index.flush()
+            self.blocks_written += 1
+        except Exception:
+            self._logger.exception("無法寫入擷取日誌 %s，捨棄 %d 筆紀錄", self.path, len(records))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TDCaptureLog:
+    """Reads a TDCapture log, seeking through its index by time and endpoint.
+
+    Only the blocks whose time range and endpoint set can match are read
+    and decompressed. Blocks missing from the index (the writer was
+    stopped between the two writes) are recovered by scanning the end of
+    the log; a torn block at the very end is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.blocks = self._read_index(path + ".idx")
+        size = os.path.getsize(path)
+        end = self.blocks[-1].offset + self.blocks[-1].length if self.blocks else 0
+        if end < size:
+            self.blocks += self._scan(end, size)
+        # 區塊依寫入順序排列；以累計最大值搜尋，時鐘回撥也不會漏掉區塊
+        self._last = list(accumulate((block.last for block in self.blocks), max))
+
+    def _read_index(self, index_path):
+        blocks = []
+        try:
+            with open(index_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return blocks
+        log_size = os.path.getsize(self.path)
+        position = 0
+        while position + INDEX.size <= len(data):
+            offset, length, count, first, last, names = INDEX.unpack_from(data, position)
+            cursor = position + INDEX.size
+            endpoints = set()
+            for _ in range(names):
+                if cursor + NAME_LENGTH.size > len(data):
+                    return blocks
+                (size,) = NAME_LENGTH.unpack_from(data, cursor)
+                endpoints.add(data[cursor + NAME_LENGTH.size:cursor + NAME_LENGTH.size + size].decode())
+                cursor += NAME_LENGTH.size + size
+            if cursor > len(data) or offset + length > log_size:
+                break
+            blocks.append(CaptureBlock(offset, length, count, first, last, frozenset(endpoints)))
+            position = cursor
+        return blocks
+
+    def _scan(self, offset, size):
+        blocks = []
+        with open(self.path, "rb") as f:
+            while offset + BLOCK.size <= size:
+                f.seek(offset)
+                magic, length, count, first, last, crc = BLOCK.unpack(f.read(BLOCK.size))
+                compressed = f.read(length)
+                if magic != BLOCK_MAGIC or len(compressed) < length or zlib.crc32(compressed) != crc:
+                    break
+                endpoints = frozenset(r.endpoint for r in _decode_block(zlib.decompress(compressed)))
+                blocks.append(CaptureBlock(offset, BLOCK.size + length, count, first, last, endpoints))
+                offset += BLOCK.size + length
+        return blocks
+
+    def __len__(self):
+        return sum(block.count for block in self.blocks)
+
+    def __iter__(self):
+        return self.records()
+
+    def endpoints(self):
+        return sorted(set().union(*(block.endpoints for block in self.blocks)))
+
+    def time_range(self):
+        """(first, last) response time in epoch ms, or None for an empty log."""
+        if not self.blocks:
+            return None
+        return min(block.first for block in self.blocks), self._last[-1]
+
+    def records(self, start=None, end=None, endpoint=None):
+        """Yield the captured exchanges between ``start`` and ``end`` (inclusive), optionally for some endpoints.
+
+        ``start``/``end`` are epoch ms or datetimes; ``endpoint`` is one
+        ``endpoint_name`` (e.g. ``"GET /v1/marketdata/{symbol}/quotes"``) or a collection of them.
+        """
+        start, end = to_epoch_ms(start), to_epoch_ms(end)
+        wanted = {endpoint} if isinstance(endpoint, str) else set(endpoint) if endpoint is not None else None
+        first_block = bisect_left(self._last, start) if start is not None else 0
+        with open(self.path, "rb") as f:
+            for block in self.blocks[first_block:]:
+                if end is not None and block.first > end:
+                    break
+                if wanted is not None and not wanted & block.endpoints:
+                    continue
+                f.seek(block.offset + BLOCK.size)
+                for record in _decode_block(zlib.decompress(f.read(block.length - BLOCK.size))):
+                    if start is not None and record.timestamp < start or end is not None and record.timestamp > end:
+                        continue
+                    if wanted is None or record.endpoint in wanted:
+                        yield record
+
+
+class TDReplayTransport:
+    """Serves a TDCapture log back through the TDTransport interface, without any network.
+
+    Requests are matched on method, URL path, query parameters and body;
+    the host is ignored, so a capture of the live API replays under any
+    ``base_url``, and so are the ``ignore_params`` (the client id by
+    default). Repeats of the same request get the captured responses in
+    their original order, and the last one once they run out, so a replay
+    of the same calls is deterministic. ``replay_latency=True`` also
+    sleeps for each response's recorded latency.
+    """
+
+    def __init__(self, log, start=None, end=None, endpoint=None, ignore_params=("apikey",), replay_latency=False):
+        if isinstance(log, str):
+            log = TDCaptureLog(log)
+        self.ignore_params = frozenset(ignore_params)
+        self.replay_latency = replay_latency
+        self.stats = TransportStats()
+        self.metrics = None
+        self.capture = None
+        self._responses = {}
+        self._positions = {}
+        self._lock = threading.Lock()
+        for record in log.records(start, end, endpoint):
+            key = self.key(record.method, record.url, record.params, record.body)
+            self._responses.setdefault(key, []).append(record)
+
+    def key(self, method, url, params=None, body=None):
+        parts = urlsplit(url)
+        query = dict(parse_qsl(parts.query))
+        query.update(params or {})
+        query = {k: v for k, v in query.items() if v is not None and k not in self.ignore_params}
+        # 擷取時已遮蔽 token，比對時也一樣遮蔽
+        return (method.upper(), parts.path, json.dumps(query, sort_keys=True, default=str),
+                encode_body(redact_body(body)))
+
+    def __len__(self):
+        return sum(len(records) for records in self._responses.values())
+
+    def reset(self):
+        """Rewind every request to its first captured response."""
+        with self._lock:
+            self._positions.clear()
+
+    def _next(self, key, method, url):
+        records = self._responses.get(key)
+        if not records:
+            raise LookupError(f"No captured response for {method} {url}")
+        with self._lock:
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+        return records[min(position, len(records) - 1)]
+
+    def request(self, method, url, priority=PRIORITY_MARKET_DATA, credentials=None, **kwargs):
+        self.stats.record_request()
+        key = self.key(method, url, kwargs.get("params"), kwargs.get("json", kwargs.get("data")))
+        record = self._next(key, method, url)
+        # 擷取時的 401 之後是刷新 token 後的重試，直接送出下一筆回應
+        if record.status == 401 and credentials is not None and self._positions[key] < len(self._responses[key]):
+            record = self._next(key, method, url)
+        if self.replay_latency:
+            time.sleep(record.elapsed)
+        return record.response()
+
+    def for_orders(self):
+        """Order calls are replayed from the same log; nothing is retried."""
+        return self
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
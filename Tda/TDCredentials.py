@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+import weakref
+
+
+class TDCredentials:
+    """A shared, thread-safe holder for the current access token.
+
+    Clients subscribe to it so a refreshed token reaches every one of them
+    at once. ``refresh`` is single-flight: callers that saw the same stale
+    token wait for one refresh instead of each starting their own.
+    """
+
+    def __init__(self, access_token, refresher=None, expires_at=None):
+        self._access_token = access_token
+        self.expires_at = expires_at  # epoch 秒，未知時為 None
+        self._refresher = refresher
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._listeners = []
+        self.refreshes = 0
+
+    @classmethod
+    def wrap(cls, access_token):
+        """Return ``access_token`` itself if it is already a TDCredentials, else a static holder."""
+        if isinstance(access_token, TDCredentials):
+            return access_token
+        return cls(access_token)
+
+    @property
+    def access_token(self):
+        return self._access_token
+
+    @property
+    def refreshable(self):
+        return self._refresher is not None
+
+    def authorization_header(self):
+        return f"Bearer {self._access_token}"
+
+    def subscribe(self, callback):
+        """Call ``callback(access_token)`` after every update; bound methods are held weakly."""
+        ref = weakref.WeakMethod(callback) if hasattr(callback, "__self__") else (lambda: callback)
+        with self._lock:
+            self._listeners.append(ref)
+
+    def update(self, access_token, expires_at=None):
+        with self._lock:
+            self._access_token = access_token
+            if expires_at is not None:
+                self.expires_at = expires_at
+            listeners = [ref() for ref in self._listeners]
+            self._listeners = [ref for ref, listener in zip(self._listeners, listeners) if listener is not None]
+        for listener in listeners:
+            if listener is not None:
+                listener(access_token)
+
+    def refresh(self, stale_token=None):
+        """Refresh the token once; return True if a usable new token is available."""
+        if self._refresher is None:
+            return False
+        with self._refresh_lock:
+            # 其他執行緒已經換過 token 了
+            if stale_token is not None and stale_token != self._access_token:
+                return True
+            before = self._access_token
+            self._refresher()
+            self.refreshes += 1
+            return self._access_token is not None and self._access_token != before
+
+    def seconds_until_expiry(self):
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.time()
+
+
+class TDTokenRefresher:
+    """A daemon thread that renews the token ``lead_time`` seconds before it expires.
+
+    Requests keep using the still-valid token while the refresh runs, so no
+    request thread ever blocks on it.
+    """
+
+    def __init__(self, credentials, lead_time=300, retry_interval=30):
+        self.credentials = credentials
+        self.lead_time = lead_time
+        self.retry_interval = retry_interval
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._logger = logging.getLogger(__name__)
+
+    def _next_delay(self):
+        remaining = self.credentials.seconds_until_expiry()
+        if remaining is None:
+            return None
+        return max(0.0, remaining - self.lead_time)
+
+    def _run(self):
+        while True:
+            delay = self._next_delay()
+            if self._stop.wait(self.retry_interval if delay is None else delay):
+                break
+            # 等待期間 token 可能已被其他人更新，重新確認
+            delay = self._next_delay()
+            if delay is None or delay > 0:
+                continue
+            try:
+                if not self.credentials.refresh():
+                    raise RuntimeError("token refresh returned no new token")
+                self.failures = 0
+            except Exception as e:
+                self.failures += 1
+                self._logger.error(f"背景刷新 token 失敗: {e}")
+                if self._stop.wait(self.retry_interval):
+                    break
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="TDTokenRefresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
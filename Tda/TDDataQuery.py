@@ -1,36 +1,116 @@
-import requests
 import json
 import logging
+import math
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from .TDCredentials import TDCredentials
+from .TDModels import Candle, LazyModels, Quote, loads, option_contracts
+from .TDRateLimiter import PRIORITY_MARKET_DATA
+from .TDTransport import TDTransport
+
+try:
+    from zoneinfo import ZoneInfo
+    MARKET_TIMEZONE = ZoneInfo("America/New_York")
+except Exception:  # 沒有 tzdata (例如 Windows) 時以 EST 近似
+    MARKET_TIMEZONE = timezone(timedelta(hours=-5))
+
+# 每個 chunk 的延遲報告
+ChunkReport = namedtuple("ChunkReport", ["symbols", "latency", "error"])
+
+
+class BulkQuoteResult(dict):
+    """Merged quotes keyed by symbol, with a per-chunk latency report."""
+
+    def __init__(self, requested=()):
+        super().__init__()
+        self.requested = list(requested)
+        self.chunks = []
+        self.elapsed = 0.0
+
+    @property
+    def missing(self):
+        return [symbol for symbol in self.requested if symbol not in self]
+
+    @property
+    def errors(self):
+        return [chunk for chunk in self.chunks if chunk.error is not None]
+
+
+def market_date():
+    """Today's date in the market's time zone, as ``yyyy-MM-dd``."""
+    return datetime.now(MARKET_TIMEZONE).strftime("%Y-%m-%d")
+
+
+def chunk_symbols(symbols, max_symbols, max_chars):
+    """Split symbols into evenly sized chunks that respect both the count and URL-length limits."""
+    # 去除重複的代號並保持順序
+    symbols = list(dict.fromkeys(s.strip() for s in symbols if s and s.strip()))
+    if not symbols:
+        return []
+
+    total_chars = sum(len(s) + 1 for s in symbols)
+    n_chunks = max(math.ceil(len(symbols) / max_symbols), math.ceil(total_chars / max_chars))
+    target = math.ceil(len(symbols) / n_chunks)
+
+    chunks, current, current_chars = [], [], 0
+    for symbol in symbols:
+        if current and (len(current) >= target or current_chars + len(symbol) + 1 > max_chars):
+            chunks.append(current)
+            current, current_chars = [], 0
+        current.append(symbol)
+        current_chars += len(symbol) + 1
+    chunks.append(current)
+    return chunks
+
 
 class TDDataQuery:
     """A class to query TD Ameritrade's market data."""
     
     BASE_URL = "https://api.tdameritrade.com/v1/marketdata"
+    # get_quotes 每次請求的代號數量與 symbol 參數長度上限
+    MAX_SYMBOLS_PER_REQUEST = 500
+    MAX_SYMBOL_PARAM_CHARS = 6000
     
-    def __init__(self, access_token, client_id):
-        self.access_token = access_token
+    def __init__(self, access_token, client_id, transport=None, cache=None):
+        self.credentials = TDCredentials.wrap(access_token)  # 可傳入字串或共用的 TDCredentials
+        self.access_token = self.credentials.access_token
         self.client_id = client_id
+        self.transport = transport or TDTransport.default()
+        self.cache = cache  # 可選的 TDCache，用於變動緩慢的端點
         self._headers = {
             "Authorization": f"Bearer {self.access_token}"
         }
+        self.credentials.subscribe(self._on_token_refreshed)
         # 初始化日誌
         self._logger = logging.getLogger(__name__)
         logging.basicConfig(level=logging.INFO)
 
+    def _on_token_refreshed(self, access_token):
+        self.access_token = access_token
+        self._headers["Authorization"] = f"Bearer {access_token}"
+
     def _make_request(self, url, params=None):
         if params is None:
             params = {}
         params["apikey"] = self.client_id  # 添加client_id到請求參數中
-        response = requests.get(url, headers=self._headers, params=params)
-        self._logger.info(f"狀態碼: {response.status_code}")
+        response = self.transport.get(url, headers=self._headers, credentials=self.credentials, params=params,
+                                      priority=PRIORITY_MARKET_DATA)
+        self._logger.debug("狀態碼: %s", response.status_code)
         response.raise_for_status()  # 對HTTP錯誤引發異常
         
         try:
-            return response.json()
+            return loads(response.content)  # 有 orjson 時使用較快的解碼器
         except json.decoder.JSONDecodeError:
             self._logger.error(f"無法從回應中解碼JSON。回應內容: {response.text}")  # 打印出回應的內容
             return {"error": "無效的JSON回應"}
 
+    def _cached_request(self, endpoint, url, params=None):
+        if self.cache is None:
+            return self._make_request(url, params)
+        return self.cache.get_or_fetch(endpoint, url, params, lambda: self._make_request(url, dict(params or {})))
+
     def search_instruments(self, symbol, projection, apikey=None):
         # 檢查projection的有效性
         valid_projections = ["symbol-search", "symbol-regex", "desc-search", "desc-regex", "fundamental"]
@@ -53,27 +133,28 @@ class TDDataQuery:
         if apikey:
             params["apikey"] = apikey
 
-        return self._make_request(url, params)
+        return self._cached_request("instruments", url, params)
 
     def get_instrument_by_cusip(self, cusip):
         url = f"{self.BASE_URL}/instruments/{cusip}"
-        return self._make_request(url)
+        return self._cached_request("instrument_cusip", url)
 
     # Market Hours
     def get_market_hours(self, markets, date=None):
         url = f"{self.BASE_URL}/marketdata/hours"
+        # 明確帶入當天日期，快取的鍵才會在換日時改變
         params = {
             "markets": markets,
-            "date": date
+            "date": date or market_date()
         }
-        return self._make_request(url, params)
+        return self._cached_request("market_hours", url, params)
 
     def get_market_hours_for_specific_market(self, market, date=None):
         url = f"{self.BASE_URL}/marketdata/{market}/hours"
         params = {
-            "date": date
+            "date": date or market_date()
         }
-        return self._make_request(url, params)
+        return self._cached_request("market_hours", url, params)
 
     # Movers
     def get_movers_for_index(self, index, direction=None, change=None):
@@ -85,29 +166,103 @@ class TDDataQuery:
         return self._make_request(url, params)
 
     # Option Chains
-    def get_option_chain(self, symbol, **kwargs):
+    def get_option_chain(self, symbol, typed=False, columnar=False, **kwargs):
         url = f"{self.BASE_URL}/marketdata/chains"
         params = {"symbol": symbol}
         params.update(kwargs)
-        return self._make_request(url, params)
+        result = self._make_request(url, params)
+        # columnar=True 時回傳 TDOptionChain (欄位陣列)，typed=True 時回傳攤平的 OptionContract 列表
+        if columnar:
+            from .TDOptionChain import TDOptionChain  # 需要時才載入 numpy
+            return TDOptionChain.from_chain(result)
+        return option_contracts(result) if typed else result
+
+    def get_option_chains(self, symbols, max_workers=8, columnar=False, typed=False, **kwargs):
+        """Fetch the option chains of several underlyings concurrently.
+
+        Returns ``{symbol: chain}``; a failed request maps to its exception.
+        """
+        symbols = list(symbols)
+        results = {}
+        if not symbols:
+            return results
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(symbols))) as executor:
+            futures = {symbol: executor.submit(self.get_option_chain, symbol, typed=typed, columnar=columnar, **kwargs)
+                       for symbol in symbols}
+            for symbol, future in futures.items():
+                try:
+                    results[symbol] = future.result()
+                except Exception as e:
+                    self._logger.error(f"取得 {symbol} 選擇權鏈失敗: {e}")
+                    results[symbol] = e
+        return results
 
     # Price History
-    def get_price_history(self, symbol, **kwargs):
+    def get_price_history(self, symbol, columnar=False, typed=False, **kwargs):
         url = f"{self.BASE_URL}/marketdata/{symbol}/pricehistory"
         params = {"symbol": symbol}
         params.update(kwargs)
-        return self._make_request(url, params)
+        result = self._make_request(url, params)
+        # columnar=True 時回傳 TDCandles (連續的型別陣列)
+        if columnar and "candles" in result:
+            from .TDCandles import TDCandles  # 需要時才載入 numpy
+            return TDCandles.from_price_history(result)
+        if typed:
+            return Candle.from_list(result.get("candles"))
+        return result
 
     # Quotes
-    def get_quotes(self, symbols):
+    def get_quotes(self, symbols, typed=False):
         if isinstance(symbols, list):
             symbols = ','.join(symbols)
         url = f"{self.BASE_URL}/marketdata/quotes"
         params = {
             "symbol": symbols
         }
-        return self._make_request(url, params)
+        result = self._make_request(url, params)
+        # typed=True 時回傳 LazyModels，每個 Quote 在第一次存取時才建立
+        return LazyModels(result, Quote) if typed else result
+
+    def get_quotes_bulk(self, symbols, chunk_size=None, max_workers=8, max_requests_per_second=None, typed=False):
+        """Fetch quotes for an arbitrarily large symbol iterable in concurrent chunks.
+
+        Returns a BulkQuoteResult: a dict of quotes keyed by symbol whose
+        ``chunks`` attribute lists a ChunkReport(symbols, latency, error) per request.
+        """
+        chunks = chunk_symbols(symbols, chunk_size or self.MAX_SYMBOLS_PER_REQUEST, self.MAX_SYMBOL_PARAM_CHARS)
+        result = BulkQuoteResult(symbol for chunk in chunks for symbol in chunk)
+        if not chunks:
+            return result
+
+        started = time.perf_counter()
+        interval = 1.0 / max_requests_per_second if max_requests_per_second else 0.0
+
+        def fetch(index, chunk):
+            # 依照速率限制錯開每個 chunk 的開始時間
+            delay = started + index * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            t0 = time.perf_counter()
+            try:
+                quotes = self.get_quotes(chunk)
+                if typed:
+                    quotes = {symbol: Quote.from_json(quote) for symbol, quote in quotes.items()}
+                return quotes, ChunkReport(len(chunk), time.perf_counter() - t0, None)
+            except Exception as e:
+                self._logger.error(f"批次報價失敗 ({len(chunk)} 個代號): {e}")
+                return {}, ChunkReport(len(chunk), time.perf_counter() - t0, e)
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            for quotes, report in executor.map(fetch, range(len(chunks)), chunks):
+                result.update(quotes)
+                result.chunks.append(report)
+
+        result.elapsed = time.perf_counter() - started
+        return result
 
-    def get_quote(self, symbol):
+    def get_quote(self, symbol, typed=False):
         url = f"{self.BASE_URL}/marketdata/{symbol}/quotes"
-        return self._make_request(url)
+        result = self._make_request(url)
+        if typed:
+            return Quote.from_json(result.get(symbol) or next(iter(result.values()), {}))
+        return result
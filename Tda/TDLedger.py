@@ -0,0 +1,209 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from .TDAccountsAndTrading import DATE_FORMAT, to_date
+
+BATCH_SIZE = 500
+COLUMNS = ("account_id", "transaction_id", "type", "sub_type", "transaction_date", "settlement_date",
+           "symbol", "asset_type", "instruction", "amount", "price", "net_amount", "description",
+           "detail", "payload")
+
+
+def _row(account_id, transaction, detail):
+    item = transaction.get("transactionItem") or {}
+    instrument = item.get("instrument") or {}
+    return (
+        str(account_id),
+        int(transaction["transactionId"]),
+        transaction.get("type"),
+        transaction.get("transactionSubType"),
+        transaction.get("transactionDate"),
+        transaction.get("settlementDate"),
+        instrument.get("symbol"),
+        instrument.get("assetType"),
+        item.get("instruction"),
+        item.get("amount"),
+        item.get("price"),
+        transaction.get("netAmount"),
+        transaction.get("description"),
+        1 if detail else 0,
+        json.dumps(transaction),
+    )
+
+
+class TDLedger:
+    """A local SQLite copy of account transactions.
+
+    ``sync`` fetches only what is newer than the account's watermark (the
+    last synced day is re-read, since it may have been partial), so
+    reconciliation queries run against the local indexes on symbol, type
+    and date instead of the API. ``backfill_details`` fetches
+    ``get_transaction`` detail records concurrently for rows that only
+    have the list summary.
+    """
+
+    def __init__(self, path, trading=None):
+        self.path = path
+        self.trading = trading
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger(__name__)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS transactions ("
+            "account_id TEXT, transaction_id INTEGER, type TEXT, sub_type TEXT, transaction_date TEXT, "
+            "settlement_date TEXT, symbol TEXT, asset_type TEXT, instruction TEXT, amount REAL, price REAL, "
+            "net_amount REAL, description TEXT, detail INTEGER, payload TEXT, "
+            "PRIMARY KEY (account_id, transaction_id))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tx_symbol ON transactions (account_id, symbol, transaction_date)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tx_type ON transactions (account_id, type, transaction_date)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tx_date ON transactions (account_id, transaction_date)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tx_pending ON transactions (detail, account_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS watermarks (account_id TEXT PRIMARY KEY, synced_through TEXT)")
+
+    # Writing
+    def upsert(self, account_id, transactions, detail=False):
+        """Insert or update transactions; a detail record is never replaced by a list summary."""
+        rows = [_row(account_id, t, detail) for t in transactions]
+        if not rows:
+            return 0
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in COLUMNS[2:])
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    f"INSERT INTO transactions ({', '.join(COLUMNS)}) VALUES ({placeholders}) "
+                    f"ON CONFLICT (account_id, transaction_id) DO UPDATE SET {updates} "
+                    f"WHERE excluded.detail >= transactions.detail",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def watermark(self, account_id):
+        with self._lock:
+            row = self._conn.execute("SELECT synced_through FROM watermarks WHERE account_id = ?",
+                                     (str(account_id),)).fetchone()
+        return row[0] if row else None
+
+    def _set_watermark(self, account_id, through):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO watermarks (account_id, synced_through) VALUES (?, ?) "
+                "ON CONFLICT (account_id) DO UPDATE SET synced_through = excluded.synced_through "
+                "WHERE excluded.synced_through > watermarks.synced_through",
+                (str(account_id), through),
+            )
+
+    # Synchronisation
+    def sync(self, account_id, start_date=None, end_date=None, window_days=30, prefetch=2):
+        """Fetch transactions newer than the watermark; ``start_date`` is only needed on the first sync."""
+        if self.trading is None:
+            raise ValueError("TDLedger.sync requires a TDAccountsAndTrading")
+        watermark = self.watermark(account_id)
+        if watermark is not None:
+            start_date = max(to_date(watermark), to_date(start_date)) if start_date else to_date(watermark)
+        elif start_date is None:
+            raise ValueError(f"No watermark for account {account_id}; pass start_date for the first sync")
+        end = to_date(end_date) if end_date else date.today()
+
+        synced = 0
+        batch = []
+        for transaction in self.trading.iter_transactions(account_id, start_date, end,
+                                                          window_days=window_days, prefetch=prefetch):
+            batch.append(transaction)
+            if len(batch) >= BATCH_SIZE:
+                synced += self.upsert(account_id, batch)
+                batch = []
+        synced += self.upsert(account_id, batch)
+        # 水位記在已結束的日期，今天的交易下次會再同步
+        self._set_watermark(account_id, min(end, date.today() - timedelta(days=1)).strftime(DATE_FORMAT))
+        return synced
+
+    def missing_details(self, account_id=None, limit=None):
+        query = "SELECT account_id, transaction_id FROM transactions WHERE detail = 0"
+        params = []
+        if account_id is not None:
+            query += " AND account_id = ?"
+            params.append(str(account_id))
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    def backfill_details(self, account_id=None, max_workers=8, limit=None):
+        """Fetch detail records for rows that lack them; returns ``{transaction_id: error}`` for failures."""
+        if self.trading is None:
+            raise ValueError("TDLedger.backfill_details requires a TDAccountsAndTrading")
+        errors = {}
+        pending = self.missing_details(account_id, limit)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self.trading.get_transaction, account, transaction_id): (account, transaction_id)
+                       for account, transaction_id in pending}
+            for future in as_completed(futures):
+                account, transaction_id = futures[future]
+                try:
+                    self.upsert(account, [future.result()], detail=True)
+                except Exception as e:
+                    self._logger.error(f"補齊交易明細 {transaction_id} 失敗: {e}")
+                    errors[transaction_id] = e
+        return errors
+
+    # Queries
+    def transactions(self, account_id=None, symbol=None, type=None, start=None, end=None):
+        """Return stored transactions (oldest first); ``start``/``end`` are inclusive dates."""
+        clauses, params = [], []
+        for column, value in (("account_id", account_id), ("symbol", symbol), ("type", type)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(str(value))
+        if start is not None:
+            clauses.append("transaction_date >= ?")
+            params.append(to_date(start).strftime(DATE_FORMAT))
+        if end is not None:
+            # transactionDate 含時間，以隔天為上界
+            clauses.append("transaction_date < ?")
+            params.append((to_date(end) + timedelta(days=1)).strftime(DATE_FORMAT))
+        query = "SELECT payload FROM transactions"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY transaction_date, transaction_id"
+        with self._lock:
+            return [json.loads(row[0]) for row in self._conn.execute(query, params)]
+
+    def net_quantities(self, account_id, as_of=None):
+        """Return ``{symbol: quantity}`` from trades, for reconciling against positions."""
+        query = ("SELECT symbol, SUM(CASE WHEN instruction = 'SELL' THEN -amount ELSE amount END) "
+                 "FROM transactions WHERE account_id = ? AND type = 'TRADE' AND symbol IS NOT NULL")
+        params = [str(account_id)]
+        if as_of is not None:
+            query += " AND transaction_date < ?"
+            params.append((to_date(as_of) + timedelta(days=1)).strftime(DATE_FORMAT))
+        query += " GROUP BY symbol"
+        with self._lock:
+            return {symbol: quantity for symbol, quantity in self._conn.execute(query, params) if quantity}
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
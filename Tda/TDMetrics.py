@@ -0,0 +1,318 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+# 0.1ms 到約 52 秒，每格乘以 sqrt(2)
+LATENCY_BUCKETS = tuple(0.0001 * 2 ** (i / 2) for i in range(39))
+
+
+class LatencyHistogram:
+    """A fixed-bucket latency histogram (seconds) with percentile estimates.
+
+    Recording is a bisect plus a few integer updates under a lock, so it is
+    cheap enough to call on every request. Percentiles are the upper bound
+    of the bucket they fall in, clamped to the observed min/max.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)  # 最後一格為超出上限
+            self.count = 0
+            self.total = 0.0
+            self.min = None
+            self.max = None
+
+    def record(self, seconds):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if self.min is None or seconds < self.min:
+                self.min = seconds
+            if self.max is None or seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, p):
+        """Return the ``p``-th percentile (0-100), or None if nothing was recorded."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = max(1, -(-self.count * p // 100))
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank:
+                    bound = self.buckets[index] if index < len(self.buckets) else self.max
+                    return min(max(bound, self.min), self.max)
+            return self.max
+
+    def cumulative(self):
+        """Return ``[(upper_bound, cumulative_count), ...]`` ending with ``(inf, count)``."""
+        with self._lock:
+            counts = list(self.counts)
+        result, seen = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            seen += count
+            result.append((bound, seen))
+        return result
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+    def __repr__(self):
+        return f"LatencyHistogram(count={self.count}, p50={self.percentile(50)}, p99={self.percentile(99)})"
+
+
+# 路徑中保留的固定片段，其餘片段視為代號或編號
+PATH_WORDS = frozenset([
+    "v1", "marketdata", "quotes", "chains", "hours", "pricehistory", "instruments", "movers", "accounts", "orders",
+    "savedorders", "transactions", "watchlists", "userprincipals", "preferences", "streamersubscriptionkeys",
+    "oauth2", "token",
+])
+
+
+@lru_cache(maxsize=4096)
+def endpoint_name(method, url):
+    """``("GET", ".../v1/marketdata/AAPL/quotes?x=1")`` -> ``"GET /v1/marketdata/{symbol}/quotes"``."""
+    segments = []
+    for segment in urlsplit(url).path.split("/"):
+        if not segment or segment in PATH_WORDS:
+            segments.append(segment)
+        else:
+            segments.append("{id}" if segment.isdigit() else "{symbol}")
+    return f"{method.upper()} {'/'.join(segments)}"
+
+
+class EndpointMetrics:
+    """Counters and a latency histogram for one endpoint."""
+
+    __slots__ = ("requests", "failures", "statuses", "bytes_received", "retries", "throttles", "latency", "_lock")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.requests = 0
+        self.failures = 0  # 沒有收到回應 (連線錯誤、逾時)
+        self.statuses = {}
+        self.bytes_received = 0
+        self.retries = 0
+        self.throttles = 0
+        self.latency = LatencyHistogram(buckets)
+        self._lock = threading.Lock()
+
+    @property
+    def errors(self):
+        return self.failures + sum(count for status, count in self.statuses.items() if status >= 400)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "failures": self.failures,
+                "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+                "bytes_received": self.bytes_received,
+                "retries": self.retries,
+                "throttles": self.throttles,
+                "latency": self.latency.snapshot(),
+            }
+
+
+class TDMetrics:
+    """Per-endpoint request metrics fed by TDTransport / TDAsyncTransport.
+
+    Transports only record when their ``metrics`` attribute is set (it is
+    None by default), so a disabled transport pays one attribute check per
+    request. URLs are grouped by ``endpoint_name`` so symbols and ids do
+    not create separate series. Exporters are objects with
+    ``export(metrics)``; ``export`` calls all of them and
+    ``start_export`` does so periodically.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, exporters=()):
+        self.buckets = tuple(buckets)
+        self.exporters = list(exporters)
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def endpoint(self, method, url):
+        name = endpoint_name(method, url)
+        metrics = self._endpoints.get(name)
+        if metrics is None:
+            with self._lock:
+                metrics = self._endpoints.setdefault(name, EndpointMetrics(self.buckets))
+        return metrics
+
+    # Recording
+    def record(self, method, url, status, seconds, size=0, retries=0, throttles=0):
+        metrics = self.endpoint(method, url)
+        with metrics._lock:
+            metrics.requests += 1
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.bytes_received += size
+            metrics.retries += retries
+            metrics.throttles += throttles + (status == 429)
+        metrics.latency.record(seconds)
+
+    def record_failure(self, method, url, seconds, retries=0):
+        metrics = self.endpoint(method, url)
+        with metrics._lock:
+            metrics.requests += 1
+            metrics.failures += 1
+            metrics.retries += retries
+        metrics.latency.record(seconds)
+
+    def record_retry(self, method, url):
+        metrics = self.endpoint(method, url)
+        with metrics._lock:
+            metrics.retries += 1
+
+    # Reading
+    def snapshot(self):
+        with self._lock:
+            endpoints = dict(self._endpoints)
+        return {name: metrics.snapshot() for name, metrics in sorted(endpoints.items())}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def to_json(self, indent=None):
+        return json.dumps({"timestamp": time.time(), "endpoints": self.snapshot()}, indent=indent)
+
+    def to_prometheus(self, prefix="td_api"):
+        """Render the Prometheus text exposition format."""
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+        counters = (
+            ("requests_total", "Requests sent, by final status.", None),
+            ("failures_total", "Requests that got no response.", "failures"),
+            ("bytes_received_total", "Response body bytes received.", "bytes_received"),
+            ("retries_total", "Retried attempts (status retries and 401 token refreshes).", "retries"),
+            ("throttles_total", "429 Too Many Requests responses.", "throttles"),
+        )
+        lines = []
+        for suffix, help_text, attr in counters:
+            lines.append(f"# HELP {prefix}_{suffix} {help_text}")
+            lines.append(f"# TYPE {prefix}_{suffix} counter")
+            for name, metrics in endpoints:
+                method, path = name.split(" ", 1)
+                labels = f'method="{method}",path="{path}"'
+                if attr is None:
+                    for status, count in sorted(metrics.statuses.items()):
+                        lines.append(f'{prefix}_{suffix}{{{labels},status="{status}"}} {count}')
+                else:
+                    lines.append(f"{prefix}_{suffix}{{{labels}}} {getattr(metrics, attr)}")
+        lines.append(f"# HELP {prefix}_request_duration_seconds Request latency.")
+        lines.append(f"# TYPE {prefix}_request_duration_seconds histogram")
+        for name, metrics in endpoints:
+            method, path = name.split(" ", 1)
+            labels = f'method="{method}",path="{path}"'
+            for bound, count in metrics.latency.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{{labels},le="{le}"}} {count}')
+            lines.append(f"{prefix}_request_duration_seconds_sum{{{labels}}} {metrics.latency.total}")
+            lines.append(f"{prefix}_request_duration_seconds_count{{{labels}}} {metrics.latency.count}")
+        return "\n".join(lines) + "\n"
+
+    # Exporting
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+        return exporter
+
+    def export(self):
+        for exporter in self.exporters:
+            exporter.export(self)
+
+    def _run_export(self, interval):
+        while not self._stop.wait(interval):
+            self.export()
+
+    def start_export(self, interval=15):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run_export, args=(interval,), name="TDMetricsExport",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop_export(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class MemoryExporter:
+    """Keeps the last ``maxlen`` snapshots in memory."""
+
+    def __init__(self, maxlen=100):
+        self.snapshots = deque(maxlen=maxlen)
+
+    def export(self, metrics):
+        snapshot = metrics.snapshot()
+        self.snapshots.append(snapshot)
+        return snapshot
+
+    @property
+    def latest(self):
+        return self.snapshots[-1] if self.snapshots else None
+
+
+class PrometheusExporter:
+    """Renders the Prometheus text format, optionally to a file for node_exporter's textfile collector."""
+
+    def __init__(self, path=None, prefix="td_api"):
+        self.path = path
+        self.prefix = prefix
+        self.last = None
+
+    def export(self, metrics):
+        self.last = metrics.to_prometheus(self.prefix)
+        if self.path:
+            _write_atomic(self.path, self.last)
+        return self.last
+
+
+class JsonExporter:
+    """Renders a JSON snapshot, optionally to a file."""
+
+    def __init__(self, path=None, indent=None):
+        self.path = path
+        self.indent = indent
+        self.last = None
+
+    def export(self, metrics):
+        self.last = metrics.to_json(self.indent)
+        if self.path:
+            _write_atomic(self.path, self.last)
+        return self.last
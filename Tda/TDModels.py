@@ -0,0 +1,188 @@
+import json
+from collections.abc import Mapping
+
+try:
+    import orjson
+except ImportError:  # orjson 為可選套件，沒有時改用標準庫
+    orjson = None
+
+
+def loads(data):
+    """Decode a JSON response body with orjson when installed, else the standard library."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _compile(fields):
+    # "a.b.0.c" -> ("a", "b", 0, "c")
+    return tuple((attr, tuple(int(p) if p.isdigit() else p for p in path.split(".")))
+                 for attr, path in fields.items())
+
+
+class Model:
+    """Base class for the typed response models.
+
+    Subclasses list ``FIELDS`` as ``attribute -> JSON path`` (dotted for
+    nested values). Only those fields are copied into ``__slots__``, so
+    the decoded payload can be freed; missing fields are ``None``.
+    """
+
+    __slots__ = ()
+    FIELDS = {}
+    _paths = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._paths = _compile(cls.FIELDS)
+
+    @classmethod
+    def from_json(cls, data):
+        obj = cls.__new__(cls)
+        for attr, path in cls._paths:
+            value = data
+            for key in path:
+                try:
+                    value = value[key]
+                except (KeyError, IndexError, TypeError):
+                    value = None
+                    break
+            setattr(obj, attr, value)
+        return obj
+
+    @classmethod
+    def from_list(cls, items):
+        return [cls.from_json(item) for item in items or ()]
+
+    def to_dict(self):
+        return {attr: getattr(self, attr) for attr in self.FIELDS}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        shown = ", ".join(f"{attr}={getattr(self, attr)!r}" for attr in list(self.FIELDS)[:4])
+        return f"{type(self).__name__}({shown})"
+
+
+class Quote(Model):
+    FIELDS = {
+        "symbol": "symbol", "asset_type": "assetType", "description": "description",
+        "bid_price": "bidPrice", "bid_size": "bidSize", "ask_price": "askPrice", "ask_size": "askSize",
+        "last_price": "lastPrice", "last_size": "lastSize", "mark": "mark",
+        "open_price": "openPrice", "high_price": "highPrice", "low_price": "lowPrice", "close_price": "closePrice",
+        "net_change": "netChange", "total_volume": "totalVolume", "volatility": "volatility",
+        "quote_time": "quoteTimeInLong", "trade_time": "tradeTimeInLong", "exchange": "exchange",
+        "high_52_week": "52WkHigh", "low_52_week": "52WkLow", "pe_ratio": "peRatio", "div_yield": "divYield",
+    }
+    __slots__ = tuple(FIELDS)
+
+    @property
+    def mid(self):
+        if self.bid_price is None or self.ask_price is None:
+            return None
+        return (self.bid_price + self.ask_price) / 2
+
+    @property
+    def spread(self):
+        if self.bid_price is None or self.ask_price is None:
+            return None
+        return self.ask_price - self.bid_price
+
+
+class Candle(Model):
+    FIELDS = {"datetime": "datetime", "open": "open", "high": "high", "low": "low", "close": "close",
+              "volume": "volume"}
+    __slots__ = tuple(FIELDS)
+
+
+class OptionContract(Model):
+    FIELDS = {
+        "symbol": "symbol", "put_call": "putCall", "description": "description",
+        "bid": "bid", "ask": "ask", "last": "last", "mark": "mark", "bid_size": "bidSize", "ask_size": "askSize",
+        "total_volume": "totalVolume", "open_interest": "openInterest", "volatility": "volatility",
+        "delta": "delta", "gamma": "gamma", "theta": "theta", "vega": "vega", "rho": "rho",
+        "strike_price": "strikePrice", "expiration_date": "expirationDate",
+        "days_to_expiration": "daysToExpiration", "in_the_money": "inTheMoney", "multiplier": "multiplier",
+    }
+    __slots__ = tuple(FIELDS)
+
+
+class Position(Model):
+    FIELDS = {
+        "symbol": "instrument.symbol", "asset_type": "instrument.assetType", "cusip": "instrument.cusip",
+        "long_quantity": "longQuantity", "short_quantity": "shortQuantity", "average_price": "averagePrice",
+        "market_value": "marketValue", "current_day_profit_loss": "currentDayProfitLoss",
+        "settled_long_quantity": "settledLongQuantity", "settled_short_quantity": "settledShortQuantity",
+    }
+    __slots__ = tuple(FIELDS)
+
+    @property
+    def quantity(self):
+        return (self.long_quantity or 0) - (self.short_quantity or 0)
+
+
+class Order(Model):
+    FIELDS = {
+        "order_id": "orderId", "account_id": "accountId", "status": "status", "order_type": "orderType",
+        "session": "session", "duration": "duration", "price": "price", "stop_price": "stopPrice",
+        "quantity": "quantity", "filled_quantity": "filledQuantity", "remaining_quantity": "remainingQuantity",
+        "entered_time": "enteredTime", "close_time": "closeTime", "cancelable": "cancelable",
+        "symbol": "orderLegCollection.0.instrument.symbol", "instruction": "orderLegCollection.0.instruction",
+        "legs": "orderLegCollection", "child_order_strategies": "childOrderStrategies",
+    }
+    __slots__ = tuple(FIELDS)
+
+
+class LazyModels(Mapping):
+    """A read-only mapping that builds each model on first access.
+
+    The decoded dict for a key is dropped once its model exists, so
+    looking up a few symbols out of a large ``get_quotes`` response
+    never pays for the rest.
+    """
+
+    __slots__ = ("_raw", "_models", "_cls")
+
+    def __init__(self, raw, cls):
+        self._raw = dict(raw)
+        self._models = {}
+        self._cls = cls
+
+    def __getitem__(self, key):
+        model = self._models.get(key)
+        if model is None:
+            model = self._models[key] = self._cls.from_json(self._raw.pop(key))
+        return model
+
+    def __iter__(self):
+        return iter(list(self._models) + list(self._raw))
+
+    def __len__(self):
+        return len(self._models) + len(self._raw)
+
+    def __contains__(self, key):
+        return key in self._models or key in self._raw
+
+    def __repr__(self):
+        return f"LazyModels({self._cls.__name__}, {len(self)} items)"
+
+
+def option_contracts(chain):
+    """Flatten ``get_option_chain`` into OptionContract models, calls then puts."""
+    contracts = []
+    for side in ("callExpDateMap", "putExpDateMap"):
+        for strikes in (chain.get(side) or {}).values():
+            for options in strikes.values():
+                contracts.extend(OptionContract.from_json(option) for option in options)
+    return contracts
+
+
+def positions_from_account(account):
+    """Return Position models from a ``get_account(fields="positions")`` payload."""
+    return Position.from_list((account.get("securitiesAccount") or account).get("positions"))
+
+
+def orders_from_account(account):
+    """Return Order models from a ``get_account(fields="orders")`` payload."""
+    return Order.from_list((account.get("securitiesAccount") or account).get("orderStrategies"))
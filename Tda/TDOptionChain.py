@@ -0,0 +1,360 @@
+import math
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # numpy 為可選套件，沒有時逐筆以 math 計算
+    np = None
+
+# 欄位名稱 -> (TD 欄位, array.array 型別代碼)
+NUMERIC_COLUMNS = {
+    "expiration": ("expirationDate", "q"),
+    "days_to_expiration": ("daysToExpiration", "d"),
+    "strike": ("strikePrice", "d"),
+    "bid": ("bid", "d"),
+    "ask": ("ask", "d"),
+    "last": ("last", "d"),
+    "mark": ("mark", "d"),
+    "volatility": ("volatility", "d"),
+    "delta": ("delta", "d"),
+    "gamma": ("gamma", "d"),
+    "theta": ("theta", "d"),
+    "vega": ("vega", "d"),
+    "rho": ("rho", "d"),
+    "open_interest": ("openInterest", "d"),
+    "total_volume": ("totalVolume", "d"),
+    "multiplier": ("multiplier", "d"),
+}
+MS_PER_YEAR = 365.0 * 24 * 60 * 60 * 1000
+
+
+def _to_float(value):
+    # TD 以 "NaN" 或 -999.0 表示沒有數值
+    if value is None or value == "NaN" or value == -999.0:
+        return math.nan
+    return float(value)
+
+
+def _column(values, typecode):
+    if np is not None:
+        return np.asarray(values, dtype=np.int64 if typecode == "q" else np.float64)
+    return array(typecode, values)
+
+
+# 標準常態分配：numpy 版本使用 Hart (1968) 的有理函數近似，雙精度下誤差約 1e-15
+def _npdf(x):
+    return np.exp(-0.5 * x * x) / math.sqrt(2 * math.pi)
+
+
+def _ncdf(x):
+    z = np.abs(x)
+    e = np.exp(-0.5 * z * z)
+    num = ((((((0.0352624965998911 * z + 0.700383064443688) * z + 6.37396220353165) * z + 33.912866078383) * z
+             + 112.079291497871) * z + 221.213596169931) * z + 220.206867912376)
+    den = (((((((0.0883883476483184 * z + 1.75566716318264) * z + 16.064177579207) * z + 86.7807322029461) * z
+              + 296.564248779674) * z + 637.333633378831) * z + 793.826512519948) * z + 440.413735824752)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tail = z + 1.0 / (z + 2.0 / (z + 3.0 / (z + 4.0 / (z + 0.65))))
+        lower = np.where(z < 7.07106781186547, e * num / den, e / tail / 2.506628274631)
+    lower = np.where(z > 37, 0.0, lower)
+    return np.where(x > 0, 1.0 - lower, lower)
+
+
+def _scalar_pdf(x):
+    return math.exp(-0.5 * x * x) / math.sqrt(2 * math.pi)
+
+
+def _scalar_cdf(x):
+    return 0.5 * (1.0 + math.erf(x / math.sqrt(2)))
+
+
+def _bsm(is_call, s, k, t, r, q, sigma, vectorized):
+    """Black-Scholes-Merton price and Greeks in TD's units (vega/rho per 1%, theta per day)."""
+    if vectorized:
+        exp, log, sqrt, cdf, pdf, where = np.exp, np.log, np.sqrt, _ncdf, _npdf, np.where
+    else:
+        exp, log, sqrt, cdf, pdf = math.exp, math.log, math.sqrt, _scalar_cdf, _scalar_pdf
+
+        def where(condition, a, b):
+            return a if condition else b
+
+    sqrt_t = sqrt(t)
+    d1 = (log(s / k) + (r - q + 0.5 * sigma * sigma) * t) / (sigma * sqrt_t)
+    d2 = d1 - sigma * sqrt_t
+    disc_q, disc_r = exp(-q * t), exp(-r * t)
+    nd1, nd2, n_d1, n_d2 = cdf(d1), cdf(d2), cdf(-d1), cdf(-d2)
+    pdf_d1 = pdf(d1)
+
+    price = where(is_call, s * disc_q * nd1 - k * disc_r * nd2, k * disc_r * n_d2 - s * disc_q * n_d1)
+    delta = where(is_call, disc_q * nd1, disc_q * (nd1 - 1.0))
+    gamma = disc_q * pdf_d1 / (s * sigma * sqrt_t)
+    vega = s * disc_q * pdf_d1 * sqrt_t / 100.0
+    decay = -s * disc_q * pdf_d1 * sigma / (2 * sqrt_t)
+    theta = where(is_call,
+                  decay - r * k * disc_r * nd2 + q * s * disc_q * nd1,
+                  decay + r * k * disc_r * n_d2 - q * s * disc_q * n_d1) / 365.0
+    rho = where(is_call, k * t * disc_r * nd2, -k * t * disc_r * n_d2) / 100.0
+    return {"price": price, "delta": delta, "gamma": gamma, "theta": theta, "vega": vega, "rho": rho}
+
+
+def _solve_iv(is_call, price, s, k, t, r, q, vectorized, iterations=60, tolerance=1e-7):
+    """Newton's method kept inside a shrinking bisection bracket, so it always converges."""
+    lo, hi = 1e-4, 5.0
+    if vectorized:
+        lo = np.full(len(price), lo)
+        hi = np.full(len(price), hi)
+    sigma = (lo + hi) / 4
+    for _ in range(iterations):
+        model = _bsm(is_call, s, k, t, r, q, sigma, vectorized)
+        diff = model["price"] - price
+        vega = model["vega"] * 100.0
+        if vectorized:
+            hi = np.where(diff > 0, sigma, hi)
+            lo = np.where(diff > 0, lo, sigma)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                step = sigma - diff / vega
+            inside = np.isfinite(step) & (step > lo) & (step < hi)
+            sigma = np.where(inside, step, (lo + hi) / 2)
+            if np.all(np.abs(diff) < tolerance):
+                break
+        else:
+            if diff > 0:
+                hi = sigma
+            else:
+                lo = sigma
+            step = sigma - diff / vega if vega > 0 else math.nan
+            sigma = step if lo < step < hi else (lo + hi) / 2
+            if abs(diff) < tolerance:
+                break
+    return sigma
+
+
+class TDOptionChain:
+    """An option chain flattened into one row per contract, stored as columns.
+
+    Numeric columns are NumPy arrays when NumPy is installed (``array.array``
+    otherwise), so filters are boolean masks over the whole chain and the
+    Greeks / implied volatility are recomputed for every contract at once.
+    ``volatility`` keeps TD's percent units; ``expiration`` is epoch ms.
+    """
+
+    __slots__ = ("underlying", "underlying_price", "interest_rate", "symbol", "is_call") + tuple(NUMERIC_COLUMNS)
+
+    def __init__(self, underlying, underlying_price, interest_rate, symbol, is_call, **columns):
+        self.underlying = underlying
+        self.underlying_price = underlying_price
+        self.interest_rate = interest_rate  # 小數，例如 0.05
+        self.symbol = symbol
+        self.is_call = is_call
+        for name in NUMERIC_COLUMNS:
+            setattr(self, name, columns[name])
+
+    @classmethod
+    def from_chain(cls, payload):
+        """Flatten a ``get_option_chain`` response (calls first, then puts)."""
+        symbols, calls = [], []
+        values = {name: [] for name in NUMERIC_COLUMNS}
+        for side, is_call in (("callExpDateMap", True), ("putExpDateMap", False)):
+            for strikes in (payload.get(side) or {}).values():
+                for contracts in strikes.values():
+                    for contract in contracts:
+                        symbols.append(contract.get("symbol"))
+                        calls.append(is_call)
+                        for name, (field, typecode) in NUMERIC_COLUMNS.items():
+                            value = contract.get(field)
+                            values[name].append(int(value or 0) if typecode == "q" else _to_float(value))
+        rate = payload.get("interestRate")
+        return cls(
+            payload.get("symbol"),
+            _to_float(payload.get("underlyingPrice")),
+            _to_float(rate) / 100.0 if rate is not None else 0.0,
+            symbols,
+            np.asarray(calls, dtype=bool) if np is not None else calls,
+            **{name: _column(values[name], typecode) for name, (_, typecode) in NUMERIC_COLUMNS.items()},
+        )
+
+    def __len__(self):
+        return len(self.symbol)
+
+    def _take(self, index):
+        """Return a new chain with the rows selected by a boolean mask, index array or slice."""
+        if np is not None:
+            if isinstance(index, slice):
+                symbols = self.symbol[index]
+            else:
+                index = np.asarray(index)
+                positions = np.flatnonzero(index) if index.dtype == bool else index
+                symbols = [self.symbol[i] for i in positions]
+            columns = {name: getattr(self, name)[index] for name in NUMERIC_COLUMNS}
+            return TDOptionChain(self.underlying, self.underlying_price, self.interest_rate,
+                                 symbols, self.is_call[index], **columns)
+        if isinstance(index, slice):
+            positions = range(len(self))[index]
+        elif index and isinstance(index[0], bool):
+            positions = [i for i, keep in enumerate(index) if keep]
+        else:
+            positions = list(index)
+        columns = {name: array(NUMERIC_COLUMNS[name][1], (getattr(self, name)[i] for i in positions))
+                   for name in NUMERIC_COLUMNS}
+        return TDOptionChain(self.underlying, self.underlying_price, self.interest_rate,
+                             [self.symbol[i] for i in positions], [self.is_call[i] for i in positions], **columns)
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            row = {"symbol": self.symbol[index], "put_call": "CALL" if self.is_call[index] else "PUT"}
+            row.update((name, getattr(self, name)[index]) for name in NUMERIC_COLUMNS)
+            return row
+        return self._take(index)
+
+    def rows(self):
+        return [self[i] for i in range(len(self))]
+
+    # Derived columns
+    @property
+    def mid(self):
+        if np is not None:
+            return (self.bid + self.ask) / 2
+        return array("d", ((b + a) / 2 for b, a in zip(self.bid, self.ask)))
+
+    @property
+    def spread(self):
+        if np is not None:
+            return self.ask - self.bid
+        return array("d", (a - b for b, a in zip(self.bid, self.ask)))
+
+    def years_to_expiration(self, as_of=None):
+        """Time to expiry in years from ``as_of`` (epoch ms, default now); at least one minute."""
+        now = int(time.time() * 1000) if as_of is None else as_of
+        floor = 60 * 1000 / MS_PER_YEAR
+        if np is not None:
+            years = np.where(self.expiration > 0, (self.expiration - now) / MS_PER_YEAR,
+                             self.days_to_expiration / 365.0)
+            return np.maximum(years, floor)
+        return array("d", (max((e - now) / MS_PER_YEAR if e > 0 else d / 365.0, floor)
+                           for e, d in zip(self.expiration, self.days_to_expiration)))
+
+    # Filters
+    def filter(self, put_call=None, min_strike=None, max_strike=None, min_days=None, max_days=None,
+               min_delta=None, max_delta=None, min_open_interest=None, min_volume=None, max_spread=None,
+               expiration=None):
+        """Return the contracts matching every given bound; delta bounds apply to ``abs(delta)``."""
+        if np is not None:
+            mask = np.ones(len(self), dtype=bool)
+            if put_call is not None:
+                mask &= self.is_call if put_call.upper() == "CALL" else ~self.is_call
+            if expiration is not None:
+                mask &= self.expiration == expiration
+            for column, low, high in (
+                (self.strike, min_strike, max_strike),
+                (self.days_to_expiration, min_days, max_days),
+                (np.abs(self.delta), min_delta, max_delta),
+                (self.open_interest, min_open_interest, None),
+                (self.total_volume, min_volume, None),
+                (self.spread, None, max_spread),
+            ):
+                if low is not None:
+                    mask &= column >= low
+                if high is not None:
+                    mask &= column <= high
+            return self._take(mask)
+
+        def keep(i):
+            if put_call is not None and self.is_call[i] != (put_call.upper() == "CALL"):
+                return False
+            if expiration is not None and self.expiration[i] != expiration:
+                return False
+            for value, low, high in (
+                (self.strike[i], min_strike, max_strike),
+                (self.days_to_expiration[i], min_days, max_days),
+                (abs(self.delta[i]), min_delta, max_delta),
+                (self.open_interest[i], min_open_interest, None),
+                (self.total_volume[i], min_volume, None),
+                (self.ask[i] - self.bid[i], None, max_spread),
+            ):
+                if (low is not None and not value >= low) or (high is not None and not value <= high):
+                    return False
+            return True
+
+        return self._take([keep(i) for i in range(len(self))])
+
+    def expirations(self):
+        return sorted(set(int(e) for e in self.expiration))
+
+    def near_the_money(self, count=5):
+        """Keep the ``count`` strikes closest to the underlying price on each side of every expiry."""
+        keep = [False] * len(self)
+        by_expiry = {}
+        for i in range(len(self)):
+            by_expiry.setdefault((int(self.expiration[i]), bool(self.is_call[i])), []).append(i)
+        for indexes in by_expiry.values():
+            indexes.sort(key=lambda i: abs(self.strike[i] - self.underlying_price))
+            for i in indexes[:count]:
+                keep[i] = True
+        return self._take(keep)
+
+    # Analytics
+    def implied_volatility(self, price=None, rate=None, dividend=0.0, as_of=None):
+        """Solve for implied volatility (percent, like ``volatility``) from ``price`` (default mid)."""
+        price = self.mid if price is None else price
+        rate = self.interest_rate if rate is None else rate
+        t = self.years_to_expiration(as_of)
+        s = self.underlying_price
+        if np is not None:
+            price = np.asarray(price, dtype=np.float64)
+            intrinsic = np.where(self.is_call,
+                                 np.maximum(s * np.exp(-dividend * t) - self.strike * np.exp(-rate * t), 0),
+                                 np.maximum(self.strike * np.exp(-rate * t) - s * np.exp(-dividend * t), 0))
+            upper = np.where(self.is_call, s * np.exp(-dividend * t), self.strike * np.exp(-rate * t))
+            valid = np.isfinite(price) & (price > intrinsic) & (price < upper)
+            with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+                sigma = _solve_iv(self.is_call, price, s, self.strike, t, rate, dividend, True)
+            return np.where(valid, sigma * 100.0, np.nan)
+
+        result = array("d")
+        for i in range(len(self)):
+            k, ti, p, call = self.strike[i], t[i], price[i], self.is_call[i]
+            disc_q, disc_r = math.exp(-dividend * ti), math.exp(-rate * ti)
+            intrinsic = max(s * disc_q - k * disc_r, 0) if call else max(k * disc_r - s * disc_q, 0)
+            upper = s * disc_q if call else k * disc_r
+            if not (math.isfinite(p) and intrinsic < p < upper):
+                result.append(math.nan)
+                continue
+            result.append(_solve_iv(call, p, s, k, ti, rate, dividend, False) * 100.0)
+        return result
+
+    def greeks(self, volatility=None, rate=None, dividend=0.0, as_of=None):
+        """Recompute price and Greeks for every contract from ``volatility`` (percent, default TD's).
+
+        Returns ``{"price", "delta", "gamma", "theta", "vega", "rho"}`` columns.
+        """
+        volatility = self.volatility if volatility is None else volatility
+        rate = self.interest_rate if rate is None else rate
+        t = self.years_to_expiration(as_of)
+        s = self.underlying_price
+        if np is not None:
+            sigma = np.asarray(volatility, dtype=np.float64) / 100.0
+            with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+                return _bsm(self.is_call, s, self.strike, t, rate, dividend, sigma, True)
+
+        columns = {name: array("d") for name in ("price", "delta", "gamma", "theta", "vega", "rho")}
+        for i in range(len(self)):
+            sigma = volatility[i] / 100.0
+            if not (sigma > 0):
+                for column in columns.values():
+                    column.append(math.nan)
+                continue
+            values = _bsm(self.is_call[i], s, self.strike[i], t[i], rate, dividend, sigma, False)
+            for name, column in columns.items():
+                column.append(values[name])
+        return columns
+
+    def with_greeks(self, volatility=None, rate=None, dividend=0.0, as_of=None):
+        """Return a copy whose Greek columns are replaced by locally recomputed values."""
+        greeks = self.greeks(volatility, rate, dividend, as_of)
+        columns = {name: getattr(self, name) for name in NUMERIC_COLUMNS}
+        columns.update((name, greeks[name]) for name in ("delta", "gamma", "theta", "vega", "rho"))
+        if volatility is not None:
+            columns["volatility"] = _column(list(volatility), "d") if np is None else np.asarray(volatility, float)
+        return TDOptionChain(self.underlying, self.underlying_price, self.interest_rate,
+                             self.symbol, self.is_call, **columns)
@@ -0,0 +1,174 @@
+import json
+import math
+import re
+
+ORDER_TYPES = {"MARKET", "LIMIT", "STOP", "STOP_LIMIT", "TRAILING_STOP", "TRAILING_STOP_LIMIT", "MARKET_ON_CLOSE",
+               "EXERCISE", "NET_DEBIT", "NET_CREDIT", "NET_ZERO"}
+SESSIONS = {"NORMAL", "AM", "PM", "SEAMLESS"}
+DURATIONS = {"DAY", "GOOD_TILL_CANCEL", "FILL_OR_KILL"}
+STRATEGY_TYPES = {"SINGLE", "OCO", "TRIGGER"}
+INSTRUCTIONS = {"BUY", "SELL", "BUY_TO_COVER", "SELL_SHORT", "BUY_TO_OPEN", "BUY_TO_CLOSE", "SELL_TO_OPEN",
+                "SELL_TO_CLOSE", "EXCHANGE"}
+ASSET_TYPES = {"EQUITY", "OPTION", "INDEX", "MUTUAL_FUND", "CASH_EQUIVALENT", "FIXED_INCOME", "CURRENCY"}
+PRICED_TYPES = {"LIMIT", "STOP_LIMIT", "NET_DEBIT", "NET_CREDIT"}
+STOP_TYPES = {"STOP", "STOP_LIMIT"}
+
+_MARKER = re.compile(rb'"<<slot:(\w+)>>"')
+
+
+class Slot:
+    """A value filled in when an OrderTemplate is rendered.
+
+    ``kind`` is ``"price"`` (positive, rounded to 4 decimals), ``"quantity"``
+    (positive, integers written without a decimal point) or ``"string"``.
+    """
+
+    __slots__ = ("name", "kind")
+
+    def __init__(self, name, kind="string"):
+        if kind not in ("price", "quantity", "string"):
+            raise ValueError(f"Unknown slot kind '{kind}'")
+        self.name = name
+        self.kind = kind
+
+    def encode(self, value):
+        if self.kind == "string":
+            if not isinstance(value, str) or not value:
+                raise ValueError(f"Order field '{self.name}' must be a non-empty string, got {value!r}")
+            return json.dumps(value).encode()
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value <= 0:
+            raise ValueError(f"Order field '{self.name}' must be a positive number, got {value!r}")
+        if self.kind == "quantity" and float(value).is_integer():
+            return str(int(value)).encode()
+        return repr(round(float(value), 4)).encode()
+
+    def __repr__(self):
+        return f"Slot({self.name!r}, {self.kind!r})"
+
+
+def _require(order, key, allowed):
+    value = order.get(key)
+    if isinstance(value, Slot):
+        return value
+    if value not in allowed:
+        raise ValueError(f"Invalid {key} {value!r}; expected one of {', '.join(sorted(allowed))}")
+    return value
+
+
+def validate_order(order):
+    """Check an order dict (Slot values allowed) against the fields TD requires; raises ValueError."""
+    strategy = _require(order, "orderStrategyType", STRATEGY_TYPES)
+    children = order.get("childOrderStrategies") or []
+    if strategy == "OCO":
+        # OCO 只是容器，本身沒有腳
+        if len(children) < 2:
+            raise ValueError("An OCO order needs at least two childOrderStrategies")
+    else:
+        order_type = _require(order, "orderType", ORDER_TYPES)
+        _require(order, "session", SESSIONS)
+        _require(order, "duration", DURATIONS)
+        if order_type in PRICED_TYPES and order.get("price") is None:
+            raise ValueError(f"A {order_type} order needs a price")
+        if order_type in STOP_TYPES and order.get("stopPrice") is None:
+            raise ValueError(f"A {order_type} order needs a stopPrice")
+        legs = order.get("orderLegCollection")
+        if not legs:
+            raise ValueError("An order needs at least one leg in orderLegCollection")
+        for leg in legs:
+            _require(leg, "instruction", INSTRUCTIONS)
+            if leg.get("quantity") is None:
+                raise ValueError("Every order leg needs a quantity")
+            instrument = leg.get("instrument") or {}
+            if instrument.get("symbol") is None:
+                raise ValueError("Every order leg needs instrument.symbol")
+            _require(instrument, "assetType", ASSET_TYPES)
+        if strategy == "TRIGGER" and not children:
+            raise ValueError("A TRIGGER order needs childOrderStrategies")
+    for child in children:
+        validate_order(child)
+    return order
+
+
+class OrderTemplate:
+    """An order validated and serialized once, with Slots filled in per call.
+
+    The JSON is split around the Slot markers at construction, so ``render``
+    only encodes the slot values and joins bytes; nothing is re-validated
+    or re-serialized on the order path.
+    """
+
+    __slots__ = ("order", "_parts", "_slots")
+
+    def __init__(self, order):
+        validate_order(order)
+        self.order = order
+        slots = {}
+
+        def marker(value):
+            if not isinstance(value, Slot):
+                raise TypeError(f"Cannot serialize {value!r} in an order")
+            if slots.setdefault(value.name, value).kind != value.kind:
+                raise ValueError(f"Slot '{value.name}' is used with two different kinds")
+            return f"<<slot:{value.name}>>"
+
+        pieces = _MARKER.split(json.dumps(order, separators=(",", ":"), default=marker).encode())
+        self._parts = pieces[0::2]
+        self._slots = tuple(slots[name.decode()] for name in pieces[1::2])
+
+    @property
+    def slot_names(self):
+        return sorted({slot.name for slot in self._slots})
+
+    def render(self, **values):
+        """Return the order JSON as bytes with every Slot filled from ``values``."""
+        parts = self._parts
+        out = [parts[0]]
+        try:
+            for slot, part in zip(self._slots, parts[1:]):
+                out.append(slot.encode(values[slot.name]))
+                out.append(part)
+        except KeyError as e:
+            raise ValueError(f"Missing order field {e.args[0]!r}") from None
+        return b"".join(out)
+
+    def __repr__(self):
+        return f"OrderTemplate(slots={self.slot_names})"
+
+
+def serialize_order(order, **values):
+    """Return the request body for an OrderTemplate, an order dict or pre-serialized bytes."""
+    if isinstance(order, OrderTemplate):
+        return order.render(**values)
+    if values:
+        raise ValueError("Slot values can only be given with an OrderTemplate")
+    if isinstance(order, (bytes, bytearray)):
+        return bytes(order)
+    return json.dumps(validate_order(order), separators=(",", ":")).encode()
+
+
+def single_leg_order(asset_type, instruction, order_type="LIMIT", session="NORMAL", duration="DAY"):
+    """A SINGLE order template with ``symbol`` and ``quantity`` slots (plus ``price``/``stopPrice`` as needed)."""
+    order = {
+        "orderType": order_type,
+        "session": session,
+        "duration": duration,
+        "orderStrategyType": "SINGLE",
+        "orderLegCollection": [{
+            "instruction": instruction,
+            "quantity": Slot("quantity", "quantity"),
+            "instrument": {"symbol": Slot("symbol"), "assetType": asset_type},
+        }],
+    }
+    if order_type in PRICED_TYPES:
+        order["price"] = Slot("price", "price")
+    if order_type in STOP_TYPES:
+        order["stopPrice"] = Slot("stopPrice", "price")
+    return OrderTemplate(order)
+
+
+def equity_order(instruction, order_type="LIMIT", session="NORMAL", duration="DAY"):
+    return single_leg_order("EQUITY", instruction, order_type, session, duration)
+
+
+def option_order(instruction, order_type="LIMIT", session="NORMAL", duration="DAY"):
+    return single_leg_order("OPTION", instruction, order_type, session, duration)
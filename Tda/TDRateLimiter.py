@@ -0,0 +1,172 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+# 優先順序：數字越小越先取得 token
+PRIORITY_ORDER = 0
+PRIORITY_ACCOUNT = 1
+PRIORITY_MARKET_DATA = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_ORDER: "order",
+    PRIORITY_ACCOUNT: "account",
+    PRIORITY_MARKET_DATA: "market_data",
+}
+
+
+class RateLimitTimeout(Exception):
+    pass
+
+
+class TDRateLimiter:
+    """A token-bucket limiter with priority classes, shared by every client in the process.
+
+    TD Ameritrade allows 120 requests per minute per account. Waiting
+    requests are served strictly by priority, then in arrival order, so
+    order traffic never queues behind market-data polling.
+    """
+
+    DEFAULT_REQUESTS_PER_MINUTE = 120
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, burst=None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst if burst is not None else requests_per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+        self.acquired = {p: 0 for p in PRIORITY_NAMES}
+        self.total_wait = {p: 0.0 for p in PRIORITY_NAMES}
+        self.max_wait = {p: 0.0 for p in PRIORITY_NAMES}
+        self.throttles = 0
+
+    @classmethod
+    def default(cls):
+        """Return the process-wide limiter, creating it on first use."""
+        if cls._default is None:
+            with cls._default_lock:
+                if cls._default is None:
+                    cls._default = cls()
+        return cls._default
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_take(self, entry):
+        # 呼叫端必須持有 self._cond；回傳 0 表示已取得 token，否則回傳建議等待秒數
+        now = time.monotonic()
+        self._refill(now)
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._waiters[0] is entry:
+            if self._tokens >= 1:
+                heapq.heappop(self._waiters)
+                self._tokens -= 1
+                self._cond.notify_all()
+                return 0
+            return (1 - self._tokens) / self.rate
+        return None
+
+    def _enqueue(self, priority):
+        entry = [priority, next(self._seq)]
+        heapq.heappush(self._waiters, entry)
+        return entry
+
+    def _dequeue(self, entry):
+        # 逾時或取消時把等待者移出佇列
+        self._waiters.remove(entry)
+        heapq.heapify(self._waiters)
+        self._cond.notify_all()
+
+    def _record(self, priority, waited):
+        self.acquired[priority] = self.acquired.get(priority, 0) + 1
+        self.total_wait[priority] = self.total_wait.get(priority, 0.0) + waited
+        self.max_wait[priority] = max(self.max_wait.get(priority, 0.0), waited)
+
+    def acquire(self, priority=PRIORITY_MARKET_DATA, timeout=None):
+        """Block until a token is available and return the seconds spent waiting."""
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        with self._cond:
+            entry = self._enqueue(priority)
+            while True:
+                delay = self._try_take(entry)
+                if delay == 0:
+                    waited = time.monotonic() - started
+                    self._record(priority, waited)
+                    return waited
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._dequeue(entry)
+                        raise RateLimitTimeout(f"No request token within {timeout} seconds")
+                    delay = remaining if delay is None else min(delay, remaining)
+                self._cond.wait(delay)
+
+    async def acquire_async(self, priority=PRIORITY_MARKET_DATA):
+        """Asyncio version of acquire; waits without blocking the event loop."""
+        started = time.monotonic()
+        with self._cond:
+            entry = self._enqueue(priority)
+        try:
+            while True:
+                with self._cond:
+                    delay = self._try_take(entry)
+                if delay == 0:
+                    break
+                await asyncio.sleep(delay if delay is not None else 1.0 / self.rate)
+        except BaseException:
+            with self._cond:
+                if entry in self._waiters:
+                    self._dequeue(entry)
+            raise
+        waited = time.monotonic() - started
+        with self._cond:
+            self._record(priority, waited)
+        return waited
+
+    def throttled(self, retry_after=None):
+        """Record a 429 from the server and pause every caller until it is safe to resume."""
+        with self._cond:
+            self.throttles += 1
+            self._tokens = 0.0
+            try:
+                pause = float(retry_after)
+            except (TypeError, ValueError):
+                pause = 1.0 / self.rate
+            self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+            self._cond.notify_all()
+
+    @property
+    def queue_depth(self):
+        return len(self._waiters)
+
+    def stats(self):
+        with self._cond:
+            by_priority = {}
+            for priority, name in PRIORITY_NAMES.items():
+                count = self.acquired.get(priority, 0)
+                by_priority[name] = {
+                    "acquired": count,
+                    "avg_wait": self.total_wait.get(priority, 0.0) / count if count else 0.0,
+                    "max_wait": self.max_wait.get(priority, 0.0),
+                }
+            return {
+                "queue_depth": len(self._waiters),
+                "queue_depth_by_priority": {
+                    name: sum(1 for entry in self._waiters if entry[0] == priority)
+                    for priority, name in PRIORITY_NAMES.items()
+                },
+                "tokens": self._tokens,
+                "throttles": self.throttles,
+                "priorities": by_priority,
+            }
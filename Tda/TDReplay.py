@@ -0,0 +1,341 @@
+import heapq
+import logging
+import time
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import repeat
+from multiprocessing import shared_memory
+from .TDBarStore import BAR_LENGTH_MS, FREQUENCY_PATTERN
+from .TDCandles import COLUMNS, TYPECODES, TDCandles, np
+from .TDModels import Candle, LazyModels, Quote
+
+DAY_MS = BAR_LENGTH_MS["daily"]
+# periodType -> (預設 period, 每個 period 的毫秒數)；ytd 另外處理
+PERIODS = {"day": (10, DAY_MS), "month": (1, 30 * DAY_MS), "year": (1, 365 * DAY_MS), "ytd": (1, None)}
+FREQUENCY_MS = {"minute": 60 * 1000, "daily": DAY_MS, "weekly": 7 * DAY_MS}
+# 每次轉成 Python 物件的事件數，限制時間軸佔用的記憶體
+TIMELINE_CHUNK = 65536
+
+
+def bar_length_ms(frequency):
+    """``"minute5"`` -> 300000."""
+    match = FREQUENCY_PATTERN.match(frequency)
+    if not match:
+        raise ValueError(f"Invalid frequency '{frequency}', expected e.g. 'minute1' or 'daily1'")
+    return BAR_LENGTH_MS[match.group(1)] * int(match.group(2))
+
+
+class SimulatedClock:
+    """The replay's notion of "now", in epoch milliseconds; it only moves when the replay advances it."""
+
+    __slots__ = ("now_ms",)
+
+    def __init__(self, now_ms=0):
+        self.now_ms = now_ms
+
+    def time(self):
+        """Seconds since the epoch, like ``time.time()``."""
+        return self.now_ms / 1000
+
+    def datetime(self):
+        return datetime.fromtimestamp(self.now_ms / 1000, tz=timezone.utc)
+
+
+class TDReplayDataQuery:
+    """Serves stored candles through TDDataQuery's ``get_price_history`` / ``get_quote(s)`` as of a SimulatedClock.
+
+    A bar is visible once it has closed (``datetime + bar length <= now``),
+    so a strategy can never see the future. Price history honours
+    ``startDate``/``endDate`` or ``periodType``/``period`` and resamples to
+    a coarser ``frequencyType``/``frequency``; quotes are built from the
+    last closed bar and the bars of its (UTC) day. ``columnar=True``
+    returns zero-copy TDCandles views and is much faster than the dict shape.
+    """
+
+    def __init__(self, bars, frequency="minute1", clock=None):
+        self.bars = {symbol.upper(): candles for symbol, candles in bars.items()}
+        self.bar_ms = bar_length_ms(frequency)
+        self.clock = clock or SimulatedClock()
+
+    def visible(self, symbol):
+        """Return the closed candles of ``symbol`` (a view), or None for an unknown symbol."""
+        candles = self.bars.get(symbol.upper())
+        if candles is None:
+            return None
+        return candles[:candles._search(self.clock.now_ms - self.bar_ms, "right")]
+
+    # Price History
+    def _lookback_start(self, period_type, period):
+        default, length = PERIODS.get(period_type, PERIODS["day"])
+        if length is None:
+            return int(datetime(self.clock.datetime().year, 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+        return self.clock.now_ms - int(period or default) * length
+
+    def get_price_history(self, symbol, columnar=False, typed=False, **kwargs):
+        candles = self.visible(symbol)
+        if candles is None:
+            return {"symbol": symbol, "empty": True, "candles": []}
+        period_type = kwargs.get("periodType") or "day"
+        if kwargs.get("startDate") is not None or kwargs.get("endDate") is not None:
+            end = kwargs.get("endDate")
+            candles = candles.between(kwargs.get("startDate"), end + 1 if end is not None else None)
+        else:
+            candles = candles.between(self._lookback_start(period_type, kwargs.get("period")))
+
+        frequency_type = kwargs.get("frequencyType") or ("minute" if period_type == "day" else "daily")
+        if frequency_type not in FREQUENCY_MS:
+            raise ValueError(f"Replay does not support frequencyType '{frequency_type}'")
+        size = FREQUENCY_MS[frequency_type] * int(kwargs.get("frequency") or 1)
+        if size > self.bar_ms:
+            candles = candles.resample(size / 60000)
+
+        if columnar:
+            return candles
+        result = candles.to_price_history()
+        if typed:
+            return Candle.from_list(result["candles"])
+        return result
+
+    # Quotes
+    def _quote(self, symbol, candles):
+        last = len(candles) - 1
+        day_start = int(candles.datetime[last]) // DAY_MS * DAY_MS
+        first = candles._search(day_start, "left")
+        session = candles[first:]
+        if np is not None:
+            high, low, volume = float(session.high.max()), float(session.low.min()), float(session.volume.sum())
+        else:
+            high, low, volume = max(session.high), min(session.low), sum(session.volume)
+        price = float(candles.close[last])
+        previous = float(candles.close[first - 1] if first else candles.open[first])
+        return {
+            "assetType": "EQUITY", "symbol": symbol, "bidPrice": price, "askPrice": price, "lastPrice": price,
+            "mark": price, "openPrice": float(candles.open[first]), "highPrice": high, "lowPrice": low,
+            "closePrice": previous, "netChange": price - previous, "totalVolume": int(volume),
+            "quoteTimeInLong": self.clock.now_ms, "tradeTimeInLong": int(candles.datetime[last]) + self.bar_ms,
+            "delayed": False,
+        }
+
+    def get_quotes(self, symbols, typed=False):
+        if isinstance(symbols, str):
+            symbols = symbols.split(",")
+        result = {}
+        for symbol in symbols:
+            candles = self.visible(symbol)
+            if candles:  # 未知或尚無收盤 K 線的代號不回傳，和 TD 相同
+                result[symbol] = self._quote(symbol, candles)
+        return LazyModels(result, Quote) if typed else result
+
+    def get_quote(self, symbol, typed=False):
+        result = self.get_quotes([symbol])
+        if typed:
+            return Quote.from_json(result.get(symbol, {}))
+        return result
+
+
+class ReplayResult(namedtuple("ReplayResult", ["symbols", "params", "result", "events", "elapsed"])):
+    """One strategy run; ``result`` is the strategy's ``result()`` or the exception it raised."""
+
+    __slots__ = ()
+
+    @property
+    def events_per_second(self):
+        return self.events / self.elapsed if self.elapsed else 0.0
+
+
+class ReplayReport(list):
+    """ReplayResults of a parallel run; ``elapsed`` is the wall time of the whole run."""
+
+    def __init__(self):
+        super().__init__()
+        self.elapsed = 0.0
+
+    @property
+    def events(self):
+        return sum(run.events for run in self)
+
+    @property
+    def events_per_second(self):
+        return self.events / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def errors(self):
+        return [run for run in self if isinstance(run.result, Exception)]
+
+
+class SharedBars:
+    """The candle columns of many symbols packed into one shared memory block.
+
+    ``layout`` maps symbol -> (offset, count); a symbol's six columns are
+    stored one after another, 8 bytes per value in native byte order.
+    Worker processes ``attach`` by name and read zero-copy TDCandles, so
+    the bars exist once in memory however many workers there are.
+    """
+
+    def __init__(self, shm, layout):
+        self.shm = shm
+        self.layout = layout
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def create(cls, bars):
+        layout, offset = {}, 0
+        for symbol, candles in bars.items():
+            layout[symbol] = (offset, len(candles))
+            offset += len(candles) * 8 * len(COLUMNS)
+        shared = cls(shared_memory.SharedMemory(create=True, size=max(offset, 1)), layout)
+        for symbol, candles in bars.items():
+            target = shared.candles(symbol)
+            for name in COLUMNS:
+                if np is not None:
+                    getattr(target, name)[:] = getattr(candles, name)
+                else:
+                    getattr(target, name)[:] = array(TYPECODES[name], getattr(candles, name))
+            del target  # close() 前不能留著指向共享記憶體的 view
+        return shared
+
+    @classmethod
+    def attach(cls, name, layout):
+        return cls(shared_memory.SharedMemory(name=name), layout)
+
+    def candles(self, symbol):
+        offset, count = self.layout[symbol]
+        columns = []
+        for index, name in enumerate(COLUMNS):
+            start = offset + index * count * 8
+            if np is not None:
+                dtype = np.int64 if TYPECODES[name] == "q" else np.float64
+                columns.append(np.ndarray((count,), dtype=dtype, buffer=self.shm.buf, offset=start))
+            else:
+                columns.append(self.shm.buf[start:start + count * 8].cast(TYPECODES[name]))
+        return TDCandles(symbol, *columns)
+
+    def all_candles(self):
+        return {symbol: self.candles(symbol) for symbol in self.layout}
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+# 工作行程的全域狀態，由 _init_worker 設定
+_worker_shared = None
+_worker_replay = None
+
+
+def _init_worker(name, layout, frequency):
+    global _worker_shared, _worker_replay
+    _worker_shared = SharedBars.attach(name, layout)
+    _worker_replay = TDReplay(_worker_shared.all_candles(), frequency)
+
+
+def _run_job(strategy, symbols, params, start, end):
+    return _worker_replay.run(strategy(**params), symbols, start, end, params=params)
+
+
+class TDReplay:
+    """Replays stored candles to strategies at maximum speed on a simulated clock.
+
+    ``run`` walks the bars of the chosen symbols in time order. Before each
+    bar it sets the clock to the bar's close, then calls
+    ``strategy.on_bar(query, symbol, bar)``. ``query`` is a
+    TDReplayDataQuery, so code written against TDDataQuery's
+    ``get_price_history`` / ``get_quotes`` runs unchanged. The optional
+    ``on_start(query)`` and ``result()`` hooks are called around the run.
+    ``run_parallel`` fans (symbol group, parameter set) jobs out to a
+    process pool that reads the bars from one SharedBars block.
+    """
+
+    def __init__(self, bars, frequency="minute1"):
+        self.bars = {symbol.upper(): candles for symbol, candles in bars.items()}
+        self.frequency = frequency
+        self.bar_ms = bar_length_ms(frequency)
+        self._logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_store(cls, store, symbols, frequency="minute1", start=None, end=None):
+        """Replay memory-mapped bars from a TDBarStore."""
+        return cls({symbol: store.read(symbol, frequency, start, end) for symbol in symbols}, frequency)
+
+    @classmethod
+    def from_price_history(cls, payloads, frequency="minute1"):
+        """Replay recorded ``get_price_history`` responses, ``{symbol: payload}``."""
+        return cls({symbol: TDCandles.from_price_history(payload) for symbol, payload in payloads.items()}, frequency)
+
+    def _timeline(self, symbols, start, end):
+        """Yield ``(timestamps, symbol_indexes, rows)`` chunks of every bar in time order."""
+        views = []
+        for candles in (self.bars[symbol] for symbol in symbols):
+            lo = 0 if start is None else candles._search(start, "left")
+            hi = len(candles) if end is None else candles._search(end, "left")
+            views.append((candles.datetime[lo:hi], lo, hi))
+        if np is not None:
+            timestamps = np.concatenate([dt for dt, _, _ in views] or [np.empty(0, np.int64)])
+            indexes = np.concatenate([np.full(hi - lo, k) for k, (_, lo, hi) in enumerate(views)] or [np.empty(0, int)])
+            rows = np.concatenate([np.arange(lo, hi) for _, lo, hi in views] or [np.empty(0, int)])
+            order = np.argsort(timestamps, kind="stable")  # 同一時間依 symbols 的順序
+            for i in range(0, len(order), TIMELINE_CHUNK):
+                chunk = order[i:i + TIMELINE_CHUNK]
+                yield timestamps[chunk].tolist(), indexes[chunk].tolist(), rows[chunk].tolist()
+            return
+        merged = heapq.merge(*(zip(dt, repeat(k), range(lo, hi)) for k, (dt, lo, hi) in enumerate(views)))
+        while True:
+            chunk = [event for _, event in zip(range(TIMELINE_CHUNK), merged)]
+            if not chunk:
+                return
+            yield tuple(zip(*chunk))
+
+    def run(self, strategy, symbols=None, start=None, end=None, params=None):
+        """Replay ``symbols`` (default: all) between ``start`` and ``end`` (epoch ms) into ``strategy``."""
+        symbols = [symbol.upper() for symbol in symbols] if symbols else sorted(self.bars)
+        clock = SimulatedClock()
+        query = TDReplayDataQuery(self.bars, self.frequency, clock)
+        candles = [self.bars[symbol] for symbol in symbols]
+        on_bar = strategy.on_bar
+        events = 0
+        started = time.perf_counter()
+        if hasattr(strategy, "on_start"):
+            strategy.on_start(query)
+        for timestamps, indexes, rows in self._timeline(symbols, start, end):
+            for timestamp, k, row in zip(timestamps, indexes, rows):
+                clock.now_ms = timestamp + self.bar_ms
+                on_bar(query, symbols[k], candles[k][row])
+            events += len(timestamps)
+        result = strategy.result() if hasattr(strategy, "result") else None
+        return ReplayResult(tuple(symbols), params, result, events, time.perf_counter() - started)
+
+    def run_parallel(self, strategy, param_sets=({},), groups=None, start=None, end=None, max_workers=None):
+        """Run ``strategy(**params)`` for every symbol group and parameter set across a process pool.
+
+        ``strategy`` must be a picklable (module-level) class. ``groups``
+        lists the symbols each run sees (default: each symbol alone).
+        Returns a ReplayReport in job order; a failed job's ``result`` is
+        its exception.
+        """
+        groups = [(group,) if isinstance(group, str) else tuple(group) for group in groups or sorted(self.bars)]
+        jobs = [([symbol.upper() for symbol in group], params) for group in groups for params in param_sets]
+        report = ReplayReport()
+        started = time.perf_counter()
+        shared = SharedBars.create(self.bars)
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                     initargs=(shared.name, shared.layout, self.frequency)) as executor:
+                futures = [executor.submit(_run_job, strategy, group, params, start, end) for group, params in jobs]
+                for (group, params), future in zip(jobs, futures):
+                    try:
+                        report.append(future.result())
+                    except Exception as e:
+                        self._logger.error(f"回放 {','.join(group)} {params} 失敗: {e}")
+                        report.append(ReplayResult(tuple(group), params, e, 0, 0.0))
+        finally:
+            shared.close()
+            shared.unlink()
+        report.elapsed = time.perf_counter() - started
+        return report
@@ -0,0 +1,288 @@
+import asyncio
+import inspect
+import json
+import logging
+import urllib.parse
+from datetime import datetime
+import aiohttp
+
+# 各服務的欄位編號對照 (TD Ameritrade Streaming API)
+LEVELONE_EQUITY_FIELDS = {
+    0: "symbol", 1: "bidPrice", 2: "askPrice", 3: "lastPrice", 4: "bidSize", 5: "askSize",
+    6: "askID", 7: "bidID", 8: "totalVolume", 9: "lastSize", 10: "tradeTime", 11: "quoteTime",
+    12: "highPrice", 13: "lowPrice", 14: "bidTick", 15: "closePrice", 16: "exchangeID",
+    17: "marginable", 18: "shortable", 24: "volatility", 28: "openPrice", 29: "netChange",
+    49: "mark", 50: "quoteTimeInLong", 51: "tradeTimeInLong",
+}
+
+CHART_EQUITY_FIELDS = {
+    0: "symbol", 1: "openPrice", 2: "highPrice", 3: "lowPrice", 4: "closePrice",
+    5: "volume", 6: "sequence", 7: "chartTime", 8: "chartDay",
+}
+
+ACCT_ACTIVITY_FIELDS = {
+    0: "subscriptionKey", 1: "accountNumber", 2: "messageType", 3: "messageData",
+}
+
+SERVICE_FIELDS = {
+    "QUOTE": LEVELONE_EQUITY_FIELDS,
+    "CHART_EQUITY": CHART_EQUITY_FIELDS,
+    "ACCT_ACTIVITY": ACCT_ACTIVITY_FIELDS,
+}
+
+
+class StreamerError(Exception):
+    pass
+
+
+class TDStreamer:
+    """A WebSocket client for level-one quotes, chart bars and account activity.
+
+    Connection details come from ``TDUserSettings.get_user_principals``.
+    Subscriptions are remembered and replayed after every reconnect.
+    Messages are delivered to handlers registered with ``add_handler`` and
+    can also be consumed with ``async for message in streamer``.
+    """
+
+    PRINCIPAL_FIELDS = "streamerSubscriptionKeys,streamerConnectionInfo"
+    LOGIN_TIMEOUT = 10
+
+    def __init__(self, user_settings, socket_url=None, reconnect=True, max_backoff=30.0, queue_size=10000):
+        self.user_settings = user_settings
+        self.socket_url = socket_url
+        self.reconnect = reconnect
+        self.max_backoff = max_backoff
+        self.subscriptions = {}  # service -> (keys, fields)
+        self.reconnects = 0
+        self._handlers = {}
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._request_id = 0
+        self._principals = None
+        self._session = None
+        self._ws = None
+        self._task = None
+        self._callbacks = set()  # 進行中的協程 handler，保留參照直到完成
+        self._logged_in = None
+        self._closing = False
+        self._logger = logging.getLogger(__name__)
+
+    # Connection
+    def _build_login(self, principals):
+        info = principals["streamerInfo"]
+        account = principals["accounts"][0]
+        timestamp = int(datetime.strptime(info["tokenTimestamp"], "%Y-%m-%dT%H:%M:%S%z").timestamp() * 1000)
+        credentials = {
+            "userid": account["accountId"],
+            "token": info["token"],
+            "company": account["company"],
+            "segment": account["segment"],
+            "cddomain": account["accountCdDomainId"],
+            "usergroup": info["userGroup"],
+            "accesslevel": info["accessLevel"],
+            "authorized": "Y",
+            "timestamp": timestamp,
+            "appid": info["appId"],
+            "acl": info["acl"],
+        }
+        return self._build_request("ADMIN", "LOGIN", {
+            "credential": urllib.parse.urlencode(credentials),
+            "token": info["token"],
+            "version": "1.0",
+        })
+
+    def _build_request(self, service, command, parameters):
+        principals = self._principals
+        self._request_id += 1
+        return {
+            "service": service,
+            "command": command,
+            "requestid": str(self._request_id),
+            "account": principals["accounts"][0]["accountId"],
+            "source": principals["streamerInfo"]["appId"],
+            "parameters": parameters,
+        }
+
+    async def _send(self, *requests):
+        await self._ws.send_str(json.dumps({"requests": list(requests)}))
+
+    async def _connect_once(self):
+        # get_user_principals 是同步呼叫，放到執行緒中避免阻塞事件迴圈
+        self._principals = await asyncio.to_thread(self.user_settings.get_user_principals, fields=self.PRINCIPAL_FIELDS)
+        url = self.socket_url or f"wss://{self._principals['streamerInfo']['streamerSocketUrl']}/ws"
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        self._ws = await self._session.ws_connect(url, heartbeat=20)
+
+        self._logged_in = asyncio.get_running_loop().create_future()
+        await self._send(self._build_login(self._principals))
+        await asyncio.wait_for(self._await_login(), self.LOGIN_TIMEOUT)
+        if not self._logged_in.result():
+            raise StreamerError("Streamer login failed")
+
+        # 重新訂閱先前的服務；帳戶活動的 key 隨 principals 更新，改用新取得的
+        if self.subscriptions.get("ACCT_ACTIVITY", ([], ""))[0]:
+            self.subscriptions["ACCT_ACTIVITY"] = ([self._account_activity_key()], self.subscriptions["ACCT_ACTIVITY"][1])
+        replay = [self._build_request(service, "SUBS", {"keys": ",".join(keys), "fields": fields})
+                  for service, (keys, fields) in self.subscriptions.items() if keys]
+        if replay:
+            await self._send(*replay)
+
+    async def _await_login(self):
+        while not self._logged_in.done():
+            self._dispatch_raw(await self._ws.receive())
+
+    async def connect(self):
+        """Connect, log in and start the receive loop in the background."""
+        self._closing = False
+        await self._connect_once()
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def _run(self):
+        backoff = 0.5
+        while not self._closing:
+            try:
+                async for message in self._ws:
+                    self._dispatch_raw(message)
+                    backoff = 0.5
+            except Exception as e:
+                self._logger.warning(f"Streamer 連線錯誤: {e}")
+            if self._closing or not self.reconnect:
+                break
+            while not self._closing:
+                self._logger.info(f"Streamer 斷線，{backoff:.1f} 秒後重新連線")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                try:
+                    await self._connect_once()
+                    self.reconnects += 1
+                    break
+                except Exception as e:
+                    self._logger.warning(f"Streamer 重新連線失敗: {e}")
+        await self._queue.put(None)
+
+    async def close(self):
+        self._closing = True
+        if self._ws is not None:
+            try:
+                await self._send(self._build_request("ADMIN", "LOGOUT", {}))
+            except Exception:
+                pass
+            await self._ws.close()
+        if self._task is not None:
+            await self._task
+        if self._callbacks:
+            # 等待尚未完成的 handler；失敗已由 _callback_done 記錄
+            await asyncio.gather(*self._callbacks, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # Message handling
+    def add_handler(self, service, callback):
+        """Call ``callback(message)`` for every data message of ``service``; coroutines are awaited."""
+        self._handlers.setdefault(service, []).append(callback)
+
+    def _dispatch_raw(self, message):
+        if message.type != aiohttp.WSMsgType.TEXT:
+            if message.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSE):
+                raise StreamerError("Streamer connection closed")
+            return
+        payload = json.loads(message.data)
+        for response in payload.get("response", []):
+            if response.get("service") == "ADMIN" and response.get("command") == "LOGIN":
+                if self._logged_in is not None and not self._logged_in.done():
+                    self._logged_in.set_result(response.get("content", {}).get("code") == 0)
+        for data in payload.get("data", []):
+            self._deliver(self._decode(data))
+
+    @staticmethod
+    def _decode(data):
+        names = SERVICE_FIELDS.get(data.get("service"), {})
+        content = []
+        for item in data.get("content", []):
+            decoded = {}
+            for field, value in item.items():
+                if field == "key":
+                    decoded["key"] = value
+                elif field.isdigit():
+                    decoded[names.get(int(field), field)] = value
+                else:
+                    decoded[field] = value
+            content.append(decoded)
+        return {"service": data.get("service"), "timestamp": data.get("timestamp"), "content": content}
+
+    def _deliver(self, message):
+        for callback in self._handlers.get(message["service"], []):
+            result = callback(message)
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result)
+                self._callbacks.add(task)
+                task.add_done_callback(self._callback_done)
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # 消費者太慢時丟棄最舊的訊息
+            self._queue.get_nowait()
+            self._queue.put_nowait(message)
+
+    def _callback_done(self, task):
+        self._callbacks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._logger.error("Streamer handler 執行失敗", exc_info=task.exception())
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self._queue.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+    # Subscriptions
+    async def _subscribe(self, service, keys, fields):
+        keys = [k for k in keys if k]
+        current, _ = self.subscriptions.get(service, ([], fields))
+        merged = list(dict.fromkeys(list(current) + keys))
+        self.subscriptions[service] = (merged, fields)
+        command = "ADD" if current else "SUBS"
+        if self._ws is not None and not self._ws.closed:
+            await self._send(self._build_request(service, command, {"keys": ",".join(keys), "fields": fields}))
+
+    async def _unsubscribe(self, service, keys):
+        current, fields = self.subscriptions.get(service, ([], ""))
+        remaining = [k for k in current if k not in set(keys)]
+        self.subscriptions[service] = (remaining, fields)
+        if self._ws is not None and not self._ws.closed:
+            await self._send(self._build_request(service, "UNSUBS", {"keys": ",".join(keys)}))
+
+    async def subscribe_quotes(self, symbols, fields=None):
+        fields = fields or ",".join(str(f) for f in LEVELONE_EQUITY_FIELDS)
+        await self._subscribe("QUOTE", [s.upper() for s in symbols], fields)
+
+    async def unsubscribe_quotes(self, symbols):
+        await self._unsubscribe("QUOTE", [s.upper() for s in symbols])
+
+    async def subscribe_chart_equity(self, symbols):
+        await self._subscribe("CHART_EQUITY", [s.upper() for s in symbols], ",".join(str(f) for f in CHART_EQUITY_FIELDS))
+
+    async def unsubscribe_chart_equity(self, symbols):
+        await self._unsubscribe("CHART_EQUITY", [s.upper() for s in symbols])
+
+    def _account_activity_key(self):
+        return self._principals["streamerSubscriptionKeys"]["keys"][0]["key"]
+
+    async def subscribe_account_activity(self):
+        if self._principals is None:
+            raise StreamerError("Connect before subscribing to account activity")
+        await self._subscribe("ACCT_ACTIVITY", [self._account_activity_key()], "0,1,2,3")
+
+    async def unsubscribe_account_activity(self):
+        keys, _ = self.subscriptions.get("ACCT_ACTIVITY", ([], ""))
+        await self._unsubscribe("ACCT_ACTIVITY", list(keys))
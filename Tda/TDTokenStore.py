@@ -0,0 +1,212 @@
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from dotenv import dotenv_values
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+EPOCH = datetime.fromisoformat("1970-01-01T00:00:00")
+# .env 中對應的鍵名
+ENV_KEYS = {
+    "access_token": "TDA_ACCESS_TOKEN",
+    "refresh_token": "TDA_REFRESH_TOKEN",
+    "access_token_expiry": "TDA_ACCESS_TOKEN_EXPIRY",
+    "refresh_token_expiry": "TDA_REFRESH_TOKEN_EXPIRY",
+}
+
+
+def empty_tokens():
+    return {"access_token": None, "refresh_token": None,
+            "access_token_expiry": EPOCH, "refresh_token_expiry": EPOCH}
+
+
+class FileLock:
+    """An exclusive lock on ``path`` shared by threads and processes.
+
+    Re-entrant within a process, so a caller holding the lock can still
+    call ``save``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                else:
+                    # LK_LOCK 只重試 10 秒，逾時就再試一次
+                    while True:
+                        try:
+                            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            continue
+            except BaseException:
+                os.close(fd)
+                self._thread_lock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            finally:
+                os.close(fd)
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class TDTokenStore:
+    """Base class for persisting tokens across processes.
+
+    ``load`` returns the cached tokens until the file's identity (inode,
+    mtime, size) changes, so a peer's refresh is picked up with one
+    ``stat`` call. ``save`` writes a temporary file and renames it over the
+    original, so readers never see a half-written file. Wrap read-modify-write
+    sequences in ``lock()``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file_lock = FileLock(path + ".lock")
+        self._signature = None
+        self._cached = None
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def changed(self):
+        """Return True if the file was written since the last ``load`` or ``save``."""
+        return self._stat_signature() != self._signature
+
+    def lock(self):
+        return self._file_lock
+
+    def load(self):
+        signature = self._stat_signature()
+        if self._cached is None or signature != self._signature:
+            self._cached = self._read() if signature is not None else empty_tokens()
+            self._signature = signature
+        return dict(self._cached)
+
+    def save(self, tokens):
+        tokens = dict(empty_tokens(), **tokens)
+        with self.lock():
+            self._atomic_write(self._render(tokens))
+            self._cached = tokens
+            self._signature = self._stat_signature()
+
+    def _atomic_write(self, content):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(self.path))
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _read(self):
+        raise NotImplementedError
+
+    def _render(self, tokens):
+        raise NotImplementedError
+
+
+class EnvTokenStore(TDTokenStore):
+    """Tokens kept in the ``config/.env`` layout; other lines are preserved."""
+
+    @staticmethod
+    def default_path():
+        return os.path.join(os.path.dirname(__file__), 'config', '.env')
+
+    def __init__(self, path=None):
+        super().__init__(path or self.default_path())
+
+    def _read(self):
+        values = dotenv_values(self.path)
+        tokens = empty_tokens()
+        for name, key in ENV_KEYS.items():
+            value = values.get(key)
+            if not value or value == "None":
+                continue
+            tokens[name] = datetime.fromisoformat(value) if name.endswith("_expiry") else value
+        return tokens
+
+    @staticmethod
+    def _format(value):
+        return value.isoformat() if isinstance(value, datetime) else value
+
+    def _render(self, tokens):
+        lines = []
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                lines = f.readlines()
+        pending = dict(ENV_KEYS)
+        new_content = []
+        for line in lines:
+            for name, key in list(pending.items()):
+                if line.startswith(f"{key}="):
+                    line = f"{key}={self._format(tokens[name])}\n"
+                    del pending[name]
+                    break
+            new_content.append(line)
+        if new_content and not new_content[-1].endswith("\n"):
+            new_content[-1] += "\n"
+        # 原本沒有的鍵補在檔案最後
+        new_content.extend(f"{key}={self._format(tokens[name])}\n" for name, key in pending.items())
+        return "".join(new_content)
+
+
+class JsonTokenStore(TDTokenStore):
+    """Tokens kept in a standalone JSON file, e.g. one per account."""
+
+    def _read(self):
+        with open(self.path) as f:
+            raw = json.load(f)
+        tokens = empty_tokens()
+        for name in tokens:
+            if raw.get(name) is not None:
+                tokens[name] = datetime.fromisoformat(raw[name]) if name.endswith("_expiry") else raw[name]
+        return tokens
+
+    def _render(self, tokens):
+        return json.dumps({name: (value.isoformat() if isinstance(value, datetime) else value)
+                           for name, value in tokens.items()}, indent=2)
@@ -0,0 +1,276 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.poolmanager import PoolManager
+from urllib3.util.retry import Retry
+from .TDRateLimiter import TDRateLimiter, PRIORITY_MARKET_DATA
+
+
+class TransportStats:
+    """Thread-safe counters describing how the connection pool is used."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.pool_hits = 0    # 重用已建立的連線 (keep-alive)
+        self.pool_misses = 0  # 需要新的 TCP+TLS 握手
+
+    def record_checkout(self, reused):
+        with self._lock:
+            if reused:
+                self.pool_hits += 1
+            else:
+                self.pool_misses += 1
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "pool_hits": self.pool_hits,
+                "pool_misses": self.pool_misses,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.pool_hits = 0
+            self.pool_misses = 0
+
+
+class _CountingPoolMixin:
+    _td_stats = None
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout=timeout)
+        if self._td_stats is not None:
+            # 新連線或已斷線被重置的連線都沒有 socket
+            self._td_stats.record_checkout(getattr(conn, "sock", None) is not None)
+        return conn
+
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _CountingPoolManager(PoolManager):
+    def __init__(self, *args, stats=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+        self._td_stats = stats
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context=request_context)
+        pool._td_stats = self._td_stats
+        return pool
+
+
+class _CountingHTTPAdapter(HTTPAdapter):
+    def __init__(self, stats, **kwargs):
+        self._td_stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _CountingPoolManager(
+            num_pools=connections, maxsize=maxsize, block=block, stats=self._td_stats, **pool_kwargs
+        )
+
+
+class _LimitedRetry(Retry):
+    """Leaves 429 to TDTransport._send, so the retry goes through the rate limiter."""
+
+    RETRY_AFTER_STATUS_CODES = Retry.RETRY_AFTER_STATUS_CODES - {429}
+
+
+class TDTransport:
+    """A pooled, keep-alive HTTP transport shared by every Tda client class."""
+
+    DEFAULT_TIMEOUT = (3.05, 10)
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, pool_connections=4, pool_maxsize=16, timeout=DEFAULT_TIMEOUT,
+                 max_retries=3, backoff_factor=0.3, pool_block=False, rate_limiter=None, metrics=None, capture=None,
+                 parent=None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.rate_limiter = rate_limiter
+        self.stats = TransportStats()
+        # for_orders 建立的下單 transport 沿用 parent 的 metrics 與 capture
+        self._parent = parent
+        self._orders = None
+        self.metrics = metrics  # TDMetrics；None 時不記錄
+        self.capture = capture  # TDCapture；None 時不擷取
+
+        # 只重試冪等的請求 (Retry 預設不包含 POST/PATCH)，避免重複下單
+        # 有 rate limiter 時由 _send 處理 429，讓重試也經過 limiter 並通知其他呼叫端暫停
+        if rate_limiter is None:
+            retry_class, statuses = Retry, self.RETRY_STATUSES
+        else:
+            retry_class, statuses = _LimitedRetry, tuple(s for s in self.RETRY_STATUSES if s != 429)
+        retry = retry_class(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=statuses,
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+        self._adapter = _CountingHTTPAdapter(
+            self.stats,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+            pool_block=pool_block,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+    @classmethod
+    def default(cls):
+        """Return the process-wide transport, creating it on first use."""
+        if cls._default is None:
+            with cls._default_lock:
+                if cls._default is None:
+                    cls._default = cls(rate_limiter=TDRateLimiter.default())
+        return cls._default
+
+    @classmethod
+    def orders(cls):
+        """Return the process-wide transport reserved for order traffic (``default().for_orders()``)."""
+        return cls.default().for_orders()
+
+    def for_orders(self):
+        """Return the transport for order calls that goes with this one.
+
+        Order calls never retry (a retried POST/PUT could place an order
+        twice). A transport that already does not retry is returned as is;
+        otherwise a companion transport is created once. It keeps its own
+        keep-alive pool, so an order never waits behind market-data requests
+        for a connection; the pool is sized for the bulk cancel/replace
+        fan-out. It shares this transport's timeout and rate limiter, and
+        reads ``metrics`` and ``capture`` from it unless given its own.
+        """
+        if self.max_retries == 0:
+            return self
+        if self._orders is None:
+            with self._default_lock:
+                if self._orders is None:
+                    self._orders = TDTransport(pool_connections=1, pool_maxsize=16, timeout=self.timeout,
+                                               max_retries=0, rate_limiter=self.rate_limiter, parent=self)
+        return self._orders
+
+    @property
+    def metrics(self):
+        if self._metrics is None and self._parent is not None:
+            return self._parent.metrics
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, metrics):
+        self._metrics = metrics
+
+    @property
+    def capture(self):
+        if self._capture is None and self._parent is not None:
+            return self._parent.capture
+        return self._capture
+
+    @capture.setter
+    def capture(self, capture):
+        self._capture = capture
+
+    def request(self, method, url, priority=PRIORITY_MARKET_DATA, credentials=None, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        stale_token = credentials.access_token if credentials is not None else None
+        response = self._send(method, url, priority, kwargs)
+        # 401 時透過共用的 credentials 刷新一次 token 後重試
+        if response.status_code == 401 and credentials is not None and credentials.refresh(stale_token):
+            kwargs["headers"] = dict(kwargs.get("headers") or {}, Authorization=credentials.authorization_header())
+            if self.metrics is not None:
+                self.metrics.record_retry(method, url)
+            response = self._send(method, url, priority, kwargs)
+        return response
+
+    def _send(self, method, url, priority, kwargs):
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(priority)
+            self.stats.record_request()
+            metrics, capture = self.metrics, self.capture
+            if metrics is None and capture is None:
+                response = self.session.request(method, url, **kwargs)
+            else:
+                response = self._send_measured(metrics, capture, method, url, kwargs)
+            if response.status_code != 429 or self.rate_limiter is None:
+                return response
+            # 先讓 limiter 依 Retry-After 暫停所有呼叫端，再重新取得 token 後重送
+            self.rate_limiter.throttled(response.headers.get("Retry-After"))
+            if attempt >= self.max_retries or method.upper() not in Retry.DEFAULT_ALLOWED_METHODS:
+                return response
+            attempt += 1
+            if metrics is not None:
+                metrics.record_retry(method, url)
+
+    def _send_measured(self, metrics, capture, method, url, kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except Exception:
+            if metrics is not None:
+                metrics.record_failure(method, url, time.perf_counter() - started)
+            raise
+        seconds = time.perf_counter() - started
+        if metrics is not None:
+            # urllib3 的重試記錄在 response.raw.retries.history
+            history = getattr(getattr(response.raw, "retries", None), "history", None) or ()
+            metrics.record(method, url, response.status_code, seconds, len(response.content),
+                           retries=len(history), throttles=sum(1 for h in history if h.status == 429))
+        if capture is not None:
+            capture.record(method, url, kwargs.get("params"), kwargs.get("json", kwargs.get("data")),
+                           response.status_code, response.headers, response.content, seconds)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        if self._orders is not None:
+            self._orders.close()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,33 +1,37 @@
-import requests
+from .TDCredentials import TDCredentials
+from .TDRateLimiter import PRIORITY_ACCOUNT
+from .TDTransport import TDTransport
 
 class TDUserSettings:
     BASE_URL = "https://api.tdameritrade.com/v1"
     
-    def __init__(self, access_token):
-        self.access_token = access_token
+    def __init__(self, access_token, transport=None):
+        self.credentials = TDCredentials.wrap(access_token)  # 可傳入字串或共用的 TDCredentials
+        self.access_token = self.credentials.access_token
+        self.transport = transport or TDTransport.default()
         self.headers = {
             "Authorization": f"Bearer {self.access_token}",
             "Content-Type": "application/json"
         }
+        self.credentials.subscribe(self._on_token_refreshed)
 
-    def _refresh_access_token(self):
-        # TODO: 使用TDA_REFRESH_TOKEN從API獲取新的訪問令牌
-        # 更新self.access_token的值
-        # 更新.env文件中的TDA_ACCESS_TOKEN和TDA_ACCESS_TOKEN_EXPIRY值
-        pass
+    def _on_token_refreshed(self, access_token):
+        self.access_token = access_token
+        self.headers["Authorization"] = f"Bearer {access_token}"
 
     def _handle_response(self, response):
-        if response.status_code == 401:  # 令牌過期或無效
-            self._refresh_access_token()
-            # TODO: 重新嘗試API請求
-        elif response.status_code != 200:
+        if response.status_code == 401:  # 令牌過期或無效，transport 已經透過 credentials 刷新並重試過一次
+            raise Exception("API Error: Unauthorized, the access token could not be refreshed.")
+        elif response.status_code not in (200, 204):
             error_msg = response.json().get("error", "Unknown error.")
             raise Exception(f"API Error: {error_msg}")
-        return response.json()
+        # 更新偏好設定成功時沒有回應內容
+        return response.json() if response.content else None
 
     def _api_request(self, method, endpoint, data=None, params=None):
         url = f"{self.BASE_URL}/{endpoint}"
-        response = requests.request(method, url, headers=self.headers, json=data, params=params)
+        response = self.transport.request(method, url, headers=self.headers, credentials=self.credentials,
+                                          json=data, params=params, priority=PRIORITY_ACCOUNT)
         return self._handle_response(response)
 
     # Get Account Preferences
@@ -1,62 +1,78 @@
-import requests
+from .TDCredentials import TDCredentials
+from .TDRateLimiter import PRIORITY_ACCOUNT
+from .TDTransport import TDTransport
 
 class TDWatchlist:
     BASE_URL = "https://api.tdameritrade.com/v1"
     
-    def __init__(self, access_token):
-        self.access_token = access_token
+    def __init__(self, access_token, transport=None):
+        self.credentials = TDCredentials.wrap(access_token)  # 可傳入字串或共用的 TDCredentials
+        self.access_token = self.credentials.access_token
+        self.transport = transport or TDTransport.default()
         self.headers = {
             "Authorization": f"Bearer {self.access_token}",
             "Content-Type": "application/json"
         }
+        self.credentials.subscribe(self._on_token_refreshed)
+
+    def _on_token_refreshed(self, access_token):
+        self.access_token = access_token
+        self.headers["Authorization"] = f"Bearer {access_token}"
 
     def _handle_response(self, response):
-        if response.status_code == 401:  # Token expired or invalid
-            # TODO: Refresh the access token
-            pass
-        elif response.status_code != 200:
+        if response.status_code == 401:  # Token expired or invalid; the transport already refreshed and retried once
+            raise Exception("API Error: Unauthorized, the access token could not be refreshed.")
+        elif response.status_code not in (200, 201, 204):
             error_msg = response.json().get("error", "Unknown error.")
             raise Exception(f"API Error: {error_msg}")
-        return response.json()
+        # 建立、更新與刪除成功時沒有回應內容
+        return response.json() if response.content else None
+
+    def _api_request(self, method, endpoint, data=None):
+        response = self.transport.request(method, f"{self.BASE_URL}/{endpoint}", headers=self.headers,
+                                          credentials=self.credentials, json=data, priority=PRIORITY_ACCOUNT)
+        return self._handle_response(response)
 
     # Get all watchlists for a specific account
     def get_watchlists_by_account(self, account_id):
         endpoint = f"accounts/{account_id}/watchlists"
-        response = requests.get(f"{self.BASE_URL}/{endpoint}", headers=self.headers)
-        return self._handle_response(response)
+        return self._api_request("GET", endpoint)
 
     # Get a specific watchlist for a specific account
     def get_specific_watchlist(self, account_id, watchlist_id):
         endpoint = f"accounts/{account_id}/watchlists/{watchlist_id}"
-        response = requests.get(f"{self.BASE_URL}/{endpoint}", headers=self.headers)
-        return self._handle_response(response)
+        return self._api_request("GET", endpoint)
 
     # Get all watchlists for all linked accounts
     def get_all_watchlists(self):
         endpoint = "accounts/watchlists"
-        response = requests.get(f"{self.BASE_URL}/{endpoint}", headers=self.headers)
-        return self._handle_response(response)
+        return self._api_request("GET", endpoint)
+
+    def get_all_watchlists_if_changed(self, etag=None):
+        """Return ``(watchlists, etag)``; ``watchlists`` is None when the server answers 304 Not Modified."""
+        headers = dict(self.headers, **{"If-None-Match": etag}) if etag else self.headers
+        response = self.transport.request("GET", f"{self.BASE_URL}/accounts/watchlists", headers=headers,
+                                          credentials=self.credentials, priority=PRIORITY_ACCOUNT)
+        if response.status_code == 304:
+            return None, etag
+        return self._handle_response(response), response.headers.get("ETag")
 
     # Create a new watchlist for a specific account
     def create_watchlist(self, account_id, watchlist_data):
         endpoint = f"accounts/{account_id}/watchlists"
-        response = requests.post(f"{self.BASE_URL}/{endpoint}", headers=self.headers, json=watchlist_data)
-        return self._handle_response(response)
+        return self._api_request("POST", endpoint, data=watchlist_data)
 
     # Update a specific watchlist for a specific account
     def update_watchlist(self, account_id, watchlist_id, watchlist_data):
         endpoint = f"accounts/{account_id}/watchlists/{watchlist_id}"
-        response = requests.put(f"{self.BASE_URL}/{endpoint}", headers=self.headers, json=watchlist_data)
-        return self._handle_response(response)
+        return self._api_request("PUT", endpoint, data=watchlist_data)
 
     # Partially update a specific watchlist for a specific account
     def partial_update_watchlist(self, account_id, watchlist_id, watchlist_data):
         endpoint = f"accounts/{account_id}/watchlists/{watchlist_id}"
-        response = requests.patch(f"{self.BASE_URL}/{endpoint}", headers=self.headers, json=watchlist_data)
-        return self._handle_response(response)
+        return self._api_request("PATCH", endpoint, data=watchlist_data)
 
     # Delete a specific watchlist for a specific account
     def delete_watchlist(self, account_id, watchlist_id):
         endpoint = f"accounts/{account_id}/watchlists/{watchlist_id}"
-        response = requests.delete(f"{self.BASE_URL}/{endpoint}", headers=self.headers)
-        return self._handle_response(response)
+        return self._api_request("DELETE", endpoint)
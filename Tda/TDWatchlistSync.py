@@ -0,0 +1,214 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import Counter, namedtuple
+
+# added / removed 為代號列表，changed 為 (account_id, watchlist_id) 列表
+WatchlistDiff = namedtuple("WatchlistDiff", ["added", "removed", "changed"])
+ITEM_FIELDS = ("quantity", "averagePrice", "commission", "purchasedDate")
+
+
+def watchlist_key(watchlist):
+    return str(watchlist.get("accountId")), str(watchlist.get("watchlistId"))
+
+
+def _instrument(item):
+    instrument = item.get("instrument") or {}
+    return instrument.get("symbol"), instrument.get("assetType")
+
+
+def watchlist_hash(watchlist):
+    """A content hash of the name and items, ignoring key order and unrelated fields."""
+    items = [[item.get("sequenceId"), *_instrument(item), *(item.get(f) for f in ITEM_FIELDS)]
+             for item in watchlist.get("watchlistItems") or []]
+    normalized = json.dumps({"name": watchlist.get("name"), "items": items}, sort_keys=True, default=str)
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def watchlist_symbols(watchlist):
+    return Counter({symbol for symbol, _ in map(_instrument, watchlist.get("watchlistItems") or []) if symbol})
+
+
+def watchlist_patch(old, new):
+    """Return ``(method, body)`` that turns ``old`` into ``new``.
+
+    Items are matched by ``sequenceId``; changed items are sent with their
+    id and new ones without, so the PATCH body carries only the delta.
+    TD's PATCH cannot delete items, so a removal falls back to a full PUT.
+    Returns ``(None, None)`` when nothing changed.
+    """
+    old_items = {item["sequenceId"]: item for item in old.get("watchlistItems") or [] if "sequenceId" in item}
+    new_items = new.get("watchlistItems") or []
+    kept = {item.get("sequenceId") for item in new_items if item.get("sequenceId") in old_items}
+    if set(old_items) - kept:
+        return "PUT", {key: value for key, value in new.items() if key != "accountId"}
+    items = []
+    for item in new_items:
+        previous = old_items.get(item.get("sequenceId"))
+        if previous is None:
+            items.append({key: value for key, value in item.items() if key != "sequenceId"})
+        elif _instrument(previous) != _instrument(item) or any(previous.get(f) != item.get(f) for f in ITEM_FIELDS):
+            items.append(item)
+    body = {}
+    if new.get("name") is not None and new.get("name") != old.get("name"):
+        body["name"] = new["name"]
+    if items:
+        body["watchlistItems"] = items
+    if not body:
+        return None, None
+    body["watchlistId"] = new.get("watchlistId", old.get("watchlistId"))
+    return "PATCH", body
+
+
+class TDWatchlistSync:
+    """Keeps a local copy of every watchlist and reports symbol-level changes.
+
+    ``sync`` re-reads all linked accounts' watchlists (sending the last
+    ETag, so an unchanged response can be a bodiless 304), compares each
+    watchlist's content hash with the cached one, and returns a
+    WatchlistDiff of the symbols that entered or left the union of all
+    lists. ``on_added`` / ``on_removed`` callbacks, ``track_quotes`` and
+    ``apply_to_streamer`` act only on that diff, so unchanged symbols are
+    never re-quoted or re-subscribed. ``update_watchlist`` sends the
+    smallest PATCH it can.
+    """
+
+    def __init__(self, watchlist, on_added=None, on_removed=None):
+        self.watchlist = watchlist
+        self.on_added = on_added
+        self.on_removed = on_removed
+        self.fetches = 0
+        self.unchanged = 0
+        self.quotes = {}
+        self._watchlists = {}      # (account_id, watchlist_id) -> (hash, watchlist)
+        self._symbols = Counter()  # 代號 -> 出現在幾個清單
+        self._etag = None
+        self._data_query = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._logger = logging.getLogger(__name__)
+
+    @property
+    def symbols(self):
+        return set(self._symbols)
+
+    def watchlists(self):
+        return [watchlist for _, watchlist in self._watchlists.values()]
+
+    def get(self, account_id, watchlist_id):
+        entry = self._watchlists.get((str(account_id), str(watchlist_id)))
+        return entry[1] if entry else None
+
+    # Synchronisation
+    def sync(self):
+        """Fetch all watchlists and return the WatchlistDiff against the cached copy."""
+        data, etag = self.watchlist.get_all_watchlists_if_changed(self._etag)
+        self.fetches += 1
+        if data is None:
+            self.unchanged += 1
+            return WatchlistDiff([], [], [])
+        self._etag = etag
+        fresh = {watchlist_key(w): (watchlist_hash(w), w) for w in data or []}
+        return self._apply(fresh, set(fresh) | set(self._watchlists))
+
+    def _apply(self, fresh, keys):
+        """Swap in ``fresh`` entries for ``keys`` (a missing key means deleted) and notify the diff."""
+        with self._lock:
+            watchlists = dict(self._watchlists)
+            symbols = self._symbols.copy()
+            changed = []
+            for key in keys:
+                old, new = watchlists.get(key), fresh.get(key)
+                if (old and old[0]) == (new and new[0]):
+                    continue
+                changed.append(key)
+                if old is not None:
+                    symbols -= watchlist_symbols(old[1])
+                    del watchlists[key]
+                if new is not None:
+                    symbols += watchlist_symbols(new[1])
+                    watchlists[key] = new
+            added = sorted(set(symbols) - set(self._symbols))
+            removed = sorted(set(self._symbols) - set(symbols))
+            self._watchlists, self._symbols = watchlists, symbols
+        if not changed:
+            self.unchanged += 1
+        diff = WatchlistDiff(added, removed, sorted(changed))
+        self._notify(diff)
+        return diff
+
+    def _notify(self, diff):
+        if self._data_query is not None:
+            for symbol in diff.removed:
+                self.quotes.pop(symbol, None)
+            if diff.added:
+                self.quotes.update(self._data_query.get_quotes_bulk(diff.added))
+        if diff.added and self.on_added is not None:
+            self.on_added(diff.added)
+        if diff.removed and self.on_removed is not None:
+            self.on_removed(diff.removed)
+
+    # Edits
+    def update_watchlist(self, account_id, watchlist_id, watchlist):
+        """Send ``watchlist`` as the smallest PATCH (or PUT) against the cached copy; returns the diff."""
+        key = (str(account_id), str(watchlist_id))
+        cached = self._watchlists.get(key)
+        if cached is None:
+            self.watchlist.update_watchlist(account_id, watchlist_id, watchlist)
+        else:
+            method, body = watchlist_patch(cached[1], watchlist)
+            if method == "PATCH":
+                self.watchlist.partial_update_watchlist(account_id, watchlist_id, body)
+            elif method == "PUT":
+                self.watchlist.update_watchlist(account_id, watchlist_id, body)
+        self._etag = None
+        updated = dict(watchlist, accountId=account_id, watchlistId=watchlist_id)
+        return self._apply({key: (watchlist_hash(updated), updated)}, {key})
+
+    def delete_watchlist(self, account_id, watchlist_id):
+        self.watchlist.delete_watchlist(account_id, watchlist_id)
+        self._etag = None
+        return self._apply({}, {(str(account_id), str(watchlist_id))})
+
+    # Consumers
+    def track_quotes(self, data_query):
+        """Keep ``quotes`` for the watched symbols; after this only added symbols are fetched on sync."""
+        self._data_query = data_query
+        if self._symbols:
+            self.quotes = dict(data_query.get_quotes_bulk(sorted(self._symbols)))
+        return self
+
+    def refresh_quotes(self):
+        if self._data_query is not None and self._symbols:
+            self.quotes.update(self._data_query.get_quotes_bulk(sorted(self._symbols)))
+        return self.quotes
+
+    async def apply_to_streamer(self, streamer, diff):
+        """Subscribe the added and unsubscribe the removed symbols on a TDStreamer."""
+        if diff.added:
+            await streamer.subscribe_quotes(diff.added)
+        if diff.removed:
+            await streamer.unsubscribe_quotes(diff.removed)
+
+    # Background polling
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.sync()
+            except Exception as e:
+                self._logger.error(f"同步自選清單失敗: {e}")
+
+    def start(self, interval=60):
+        """Call ``sync`` every ``interval`` seconds in a daemon thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval,), name="TDWatchlistSync", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,223 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, quote
+
+
+class RecordedRequest:
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+
+class LocalAPIServer:
+    """A tiny keep-alive HTTP server for offline tests.
+
+    Routes map ``(METHOD, path_regex)`` to a handler that receives a
+    ``RecordedRequest`` plus the regex groups and returns ``(status, body)``
+    or ``(status, body, headers)``. ``body`` is JSON-encoded unless it is bytes.
+    Every request is kept in ``requests`` unless ``record_requests`` is False.
+    """
+
+    def __init__(self, routes=None, port=0, record_requests=True):
+        self.routes = []
+        self.requests = []
+        self.record_requests = record_requests
+        self.connections = 0
+        for (method, pattern), handler in (routes or {}).items():
+            self.route(method, pattern, handler)
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 標頭與內容分兩次寫出，開著 Nagle 時會和用戶端的延遲 ACK 互等約 40ms
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _dispatch(self):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                request = RecordedRequest(
+                    self.command, parts.path,
+                    {k: v[-1] for k, v in parse_qs(parts.query).items()},
+                    dict(self.headers), body,
+                )
+                if server.record_requests:
+                    server.requests.append(request)
+                result = (404, {"error": "Not found"})
+                for method, regex, handler in server.routes:
+                    match = regex.fullmatch(parts.path)
+                    if method == self.command and match:
+                        result = handler(request, *match.groups())
+                        break
+                status, payload = result[0], result[1]
+                headers = result[2] if len(result) > 2 else {}
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", headers.pop("Content-Type", "application/json"))
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _dispatch
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}"
+
+    def route(self, method, pattern, handler):
+        self.routes.append((method, re.compile(pattern), handler))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class FakeLoginPage(LocalAPIServer):
+    """A stand-in for the TD Ameritrade OAuth pages used by ``get_authentication_code``.
+
+    ``/auth`` shows the username/password form, ``/login`` the second
+    "accept" page, which links to ``/callback?code=code-<username>``.
+    Every ``/auth`` visit sets a session cookie; ``auth_cookies`` records the
+    cookies the browser sent, so tests can check that sessions are isolated.
+    """
+
+    LOGIN_FORM = (
+        '<html><body><form method="post" action="/login">'
+        '<input id="username0" name="username"><input id="password1" name="password" type="password">'
+        '<button id="accept" type="submit">Log in</button></form></body></html>'
+    )
+    ACCEPT_PAGE = '<html><body><a id="accept" href="/callback?code={code}">Allow</a></body></html>'
+
+    def __init__(self):
+        super().__init__()
+        self.auth_cookies = []
+        self.logins = []
+        self.route("GET", r"/auth", self._auth)
+        self.route("POST", r"/login", self._login)
+        self.route("GET", r"/callback", lambda req: (200, b"<html><body>done</body></html>", {"Content-Type": "text/html"}))
+
+    @property
+    def redirect_uri(self):
+        return f"{self.url}/callback"
+
+    def _auth(self, request):
+        self.auth_cookies.append(request.headers.get("Cookie"))
+        headers = {"Content-Type": "text/html", "Set-Cookie": f"tda_session={len(self.auth_cookies)}; Path=/"}
+        return 200, self.LOGIN_FORM.encode(), headers
+
+    def _login(self, request):
+        form = {k: v[-1] for k, v in parse_qs(request.body.decode()).items()}
+        self.logins.append((form.get("username"), form.get("password")))
+        code = quote(f"code-{form.get('username')}")
+        return 200, self.ACCEPT_PAGE.format(code=code).encode(), {"Content-Type": "text/html"}
+
+
+class FakeOrderServer(LocalAPIServer):
+    """An in-memory TD orders API: place (POST), replace (PUT), get, list and cancel (DELETE).
+
+    New orders are WORKING; ``fill`` marks one FILLED. Place and replace
+    answer 201 with the new id in the Location header, like TD. ``latency``
+    adds a per-request delay to make concurrency measurable.
+    """
+
+    def __init__(self, latency=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.orders = {}
+        self._lock = threading.Lock()
+        self._next_id = 1000
+        prefix = r"/v1/accounts/(\w+)/orders"
+        self.route("POST", prefix, self._place)
+        self.route("GET", prefix, self._list)
+        self.route("GET", prefix + r"/(\d+)", self._get)
+        self.route("PUT", prefix + r"/(\d+)", self._replace)
+        self.route("DELETE", prefix + r"/(\d+)", self._cancel)
+
+    def _delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _create(self, request, account_id):
+        with self._lock:
+            order_id = self._next_id
+            self._next_id += 1
+            order = dict(request.json(), orderId=order_id, accountId=account_id, status="WORKING", cancelable=True)
+            self.orders[order_id] = order
+        location = f"{self.url}/v1/accounts/{account_id}/orders/{order_id}"
+        return 201, b"", {"Location": location}
+
+    def _place(self, request, account_id):
+        self._delay()
+        return self._create(request, account_id)
+
+    def _list(self, request, account_id):
+        self._delay()
+        status = request.query.get("status")
+        with self._lock:
+            orders = [o for o in self.orders.values()
+                      if o["accountId"] == account_id and (status is None or o["status"] == status)]
+        return 200, orders
+
+    def _get(self, request, account_id, order_id):
+        self._delay()
+        order = self.orders.get(int(order_id))
+        if order is None or order["accountId"] != account_id:
+            return 404, {"error": "Order not found"}
+        return 200, order
+
+    def _close(self, account_id, order_id, status):
+        with self._lock:
+            order = self.orders.get(int(order_id))
+            if order is None or order["accountId"] != account_id:
+                return 404, {"error": "Order not found"}
+            if order["status"] != "WORKING":
+                return 400, {"error": f"Order {order_id} is {order['status']}"}
+            order.update(status=status, cancelable=False)
+        return None
+
+    def _replace(self, request, account_id, order_id):
+        self._delay()
+        return self._close(account_id, order_id, "REPLACED") or self._create(request, account_id)
+
+    def _cancel(self, request, account_id, order_id):
+        self._delay()
+        return self._close(account_id, order_id, "CANCELED") or (200, b"")
+
+    def fill(self, order_id):
+        with self._lock:
+            self.orders[order_id].update(status="FILLED", cancelable=False)
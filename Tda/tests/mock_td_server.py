@@ -0,0 +1,644 @@
+"""A local mock of the TD Ameritrade REST API for offline tests and benchmarks.
+
+Usage:
+    python -m Tda.tests.mock_td_server [--port 8080] [--latency 0.02] [--jitter 0.01]
+                                       [--error-rate 0.01] [--rate-limit 2] [--seed 0]
+
+Clients are pointed at it with ``server.attach(client, ...)`` (or by setting
+their base URL to ``server.api_url``). ``MockTDProcess`` runs the same server
+in a child process for benchmarks.
+"""
+import argparse
+import math
+import multiprocessing
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import parse_qs
+from Tda.tests.helpers import FakeOrderServer
+
+DEFAULT_SYMBOLS = ("AAPL", "MSFT", "AMZN", "NVDA", "GOOGL", "META", "TSLA", "SPY", "QQQ", "IWM")
+MINUTES_PER_DAY = 390
+# 每個 periodType 單位的交易日數
+TRADING_DAYS = {"day": 1, "month": 21, "year": 252, "ytd": 252}
+FREQUENCY_SECONDS = {"minute": 60, "daily": 86400, "weekly": 7 * 86400, "monthly": 30 * 86400}
+DAYS_PER_BAR = {"daily": 1, "weekly": 5, "monthly": 21}
+ITEM_DEFAULTS = {"quantity": 0.0, "averagePrice": 0.0, "commission": 0.0}
+TOKEN_PATH = "/v1/oauth2/token"
+
+
+def base_price(symbol):
+    """A stable price between 10 and 510 derived from the symbol."""
+    return 10 + zlib.crc32(symbol.encode()) % 50000 / 100
+
+
+def cusip(symbol):
+    return f"{zlib.crc32(symbol.encode()) % 10 ** 9:09d}"
+
+
+def _ncdf(x):
+    return 0.5 * (1 + math.erf(x / math.sqrt(2)))
+
+
+def _parse_date(value):
+    return datetime.strptime(value[:10], "%Y-%m-%d").date() if value else None
+
+
+def attach(url, *clients):
+    """Point TD clients (sync or async) and TDAAuthentication at the mock API served at ``url``."""
+    for client in clients:
+        if hasattr(client, "token_endpoint"):
+            client.token_endpoint = f"{url}{TOKEN_PATH}"
+        elif hasattr(client, "base_url"):
+            client.base_url = f"{url}/v1"
+        else:
+            client.BASE_URL = f"{url}/v1"
+
+
+def _epoch_ms(day, hour=21):
+    return int(datetime(day.year, day.month, day.day, hour, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+class MockTDServer(FakeOrderServer):
+    """An in-memory TD Ameritrade API: market data, accounts, orders, watchlists, user principals and OAuth tokens.
+
+    Market data is generated deterministically from the symbol, so the same
+    request always returns the same payload. Orders, watchlists and
+    preferences are stateful. Every route goes through the same fault
+    injection, in this order:
+
+    * ``latency`` seconds plus an exponential ``jitter`` (mean, seconds), so
+      the latency distribution has a tail like a real API;
+    * a token bucket of ``rate_limit`` requests/second (``burst`` deep) that
+      answers 429, with ``Retry-After`` if ``retry_after`` is set;
+    * ``error_rate``: the fraction of requests answered 500;
+    * ``require_auth``: reject bearer tokens not issued by ``/oauth2/token``
+      with 401.
+
+    Randomness comes from ``random.Random(seed)``. ``injected`` counts the
+    faults that were served.
+    """
+
+    TOKEN_LIFETIME = 1800
+    REFRESH_TOKEN_LIFETIME = 7776000
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit=None, burst=None, retry_after=None,
+                 require_auth=False, accounts=("1",), symbols=DEFAULT_SYMBOLS, seed=0, port=0, record_requests=True):
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = burst or max(1, rate_limit or 1)
+        self.retry_after = retry_after
+        self.require_auth = require_auth
+        self.symbols = tuple(symbols)
+        self.injected = Counter()
+        self.access_tokens = set()
+        self.refresh_tokens = set()
+        self.transactions_per_day = 2
+        self._rng = random.Random(seed)
+        self._fault_lock = threading.Lock()
+        self._bucket = float(self.burst)
+        self._refilled = time.monotonic()
+        self._token_serial = 0
+        super().__init__(latency, port=port, record_requests=record_requests)
+        self.accounts = {str(account_id): self._new_account(str(account_id)) for account_id in accounts}
+        self.preferences = {account_id: self._new_preferences() for account_id in self.accounts}
+        self.watchlists = {}  # (account_id, watchlist_id) -> watchlist
+        self._watchlist_version = 0
+        self._next_watchlist_id = 1
+        for account_id in self.accounts:
+            self._store_watchlist(account_id, None, {
+                "name": "Default", "watchlistItems": [{"instrument": {"symbol": s, "assetType": "EQUITY"}}
+                                                      for s in self.symbols]})
+
+        self.route("POST", TOKEN_PATH, self._token)
+        # Market data
+        self.route("GET", r"/v1/marketdata/quotes", self._quotes)
+        self.route("GET", r"/v1/marketdata/chains", self._option_chain)
+        self.route("GET", r"/v1/marketdata/hours", self._hours)
+        self.route("GET", r"/v1/marketdata/([^/]+)/quotes", self._quote)
+        self.route("GET", r"/v1/marketdata/([^/]+)/pricehistory", self._price_history)
+        self.route("GET", r"/v1/marketdata/([^/]+)/movers", self._movers)
+        self.route("GET", r"/v1/marketdata/(\w+)/hours", self._market_hours)
+        self.route("GET", r"/v1/instruments", self._instruments)
+        self.route("GET", r"/v1/instruments/(\w+)", self._instrument)
+        # Watchlists (在 /accounts/{id} 之前，否則 "watchlists" 會被當成帳號)
+        self.route("GET", r"/v1/accounts/watchlists", self._all_watchlists)
+        self.route("GET", r"/v1/accounts/(\w+)/watchlists", self._account_watchlists)
+        self.route("POST", r"/v1/accounts/(\w+)/watchlists", self._create_watchlist)
+        self.route("GET", r"/v1/accounts/(\w+)/watchlists/(\w+)", self._get_watchlist)
+        self.route("PUT", r"/v1/accounts/(\w+)/watchlists/(\w+)", self._replace_watchlist)
+        self.route("PATCH", r"/v1/accounts/(\w+)/watchlists/(\w+)", self._patch_watchlist)
+        self.route("DELETE", r"/v1/accounts/(\w+)/watchlists/(\w+)", self._delete_watchlist)
+        # Accounts and user settings
+        self.route("GET", r"/v1/accounts", self._accounts)
+        self.route("GET", r"/v1/accounts/(\w+)", self._account)
+        self.route("GET", r"/v1/accounts/(\w+)/transactions", self._transactions)
+        self.route("GET", r"/v1/accounts/(\w+)/transactions/(\d+)", self._transaction_by_id)
+        self.route("DELETE", r"/v1/accounts/(\w+)/savedorders/(\w+)", lambda req, *ids: (200, b""))
+        self.route("GET", r"/v1/accounts/(\w+)/preferences", self._get_preferences)
+        self.route("PUT", r"/v1/accounts/(\w+)/preferences", self._put_preferences)
+        self.route("GET", r"/v1/userprincipals", self._user_principals)
+        self.route("GET", r"/v1/userprincipals/streamersubscriptionkeys",
+                   lambda req: (200, {"keys": [{"key": "mock-subscription-key"}]}))
+
+    @property
+    def api_url(self):
+        return f"{self.url}/v1"
+
+    def attach(self, *clients):
+        """Point TD clients (sync or async) and TDAAuthentication at this server."""
+        attach(self.url, *clients)
+
+    # Fault injection
+    def route(self, method, pattern, handler):
+        def guarded(request, *groups):
+            return self._inject(request) or handler(request, *groups)
+        super().route(method, pattern, guarded)
+
+    def _delay(self):
+        pass  # 延遲在 _inject 中套用到所有路由
+
+    def _take_token(self):
+        now = time.monotonic()
+        self._bucket = min(self.burst, self._bucket + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._bucket >= 1:
+            self._bucket -= 1
+            return True
+        return False
+
+    def _inject(self, request):
+        """Apply latency, throttling, errors and the auth check; return a response to short-circuit the route."""
+        with self._fault_lock:
+            delay = self.latency + (self._rng.expovariate(1 / self.jitter) if self.jitter else 0.0)
+            failed = bool(self.error_rate) and self._rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if self.rate_limit:
+            with self._fault_lock:
+                throttled = not self._take_token()
+                self.injected["throttles"] += throttled
+            if throttled:
+                headers = {"Retry-After": str(self.retry_after)} if self.retry_after is not None else {}
+                return 429, {"error": "Individual App's transactions per seconds restriction reached."}, headers
+        if failed:
+            with self._fault_lock:
+                self.injected["errors"] += 1
+            return 500, {"error": "Internal server error (injected)."}
+        if self.require_auth and request.path != TOKEN_PATH:
+            token = (request.headers.get("Authorization") or "").partition("Bearer ")[2]
+            if token not in self.access_tokens:
+                with self._fault_lock:
+                    self.injected["unauthorized"] += 1
+                return 401, {"error": "The access token being passed has expired or is invalid."}
+        return None
+
+    # OAuth
+    def issue_tokens(self, refresh=True):
+        """Issue an access token (and a refresh token); returns the token response."""
+        with self._fault_lock:
+            self._token_serial += 1
+            serial = self._token_serial
+        tokens = {"access_token": f"access-{serial}", "token_type": "Bearer", "expires_in": self.TOKEN_LIFETIME,
+                  "scope": "PlaceTrades AccountAccess MoveMoney"}
+        self.access_tokens.add(tokens["access_token"])
+        if refresh:
+            tokens.update(refresh_token=f"refresh-{serial}", refresh_token_expires_in=self.REFRESH_TOKEN_LIFETIME)
+            self.refresh_tokens.add(tokens["refresh_token"])
+        return tokens
+
+    def expire_access_tokens(self):
+        self.access_tokens.clear()
+
+    def _token(self, request):
+        form = {k: v[-1] for k, v in parse_qs(request.body.decode()).items()}
+        grant = form.get("grant_type")
+        if grant == "authorization_code" and form.get("code"):
+            return 200, self.issue_tokens()
+        if grant == "refresh_token" and form.get("refresh_token") in self.refresh_tokens:
+            return 200, self.issue_tokens(refresh=form.get("access_type") == "offline")
+        return 400, {"error": "invalid_grant"}
+
+    # Market data
+    def quote(self, symbol):
+        price = base_price(symbol)
+        now = int(time.time() * 1000)
+        return {
+            "assetType": "EQUITY", "symbol": symbol, "description": f"{symbol} Common Stock", "cusip": cusip(symbol),
+            "bidPrice": round(price - 0.01, 2), "bidSize": 100, "askPrice": round(price + 0.01, 2), "askSize": 200,
+            "lastPrice": price, "lastSize": 100, "mark": price, "openPrice": round(price * 0.99, 2),
+            "highPrice": round(price * 1.01, 2), "lowPrice": round(price * 0.98, 2), "closePrice": round(price * 0.99, 2),
+            "netChange": round(price * 0.01, 2), "totalVolume": 1000000 + zlib.crc32(symbol.encode()) % 9000000,
+            "quoteTimeInLong": now, "tradeTimeInLong": now, "exchange": "q", "exchangeName": "NASD",
+            "52WkHigh": round(price * 1.3, 2), "52WkLow": round(price * 0.7, 2), "volatility": 0.3,
+            "peRatio": 25.0, "divYield": 0.5, "delayed": False,
+        }
+
+    def _quotes(self, request):
+        symbols = [s for s in (request.query.get("symbol") or "").split(",") if s]
+        return 200, {symbol: self.quote(symbol) for symbol in symbols}
+
+    def _quote(self, request, symbol):
+        return 200, {symbol: self.quote(symbol)}
+
+    def candles(self, symbol, count, start, step):
+        """``count`` random-walk candles starting at epoch second ``start``, seeded by the symbol."""
+        rng = random.Random(zlib.crc32(symbol.encode()))
+        price = base_price(symbol)
+        candles = []
+        for i in range(count):
+            close = round(max(0.01, price * (1 + rng.gauss(0, 0.002))), 2)
+            candles.append({
+                "open": price, "high": round(max(price, close) * (1 + rng.random() * 0.001), 2),
+                "low": round(min(price, close) * (1 - rng.random() * 0.001), 2), "close": close,
+                "volume": rng.randint(100, 100000), "datetime": (start + i * step) * 1000,
+            })
+            price = close
+        return candles
+
+    def _price_history(self, request, symbol):
+        query = request.query
+        period_type = query.get("periodType") or "day"
+        frequency_type = query.get("frequencyType") or ("minute" if period_type == "day" else "daily")
+        frequency = int(query.get("frequency") or 1)
+        step = FREQUENCY_SECONDS.get(frequency_type, 60) * frequency
+        end = int(query["endDate"]) // 1000 if query.get("endDate") else int(time.time()) // 60 * 60
+        if query.get("startDate"):
+            count = (end - int(query["startDate"]) // 1000) // step + 1
+        else:
+            days = int(query.get("period") or (10 if period_type == "day" else 1)) * TRADING_DAYS.get(period_type, 1)
+            if frequency_type == "minute":
+                count = days * MINUTES_PER_DAY // frequency
+            else:
+                count = days // DAYS_PER_BAR.get(frequency_type, 1) // frequency
+        count = max(1, count)
+        candles = self.candles(symbol, count, end - (count - 1) * step, step)
+        return 200, {"candles": candles, "symbol": symbol, "empty": False}
+
+    def _contract(self, symbol, underlying, put_call, strike, expiration, days):
+        t = max(days, 1) / 365
+        sigma = 0.3
+        d1 = (math.log(underlying / strike) + 0.5 * sigma * sigma * t) / (sigma * math.sqrt(t))
+        d2 = d1 - sigma * math.sqrt(t)
+        pdf = math.exp(-d1 * d1 / 2) / math.sqrt(2 * math.pi)
+        call = underlying * _ncdf(d1) - strike * _ncdf(d2)
+        is_call = put_call == "CALL"
+        mark = round(call if is_call else call - underlying + strike, 2)
+        return {
+            "putCall": put_call, "symbol": f"{symbol}_{expiration:%m%d%y}{put_call[0]}{strike:g}",
+            "description": f"{symbol} {expiration:%b %d %Y} {strike:g} {put_call.title()}",
+            "bid": max(0.0, round(mark - 0.05, 2)), "ask": round(mark + 0.05, 2), "last": mark, "mark": mark,
+            "bidSize": 10, "askSize": 10, "totalVolume": 100, "openInterest": 1000, "volatility": sigma * 100,
+            "delta": round(_ncdf(d1) - (0 if is_call else 1), 4),
+            "gamma": round(pdf / (underlying * sigma * math.sqrt(t)), 4),
+            "theta": round(-underlying * pdf * sigma / (2 * math.sqrt(t)) / 365, 4),
+            "vega": round(underlying * pdf * math.sqrt(t) / 100, 4), "rho": 0.0,
+            "strikePrice": strike, "expirationDate": _epoch_ms(expiration), "daysToExpiration": days,
+            "inTheMoney": (underlying > strike) == is_call, "multiplier": 100.0,
+        }
+
+    def _option_chain(self, request):
+        query = request.query
+        symbol = query.get("symbol") or "SPY"
+        contract_type = query.get("contractType") or "ALL"
+        strike_count = int(query.get("strikeCount") or 10)
+        underlying = base_price(symbol)
+        interval = 1.0 if underlying < 100 else 5.0
+        atm = round(underlying / interval) * interval
+        strikes = [s for s in (atm + (i - strike_count // 2) * interval for i in range(strike_count)) if s > 0]
+        today = date.today()
+        chain = {"callExpDateMap": {}, "putExpDateMap": {}}
+        for weeks in (1, 2, 4, 8):
+            expiration = today + timedelta(days=7 * weeks)
+            days = (expiration - today).days
+            key = f"{expiration:%Y-%m-%d}:{days}"
+            for side, put_call in (("callExpDateMap", "CALL"), ("putExpDateMap", "PUT")):
+                if contract_type in ("ALL", put_call):
+                    chain[side][key] = {f"{strike:.1f}": [self._contract(symbol, underlying, put_call, strike,
+                                                                        expiration, days)]
+                                        for strike in strikes}
+        count = sum(len(strikes) for side in chain.values() for strikes in side.values())
+        return 200, {"symbol": symbol, "status": "SUCCESS", "strategy": "SINGLE", "isDelayed": False,
+                     "underlyingPrice": underlying, "interestRate": 0.0, "volatility": 30.0,
+                     "numberOfContracts": count, **chain}
+
+    def _session(self, market, day):
+        product = {"EQUITY": "EQ", "OPTION": "EQO", "FUTURE": "F", "BOND": "BON", "FOREX": "forex"}.get(market, market)
+        hours = {"date": f"{day}", "marketType": market, "product": product, "isOpen": day.weekday() < 5}
+        if hours["isOpen"]:
+            hours["sessionHours"] = {"regularMarket": [{"start": f"{day}T09:30:00-05:00",
+                                                        "end": f"{day}T16:00:00-05:00"}]}
+        return {market.lower(): {product: hours}}
+
+    def _hours(self, request):
+        day = _parse_date(request.query.get("date")) or date.today()
+        result = {}
+        for market in (request.query.get("markets") or "EQUITY").split(","):
+            result.update(self._session(market.upper(), day))
+        return 200, result
+
+    def _market_hours(self, request, market):
+        return 200, self._session(market.upper(), _parse_date(request.query.get("date")) or date.today())
+
+    def _movers(self, request, index):
+        direction = request.query.get("direction") or "up"
+        sign = 1 if direction == "up" else -1
+        movers = [{"symbol": s, "description": f"{s} Common Stock", "direction": direction,
+                   "change": sign * round(0.01 + zlib.crc32(s.encode()) % 500 / 10000, 4),
+                   "last": base_price(s), "totalVolume": 1000000 + zlib.crc32(s.encode()) % 9000000}
+                  for s in self.symbols]
+        return 200, sorted(movers, key=lambda m: -abs(m["change"]))
+
+    def instrument(self, symbol, fundamental=False):
+        result = {"cusip": cusip(symbol), "symbol": symbol, "description": f"{symbol} Common Stock",
+                  "exchange": "NASDAQ", "assetType": "EQUITY"}
+        if fundamental:
+            price = base_price(symbol)
+            result["fundamental"] = {"symbol": symbol, "high52": round(price * 1.3, 2), "low52": round(price * 0.7, 2),
+                                     "peRatio": 25.0, "dividendYield": 0.5, "marketCap": round(price * 1e7, 2)}
+        return result
+
+    def _instruments(self, request):
+        symbol = request.query.get("symbol") or ""
+        projection = request.query.get("projection") or "symbol-search"
+        if projection == "symbol-regex":
+            matches = [s for s in self.symbols if re.fullmatch(symbol, s)]
+        elif projection in ("desc-search", "desc-regex"):
+            matches = [s for s in self.symbols if re.search(symbol if projection == "desc-regex" else re.escape(symbol),
+                                                            f"{s} Common Stock")]
+        else:
+            matches = [s for s in symbol.split(",") if s]
+        return 200, {s: self.instrument(s, projection == "fundamental") for s in matches}
+
+    def _instrument(self, request, value):
+        matches = [self.instrument(s) for s in self.symbols if cusip(s) == value]
+        return (200, matches) if matches else (404, {"error": f"Instrument {value} not found"})
+
+    # Accounts
+    def _new_account(self, account_id):
+        positions = []
+        for symbol in self.symbols[:5]:
+            price = base_price(symbol)
+            positions.append({
+                "shortQuantity": 0.0, "averagePrice": round(price * 0.9, 2), "currentDayProfitLoss": round(price, 2),
+                "longQuantity": 100.0, "settledLongQuantity": 100.0, "settledShortQuantity": 0.0,
+                "instrument": {"assetType": "EQUITY", "cusip": cusip(symbol), "symbol": symbol},
+                "marketValue": round(price * 100, 2),
+            })
+        value = round(sum(p["marketValue"] for p in positions), 2)
+        balances = {"cashBalance": 100000.0, "longMarketValue": value, "liquidationValue": 100000.0 + value,
+                    "buyingPower": 200000.0, "equity": 100000.0 + value}
+        return {"type": "MARGIN", "accountId": account_id, "roundTrips": 0, "isDayTrader": False,
+                "isClosingOnlyRestricted": False, "positions": positions, "initialBalances": dict(balances),
+                "currentBalances": balances, "projectedBalances": dict(balances)}
+
+    def _account_view(self, account_id, fields):
+        fields = set((fields or "").split(","))
+        account = {k: v for k, v in self.accounts[account_id].items() if k != "positions" or "positions" in fields}
+        if "orders" in fields:
+            with self._lock:
+                account["orderStrategies"] = [o for o in self.orders.values() if o["accountId"] == account_id]
+        return {"securitiesAccount": account}
+
+    def _accounts(self, request):
+        return 200, [self._account_view(account_id, request.query.get("fields")) for account_id in self.accounts]
+
+    def _account(self, request, account_id):
+        if account_id not in self.accounts:
+            return 404, {"error": f"Account {account_id} not found"}
+        return 200, self._account_view(account_id, request.query.get("fields"))
+
+    def _transaction(self, day, index):
+        symbol = self.symbols[(day.toordinal() + index) % len(self.symbols)]
+        price = base_price(symbol)
+        instruction = "BUY" if index % 2 == 0 else "SELL"
+        amount = 10.0
+        return {
+            "type": "TRADE", "subAccount": "2", "transactionId": int(f"{day:%Y%m%d}{index:02d}"),
+            "transactionDate": f"{day}T14:30:00+0000", "settlementDate": f"{day + timedelta(days=2)}",
+            "description": f"{instruction} TRADE", "netAmount": round(price * amount * (-1 if index % 2 == 0 else 1), 2),
+            "fees": {"commission": 0.0},
+            "transactionItem": {"amount": amount, "price": price, "cost": round(price * amount, 2),
+                                "instruction": instruction,
+                                "instrument": {"symbol": symbol, "cusip": cusip(symbol), "assetType": "EQUITY"}},
+        }
+
+    def _transactions(self, request, account_id):
+        query = request.query
+        end = _parse_date(query.get("endDate")) or date.today()
+        day = _parse_date(query.get("startDate")) or end - timedelta(days=30)
+        result = []
+        while day <= end:
+            if day.weekday() < 5:
+                result.extend(self._transaction(day, index) for index in range(self.transactions_per_day))
+            day += timedelta(days=1)
+        if query.get("symbol"):
+            result = [t for t in result if t["transactionItem"]["instrument"]["symbol"] == query["symbol"]]
+        if query.get("type") and query["type"] not in ("ALL", "TRADE"):
+            result = []
+        return 200, result
+
+    def _transaction_by_id(self, request, account_id, transaction_id):
+        try:
+            day = datetime.strptime(transaction_id[:8], "%Y%m%d").date()
+            return 200, self._transaction(day, int(transaction_id[8:]))
+        except ValueError:
+            return 404, {"error": f"Transaction {transaction_id} not found"}
+
+    # User settings
+    @staticmethod
+    def _new_preferences():
+        return {"expressTrading": False, "directOptionsRouting": False, "directEquityRouting": False,
+                "defaultEquityOrderLegInstruction": "NONE", "defaultEquityOrderType": "LIMIT",
+                "defaultEquityOrderPriceLinkType": "NONE", "defaultEquityOrderDuration": "DAY",
+                "defaultEquityOrderMarketSession": "NORMAL", "defaultEquityQuantity": 0,
+                "mutualFundTaxLotMethod": "FIFO", "optionTaxLotMethod": "FIFO", "equityTaxLotMethod": "FIFO",
+                "defaultAdvancedToolLaunch": "NONE", "authTokenTimeout": "FIFTY_FIVE_MINUTES"}
+
+    def _get_preferences(self, request, account_id):
+        if account_id not in self.preferences:
+            return 404, {"error": f"Account {account_id} not found"}
+        return 200, self.preferences[account_id]
+
+    def _put_preferences(self, request, account_id):
+        if account_id not in self.preferences:
+            return 404, {"error": f"Account {account_id} not found"}
+        self.preferences[account_id] = dict(self.preferences[account_id], **(request.json() or {}))
+        return 204, b""
+
+    def _user_principals(self, request):
+        fields = set((request.query.get("fields") or "").split(","))
+        account_ids = list(self.accounts)
+        principals = {
+            "userId": "mockuser", "userCdDomainId": "A000000000000000", "primaryAccountId": account_ids[0],
+            "lastLoginTime": f"{datetime.now(timezone.utc):%Y-%m-%dT%H:%M:%S+0000}", "loginTime": None,
+            "accounts": [{"accountId": account_id, "displayName": "mockuser", "accountCdDomainId": "A000000000000001",
+                          "company": "AMER", "segment": "AMER", "acl": "AKBPCNDPESF7GKHLMHPN",
+                          "authorizations": {"apex": False, "levelTwoQuotes": True, "stockTrading": True,
+                                             "marginTrading": True, "streamingNews": False,
+                                             "optionTradingLevel": "COVERED", "streamerAccess": True}}
+                         for account_id in account_ids],
+        }
+        if "streamerConnectionInfo" in fields:
+            principals["streamerInfo"] = {
+                "streamerBinaryUrl": "streamer-bin.tdameritrade.com", "streamerSocketUrl": "streamer-ws.tdameritrade.com",
+                "token": "mock-streamer-token", "tokenTimestamp": f"{datetime.now(timezone.utc):%Y-%m-%dT%H:%M:%S+0000}",
+                "userGroup": "ACCT", "accessLevel": "ACCT", "acl": "AKBPCNDPESF7GKHLMHPN", "appId": "mockapp",
+            }
+        if "streamerSubscriptionKeys" in fields:
+            principals["streamerSubscriptionKeys"] = {"keys": [{"key": "mock-subscription-key"}]}
+        if "preferences" in fields:
+            principals["preferences"] = self.preferences[account_ids[0]]
+        if "surrogateIds" in fields:
+            principals["surrogateIds"] = {}
+        return 200, principals
+
+    # Watchlists (寫入時整份替換，讀取中的回應不會看到一半的修改)
+    def _store_watchlist(self, account_id, watchlist_id, data, items=None):
+        with self._lock:
+            if watchlist_id is None:
+                watchlist_id = str(self._next_watchlist_id)
+                self._next_watchlist_id += 1
+            if items is None:
+                # PUT 送回的項目可能帶有舊的 sequenceId，一律重新編號
+                items = [dict(ITEM_DEFAULTS, **{k: v for k, v in item.items() if k != "sequenceId"}, sequenceId=sequence)
+                         for sequence, item in enumerate(data.get("watchlistItems") or [], 1)]
+            self.watchlists[(account_id, watchlist_id)] = {
+                "name": data.get("name"), "watchlistId": watchlist_id, "accountId": account_id, "status": "UNCHANGED",
+                "watchlistItems": items,
+            }
+            self._watchlist_version += 1
+        return watchlist_id
+
+    def _all_watchlists(self, request):
+        etag = f'"{self._watchlist_version}"'
+        if request.headers.get("If-None-Match") == etag:
+            return 304, b""
+        return 200, list(self.watchlists.values()), {"ETag": etag}
+
+    def _account_watchlists(self, request, account_id):
+        return 200, [w for (owner, _), w in list(self.watchlists.items()) if owner == account_id]
+
+    def _get_watchlist(self, request, account_id, watchlist_id):
+        watchlist = self.watchlists.get((account_id, watchlist_id))
+        return (200, watchlist) if watchlist else (404, {"error": f"Watchlist {watchlist_id} not found"})
+
+    def _create_watchlist(self, request, account_id):
+        watchlist_id = self._store_watchlist(account_id, None, request.json() or {})
+        return 201, b"", {"Location": f"{self.api_url}/accounts/{account_id}/watchlists/{watchlist_id}"}
+
+    def _replace_watchlist(self, request, account_id, watchlist_id):
+        if (account_id, watchlist_id) not in self.watchlists:
+            return 404, {"error": f"Watchlist {watchlist_id} not found"}
+        self._store_watchlist(account_id, watchlist_id, request.json() or {})
+        return 204, b""
+
+    def _patch_watchlist(self, request, account_id, watchlist_id):
+        current = self.watchlists.get((account_id, watchlist_id))
+        if current is None:
+            return 404, {"error": f"Watchlist {watchlist_id} not found"}
+        body = request.json() or {}
+        items = {item["sequenceId"]: item for item in current["watchlistItems"]}
+        sequence = max(items, default=0)
+        for item in body.get("watchlistItems") or []:
+            if item.get("sequenceId") in items:
+                items[item["sequenceId"]] = dict(items[item["sequenceId"]], **item)
+            else:
+                sequence += 1
+                items[sequence] = dict(ITEM_DEFAULTS, **{k: v for k, v in item.items() if k != "sequenceId"},
+                                       sequenceId=sequence)
+        self._store_watchlist(account_id, watchlist_id, {"name": body.get("name") or current["name"]},
+                              list(items.values()))
+        return 204, b""
+
+    def _delete_watchlist(self, request, account_id, watchlist_id):
+        with self._lock:
+            if self.watchlists.pop((account_id, watchlist_id), None) is None:
+                return 404, {"error": f"Watchlist {watchlist_id} not found"}
+            self._watchlist_version += 1
+        return 204, b""
+
+
+def _serve(options, conn):
+    server = MockTDServer(**options).start()
+    conn.send(server.url)
+    conn.recv()  # 等待停止訊號
+    server.stop()
+
+
+class MockTDProcess:
+    """Runs a MockTDServer in a child process.
+
+    The server's threads then do not compete for the GIL with the client
+    being measured, so benchmark latencies are not inflated by the mock.
+    State (orders, watchlists, ``requests``) lives in the child.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+        self.url = None
+        self._process = None
+        self._conn = None
+
+    @property
+    def api_url(self):
+        return f"{self.url}/v1"
+
+    def attach(self, *clients):
+        attach(self.url, *clients)
+
+    def start(self):
+        self._conn, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve, args=(self.options, child), daemon=True)
+        self._process.start()
+        self.url = self._conn.recv()
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._conn.send(None)
+            self._process.join(5)
+            self._process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a mock TD Ameritrade API on localhost.")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="fixed delay per request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="mean of the extra exponential delay (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered 500")
+    parser.add_argument("--rate-limit", type=float, default=None, help="requests/second before answering 429")
+    parser.add_argument("--burst", type=int, default=None)
+    parser.add_argument("--require-auth", action="store_true", help="only accept tokens issued by /oauth2/token")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    server = MockTDServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          rate_limit=args.rate_limit, burst=args.burst, require_auth=args.require_auth,
+                          seed=args.seed, port=args.port, record_requests=False)
+    server.start()
+    print(f"Mock TD Ameritrade API on {server.api_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from urllib.parse import parse_qs
+from Tda.TDAAuthentication import TDAAuthentication
+from Tda.TDAccountManager import TDAccountManager
+from Tda.TDCredentials import TDCredentials
+from Tda.TDTokenStore import JsonTokenStore
+from Tda.TDTransport import TDTransport
+from Tda.tests.helpers import LocalAPIServer
+
+
+class TestTDAccountManager(unittest.TestCase):
+
+    def setUp(self):
+        self.valid_tokens = {"token-alice": "111", "fresh-refresh-bob": "222"}
+        self.server = LocalAPIServer({
+            ("POST", r"/v1/oauth2/token"): self._token,
+            ("GET", r"/v1/accounts"): self._accounts,
+            ("GET", r"/v1/accounts/(\w+)/transactions"): self._transactions,
+        }).start()
+        self.tmp = tempfile.TemporaryDirectory()
+        now = datetime.now()
+        JsonTokenStore(os.path.join(self.tmp.name, "alice.json")).save({
+            "access_token": "token-alice", "refresh_token": "refresh-alice",
+            "access_token_expiry": now + timedelta(hours=1), "refresh_token_expiry": now + timedelta(days=60)})
+        JsonTokenStore(os.path.join(self.tmp.name, "bob.json")).save({
+            "access_token": "stale-bob", "refresh_token": "refresh-bob",
+            "access_token_expiry": now - timedelta(minutes=1), "refresh_token_expiry": now + timedelta(days=60)})
+        self.transport = TDTransport(max_retries=0, pool_maxsize=4)
+        endpoint = mock.patch.object(TDAAuthentication, "TOKEN_ENDPOINT", f"{self.server.url}/v1/oauth2/token")
+        endpoint.start()
+        self.addCleanup(endpoint.stop)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def _token(self, request):
+        form = {k: v[-1] for k, v in parse_qs(request.body.decode()).items()}
+        return 200, {"access_token": f"fresh-{form['refresh_token']}", "expires_in": 1800}
+
+    def _account_id(self, request):
+        return self.valid_tokens.get(request.headers.get("Authorization", "").replace("Bearer ", ""))
+
+    def _accounts(self, request):
+        account_id = self._account_id(request)
+        if account_id is None:
+            return 401, {"error": "Unauthorized"}
+        return 200, [{"securitiesAccount": {"accountId": account_id}}]
+
+    def _transactions(self, request, account_id):
+        if self._account_id(request) != account_id:
+            return 401, {"error": "Unauthorized"}
+        return 200, [{"transactionId": int(account_id), "type": request.query.get("type")}]
+
+    def _manager(self, **kwargs):
+        manager = TDAccountManager("client", "https://localhost", token_dir=self.tmp.name,
+                                   transport=self.transport, **kwargs)
+        self.addCleanup(manager.close)
+        return manager
+
+    def _point_at_server(self, session):
+        session.trading.base_url = f"{self.server.url}/v1"
+        session.watchlist.BASE_URL = f"{self.server.url}/v1"
+
+    def test_orders_use_the_order_transport(self):
+        session = self._manager().add_credentials("carol", "token-carol")
+        self.assertIs(session.trading.transport, self.transport)
+        self.assertIs(session.trading.order_transport, self.transport.for_orders())
+        order_transport = TDTransport(max_retries=0)
+        self.addCleanup(order_transport.close)
+        session = self._manager(order_transport=order_transport).add_credentials("carol", "token-carol")
+        self.assertIs(session.trading.order_transport, order_transport)
+
+    def test_fan_out_keyed_by_account(self):
+        manager = self._manager()
+        alice = manager.add_account("alice", account_id="111")
+        self._point_at_server(alice)
+        carol = manager.add_credentials("carol", "revoked", account_id="333")
+        self._point_at_server(carol)
+
+        results = manager.get_accounts()
+        self.assertEqual(results["alice"], [{"securitiesAccount": {"accountId": "111"}}])
+        self.assertIsInstance(results["carol"], Exception)
+
+        transactions = manager.get_transactions(accounts=["alice"], type="TRADE")
+        self.assertEqual(transactions, {"alice": [{"transactionId": 111, "type": "TRADE"}]})
+        self.assertLessEqual(self.server.connections, 4)
+
+    def test_expired_accounts_refresh_on_startup(self):
+        manager = self._manager()
+        alice, bob = manager.add_accounts(["alice", "bob"])
+        self.assertEqual(alice.credentials.access_token, "token-alice")
+        self.assertEqual(bob.credentials.access_token, "fresh-refresh-bob")
+        self._point_at_server(bob)
+
+        self.assertEqual(manager.get_accounts(accounts=["bob"]), {"bob": [{"securitiesAccount": {"accountId": "222"}}]})
+        with open(os.path.join(self.tmp.name, "bob.json")) as f:
+            self.assertIn("fresh-refresh-bob", f.read())
+
+    def test_refreshes_are_staggered(self):
+        manager = self._manager(refresh_lead_time=0.2, refresh_spread=0.6, retry_interval=0.05)
+        refreshed = {}
+        lock = threading.Lock()
+
+        def make_credentials(name):
+            def refresher():
+                with lock:
+                    refreshed[name] = time.monotonic()
+                credentials.update(f"{name}-new", time.time() + 3600)
+            credentials = TDCredentials(f"{name}-old", refresher=refresher, expires_at=time.time() + 0.9)
+            return credentials
+
+        for name in ("a", "b", "c", "d"):
+            manager.add_credentials(name, make_credentials(name))
+        manager.start_background_refresh()
+        deadline = time.time() + 3
+        while len(refreshed) < 4 and time.time() < deadline:
+            time.sleep(0.02)
+        manager.stop_background_refresh()
+
+        self.assertEqual(manager.refreshes, 4)
+        order = sorted(refreshed, key=refreshed.get)
+        self.assertEqual(order, ["d", "c", "b", "a"])
+        gaps = [refreshed[order[i + 1]] - refreshed[order[i]] for i in range(3)]
+        self.assertTrue(all(gap > 0.08 for gap in gaps), gaps)
+
+
+if __name__ == '__main__':
+    unittest.main()
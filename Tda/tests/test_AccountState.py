@@ -0,0 +1,118 @@
+import unittest
+from Tda.TDAccountState import TDAccountState, parse_account_activity
+from Tda.TDAccountsAndTrading import TDAccountsAndTrading
+from Tda.TDOrderTemplate import equity_order
+from Tda.TDTransport import TDTransport
+from Tda.tests.helpers import LocalAPIServer
+
+ACCOUNT = {"securitiesAccount": {
+    "accountId": "1",
+    "currentBalances": {"cashBalance": 10000.0, "liquidationValue": 25000.0},
+    "positions": [{"longQuantity": 10.0, "shortQuantity": 0.0, "averagePrice": 150.0,
+                   "instrument": {"symbol": "AAPL", "assetType": "EQUITY"}}],
+    "orderStrategies": [
+        {"orderId": 42, "status": "WORKING", "orderType": "LIMIT", "price": 180.0, "quantity": 5,
+         "filledQuantity": 0.0, "remainingQuantity": 5.0,
+         "orderLegCollection": [{"instruction": "SELL", "quantity": 5, "instrument": {"symbol": "AAPL"}}]},
+        {"orderId": 43, "status": "FILLED", "orderType": "MARKET", "quantity": 1,
+         "orderLegCollection": [{"instruction": "BUY", "quantity": 1, "instrument": {"symbol": "MSFT"}}]},
+    ],
+}}
+
+FILL = (
+    '<?xml version="1.0" encoding="UTF-8"?><OrderFillMessage xmlns="urn:xmlns:beb.ameritrade.com">'
+    '<Order><OrderKey>42</OrderKey><Security><Symbol>AAPL</Symbol><SecurityType>Common Stock</SecurityType>'
+    '</Security><OrderPricing><Limit>180</Limit></OrderPricing><OrderType>Limit</OrderType>'
+    '<OrderInstructions>Sell</OrderInstructions><OriginalQuantity>5</OriginalQuantity></Order>'
+    '<ContraInformation><Contra><AccountKey>0</AccountKey><SubAccountType>Margin</SubAccountType>'
+    '<Broker>NITE</Broker><Quantity>99</Quantity><BadgeNumber></BadgeNumber><ReportTime>2021-01-04T14:30:00'
+    '</ReportTime></Contra></ContraInformation>'
+    '<ExecutionInformation><Type>Sold</Type><Quantity>{quantity}</Quantity><ExecutionPrice>180.5</ExecutionPrice>'
+    '<LeavesQuantity>{leaves}</LeavesQuantity></ExecutionInformation></OrderFillMessage>'
+)
+ENTRY = (
+    '<OrderEntryRequestMessage xmlns="urn:xmlns:beb.ameritrade.com"><Order><OrderKey>50</OrderKey>'
+    '<Security><Symbol>TSLA</Symbol><SecurityType>Common Stock</SecurityType></Security>'
+    '<OrderPricing><Limit>200</Limit></OrderPricing><OrderType>Limit</OrderType>'
+    '<OrderInstructions>Buy</OrderInstructions><OriginalQuantity>3</OriginalQuantity></Order>'
+    '</OrderEntryRequestMessage>'
+)
+UROUT = '<UROUTMessage xmlns="urn:xmlns:beb.ameritrade.com"><Order><OrderKey>50</OrderKey></Order></UROUTMessage>'
+
+
+def activity(message_type, data, account="1"):
+    return {"service": "ACCT_ACTIVITY", "content": [
+        {"key": "k", "accountNumber": account, "messageType": message_type, "messageData": data}]}
+
+
+class TestTDAccountState(unittest.TestCase):
+
+    def setUp(self):
+        self.state = TDAccountState("1").seed(ACCOUNT)
+
+    def test_seed_and_queries(self):
+        self.assertEqual(self.state.quantity("AAPL"), 10.0)
+        self.assertEqual(self.state.quantity("MSFT"), 0.0)
+        self.assertEqual([o["orderId"] for o in self.state.working_orders("AAPL")], [42])
+        self.assertEqual(self.state.working_orders("MSFT"), [])
+        self.assertEqual(self.state.open_quantity("AAPL"), -5.0)
+        self.assertEqual(self.state.balances["cashBalance"], 10000.0)
+
+    def test_fills_from_account_activity(self):
+        self.state.handle_activity(activity("OrderPartialFill", FILL.format(quantity=2, leaves=3)))
+        self.assertEqual(self.state.quantity("AAPL"), 8.0)
+        self.assertEqual(self.state.order(42)["remainingQuantity"], 3.0)
+        self.assertEqual(self.state.order(42)["status"], "WORKING")
+        self.state.handle_activity(activity("OrderFill", FILL.format(quantity=3, leaves=0)))
+        self.assertEqual(self.state.quantity("AAPL"), 5.0)
+        self.assertEqual(self.state.order(42)["status"], "FILLED")
+        self.assertEqual(self.state.working_orders("AAPL"), [])
+        self.assertAlmostEqual(self.state.balances["cashBalance"], 10000.0 + 5 * 180.5)
+        # 減倉不改變平均成本
+        self.assertEqual(self.state.position("AAPL").average_price, 150.0)
+
+    def test_order_events(self):
+        self.state.handle_activity(activity("OrderEntryRequest", ENTRY))
+        order = self.state.order(50)
+        self.assertEqual((order["status"], order["price"], order["remainingQuantity"]), ("QUEUED", 200.0, 3.0))
+        self.assertEqual(self.state.open_quantity("TSLA"), 3.0)
+        self.state.handle_activity(activity("UROUT", UROUT))
+        self.assertEqual(self.state.order(50)["status"], "CANCELED")
+        # 其他帳戶的訊息被忽略
+        self.state.handle_activity(activity("OrderEntryRequest", ENTRY.replace("50", "51"), account="2"))
+        self.assertIsNone(self.state.order(51))
+        self.assertIsNone(parse_account_activity({"messageType": "SUBSCRIBED", "messageData": ""}))
+
+    def test_own_order_calls_and_position_flip(self):
+        body = equity_order("BUY").render(symbol="AAPL", quantity=20, price=100.0)
+        self.state.order_placed(60, body)
+        self.state.apply_fill("AAPL", "BUY", 20, 100.0, order_id=60)
+        position = self.state.position("AAPL")
+        self.assertEqual(position.quantity, 30.0)
+        self.assertAlmostEqual(position.average_price, (10 * 150.0 + 20 * 100.0) / 30)
+        self.assertEqual(self.state.order(60)["status"], "FILLED")
+        self.state.apply_fill("AAPL", "SELL_SHORT", 40, 90.0)
+        self.assertEqual((position.quantity, position.average_price), (-10.0, 90.0))
+        self.state.apply_fill("AAPL", "BUY_TO_COVER", 10, 95.0)
+        self.assertIsNone(self.state.position("AAPL"))
+
+    def test_reconcile_reports_drift(self):
+        server = LocalAPIServer({("GET", r"/v1/accounts/1"): lambda req: (200, ACCOUNT)}).start()
+        transport = TDTransport(max_retries=0)
+        try:
+            trading = TDAccountsAndTrading("token", transport=transport)
+            trading.base_url = f"{server.url}/v1"
+            state = TDAccountState("1", trading).seed()
+            state.apply_fill("AAPL", "SELL", 4, 181.0, order_id=42)
+            drift = state.reconcile()
+            self.assertEqual(drift["positions"], {"AAPL": (6.0, 10.0)})
+            self.assertEqual(drift["orders"], {})
+            self.assertEqual(state.quantity("AAPL"), 10.0)
+            self.assertEqual(server.requests[-1].query, {"fields": "positions,orders"})
+        finally:
+            transport.close()
+            server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,47 +1,51 @@
-import sys
-sys.path.append("D:/SRC/TD_LINETRADE")
-import os
-from dotenv import load_dotenv
-from Tda.TDAAuthentication import TDAAuthentication
+import unittest
 from Tda.TDAccountsAndTrading import TDAccountsAndTrading
+from Tda.TDOrderTemplate import equity_order
+from Tda.TDTransport import TDTransport
+from Tda.tests.mock_td_server import MockTDServer
 
-class TestTDAccountsAndTrading:
-    def __init__(self, auth):
-        self.trading_api = TDAccountsAndTrading(auth.access_token)
 
-    def test_get_account(self, account_id):
-        print("測試 get_account()...")
-        account = self.trading_api.get_account(account_id)
-        assert account, "無法取得帳戶資訊"
-        print("取得帳戶資訊成功！\n")
+class TestTDAccountsAndTrading(unittest.TestCase):
 
-    def test_get_accounts(self):
-        print("測試 get_accounts()...")
-        accounts = self.trading_api.get_accounts()
-        assert accounts, "無法取得所有帳戶資訊"
-        print("取得所有帳戶資訊成功！\n")
-
-    # 這裡可以加入其他的測試方法...
-
-    def run_tests(self, account_id):
-        self.test_get_account('635067306')
-        self.test_get_accounts()
-        # 這裡可以加入其他的測試方法呼叫...
-        print("所有測試均已通過！")
+    def setUp(self):
+        # 離線執行：所有請求都送到本機的模擬 TD API
+        self.server = MockTDServer(accounts=("635067306", "2")).start()
+        self.transport = TDTransport(max_retries=0)
+        self.trading_api = TDAccountsAndTrading("token", transport=self.transport, order_transport=self.transport)
+        self.server.attach(self.trading_api)
 
-if __name__ == "__main__":
-    load_dotenv(os.path.join(os.path.dirname(__file__), '..', 'config', '.env'))
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
 
-    CLIENT_ID = os.environ.get("TDA_CLIENT_ID")
-    REDIRECT_URI = os.environ.get("TDA_REDIRECT_URI")
-    TD_ACCOUNT_ID = os.environ.get("TDA_ACCOUNT_ID")
-    TD_PASSWORD = os.environ.get("TDA_PASSWORD")
+    def test_get_account(self):
+        account = self.trading_api.get_account("635067306")
+        self.assertEqual(account["securitiesAccount"]["accountId"], "635067306", "無法取得帳戶資訊")
+        self.assertNotIn("positions", account["securitiesAccount"])
+        with self.assertRaises(Exception):
+            self.trading_api.get_account("404")
 
-    print(f"CLIENT_ID: {CLIENT_ID}")
-    print(f"REDIRECT_URI: {REDIRECT_URI}")
-
-    auth = TDAAuthentication(CLIENT_ID, REDIRECT_URI)
-    auth.authenticate(TD_ACCOUNT_ID, TD_PASSWORD)  # 使用 authenticate 方法，它會自動處理 token 的取得或刷新
-
-    tester = TestTDAccountsAndTrading(auth)
-    tester.run_tests(TD_ACCOUNT_ID)
+    def test_get_accounts(self):
+        accounts = self.trading_api.get_accounts(fields="positions")
+        self.assertEqual([a["securitiesAccount"]["accountId"] for a in accounts], ["635067306", "2"])
+        self.assertEqual(len(self.trading_api.get_positions("2", typed=True)), 5)
+
+    def test_orders_show_up_on_the_account(self):
+        order_id = self.trading_api.place_order("635067306", equity_order("BUY"), symbol="AAPL", quantity=1,
+                                                price=100.0)
+        account = self.trading_api.get_account("635067306", fields="orders")
+        self.assertEqual([o["orderId"] for o in account["securitiesAccount"]["orderStrategies"]], [order_id])
+        self.trading_api.cancel_order("635067306", order_id)
+        self.assertEqual(self.trading_api.get_order("635067306", order_id)["status"], "CANCELED")
+
+    def test_get_transactions(self):
+        transactions = self.trading_api.get_transactions("2", startDate="2024-01-01", endDate="2024-01-07")
+        self.assertEqual(len(transactions), 5 * self.server.transactions_per_day)
+        first = transactions[0]
+        self.assertEqual(self.trading_api.get_transaction("2", first["transactionId"]), first)
+        exported = list(self.trading_api.iter_transactions("2", "2024-01-01", "2024-03-31", window_days=30))
+        self.assertEqual(len({t["transactionId"] for t in exported}), len(exported))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import asyncio
+import unittest
+from Tda.AsyncTDDataQuery import AsyncTDDataQuery
+from Tda.AsyncTDAccountsAndTrading import AsyncTDAccountsAndTrading
+from Tda.TDAsyncTransport import TDAsyncTransport
+from Tda.tests.helpers import LocalAPIServer
+
+
+class TestAsyncClients(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.server = LocalAPIServer({
+            ("GET", r"/v1/marketdata/marketdata/([^/]+)/quotes"):
+                lambda req, symbol: (200, {symbol: {"symbol": symbol, "lastPrice": 1.0}}),
+            ("GET", r"/v1/marketdata/marketdata/hours"):
+                lambda req: (200, {"query": req.query}),
+            ("GET", r"/v1/accounts"): lambda req: (200, [{"securitiesAccount": {"accountId": "1"}}]),
+            ("DELETE", r"/v1/accounts/1/orders/9"): lambda req: (401, {"error": "Not authorized"}),
+        }).start()
+        self.transport = TDAsyncTransport(pool_size=4, max_concurrency=4)
+
+    async def asyncTearDown(self):
+        await self.transport.close()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _data_query(self):
+        query = AsyncTDDataQuery("token", "CLIENT", transport=self.transport)
+        query.BASE_URL = f"{self.server.url}/v1/marketdata"
+        return query
+
+    async def test_many_quotes_share_bounded_pool(self):
+        query = self._data_query()
+        symbols = [f"SYM{i}" for i in range(100)]
+        results = await asyncio.gather(*(query.get_quote(s) for s in symbols))
+
+        self.assertEqual([list(r)[0] for r in results], symbols)
+        stats = self.transport.stats.snapshot()
+        self.assertEqual(stats["requests"], 100)
+        self.assertLessEqual(stats["pool_misses"], 4)
+        self.assertLessEqual(self.server.connections, 4)
+
+    async def test_none_params_are_dropped(self):
+        query = self._data_query()
+        result = await query.get_market_hours("EQUITY")
+        self.assertEqual(result["query"], {"markets": "EQUITY", "apikey": "CLIENT"})
+
+    async def test_accounts_mirror_sync_errors(self):
+        trading = AsyncTDAccountsAndTrading("token", transport=self.transport)
+        trading.base_url = f"{self.server.url}/v1"
+        accounts = await trading.get_accounts()
+        self.assertEqual(accounts[0]["securitiesAccount"]["accountId"], "1")
+        with self.assertRaisesRegex(Exception, "API Error: Not authorized"):
+            await trading.cancel_order("1", "9")
+
+
+if __name__ == '__main__':
+    unittest.main()
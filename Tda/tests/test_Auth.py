@@ -1,65 +1,66 @@
 import os
-from dotenv import load_dotenv
+import tempfile
+import unittest
 from Tda.TDAAuthentication import TDAAuthentication
+from Tda.TDTokenStore import JsonTokenStore
+from Tda.TDTransport import TDTransport
+from Tda.tests.mock_td_server import MockTDServer
 
-class TestTDAAuthentication:
-    def __init__(self, client_id, redirect_uri, td_account_id, td_password):
-        self.auth = TDAAuthentication(client_id, redirect_uri)
-        self.td_account_id = td_account_id
-        self.td_password = td_password
 
-    def test_get_authentication_url(self):
-        print("Testing get_authentication_url()...")
-        url = self.auth.get_authentication_url()
-        print(f"Authentication URL: {url}\n")
-        assert "https://auth.tdameritrade.com/auth" in url
+class TestTDAAuthentication(unittest.TestCase):
 
-    def test_get_authentication_code(self):
-        print("\nTesting get_authentication_code()...")
-        self.auth_code = self.auth.get_authentication_code(self.td_account_id, self.td_password)
-        print("Authentication Code:", self.auth_code)
-        assert self.auth_code is not None, "Failed to retrieve authentication code"
+    def setUp(self):
+        # 離線執行：token 端點指向本機的模擬 TD API
+        self.server = MockTDServer().start()
+        self.transport = TDTransport(max_retries=0)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.auth = self._auth()
 
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+        self.tmp.cleanup()
 
-    def test_get_tokens(self):
-        print("\nTesting get_tokens()...\n")
-        self.auth.get_tokens(self.auth_code)
-        print("Access Token:", self.auth.access_token)
-        print("Refresh Token:", self.auth.refresh_token)
-        # Add the assertion here
-        assert self.auth.access_token is not None, "Failed to retrieve access token"
+    def _auth(self):
+        auth = TDAAuthentication("CLIENT_ID", "https://localhost", transport=self.transport,
+                                 token_store=JsonTokenStore(os.path.join(self.tmp.name, "tokens.json")))
+        self.server.attach(auth)
+        return auth
 
+    def test_get_authentication_url(self):
+        url = self.auth.get_authentication_url()
+        self.assertIn("https://auth.tdameritrade.com/auth", url)
+        self.assertIn("client_id=CLIENT_ID%40AMER.OAUTHAP", url)
+
+    def test_get_tokens(self):
+        self.auth.get_tokens("code")
+        self.assertEqual((self.auth.access_token, self.auth.refresh_token), ("access-1", "refresh-1"))
+        self.assertEqual(self.auth.credentials.access_token, "access-1")
+        self.assertFalse(self.auth.is_access_token_expired())
+        self.assertFalse(self.auth.is_refresh_token_expired())
+        # 新的實例從 token store 載入仍有效的 token，不需要重新取得
+        reloaded = self._auth()
+        self.assertEqual(reloaded.access_token, "access-1")
+        self.assertEqual(len(self.server.requests), 1)
 
     def test_refresh_access_token(self):
-        print("Testing refresh_access_token()...")
+        self.auth.get_tokens("code")
         self.auth.refresh_access_token()
-        print(f"Refreshed Access Token: {self.auth.access_token}\n")
-        assert self.auth.access_token is not None
+        self.assertEqual((self.auth.access_token, self.auth.refresh_token), ("access-2", "refresh-1"))
+        self.assertEqual(self.auth.credentials.access_token, "access-2")
+        self.assertNotIn("access_type", self.server.requests[-1].body.decode())
 
     def test_refresh_all_tokens(self):
-        print("Testing refresh_all_tokens()...")
+        self.auth.get_tokens("code")
         self.auth.refresh_all_tokens()
-        print(f"Refreshed Access Token: {self.auth.access_token}")
-        print(f"Refreshed Refresh Token: {self.auth.refresh_token}\n")
-        assert self.auth.access_token is not None
-        assert self.auth.refresh_token is not None
+        self.assertEqual((self.auth.access_token, self.auth.refresh_token), ("access-2", "refresh-2"))
 
-    def run_tests(self):
-        self.test_get_authentication_url()
-        self.test_get_authentication_code()
-        self.test_get_tokens()
-        self.test_refresh_access_token()
-        self.test_refresh_all_tokens()
-        print("All tests passed!")
-
-# 使用以下方式運行測試
-if __name__ == "__main__":
-    load_dotenv(os.path.join(os.path.dirname(__file__), '..', 'config', '.env'))
+    def test_invalid_refresh_token_keeps_tokens(self):
+        self.auth.get_tokens("code")
+        self.auth.refresh_token = "revoked"
+        self.auth.refresh_access_token()
+        self.assertEqual(self.auth.access_token, "access-1")
 
-    CLIENT_ID = os.environ.get("TDA_CLIENT_ID")
-    REDIRECT_URI = os.environ.get("TDA_REDIRECT_URI")
-    TD_ACCOUNT_ID = os.environ.get("TDA_ACCOUNT_ID")
-    TD_PASSWORD = os.environ.get("TDA_PASSWORD")
 
-    tester = TestTDAAuthentication(CLIENT_ID, REDIRECT_URI, TD_ACCOUNT_ID, TD_PASSWORD)
-    tester.run_tests()
+if __name__ == '__main__':
+    unittest.main()
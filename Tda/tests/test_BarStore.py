@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from Tda import TDBarStore as bar_store_module
+from Tda.TDBarStore import TDBarStore
+from Tda.TDCandles import COLUMNS
+from Tda.TDDataQuery import TDDataQuery
+from Tda.TDTransport import TDTransport
+from Tda.tests.helpers import LocalAPIServer
+
+MINUTE = 60 * 1000
+DAY = 24 * 60 * MINUTE
+START = 1696204800000  # 2023-10-02 00:00 UTC
+
+
+def history_handler(request, symbol):
+    start, end = int(request.query["startDate"]), int(request.query["endDate"])
+    first = -(-start // MINUTE) * MINUTE
+    candles = [{"open": t / 1e10, "high": t / 1e10 + 1, "low": t / 1e10 - 1, "close": t / 1e10,
+                "volume": 100, "datetime": t} for t in range(first, end + 1, MINUTE)]
+    return 200, {"symbol": symbol, "empty": not candles, "candles": candles}
+
+
+class TestTDBarStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = LocalAPIServer({("GET", r"/v1/marketdata/marketdata/([^/]+)/pricehistory"): history_handler}).start()
+        self.query = TDDataQuery("token", "CLIENT", transport=TDTransport(max_retries=0))
+        self.query.BASE_URL = f"{self.server.url}/v1/marketdata"
+        self.store = TDBarStore(self.tmp.name, self.query)
+
+    def tearDown(self):
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def test_sync_fetches_only_missing_ranges(self):
+        end = START + 12 * DAY - 1
+        result = self.store.sync(["AAPL", "MSFT"], "minute1", START, end)
+        self.assertEqual(result, {"AAPL": 12 * 24 * 60, "MSFT": 12 * 24 * 60})
+        self.assertEqual(len(self.server.requests), 4)  # 每個代號切成兩個 10 天的視窗
+
+        self.assertEqual(self.store.sync(["AAPL"], "minute1", START, end), {"AAPL": 0})
+        self.assertEqual(len(self.server.requests), 4)
+
+        self.store.sync(["AAPL"], "minute1", START - DAY, end + DAY)
+        queried = [(int(r.query["startDate"]), int(r.query["endDate"])) for r in self.server.requests[4:]]
+        self.assertEqual(queried, [(START - DAY, START - 1), (end + 1, end + DAY)])
+
+        candles = self.store.read("AAPL", "minute1")
+        self.assertEqual(len(candles), 14 * 24 * 60)
+        self.assertEqual(candles.datetime[0], START - DAY)
+        self.assertTrue(all(b > a for a, b in zip(candles.datetime[:-1], candles.datetime[1:])))
+
+    def test_sync_without_start_continues_the_stored_range(self):
+        result = self.store.sync(["AAPL", "MSFT"], "minute1", end=START + DAY - 1)
+        self.assertIsInstance(result["AAPL"], ValueError)  # 尚未儲存任何資料
+        self.assertEqual(self.server.requests, [])
+
+        self.store.sync("AAPL", "minute1", START, START + DAY - 1)
+        self.assertEqual(self.store.sync("AAPL", "minute1", end=START + 2 * DAY - 1), {"AAPL": 24 * 60})
+        queried = [(int(r.query["startDate"]), int(r.query["endDate"])) for r in self.server.requests[1:]]
+        self.assertEqual(queried, [(START + DAY, START + 2 * DAY - 1)])
+        self.assertEqual(self.store.info("AAPL", "minute1")["synced_from"], START)
+
+    def test_read_is_memory_mapped_and_sliceable(self):
+        self.store.sync("AAPL", "minute1", START, START + DAY - 1)
+        candles = self.store.read("AAPL", "minute1", START + 60 * MINUTE, START + 120 * MINUTE)
+        self.assertEqual(len(candles), 60)
+        self.assertEqual(candles[0]["datetime"], START + 60 * MINUTE)
+        if bar_store_module.np is not None:
+            self.assertIsInstance(candles.close.base, bar_store_module.np.memmap)
+
+    def test_uncommitted_rows_are_discarded(self):
+        self.store.sync("AAPL", "minute1", START, START + 9 * MINUTE)
+        with open(os.path.join(self.tmp.name, "AAPL", "minute1", "close.bin"), "ab") as f:
+            f.write(b"\0" * 8)  # 模擬寫到一半中斷
+        self.store.append("AAPL", "minute1", [{"open": 1, "high": 1, "low": 1, "close": 1, "volume": 1,
+                                               "datetime": START + 10 * MINUTE}])
+        candles = self.store.read("AAPL", "minute1")
+        self.assertEqual(len(candles), 11)
+        self.assertEqual(candles.close[-1], 1.0)
+
+    def test_rewrite_switches_generation_atomically(self):
+        self.store.sync("AAPL", "minute1", START, START + 9 * MINUTE)
+        directory = os.path.join(self.tmp.name, "AAPL", "minute1")
+        before = self.store.read("AAPL", "minute1")
+        bar = {"open": 1, "high": 1, "low": 1, "close": 1, "volume": 1, "datetime": START + 5 * MINUTE}
+        # meta 寫入前中斷：舊資料維持完整
+        with mock.patch.object(TDBarStore, "_write_meta", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.store.append("AAPL", "minute1", [bar])
+        self.assertEqual(list(self.store.read("AAPL", "minute1").close), list(before.close))
+
+        self.store.append("AAPL", "minute1", [bar])
+        self.assertEqual(self.store.info("AAPL", "minute1")["generation"], 1)
+        self.assertEqual(sorted(os.listdir(directory)),
+                         sorted([f"{name}.1.bin" for name in COLUMNS] + ["meta.json"]))
+        self.assertEqual(self.store.read("AAPL", "minute1").close[5], 1.0)
+        self.assertNotEqual(before.close[5], 1.0)  # 先前的映射不受影響
+        self.store.append("AAPL", "minute1", [dict(bar, datetime=START + 10 * MINUTE)])
+        self.assertEqual(len(self.store.read("AAPL", "minute1")), 11)
+
+    def test_array_fallback_reads(self):
+        self.store.sync("AAPL", "minute1", START, START + 9 * MINUTE)
+        with mock.patch.object(bar_store_module, "np", None), mock.patch("Tda.TDCandles.np", None):
+            candles = self.store.read("AAPL", "minute1", START + 2 * MINUTE)
+            self.assertIsInstance(candles.datetime, memoryview)
+            self.assertEqual(len(candles), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
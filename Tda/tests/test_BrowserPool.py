@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from Tda.TDAAuthentication import TDAAuthentication
+from Tda.TDBrowserPool import TDBrowserPool
+from Tda.TDTokenStore import JsonTokenStore
+from Tda.tests.helpers import FakeLoginPage
+
+try:
+    import selenium
+except ImportError:
+    selenium = None
+
+CHROME_AVAILABLE = selenium is not None and any(
+    shutil.which(name) for name in ("google-chrome", "chromium", "chromium-browser", "chrome"))
+
+
+class StandInDriver:
+    """Records what the pool does to a driver; used to check pool bookkeeping only."""
+
+    active = 0
+    peak = 0
+    guard = threading.Lock()
+
+    def __init__(self):
+        self.visited = []
+        self.cookies_cleared = 0
+        self.quit_called = False
+
+    @property
+    def current_url(self):
+        return self.visited[-1] if self.visited else "data:,"
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def delete_all_cookies(self):
+        self.cookies_cleared += 1
+
+    def quit(self):
+        self.quit_called = True
+
+    def work(self):
+        with StandInDriver.guard:
+            StandInDriver.active += 1
+            StandInDriver.peak = max(StandInDriver.peak, StandInDriver.active)
+        time.sleep(0.02)
+        with StandInDriver.guard:
+            StandInDriver.active -= 1
+
+
+class TestTDBrowserPool(unittest.TestCase):
+
+    def setUp(self):
+        StandInDriver.active = StandInDriver.peak = 0
+        self.drivers = []
+
+    def factory(self):
+        driver = StandInDriver()
+        self.drivers.append(driver)
+        return driver
+
+    def test_warm_drivers_are_reused_and_reset(self):
+        with TDBrowserPool(size=2, driver_factory=self.factory) as pool:
+            pool.warm()
+            self.assertEqual(pool.created, 2)
+            for _ in range(5):
+                with pool.driver() as driver:
+                    driver.get("https://auth.tdameritrade.com/auth")
+            self.assertEqual(pool.created, 2)
+            self.assertEqual(pool.reused, 5)
+            self.assertEqual(driver.visited[-1], "about:blank")
+            self.assertEqual(sum(d.cookies_cleared for d in self.drivers), 5)
+        self.assertTrue(all(d.quit_called for d in self.drivers))
+
+    def test_concurrency_is_bounded(self):
+        pool = TDBrowserPool(size=3, driver_factory=self.factory)
+
+        def checkout():
+            with pool.driver() as driver:
+                driver.work()
+
+        threads = [threading.Thread(target=checkout) for _ in range(12)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        pool.close()
+        self.assertLessEqual(StandInDriver.peak, 3)
+        self.assertLessEqual(pool.created, 3)
+
+    def test_failed_login_retires_driver(self):
+        pool = TDBrowserPool(size=1, driver_factory=self.factory)
+        with self.assertRaises(ValueError):
+            with pool.driver():
+                raise ValueError("login page changed")
+        self.assertTrue(self.drivers[0].quit_called)
+        with pool.driver(timeout=1):
+            pass
+        self.assertEqual(pool.created, 2)
+        pool.close()
+
+    def test_max_uses_recycles_driver(self):
+        with TDBrowserPool(size=1, driver_factory=self.factory, max_uses=2) as pool:
+            for _ in range(3):
+                with pool.driver():
+                    pass
+        self.assertEqual(pool.created, 2)
+
+
+@unittest.skipUnless(CHROME_AVAILABLE, "selenium and Chrome are required")
+class TestTDBrowserPoolWithChrome(unittest.TestCase):
+
+    def setUp(self):
+        self.page = FakeLoginPage().start()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.page.stop()
+        self.tmp.cleanup()
+
+    def _auth(self, account):
+        auth = TDAAuthentication("client", self.page.redirect_uri,
+                                 token_store=JsonTokenStore(os.path.join(self.tmp.name, f"{account}.json")))
+        auth.base_url = self.page.url
+        return auth
+
+    def test_concurrent_logins_with_isolated_sessions(self):
+        accounts = ["alice", "bob", "carol"]
+        with TDBrowserPool(size=2) as pool:
+            results = pool.login_many([(self._auth(a), a, "pw") for a in accounts])
+        self.assertEqual(results, {a: f"code-{a}" for a in accounts})
+        self.assertEqual(self.page.auth_cookies, [None] * 3)
+        self.assertLessEqual(pool.created, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
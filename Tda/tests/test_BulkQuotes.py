@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+from Tda.AsyncTDDataQuery import AsyncTDDataQuery
+from Tda.TDAsyncTransport import TDAsyncTransport
+from Tda.TDDataQuery import TDDataQuery, chunk_symbols
+from Tda.TDTransport import TDTransport
+from Tda.tests.helpers import LocalAPIServer
+
+
+def quotes_handler(request):
+    symbols = request.query["symbol"].split(",")
+    if "BAD" in symbols:
+        return 500, {"error": "boom"}
+    return 200, {s: {"symbol": s, "lastPrice": 1.0} for s in symbols}
+
+
+class TestChunkSymbols(unittest.TestCase):
+
+    def test_chunks_are_balanced_and_deduplicated(self):
+        symbols = [f"S{i}" for i in range(1001)] + ["S1", " ", ""]
+        chunks = chunk_symbols(symbols, 500, 10000)
+        self.assertEqual([len(c) for c in chunks], [334, 334, 333])
+        self.assertEqual(sum(chunks, []), [f"S{i}" for i in range(1001)])
+
+    def test_chunks_respect_url_length(self):
+        chunks = chunk_symbols([f"SYMBOL{i:04d}" for i in range(100)], 500, 120)
+        self.assertTrue(all(sum(len(s) + 1 for s in c) <= 120 for c in chunks))
+
+
+class TestBulkQuotes(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalAPIServer({("GET", r"/v1/marketdata/marketdata/quotes"): quotes_handler}).start()
+        self.transport = TDTransport(max_retries=0)
+        self.query = TDDataQuery("token", "CLIENT", transport=self.transport)
+        self.query.BASE_URL = f"{self.server.url}/v1/marketdata"
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def test_large_universe_is_merged(self):
+        symbols = [f"SYM{i}" for i in range(5000)]
+        result = self.query.get_quotes_bulk(symbols, chunk_size=400)
+        self.assertEqual(len(result), 5000)
+        self.assertEqual(len(result.chunks), 13)
+        self.assertEqual(result.missing, [])
+        self.assertTrue(all(chunk.latency >= 0 and chunk.error is None for chunk in result.chunks))
+
+    def test_failed_chunk_is_reported(self):
+        result = self.query.get_quotes_bulk(["AAPL", "MSFT", "BAD", "IBM"], chunk_size=2)
+        self.assertEqual(sorted(result), ["AAPL", "MSFT"])
+        self.assertEqual(result.missing, ["BAD", "IBM"])
+        self.assertEqual(len(result.errors), 1)
+
+    def test_async_bulk_quotes(self):
+        async def run():
+            async with AsyncTDDataQuery("token", "CLIENT", transport=TDAsyncTransport(max_retries=0)) as query:
+                query.BASE_URL = f"{self.server.url}/v1/marketdata"
+                return await query.get_quotes_bulk([f"SYM{i}" for i in range(1200)], chunk_size=300)
+
+        result = asyncio.run(run())
+        self.assertEqual(len(result), 1200)
+        self.assertEqual(len(result.chunks), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
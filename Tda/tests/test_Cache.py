@@ -0,0 +1,120 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from Tda import TDDataQuery as data_query_module
+from Tda.TDCache import TDCache, MemoryCacheBackend, DiskCacheBackend
+from Tda.TDDataQuery import TDDataQuery
+from Tda.TDTransport import TDTransport
+from Tda.tests.helpers import LocalAPIServer
+
+
+class TestCacheBackends(unittest.TestCase):
+
+    def test_memory_lru_eviction_by_size(self):
+        backend = MemoryCacheBackend(max_bytes=10)
+        backend.set("a", b"1234", 60)
+        backend.set("b", b"1234", 60)
+        backend.get("a")
+        backend.set("c", b"1234", 60)
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual(backend.get("a"), b"1234")
+        self.assertEqual(backend.size, 8)
+
+    def test_memory_ttl_expiry(self):
+        backend = MemoryCacheBackend()
+        backend.set("a", b"1", 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(backend.get("a"))
+        self.assertEqual(len(backend), 0)
+
+    def test_disk_backend_survives_restart(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite")
+            backend = DiskCacheBackend(path, max_bytes=10)
+            backend.set("a", b"1234", 60)
+            backend.set("b", b"1234", 60)
+            backend.get("a")
+            backend.set("c", b"1234", 60)
+            backend.close()
+
+            reopened = DiskCacheBackend(path)
+            self.assertEqual(reopened.get("a"), b"1234")
+            self.assertIsNone(reopened.get("b"))
+            reopened.close()
+
+
+class TestTDDataQueryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self.server = LocalAPIServer({
+            ("GET", r"/v1/marketdata/marketdata/hours"): self._hours,
+            ("GET", r"/v1/marketdata/marketdata/quotes"): lambda req: (200, {"AAPL": {}}),
+        }).start()
+        self.transport = TDTransport(max_retries=0)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def _hours(self, request):
+        self.calls += 1
+        self.release.wait(1)
+        return 200, {"equity": {"EQ": {"isOpen": True, "date": request.query.get("date")}}}
+
+    def _query(self, cache):
+        query = TDDataQuery("token", "CLIENT", transport=self.transport, cache=cache)
+        query.BASE_URL = f"{self.server.url}/v1/marketdata"
+        return query
+
+    def test_repeat_calls_are_served_from_cache(self):
+        self.release.set()
+        cache = TDCache()
+        query = self._query(cache)
+        first = query.get_market_hours("EQUITY")
+        first["mutated"] = True
+        second = query.get_market_hours("EQUITY")
+        query.get_market_hours("EQUITY", date="2023-10-02")
+        query.get_quotes(["AAPL"])
+        query.get_quotes(["AAPL"])
+
+        self.assertNotIn("mutated", second)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_todays_hours_expire_at_the_date_rollover(self):
+        self.release.set()
+        query = self._query(TDCache())
+        with mock.patch.object(data_query_module, "market_date", return_value="2023-10-02"):
+            self.assertEqual(query.get_market_hours("EQUITY")["equity"]["EQ"]["date"], "2023-10-02")
+            query.get_market_hours("EQUITY")
+        with mock.patch.object(data_query_module, "market_date", return_value="2023-10-03"):
+            self.assertEqual(query.get_market_hours("EQUITY")["equity"]["EQ"]["date"], "2023-10-03")
+        self.assertEqual(self.calls, 2)
+
+    def test_concurrent_identical_calls_are_coalesced(self):
+        cache = TDCache()
+        query = self._query(cache)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(query.get_market_hours("EQUITY")))
+                   for _ in range(5)]
+        for t in threads:
+            t.start()
+        while cache.coalesced < 4:
+            time.sleep(0.005)
+        self.release.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(results), 5)
+        self.assertEqual(cache.stats()["coalesced"], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
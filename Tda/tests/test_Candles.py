@@ -0,0 +1,74 @@
+import unittest
+from unittest import mock
+from Tda import TDCandles as candles_module
+from Tda.TDCandles import TDCandles
+from Tda.TDDataQuery import TDDataQuery
+from Tda.TDTransport import TDTransport
+from Tda.tests.helpers import LocalAPIServer
+
+MINUTE = 60 * 1000
+START = 1696253400000  # 2023-10-02 13:30 UTC
+
+
+def price_history(n=10):
+    candles = [{"open": 100 + i, "high": 101 + i, "low": 99 + i, "close": 100.5 + i,
+                "volume": 1000 + i, "datetime": START + i * MINUTE} for i in range(n)]
+    return {"symbol": "AAPL", "empty": False, "candles": candles}
+
+
+class CandlesBehaviour:
+
+    def test_columns_and_roundtrip(self):
+        candles = TDCandles.from_price_history(price_history())
+        self.assertEqual(len(candles), 10)
+        self.assertEqual(candles[3]["open"], 103)
+        self.assertEqual(candles.to_price_history(), price_history())
+
+    def test_between_is_zero_copy(self):
+        candles = TDCandles.from_price_history(price_history())
+        window = candles.between(START + 2 * MINUTE, START + 5 * MINUTE)
+        self.assertEqual(list(window.datetime), [START + i * MINUTE for i in (2, 3, 4)])
+        candles.close[3] = 0.0
+        self.assertEqual(window.close[1], 0.0)
+
+    def test_resample_to_five_minutes(self):
+        bars = TDCandles.from_price_history(price_history(12)).resample(5)
+        self.assertEqual(len(bars), 3)
+        self.assertEqual(list(bars.open), [100, 105, 110])
+        self.assertEqual(list(bars.high), [105, 110, 112])
+        self.assertEqual(list(bars.low), [99, 104, 109])
+        self.assertEqual(list(bars.close), [104.5, 109.5, 111.5])
+        self.assertEqual(list(bars.volume), [5010, 5035, 2021])
+        self.assertEqual(bars.datetime[1], START + 5 * MINUTE)
+
+
+class TestCandlesNumpy(CandlesBehaviour, unittest.TestCase):
+
+    def setUp(self):
+        if candles_module.np is None:
+            self.skipTest("numpy is not installed")
+
+
+class TestCandlesArrayFallback(CandlesBehaviour, unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(candles_module, "np", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestColumnarPriceHistory(unittest.TestCase):
+
+    def test_get_price_history_columnar(self):
+        with LocalAPIServer({("GET", r"/v1/marketdata/marketdata/AAPL/pricehistory"):
+                             lambda req: (200, price_history())}) as server:
+            query = TDDataQuery("token", "CLIENT", transport=TDTransport(max_retries=0))
+            query.BASE_URL = f"{server.url}/v1/marketdata"
+            candles = query.get_price_history("AAPL", columnar=True, frequencyType="minute")
+            self.assertIsInstance(candles, TDCandles)
+            self.assertEqual(server.requests[0].query["frequencyType"], "minute")
+            self.assertNotIn("columnar", server.requests[0].query)
+
+
+if __name__ == '__main__':
+    unittest.main()
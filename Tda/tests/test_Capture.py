@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+from Tda.TDAAuthentication import TDAAuthentication
+from Tda.TDAccountsAndTrading import TDAccountsAndTrading
+from Tda.TDCapture import BLOCK, REDACTED, TDCapture, TDCaptureLog, TDReplayTransport
+from Tda.TDDataQuery import TDDataQuery
+from Tda.TDOrderTemplate import equity_order
+from Tda.TDTokenStore import JsonTokenStore
+from Tda.TDTransport import TDTransport
+from Tda.TDUserSettings import TDUserSettings
+from Tda.tests.mock_td_server import MockTDServer, attach
+
+QUOTES = "GET /v1/marketdata/{symbol}/quotes"
+
+
+def clients(transport):
+    return (TDDataQuery("token", "CLIENT_ID", transport=transport),
+            TDAccountsAndTrading("token", transport=transport),
+            TDUserSettings("token", transport=transport))
+
+
+def session(data, trading, settings):
+    """A fixed sequence of calls; returns everything the clients answered."""
+    results = [data.get_quote("AAPL"), data.get_quotes(["MSFT", "SPY"]),
+               data.get_price_history("AAPL", periodType="day", period=1, frequencyType="minute", frequency=5)]
+    order_id = trading.place_order("1", equity_order("BUY"), symbol="AAPL", quantity=1, price=100.0)
+    results += [order_id, trading.get_order("1", order_id), trading.cancel_order("1", order_id),
+                trading.get_order("1", order_id), settings.get_account_preferences("1"),
+                settings.update_account_preferences("1", {"expressTrading": True}), data.get_quote("AAPL")]
+    return results
+
+
+class TestTDCapture(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "traffic.tdcap")
+        self.server = MockTDServer(accounts=("1",)).start()
+        # 會重試的 transport：下單走它衍生的 for_orders()，同樣要被擷取
+        self.transport = TDTransport(backoff_factor=0)
+        self.clients = clients(self.transport)
+        self.server.attach(*self.clients)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def capture(self, **kwargs):
+        with TDCapture(self.path, **kwargs) as capture:
+            self.transport.capture = capture
+            results = session(*self.clients)
+            self.transport.capture = None
+        return results
+
+    def test_capture_and_seek(self):
+        results = self.capture(block_records=3)
+        log = TDCaptureLog(self.path)
+        self.assertEqual(len(log), len(self.server.requests))
+        self.assertEqual(len(log.blocks), 4)
+        records = list(log)
+        self.assertEqual([r.method for r in records], [r.method for r in self.server.requests])
+        self.assertEqual(self.transport.for_orders().stats.snapshot()["requests"], 4)
+        self.assertIn(QUOTES, log.endpoints())
+        self.assertEqual(len(list(log.records(endpoint=QUOTES))), 2)
+        order = records[3]
+        self.assertEqual((order.method, order.status, order.endpoint), ("POST", 201, "POST /v1/accounts/{id}/orders"))
+        self.assertIn('"instruction":"BUY"', order.body)
+        self.assertEqual(records[0].params, {"apikey": "CLIENT_ID"})
+        self.assertEqual(records[0].response().json(), results[0])
+        self.assertNotIn("Bearer", str(records))
+        # 依時間搜尋：只讀取時間範圍重疊的區塊
+        first, last = log.time_range()
+        self.assertEqual([r.timestamp for r in log.records(start=records[5].timestamp)],
+                         [r.timestamp for r in records if r.timestamp >= records[5].timestamp])
+        self.assertEqual(list(log.records(start=last + 1)), [])
+        self.assertEqual(len(list(log.records(end=first))), sum(r.timestamp == first for r in records))
+
+    def test_appends_and_recovers_a_missing_index(self):
+        self.capture()
+        self.capture()
+        self.assertEqual(len(TDCaptureLog(self.path)), 2 * 10)
+        os.remove(self.path + ".idx")
+        with open(self.path, "ab") as f:
+            f.write(b"TDCB\x10")  # 寫到一半的區塊
+        log = TDCaptureLog(self.path)
+        self.assertEqual((len(log.blocks), len(log)), (2, 20))
+        self.assertIn(QUOTES, log.blocks[0].endpoints)
+
+    def test_replay_is_deterministic(self):
+        recorded = self.capture()
+        self.server.stop()  # 回放不需要網路
+        with TDReplayTransport(self.path) as replay:
+            replayed = clients(replay)
+            self.assertIs(replayed[1].order_transport, replay)
+            attach("http://replay.invalid", *replayed)
+            self.assertEqual(session(*replayed), recorded)
+            replay.reset()
+            self.assertEqual(session(*replayed), recorded)
+            with self.assertRaises(LookupError):
+                replayed[0].get_quote("IBM")
+        with TDReplayTransport(self.path, endpoint=QUOTES) as quotes_only:
+            self.assertEqual(len(quotes_only), 2)
+
+    def test_tokens_are_redacted(self):
+        auth = TDAAuthentication("CLIENT_ID", "https://localhost", transport=self.transport,
+                                 token_store=JsonTokenStore(os.path.join(self.directory, "tokens.json")))
+        self.server.attach(auth)
+        with TDCapture(self.path) as capture:
+            self.transport.capture = capture
+            auth.get_tokens("secret-code")
+            auth.refresh_access_token()
+            self.transport.capture = None
+        self.assertEqual((auth.access_token, auth.refresh_token), ("access-2", "refresh-1"))
+        log = TDCaptureLog(self.path)
+        records = list(log)
+        self.assertEqual([r.endpoint for r in records], ["POST /v1/oauth2/token"] * 2)
+        self.assertIn(f'"code":"{REDACTED}"', records[0].body)
+        self.assertEqual(records[0].response().json()["refresh_token"], REDACTED)
+        with open(self.path, "rb") as f:
+            data = f.read()
+        raw = b"".join(zlib.decompress(data[b.offset + BLOCK.size:b.offset + b.length]) for b in log.blocks)
+        for secret in (b"secret-code", b"access-1", b"access-2", b"refresh-1"):
+            self.assertNotIn(secret, raw)
+        # 回放時同樣遮蔽請求中的授權碼，仍然可以比對
+        with TDReplayTransport(self.path) as replay:
+            self.assertEqual(replay.post(self.server.url + "/v1/oauth2/token", data={
+                "grant_type": "authorization_code", "access_type": "offline", "code": "another-code",
+                "client_id": "CLIENT_ID", "redirect_uri": "https://localhost"}).json()["access_token"], REDACTED)
+
+    def test_dropped_when_the_writer_falls_behind(self):
+        with TDCapture(self.path, max_pending=0) as capture:
+            self.transport.capture = capture
+            self.clients[0].get_quote("AAPL")
+        self.assertEqual(capture.dropped, 1)
+        self.assertEqual(len(TDCaptureLog(self.path)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import threading
+import time
+import unittest
+from Tda.TDAccountsAndTrading import TDAccountsAndTrading
+from Tda.TDCredentials import TDCredentials, TDTokenRefresher
+from Tda.TDTransport import TDTransport
+from Tda.TDWatchlist import TDWatchlist
+from Tda.tests.helpers import LocalAPIServer
+
+
+class FakeTokenSource:
+    """Issues numbered tokens, standing in for TDAAuthentication.refresh_access_token."""
+
+    def __init__(self, lifetime=1800):
+        self.lifetime = lifetime
+        self.calls = 0
+        self.credentials = TDCredentials("token-0", refresher=self.refresh, expires_at=time.time() + lifetime)
+
+    def refresh(self):
+        self.calls += 1
+        time.sleep(0.05)
+        self.credentials.update(f"token-{self.calls}", time.time() + self.lifetime)
+
+
+class TestTDCredentials(unittest.TestCase):
+
+    def setUp(self):
+        self.valid_token = "Bearer token-1"
+        self.server = LocalAPIServer({
+            ("GET", r"/v1/accounts/watchlists"): self._authorized,
+            ("GET", r"/v1/accounts"): self._authorized,
+        }).start()
+        self.transport = TDTransport(max_retries=0)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def _authorized(self, request):
+        if request.headers.get("Authorization") != self.valid_token:
+            return 401, {"error": "The access token being passed has expired or is invalid."}
+        return 200, []
+
+    def test_refresh_is_pushed_to_every_client(self):
+        source = FakeTokenSource()
+        watchlist = TDWatchlist(source.credentials, transport=self.transport)
+        trading = TDAccountsAndTrading(source.credentials, transport=self.transport)
+        source.credentials.refresh()
+        self.assertEqual(watchlist.headers["Authorization"], "Bearer token-1")
+        self.assertEqual(trading.access_token, "token-1")
+
+    def test_401_refreshes_once_and_retries(self):
+        source = FakeTokenSource()
+        watchlist = TDWatchlist(source.credentials, transport=self.transport)
+        watchlist.BASE_URL = f"{self.server.url}/v1"
+        trading = TDAccountsAndTrading(source.credentials, transport=self.transport)
+        trading.base_url = f"{self.server.url}/v1"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(watchlist.get_all_watchlists())) for _ in range(4)]
+        threads.append(threading.Thread(target=lambda: results.append(trading.get_accounts())))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, [[]] * 5)
+        self.assertEqual(source.calls, 1)
+
+    def test_unrecoverable_401_raises(self):
+        self.valid_token = "never"
+        source = FakeTokenSource()
+        watchlist = TDWatchlist(source.credentials, transport=self.transport)
+        watchlist.BASE_URL = f"{self.server.url}/v1"
+        with self.assertRaisesRegex(Exception, "Unauthorized"):
+            watchlist.get_all_watchlists()
+        self.assertEqual(source.calls, 1)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_plain_token_does_not_retry(self):
+        watchlist = TDWatchlist("token-0", transport=self.transport)
+        watchlist.BASE_URL = f"{self.server.url}/v1"
+        with self.assertRaises(Exception):
+            watchlist.get_all_watchlists()
+        self.assertEqual(len(self.server.requests), 1)
+
+
+class TestTDTokenRefresher(unittest.TestCase):
+
+    def test_refreshes_ahead_of_expiry(self):
+        source = FakeTokenSource(lifetime=0.5)
+        refresher = TDTokenRefresher(source.credentials, lead_time=0.3, retry_interval=0.05).start()
+        try:
+            time.sleep(0.45)
+            self.assertGreaterEqual(source.calls, 1)
+            self.assertGreater(source.credentials.seconds_until_expiry(), 0)
+        finally:
+            refresher.stop()
+        self.assertFalse(refresher.running)
+
+
+if __name__ == '__main__':
+    unittest.main()
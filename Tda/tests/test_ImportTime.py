@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 以 None 佔位，任何 import 都會直接失敗，等同確認沒有被提前載入
+PROBE = """
+import sys
+for name in ("selenium", "pyvirtualdisplay", "numpy"):
+    sys.modules[name] = None
+import {module}
+"""
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def _import_without_heavy_dependencies(self, module):
+        env = dict(os.environ, IN_DOCKER="true")
+        result = subprocess.run([sys.executable, "-c", PROBE.format(module=module)],
+                                cwd=ROOT, env=env, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_authentication_does_not_load_browser_automation(self):
+        self._import_without_heavy_dependencies("Tda.TDAAuthentication")
+
+    def test_clients_do_not_load_numpy(self):
+        for module in ("Tda.TDDataQuery", "Tda.AsyncTDDataQuery", "Tda.TDAccountsAndTrading"):
+            with self.subTest(module=module):
+                self._import_without_heavy_dependencies(module)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date, timedelta
+from Tda.TDAccountsAndTrading import TDAccountsAndTrading
+from Tda.TDLedger import TDLedger
+from Tda.TDTransport import TDTransport
+from Tda.tests.helpers import LocalAPIServer
+
+
+def make_transaction(transaction_id, day, symbol, instruction, amount, type="TRADE"):
+    return {
+        "transactionId": transaction_id, "type": type, "transactionDate": f"{day}T15:00:00+0000",
+        "netAmount": -amount * 10 if instruction == "BUY" else amount * 10, "description": f"{instruction} {symbol}",
+        "transactionItem": {"instruction": instruction, "amount": amount, "price": 10.0,
+                            "instrument": {"symbol": symbol, "assetType": "EQUITY"}},
+    }
+
+
+class TestTDLedger(unittest.TestCase):
+
+    def setUp(self):
+        today = date.today()
+        self.history = [
+            make_transaction(1, today - timedelta(days=40), "AAPL", "BUY", 10),
+            make_transaction(2, today - timedelta(days=35), "MSFT", "BUY", 5),
+            make_transaction(3, today - timedelta(days=20), "AAPL", "SELL", 4),
+            make_transaction(4, today - timedelta(days=10), None, None, 0, type="DIVIDEND_OR_INTEREST"),
+        ]
+        self.detail_calls = 0
+        self.detail_peak = 0
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.server = LocalAPIServer({
+            ("GET", r"/v1/accounts/(\w+)/transactions"): self._list,
+            ("GET", r"/v1/accounts/(\w+)/transactions/(\d+)"): self._detail,
+        }).start()
+        self.transport = TDTransport(max_retries=0)
+        self.trading = TDAccountsAndTrading("token", transport=self.transport)
+        self.trading.base_url = f"{self.server.url}/v1"
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ledger = TDLedger(os.path.join(self.tmp.name, "ledger.db"), trading=self.trading)
+
+    def tearDown(self):
+        self.ledger.close()
+        self.transport.close()
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def _list(self, request, account_id):
+        start, end = request.query["startDate"], request.query["endDate"]
+        return 200, [t for t in self.history if start <= t["transactionDate"][:10] <= end]
+
+    def _detail(self, request, account_id, transaction_id):
+        with self.lock:
+            self.detail_calls += 1
+            self.in_flight += 1
+            self.detail_peak = max(self.detail_peak, self.in_flight)
+        time.sleep(0.02)
+        with self.lock:
+            self.in_flight -= 1
+        if transaction_id == "4":
+            return 500, {"error": "Internal error"}
+        transaction = next(t for t in self.history if str(t["transactionId"]) == transaction_id)
+        return 200, dict(transaction, fees={"commission": 0.65})
+
+    def test_incremental_sync_from_watermark(self):
+        with self.assertRaises(ValueError):
+            self.ledger.sync("1")
+        self.assertEqual(self.ledger.sync("1", start_date=date.today() - timedelta(days=60)), 4)
+        watermark = self.ledger.watermark("1")
+        self.assertEqual(watermark, (date.today() - timedelta(days=1)).isoformat())
+
+        self.history.append(make_transaction(5, date.today(), "MSFT", "SELL", 5))
+        requests_before = len(self.server.requests)
+        self.assertEqual(self.ledger.sync("1"), 1)
+        new_requests = self.server.requests[requests_before:]
+        self.assertEqual([r.query["startDate"] for r in new_requests], [watermark])
+        self.assertEqual(len(self.ledger), 5)
+
+    def test_queries_use_local_index(self):
+        self.ledger.sync("1", start_date=date.today() - timedelta(days=60))
+        requests_before = len(self.server.requests)
+
+        self.assertEqual([t["transactionId"] for t in self.ledger.transactions("1", symbol="AAPL")], [1, 3])
+        self.assertEqual([t["transactionId"] for t in self.ledger.transactions(type="DIVIDEND_OR_INTEREST")], [4])
+        recent = self.ledger.transactions("1", start=date.today() - timedelta(days=20), end=date.today())
+        self.assertEqual([t["transactionId"] for t in recent], [3, 4])
+        self.assertEqual(self.ledger.net_quantities("1"), {"AAPL": 6, "MSFT": 5})
+        self.assertEqual(self.ledger.net_quantities("1", as_of=date.today() - timedelta(days=30)), {"AAPL": 10, "MSFT": 5})
+        self.assertEqual(len(self.server.requests), requests_before)
+
+    def test_backfill_details_concurrently(self):
+        self.ledger.sync("1", start_date=date.today() - timedelta(days=60))
+        errors = self.ledger.backfill_details("1", max_workers=4)
+
+        self.assertEqual(list(errors), [4])
+        self.assertEqual(self.detail_calls, 4)
+        self.assertGreater(self.detail_peak, 1)
+        self.assertEqual(self.ledger.missing_details("1"), [("1", 4)])
+        self.assertEqual(self.ledger.transactions("1", symbol="MSFT")[0]["fees"], {"commission": 0.65})
+
+        # 再次同步清單不會覆蓋已補齊的明細
+        self.ledger.upsert("1", self.history)
+        self.assertEqual(self.ledger.transactions("1", symbol="MSFT")[0]["fees"], {"commission": 0.65})
+
+
+if __name__ == '__main__':
+    unittest.main()
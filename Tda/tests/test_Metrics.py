@@ -0,0 +1,117 @@
+import asyncio
+import json
+import socket
+import unittest
+from Tda.TDAccountsAndTrading import TDAccountsAndTrading
+from Tda.TDAsyncTransport import TDAsyncTransport
+from Tda.TDDataQuery import TDDataQuery
+from Tda.TDMetrics import JsonExporter, MemoryExporter, PrometheusExporter, TDMetrics, endpoint_name
+from Tda.TDOrderTemplate import equity_order
+from Tda.TDTransport import TDTransport
+from Tda.tests.helpers import FakeOrderServer, LocalAPIServer
+
+
+def flaky(statuses):
+    """A handler answering the given statuses in turn, then 200."""
+    statuses = list(statuses)
+
+    def handler(request, *groups):
+        status = statuses.pop(0) if statuses else 200
+        return status, {"status": status}
+    return handler
+
+
+class TestTDMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalAPIServer({
+            ("GET", r"/v1/marketdata/(\w+)/quotes"): lambda req, symbol: (200, {symbol: {"lastPrice": 1.0}}),
+            ("GET", r"/v1/accounts/(\d+)/orders/(\d+)"): flaky([429, 503]),
+            ("GET", r"/v1/accounts/(\d+)"): lambda req, account: (404, {"error": "not found"}),
+        }).start()
+        self.metrics = TDMetrics()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_endpoint_name(self):
+        self.assertEqual(endpoint_name("get", "https://x/v1/marketdata/AAPL/quotes?apikey=1"),
+                         "GET /v1/marketdata/{symbol}/quotes")
+        self.assertEqual(endpoint_name("DELETE", "https://x/v1/accounts/123/orders/456"),
+                         "DELETE /v1/accounts/{id}/orders/{id}")
+        self.assertEqual(endpoint_name("GET", "https://x/v1/marketdata/$SPX.X/movers"),
+                         "GET /v1/marketdata/{symbol}/movers")
+
+    def test_sync_transport_records_per_endpoint(self):
+        with TDTransport(max_retries=2, backoff_factor=0, metrics=self.metrics) as transport:
+            query = TDDataQuery("token", "CLIENT", transport=transport)
+            query.BASE_URL = f"{self.server.url}/v1"
+            for symbol in ("AAPL", "MSFT", "SPY"):
+                query.get_quote(symbol)
+            transport.get(f"{self.server.url}/v1/accounts/1/orders/2")
+            transport.get(f"{self.server.url}/v1/accounts/1")
+
+        snapshot = self.metrics.snapshot()
+        quotes = snapshot["GET /v1/marketdata/{symbol}/quotes"]
+        self.assertEqual((quotes["requests"], quotes["errors"], quotes["latency"]["count"]), (3, 0, 3))
+        self.assertGreater(quotes["bytes_received"], 0)
+        orders = snapshot["GET /v1/accounts/{id}/orders/{id}"]
+        self.assertEqual((orders["requests"], orders["retries"], orders["throttles"]), (1, 2, 1))
+        self.assertEqual(snapshot["GET /v1/accounts/{id}"]["statuses"], {"404": 1})
+
+    def test_failures_and_disabled_default(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        with TDTransport(max_retries=0, metrics=self.metrics) as transport:
+            with self.assertRaises(Exception):
+                transport.get(f"http://127.0.0.1:{port}/v1/accounts")
+        self.assertEqual(self.metrics.snapshot()["GET /v1/accounts"]["failures"], 1)
+        self.assertIsNone(TDTransport(max_retries=0).metrics)
+
+    def test_default_metrics_include_order_calls(self):
+        default = TDTransport.default()
+        orders = TDTransport.orders()  # 在啟用 metrics 之前就已建立
+        self.addCleanup(setattr, default, "metrics", None)
+        default.metrics = self.metrics
+        with FakeOrderServer() as server:
+            trading = TDAccountsAndTrading("token")
+            trading.base_url = f"{server.url}/v1"
+            order_id = trading.place_order("1", equity_order("BUY"), symbol="AAPL", quantity=1, price=1.0)
+            trading.cancel_order("1", order_id)
+        self.assertIs(trading.order_transport, orders)
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["POST /v1/accounts/{id}/orders"]["requests"], 1)
+        self.assertEqual(snapshot["DELETE /v1/accounts/{id}/orders/{id}"]["requests"], 1)
+
+    def test_exporters(self):
+        with TDTransport(max_retries=0, metrics=self.metrics) as transport:
+            transport.get(f"{self.server.url}/v1/marketdata/AAPL/quotes")
+        memory = self.metrics.add_exporter(MemoryExporter())
+        prometheus = self.metrics.add_exporter(PrometheusExporter())
+        exporter = self.metrics.add_exporter(JsonExporter())
+        self.metrics.export()
+
+        self.assertEqual(memory.latest["GET /v1/marketdata/{symbol}/quotes"]["requests"], 1)
+        labels = 'method="GET",path="/v1/marketdata/{symbol}/quotes"'
+        self.assertIn(f'td_api_requests_total{{{labels},status="200"}} 1', prometheus.last)
+        self.assertIn(f'td_api_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1', prometheus.last)
+        self.assertIn("# TYPE td_api_request_duration_seconds histogram", prometheus.last)
+        self.assertEqual(json.loads(exporter.last)["endpoints"], memory.latest)
+
+    def test_async_transport_records(self):
+        async def run():
+            transport = TDAsyncTransport(max_retries=2, backoff_factor=0, metrics=self.metrics)
+            try:
+                await transport.get(f"{self.server.url}/v1/accounts/1/orders/2")
+            finally:
+                await transport.close()
+
+        asyncio.run(run())
+        orders = self.metrics.snapshot()["GET /v1/accounts/{id}/orders/{id}"]
+        self.assertEqual((orders["requests"], orders["retries"], orders["throttles"], orders["statuses"]),
+                         (1, 2, 1, {"200": 1}))
+
+
+if __name__ == '__main__':
+    unittest.main()
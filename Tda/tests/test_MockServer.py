@@ -0,0 +1,81 @@
+import os
+import tempfile
+import time
+import unittest
+from Tda.TDAAuthentication import TDAAuthentication
+from Tda.TDDataQuery import TDDataQuery
+from Tda.TDMetrics import TDMetrics
+from Tda.TDTokenStore import JsonTokenStore
+from Tda.TDTransport import TDTransport
+from Tda.TDWatchlist import TDWatchlist
+from Tda.tests.mock_td_server import MockTDServer
+
+
+class TestMockTDServer(unittest.TestCase):
+
+    def _query(self, server, **transport_options):
+        transport = TDTransport(backoff_factor=0, **transport_options)
+        self.addCleanup(transport.close)
+        query = TDDataQuery("token", "CLIENT", transport=transport)
+        server.attach(query)
+        return query
+
+    def test_injected_errors_are_seeded(self):
+        counts = []
+        for _ in range(2):
+            with MockTDServer(error_rate=0.3, seed=7) as server:
+                query = self._query(server, max_retries=0)
+                failed = 0
+                for _ in range(50):
+                    try:
+                        query.get_quote("AAPL")
+                    except Exception:
+                        failed += 1
+                self.assertEqual(failed, server.injected["errors"])
+                counts.append(failed)
+        self.assertEqual(counts[0], counts[1])
+        self.assertTrue(5 < counts[0] < 30)
+
+    def test_rate_limit_answers_429(self):
+        metrics = TDMetrics()
+        with MockTDServer(rate_limit=20, burst=3) as server:
+            query = self._query(server, max_retries=0, metrics=metrics)
+            results = []
+            for _ in range(5):
+                try:
+                    results.append(bool(query.get_quote("AAPL")))
+                except Exception:
+                    results.append(False)
+            self.assertEqual(results, [True, True, True, False, False])
+            time.sleep(0.1)  # 補回兩個額度
+            self.assertTrue(query.get_quote("AAPL"))
+        self.assertEqual(metrics.snapshot()["GET /v1/marketdata/{symbol}/quotes"]["throttles"], 2)
+
+    def test_latency(self):
+        with MockTDServer(latency=0.05) as server:
+            query = self._query(server, max_retries=0)
+            started = time.perf_counter()
+            query.get_quote("AAPL")
+            self.assertGreaterEqual(time.perf_counter() - started, 0.05)
+
+    def test_expired_token_is_refreshed_through_oauth(self):
+        with tempfile.TemporaryDirectory() as tmp, MockTDServer(require_auth=True) as server:
+            transport = TDTransport(max_retries=0)
+            self.addCleanup(transport.close)
+            auth = TDAAuthentication("CLIENT", "https://localhost", transport=transport,
+                                     token_store=JsonTokenStore(os.path.join(tmp, "tokens.json")))
+            server.attach(auth)
+            auth.get_tokens("code")
+            watchlist = TDWatchlist(auth.credentials, transport=transport)
+            server.attach(watchlist)
+            self.assertEqual(len(watchlist.get_all_watchlists()), 1)
+
+            server.expire_access_tokens()
+            self.assertEqual(len(watchlist.get_all_watchlists()), 1)
+            self.assertEqual(server.injected["unauthorized"], 1)
+            self.assertEqual(auth.credentials.refreshes, 1)
+            self.assertEqual(watchlist.access_token, "access-2")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from Tda.TDAccountsAndTrading import TDAccountsAndTrading
+from Tda.TDDataQuery import TDDataQuery
+from Tda.TDModels import LazyModels, Order, Quote, loads, option_contracts, orders_from_account
+from Tda.TDTransport import TDTransport
+from Tda.tests.helpers import LocalAPIServer
+
+QUOTES = {
+    "AAPL": {"symbol": "AAPL", "assetType": "EQUITY", "bidPrice": 189.5, "askPrice": 189.7, "lastPrice": 189.6,
+             "totalVolume": 1000, "52WkHigh": 199.6, "unusedField": "x"},
+    "MSFT": {"symbol": "MSFT", "assetType": "EQUITY", "bidPrice": 330.0, "askPrice": 330.4, "lastPrice": 330.2},
+}
+CHAIN = {
+    "symbol": "AAPL",
+    "callExpDateMap": {"2023-12-15:30": {"190.0": [{"symbol": "AAPL_121523C190", "putCall": "CALL", "delta": 0.45,
+                                                      "strikePrice": 190.0, "bid": 3.1, "ask": 3.2}]}},
+    "putExpDateMap": {"2023-12-15:30": {"190.0": [{"symbol": "AAPL_121523P190", "putCall": "PUT", "delta": -0.55,
+                                                     "strikePrice": 190.0, "bid": 3.5, "ask": 3.7}]}},
+}
+ACCOUNT = {"securitiesAccount": {
+    "accountId": "1",
+    "positions": [{"longQuantity": 10.0, "shortQuantity": 0.0, "averagePrice": 150.0,
+                   "instrument": {"symbol": "AAPL", "assetType": "EQUITY", "cusip": "037833100"}}],
+    "orderStrategies": [{"orderId": 42, "status": "WORKING", "orderType": "LIMIT", "price": 180.0, "quantity": 5,
+                         "orderLegCollection": [{"instruction": "BUY", "instrument": {"symbol": "AAPL"}}]}],
+}}
+
+
+class TestTDModels(unittest.TestCase):
+
+    def test_quote_copies_only_declared_fields(self):
+        quote = Quote.from_json(QUOTES["AAPL"])
+        self.assertEqual(quote.symbol, "AAPL")
+        self.assertEqual(quote.high_52_week, 199.6)
+        self.assertIsNone(quote.mark)
+        self.assertAlmostEqual(quote.mid, 189.6)
+        self.assertFalse(hasattr(quote, "__dict__"))
+        with self.assertRaises(AttributeError):
+            quote.unused_field = 1
+
+    def test_lazy_models_build_on_access(self):
+        quotes = LazyModels(QUOTES, Quote)
+        self.assertEqual(len(quotes), 2)
+        self.assertIn("MSFT", quotes)
+        self.assertEqual(quotes._models, {})
+        self.assertEqual(quotes["MSFT"].last_price, 330.2)
+        self.assertIs(quotes["MSFT"], quotes["MSFT"])
+        self.assertEqual(sorted(quotes), ["AAPL", "MSFT"])
+
+    def test_nested_paths(self):
+        order = orders_from_account(ACCOUNT)[0]
+        self.assertEqual((order.order_id, order.symbol, order.instruction), (42, "AAPL", "BUY"))
+        self.assertIsNone(Order.from_json({"orderId": 1}).symbol)
+        contracts = option_contracts(CHAIN)
+        self.assertEqual([c.put_call for c in contracts], ["CALL", "PUT"])
+        self.assertEqual(contracts[1].delta, -0.55)
+
+    def test_loads_accepts_bytes(self):
+        self.assertEqual(loads(b'{"a": [1, 2.5]}'), {"a": [1, 2.5]})
+
+
+class TestTypedClients(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalAPIServer({
+            ("GET", r"/v1/marketdata/quotes"): lambda req: (200, QUOTES),
+            ("GET", r"/v1/marketdata/(\w+)/quotes"): lambda req, symbol: (200, {symbol: QUOTES[symbol]}),
+            ("GET", r"/v1/marketdata/chains"): lambda req: (200, CHAIN),
+            ("GET", r"/v1/marketdata/(\w+)/pricehistory"): lambda req, symbol: (200, {"symbol": symbol, "candles": [
+                {"datetime": 1, "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "volume": 100}]}),
+            ("GET", r"/v1/accounts/1"): lambda req: (200, ACCOUNT),
+        }).start()
+        self.transport = TDTransport(max_retries=0)
+        self.query = TDDataQuery("token", "CLIENT", transport=self.transport)
+        self.query.BASE_URL = f"{self.server.url}/v1"
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def test_typed_market_data(self):
+        self.assertEqual(self.query.get_quote("AAPL", typed=True).ask_price, 189.7)
+        self.assertIsInstance(self.query.get_quotes(["AAPL", "MSFT"], typed=True), LazyModels)
+        self.assertEqual(self.query.get_quotes_bulk(["AAPL", "MSFT"], typed=True)["AAPL"].bid_price, 189.5)
+        self.assertEqual(self.query.get_price_history("AAPL", typed=True)[0].close, 1.5)
+        self.assertEqual(len(self.query.get_option_chain("AAPL", typed=True)), 2)
+        # 預設仍回傳原本的 dict
+        self.assertEqual(self.query.get_quotes(["AAPL"]), QUOTES)
+
+    def test_typed_positions(self):
+        trading = TDAccountsAndTrading("token", transport=self.transport)
+        trading.base_url = f"{self.server.url}/v1"
+        position = trading.get_positions("1", typed=True)[0]
+        self.assertEqual((position.symbol, position.quantity), ("AAPL", 10.0))
+        self.assertEqual(trading.get_positions("1"), ACCOUNT["securitiesAccount"]["positions"])
+        self.assertEqual(self.server.requests[-1].query, {"fields": "positions"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import time
+import unittest
+from unittest import mock
+from Tda import TDOptionChain as chain_module
+from Tda.TDDataQuery import TDDataQuery
+from Tda.TDOptionChain import TDOptionChain
+from Tda.TDTransport import TDTransport
+from Tda.tests.helpers import LocalAPIServer
+
+NOW = int(time.time() * 1000)
+EXPIRY = NOW + 30 * 24 * 60 * 60 * 1000
+SPOT, RATE, VOL = 100.0, 0.05, 0.25
+
+
+def make_chain(symbol="XYZ"):
+    """A chain whose prices and Greeks come from Black-Scholes at 25% volatility."""
+    sides = {"callExpDateMap": {}, "putExpDateMap": {}}
+    for strike in (80.0, 90.0, 100.0, 110.0, 120.0):
+        for side, put_call in (("callExpDateMap", "CALL"), ("putExpDateMap", "PUT")):
+            g = chain_module._bsm(put_call == "CALL", SPOT, strike, 30 / 365, RATE, 0.0, VOL, False)
+            contract = {"symbol": f"{symbol}_{put_call[0]}{strike:g}", "putCall": put_call, "strikePrice": strike,
+                        "bid": g["price"] - 0.01, "ask": g["price"] + 0.01, "mark": g["price"], "last": g["price"],
+                        "volatility": VOL * 100, "delta": g["delta"], "gamma": g["gamma"], "theta": g["theta"],
+                        "vega": g["vega"], "rho": g["rho"], "expirationDate": EXPIRY, "daysToExpiration": 30,
+                        "openInterest": strike * 10, "totalVolume": strike, "multiplier": 100.0}
+            sides[side].setdefault("2024-01-19:30", {})[str(strike)] = [contract]
+    return {"symbol": symbol, "underlyingPrice": SPOT, "interestRate": RATE * 100, **sides}
+
+
+class TestTDOptionChain(unittest.TestCase):
+
+    def setUp(self):
+        self.chain = TDOptionChain.from_chain(make_chain())
+
+    def test_flatten(self):
+        self.assertEqual(len(self.chain), 10)
+        self.assertEqual(self.chain.symbol[0], "XYZ_C80")
+        self.assertEqual(self.chain[5]["put_call"], "PUT")
+        self.assertAlmostEqual(self.chain.interest_rate, RATE)
+        self.assertEqual(self.chain.expirations(), [EXPIRY])
+        self.assertAlmostEqual(self.chain.spread[0], 0.02)
+
+    def test_filters(self):
+        puts = self.chain.filter(put_call="PUT", min_strike=90, max_strike=110)
+        self.assertEqual(list(puts.symbol), ["XYZ_P90", "XYZ_P100", "XYZ_P110"])
+        self.assertEqual(len(self.chain.filter(min_delta=0.3, max_delta=0.7)), 2)
+        self.assertEqual(len(self.chain.filter(min_open_interest=1000)), 6)
+        self.assertEqual(list(self.chain.near_the_money(1).symbol), ["XYZ_C100", "XYZ_P100"])
+
+    def test_greeks_and_implied_volatility(self):
+        greeks = self.chain.greeks(as_of=NOW)
+        for i in range(len(self.chain)):
+            self.assertAlmostEqual(greeks["delta"][i], self.chain.delta[i], places=5)
+            self.assertAlmostEqual(greeks["vega"][i], self.chain.vega[i], places=5)
+        iv = self.chain.implied_volatility(price=self.chain.mark, as_of=NOW)
+        for value in iv:
+            self.assertAlmostEqual(value, VOL * 100, places=2)
+        # 低於內含價值的價格沒有隱含波動率
+        below = [0.0] * len(self.chain)
+        self.assertTrue(all(value != value for value in self.chain.implied_volatility(price=below, as_of=NOW)))
+
+    def test_pure_python_fallback(self):
+        if chain_module.np is None:
+            self.skipTest("numpy is not installed")
+        vectorized = self.chain.implied_volatility(as_of=NOW)
+        with mock.patch.object(chain_module, "np", None):
+            chain = TDOptionChain.from_chain(make_chain())
+            self.assertEqual(len(chain.filter(put_call="CALL", min_strike=100)), 3)
+            fallback = chain.implied_volatility(as_of=NOW)
+        for a, b in zip(vectorized, fallback):
+            self.assertAlmostEqual(a, b, places=3)
+
+
+class TestOptionChainFetch(unittest.TestCase):
+
+    def test_get_option_chains(self):
+        def chains(request):
+            if request.query["symbol"] == "BAD":
+                return 500, {"error": "boom"}
+            return 200, make_chain(request.query["symbol"])
+
+        with LocalAPIServer({("GET", r"/v1/marketdata/chains"): chains}) as server:
+            transport = TDTransport(max_retries=0)
+            query = TDDataQuery("token", "CLIENT", transport=transport)
+            query.BASE_URL = f"{server.url}/v1"
+            results = query.get_option_chains(["AAA", "BBB", "BAD"], columnar=True, strikeCount=5)
+            transport.close()
+        self.assertEqual(results["AAA"].symbol[0], "AAA_C80")
+        self.assertEqual(len(results["BBB"]), 10)
+        self.assertIsInstance(results["BAD"], Exception)
+        self.assertEqual(server.requests[0].query["strikeCount"], "5")
+
+
+if __name__ == '__main__':
+    unittest.main()
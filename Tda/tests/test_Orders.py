@@ -0,0 +1,233 @@
+import json
+import unittest
+from Tda.AsyncTDAccountsAndTrading import AsyncTDAccountsAndTrading
+from Tda.TDAccountsAndTrading import TDAccountsAndTrading, cancelable_orders, order_id_from_location
+from Tda.TDAsyncTransport import TDAsyncTransport
+from Tda.TDMetrics import LatencyHistogram, TDMetrics
+from Tda.TDOrderTemplate import OrderTemplate, Slot, equity_order, option_order, serialize_order, validate_order
+from Tda.TDTransport import TDTransport
+from Tda.tests.helpers import FakeOrderServer, LocalAPIServer
+
+
+class TestOrderTemplate(unittest.TestCase):
+
+    def test_render_fills_slots(self):
+        template = equity_order("BUY")
+        self.assertEqual(template.slot_names, ["price", "quantity", "symbol"])
+        body = json.loads(template.render(symbol="AAPL", quantity=10.0, price=189.123456))
+        self.assertEqual(body["price"], 189.1235)
+        self.assertEqual(body["orderLegCollection"][0]["quantity"], 10)
+        self.assertEqual(body["orderLegCollection"][0]["instrument"], {"symbol": "AAPL", "assetType": "EQUITY"})
+        self.assertNotIn("stopPrice", body)
+        self.assertIn("stopPrice", option_order("SELL_TO_CLOSE", order_type="STOP").slot_names)
+
+    def test_render_rejects_bad_values(self):
+        template = equity_order("SELL", order_type="MARKET")
+        for values in ({"symbol": "AAPL"}, {"symbol": "AAPL", "quantity": 0}, {"symbol": "", "quantity": 1},
+                       {"symbol": "AAPL", "quantity": float("nan")}, {"symbol": "AAPL", "quantity": True}):
+            with self.assertRaises(ValueError):
+                template.render(**values)
+
+    def test_validation(self):
+        order = dict(equity_order("BUY").order)
+        del order["price"]
+        with self.assertRaisesRegex(ValueError, "needs a price"):
+            validate_order(order)
+        with self.assertRaisesRegex(ValueError, "Invalid instruction"):
+            OrderTemplate({"orderType": "MARKET", "session": "NORMAL", "duration": "DAY",
+                           "orderStrategyType": "SINGLE",
+                           "orderLegCollection": [{"instruction": "HOLD", "quantity": 1,
+                                                   "instrument": {"symbol": "AAPL", "assetType": "EQUITY"}}]})
+        with self.assertRaisesRegex(ValueError, "two different kinds"):
+            OrderTemplate({"orderType": "LIMIT", "session": "NORMAL", "duration": "DAY", "price": Slot("x", "price"),
+                           "orderStrategyType": "SINGLE",
+                           "orderLegCollection": [{"instruction": "BUY", "quantity": Slot("x", "quantity"),
+                                                   "instrument": {"symbol": "AAPL", "assetType": "EQUITY"}}]})
+        self.assertEqual(serialize_order(b'{"raw": true}'), b'{"raw": true}')
+
+    def test_latency_histogram(self):
+        histogram = LatencyHistogram()
+        self.assertIsNone(histogram.percentile(50))
+        for ms in range(1, 101):
+            histogram.record(ms / 1000)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["count"], 100)
+        self.assertAlmostEqual(snapshot["mean"], 0.0505)
+        # 桶的寬度為 sqrt(2) 倍，估計值落在真實值的一個桶內
+        self.assertTrue(0.05 <= snapshot["p50"] <= 0.05 * 1.5)
+        self.assertTrue(0.099 <= snapshot["p99"] <= 0.1)
+
+    def test_order_id_from_location(self):
+        self.assertEqual(order_id_from_location("https://api.tdameritrade.com/v1/accounts/1/orders/42"), 42)
+        self.assertIsNone(order_id_from_location(None))
+
+
+class TestOrderCalls(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeOrderServer().start()
+        self.transport = TDTransport(max_retries=0)
+        self.order_transport = TDTransport(pool_maxsize=1, max_retries=0)
+        self.trading = TDAccountsAndTrading("token", transport=self.transport, order_transport=self.order_transport)
+        self.trading.base_url = f"{self.server.url}/v1"
+        self.template = equity_order("BUY")
+
+    def tearDown(self):
+        self.transport.close()
+        self.order_transport.close()
+        self.server.stop()
+
+    def test_order_lifecycle(self):
+        order_id = self.trading.place_order("1", self.template, symbol="AAPL", quantity=5, price=180.0)
+        self.assertEqual(self.server.orders[order_id]["price"], 180.0)
+        self.assertEqual(self.trading.get_order("1", order_id, typed=True).status, "WORKING")
+
+        new_id = self.trading.replace_order("1", order_id, self.template, symbol="AAPL", quantity=5, price=181.5)
+        self.assertNotEqual(new_id, order_id)
+        self.assertEqual(self.server.orders[order_id]["status"], "REPLACED")
+        working = self.trading.get_orders("1", status="WORKING", typed=True)
+        self.assertEqual([(o.order_id, o.price) for o in working], [(new_id, 181.5)])
+
+        self.assertIsNone(self.trading.cancel_order("1", new_id))
+        with self.assertRaisesRegex(Exception, "API Error: Order .* is CANCELED"):
+            self.trading.cancel_order("1", new_id)
+
+        latency = self.trading.order_latency_snapshot()
+        self.assertEqual(latency["place_order"]["count"], 1)
+        self.assertEqual(latency["cancel_order"]["count"], 2)
+        self.assertEqual(self.transport.stats.snapshot()["requests"], 0)
+        # 所有下單流量共用同一條 keep-alive 連線
+        stats = self.order_transport.stats.snapshot()
+        self.assertEqual((stats["requests"], stats["pool_misses"]), (6, 1))
+
+    def test_plain_dict_orders_are_validated(self):
+        order = {"orderType": "MARKET", "session": "NORMAL", "duration": "DAY", "orderStrategyType": "SINGLE",
+                 "orderLegCollection": [{"instruction": "SELL", "quantity": 1,
+                                         "instrument": {"symbol": "MSFT", "assetType": "EQUITY"}}]}
+        order_id = self.trading.place_order("1", order)
+        self.assertEqual(self.server.orders[order_id]["orderType"], "MARKET")
+        with self.assertRaises(ValueError):
+            self.trading.place_order("1", dict(order, duration="FOREVER"))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_orders_do_not_use_the_retrying_transport(self):
+        # 不重試的 transport 直接沿用
+        self.assertIs(TDAccountsAndTrading("token", transport=self.transport).order_transport, self.transport)
+        metrics = TDMetrics()
+        with TDTransport(max_retries=3, timeout=5, metrics=metrics) as retrying:
+            order_transport = TDAccountsAndTrading("token", transport=retrying).order_transport
+            self.assertIsNot(order_transport, retrying)
+            self.assertIs(retrying.for_orders(), order_transport)
+            self.assertEqual((order_transport.max_retries, order_transport.timeout), (0, 5))
+            self.assertIs(order_transport.metrics, metrics)
+            capture = object()
+            retrying.capture = capture
+            self.assertIs(order_transport.capture, capture)
+        self.assertIs(TDTransport.orders(), TDTransport.default().for_orders())
+
+
+class TestBulkOrders(unittest.TestCase):
+    LATENCY = 0.1
+
+    def setUp(self):
+        self.server = FakeOrderServer().start()
+        self.transport = TDTransport(pool_maxsize=16, max_retries=0)
+        self.trading = TDAccountsAndTrading("token", transport=self.transport, order_transport=self.transport)
+        self.trading.base_url = f"{self.server.url}/v1"
+        self.template = equity_order("BUY")
+        self.ids = {}
+        for symbol, count in (("AAPL", 6), ("MSFT", 4)):
+            self.ids[symbol] = [self.trading.place_order("1", self.template, symbol=symbol, quantity=1, price=10.0 + i)
+                                for i in range(count)]
+        self.server.latency = self.LATENCY
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def test_cancel_by_symbol_runs_concurrently(self):
+        self.server.fill(self.ids["AAPL"][0])
+        result = self.trading.cancel_orders_by_symbol("1", "AAPL")
+        self.assertEqual(sorted(result.succeeded), self.ids["AAPL"][1:])
+        self.assertEqual(result.errors, {})
+        # 5 筆取消約一個來回的時間，而不是 5 個
+        self.assertLess(result.elapsed, self.LATENCY * 3)
+        self.assertEqual(len(result.latencies), 5)
+        remaining = self.trading.cancel_all_orders("1")
+        self.assertEqual(sorted(remaining), self.ids["MSFT"])
+
+    def test_per_order_outcomes(self):
+        filled = self.ids["MSFT"][0]
+        self.server.fill(filled)
+        result = self.trading.cancel_orders("1", [filled, self.ids["MSFT"][1], 999])
+        self.assertEqual(result.succeeded, [self.ids["MSFT"][1]])
+        self.assertEqual(set(result.errors), {filled, 999})
+
+        replacements = {order_id: (self.template, {"symbol": "AAPL", "quantity": 2, "price": 20.0})
+                        for order_id in self.ids["AAPL"][:3]}
+        replacements[filled] = (self.template, {"symbol": "MSFT", "quantity": 2, "price": 20.0})
+        result = self.trading.replace_orders("1", replacements)
+        self.assertEqual(set(result.errors), {filled})
+        for old_id in self.ids["AAPL"][:3]:
+            self.assertEqual(self.server.orders[result[old_id]]["price"], 20.0)
+        self.assertLess(result.elapsed, self.LATENCY * 3)
+
+    def test_cancelable_orders_walks_child_orders(self):
+        leg = lambda symbol: [{"instruction": "SELL", "instrument": {"symbol": symbol}}]
+        orders = [
+            {"orderId": 1, "cancelable": True, "orderLegCollection": leg("AAPL"),
+             "childOrderStrategies": [{"orderId": 2, "cancelable": True, "orderLegCollection": leg("AAPL")}]},
+            {"orderId": 3, "cancelable": False, "orderLegCollection": leg("MSFT"),
+             "childOrderStrategies": [{"orderId": 4, "cancelable": True, "orderStrategyType": "OCO",
+                                       "childOrderStrategies": [
+                                           {"orderId": 5, "cancelable": True, "orderLegCollection": leg("MSFT")},
+                                           {"orderId": 6, "cancelable": True, "orderLegCollection": leg("MSFT")}]}]},
+        ]
+        self.assertEqual(cancelable_orders(orders), [1, 4])
+        self.assertEqual(cancelable_orders(orders, "MSFT"), [4])
+        self.assertEqual(cancelable_orders(orders, "TSLA"), [])
+
+
+class TestAsyncOrderCalls(unittest.IsolatedAsyncioTestCase):
+
+    async def test_async_order_lifecycle(self):
+        with FakeOrderServer() as server:
+            transport = TDAsyncTransport(max_retries=0)
+            trading = AsyncTDAccountsAndTrading("token", transport=transport)
+            trading.base_url = f"{server.url}/v1"
+            try:
+                order_id = await trading.place_order("1", equity_order("BUY"), symbol="AAPL", quantity=1, price=1.5)
+                new_id = await trading.replace_order("1", order_id, equity_order("BUY"), symbol="AAPL", quantity=1,
+                                                     price=1.6)
+                self.assertEqual((await trading.get_order("1", new_id))["price"], 1.6)
+                await trading.cancel_order("1", new_id)
+                self.assertEqual([o["status"] for o in await trading.get_orders("1")], ["REPLACED", "CANCELED"])
+
+                ids = [await trading.place_order("1", equity_order("BUY"), symbol=s, quantity=1, price=1.0)
+                       for s in ("AAPL", "AAPL", "MSFT")]
+                result = await trading.cancel_orders_by_symbol("1", "AAPL")
+                self.assertEqual(sorted(result.succeeded), ids[:2])
+                result = await trading.cancel_orders("1", ids)
+                self.assertEqual(set(result.errors), set(ids[:2]))
+            finally:
+                await transport.close()
+
+    async def test_async_order_calls_are_not_retried(self):
+        with LocalAPIServer({("PUT", r"/v1/accounts/1/orders/(\d+)"): lambda req, order_id: (503, {"error": "down"}),
+                             ("GET", r"/v1/accounts/1"): lambda req: (503, {"error": "down"})}) as server:
+            transport = TDAsyncTransport(max_retries=2, backoff_factor=0)
+            trading = AsyncTDAccountsAndTrading("token", transport=transport)
+            trading.base_url = f"{server.url}/v1"
+            try:
+                with self.assertRaisesRegex(Exception, "API Error: down"):
+                    await trading.replace_order("1", 7, equity_order("BUY"), symbol="AAPL", quantity=1, price=1.0)
+                self.assertEqual(len(server.requests), 1)
+                with self.assertRaises(Exception):
+                    await trading.get_account("1")  # 查詢仍會重試
+                self.assertEqual(len(server.requests), 4)
+            finally:
+                await transport.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+import unittest
+from Tda.AsyncTDAccountsAndTrading import AsyncTDAccountsAndTrading
+from Tda.AsyncTDDataQuery import AsyncTDDataQuery
+from Tda.TDRateLimiter import (TDRateLimiter, RateLimitTimeout,
+                               PRIORITY_ORDER, PRIORITY_ACCOUNT, PRIORITY_MARKET_DATA)
+from Tda.TDTransport import TDTransport
+from Tda.tests.helpers import LocalAPIServer
+
+
+class TestTDRateLimiter(unittest.TestCase):
+
+    def test_burst_then_refill_rate(self):
+        limiter = TDRateLimiter(requests_per_minute=600, burst=5)  # 10 個/秒
+        started = time.monotonic()
+        for _ in range(8):
+            limiter.acquire()
+        elapsed = time.monotonic() - started
+        self.assertGreaterEqual(elapsed, 0.25)
+        self.assertLess(elapsed, 1.0)
+
+    def test_orders_jump_ahead_of_market_data(self):
+        limiter = TDRateLimiter(requests_per_minute=1200, burst=1)  # 20 個/秒
+        limiter.throttled(retry_after=0.3)  # 先暫停，讓請求排隊
+        served = []
+
+        def worker(priority, name):
+            limiter.acquire(priority)
+            served.append(name)
+
+        threads = [threading.Thread(target=worker, args=(PRIORITY_MARKET_DATA, f"data{i}")) for i in range(3)]
+        threads.append(threading.Thread(target=worker, args=(PRIORITY_ORDER, "order")))
+        for t in threads:
+            t.start()
+            while limiter.queue_depth < len(served) + threads.index(t) + 1:
+                time.sleep(0.001)
+        self.assertEqual(limiter.stats()["queue_depth_by_priority"], {"order": 1, "account": 0, "market_data": 3})
+        for t in threads:
+            t.join()
+
+        self.assertEqual(served, ["order", "data0", "data1", "data2"])
+        stats = limiter.stats()
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertEqual(stats["priorities"]["order"]["acquired"], 1)
+        self.assertEqual(stats["priorities"]["market_data"]["acquired"], 3)
+        self.assertGreater(stats["priorities"]["market_data"]["max_wait"], 0.3)
+
+    def test_timeout_leaves_queue_clean(self):
+        limiter = TDRateLimiter(requests_per_minute=1, burst=1)
+        limiter.acquire(PRIORITY_ACCOUNT)
+        with self.assertRaises(RateLimitTimeout):
+            limiter.acquire(PRIORITY_ACCOUNT, timeout=0.05)
+        self.assertEqual(limiter.queue_depth, 0)
+
+    def test_async_acquire(self):
+        limiter = TDRateLimiter(requests_per_minute=1200, burst=2)
+
+        async def run():
+            return await asyncio.gather(*(limiter.acquire_async() for _ in range(4)))
+
+        waits = asyncio.run(run())
+        self.assertEqual(len(waits), 4)
+        self.assertGreater(max(waits), 0.04)
+
+    def test_throttle_pauses_callers(self):
+        limiter = TDRateLimiter(requests_per_minute=6000)
+        with LocalAPIServer({("GET", r"/limited"): lambda req: (429, {"error": "slow down"}, {"Retry-After": "0.2"})}) as server:
+            with TDTransport(max_retries=0, rate_limiter=limiter) as transport:
+                self.assertEqual(transport.get(f"{server.url}/limited").status_code, 429)
+                started = time.monotonic()
+                limiter.acquire()
+                self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        self.assertEqual(limiter.stats()["throttles"], 1)
+
+    def test_throttled_retries_go_through_the_limiter(self):
+        limiter = TDRateLimiter(requests_per_minute=6000)
+        statuses = [429, 429]
+
+        def limited(req):
+            status = statuses.pop(0) if statuses else 200
+            return status, {"status": status}, {"Retry-After": "0.1"}
+
+        with LocalAPIServer({("GET", r"/limited"): limited}) as server:
+            with TDTransport(rate_limiter=limiter) as transport:  # 預設的重試設定
+                started = time.monotonic()
+                self.assertEqual(transport.get(f"{server.url}/limited").status_code, 200)
+                self.assertGreaterEqual(time.monotonic() - started, 0.15)
+            self.assertEqual(len(server.requests), 3)
+        stats = limiter.stats()
+        self.assertEqual(stats["throttles"], 2)
+        self.assertEqual(stats["priorities"]["market_data"]["acquired"], 3)
+
+    def test_default_transport_uses_default_limiter(self):
+        self.assertIs(TDTransport.default().rate_limiter, TDRateLimiter.default())
+
+    def test_async_clients_use_default_limiter(self):
+        data = AsyncTDDataQuery("token", "CLIENT_ID")
+        trading = AsyncTDAccountsAndTrading("token")
+        self.assertIs(data.transport.rate_limiter, TDRateLimiter.default())
+        self.assertIs(trading.transport.rate_limiter, TDRateLimiter.default())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+from unittest import mock
+from Tda import TDCandles as candles_module
+from Tda import TDReplay as replay_module
+from Tda.TDCandles import TDCandles
+from Tda.TDReplay import SharedBars, SimulatedClock, TDReplay, TDReplayDataQuery
+
+MINUTE = 60 * 1000
+DAY = 24 * 60 * MINUTE
+START = 1696204800000  # 2023-10-02 00:00 UTC
+
+
+def make_bars(symbol, count, start=START, base=100.0):
+    closes = [base + (i % 17) - (i % 5) * 0.5 for i in range(count)]
+    return TDCandles.from_columns(
+        symbol, datetime=[start + i * MINUTE for i in range(count)], open=[c - 0.25 for c in closes],
+        high=[c + 1 for c in closes], low=[c - 1 for c in closes], close=closes, volume=[100.0] * count,
+    )
+
+
+class Recorder:
+    """Checks what the query shows at each bar and records the event order."""
+
+    def __init__(self):
+        self.events = []
+        self.leaks = 0
+
+    def on_bar(self, query, symbol, bar):
+        self.events.append((int(bar["datetime"]), symbol))
+        history = query.get_price_history(symbol, columnar=True, periodType="day", period=1)
+        quote = query.get_quote(symbol)[symbol]
+        if int(history.datetime[-1]) != bar["datetime"] or quote["lastPrice"] != bar["close"]:
+            self.leaks += 1
+
+    def result(self):
+        return self.leaks
+
+
+class SmaCross:
+    def __init__(self, fast=3, slow=8):
+        self.fast, self.slow = fast, slow
+        self.position, self.entry, self.pnl, self.trades = 0, 0.0, 0.0, 0
+
+    def on_bar(self, query, symbol, bar):
+        closes = query.get_price_history(symbol, columnar=True, periodType="day", period=1).close
+        if len(closes) < self.slow:
+            return
+        fast = sum(closes[-self.fast:]) / self.fast
+        slow = sum(closes[-self.slow:]) / self.slow
+        price = float(bar["close"])
+        if fast > slow and self.position == 0:
+            self.position, self.entry, self.trades = 1, price, self.trades + 1
+        elif fast < slow and self.position == 1:
+            self.position, self.pnl = 0, self.pnl + price - self.entry
+
+    def result(self):
+        return self.trades, round(self.pnl, 6)
+
+
+class Failing:
+    def on_bar(self, query, symbol, bar):
+        raise RuntimeError("boom")
+
+
+class TestTDReplayDataQuery(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = SimulatedClock(START + 2 * DAY)
+        self.query = TDReplayDataQuery({"AAPL": make_bars("AAPL", 3 * 24 * 60)}, clock=self.clock)
+
+    def test_only_closed_bars_are_visible(self):
+        self.clock.now_ms = START + 10 * MINUTE + 30 * 1000
+        history = self.query.get_price_history("AAPL")
+        self.assertEqual(len(history["candles"]), 10)
+        self.assertEqual(history["candles"][-1]["datetime"], START + 9 * MINUTE)
+        self.assertEqual(self.query.get_quotes(["AAPL", "MSFT"])["AAPL"]["quoteTimeInLong"], self.clock.now_ms)
+        self.assertNotIn("MSFT", self.query.get_quotes(["AAPL", "MSFT"]))
+        self.clock.now_ms = START
+        self.assertEqual(self.query.get_quotes("AAPL"), {})
+
+    def test_price_history_parameters(self):
+        self.assertEqual(len(self.query.get_price_history("AAPL", columnar=True)), 2 * 24 * 60)
+        self.assertEqual(len(self.query.get_price_history("AAPL", columnar=True, period=1)), 24 * 60)
+        window = self.query.get_price_history("AAPL", startDate=START + DAY, endDate=START + DAY + 9 * MINUTE)
+        self.assertEqual(len(window["candles"]), 10)
+        five = self.query.get_price_history("AAPL", columnar=True, period=1, frequency=5)
+        self.assertEqual(len(five), 24 * 60 // 5)
+        daily = self.query.get_price_history("AAPL", typed=True, periodType="month", frequencyType="daily")
+        self.assertEqual([c.datetime for c in daily], [START, START + DAY])
+        with self.assertRaises(ValueError):
+            self.query.get_price_history("AAPL", periodType="year", frequencyType="monthly")
+
+    def test_quote_aggregates_the_day(self):
+        quote = self.query.get_quote("AAPL", typed=True)
+        day = self.query.get_price_history("AAPL", columnar=True, startDate=START + DAY)
+        self.assertEqual(quote.open_price, day.open[0])
+        self.assertEqual(quote.high_price, max(day.high))
+        self.assertEqual(quote.total_volume, 100 * 24 * 60)
+        self.assertEqual(quote.close_price, self.query.get_price_history("AAPL", columnar=True).close[24 * 60 - 1])
+
+
+class TestTDReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.replay = TDReplay({"AAPL": make_bars("AAPL", 300), "MSFT": make_bars("MSFT", 200, START + MINUTE, 50.0),
+                                "SPY": make_bars("SPY", 250, base=400.0)})
+
+    def test_run_in_time_order_without_lookahead(self):
+        recorder = Recorder()
+        result = self.replay.run(recorder, ["AAPL", "MSFT"], end=START + 100 * MINUTE)
+        self.assertEqual(result.events, 100 + 99)
+        self.assertEqual(result.result, 0)
+        self.assertEqual(recorder.events[:3], [(START, "AAPL"), (START + MINUTE, "AAPL"), (START + MINUTE, "MSFT")])
+        self.assertEqual(recorder.events, sorted(recorder.events))
+        self.assertGreater(result.events_per_second, 0)
+
+    def test_parallel_matches_serial(self):
+        params = [{"fast": 3, "slow": 8}, {"fast": 5, "slow": 20}]
+        report = self.replay.run_parallel(SmaCross, params, groups=["AAPL", "MSFT", "SPY"], max_workers=2)
+        expected = [self.replay.run(SmaCross(**p), [symbol]).result for symbol in ("AAPL", "MSFT", "SPY") for p in params]
+        self.assertEqual([run.result for run in report], expected)
+        self.assertEqual([run.params for run in report], params * 3)
+        self.assertEqual(report.events, 2 * (300 + 200 + 250))
+        self.assertGreater(report.events_per_second, 0)
+        self.assertTrue(any(trades for trades, _ in expected))
+
+    def test_parallel_reports_failures(self):
+        report = self.replay.run_parallel(Failing, groups=[("AAPL", "MSFT")], max_workers=1)
+        self.assertEqual(len(report.errors), 1)
+        self.assertEqual(report[0].symbols, ("AAPL", "MSFT"))
+
+    def test_shared_bars_without_numpy(self):
+        with mock.patch.object(candles_module, "np", None), mock.patch.object(replay_module, "np", None):
+            bars = {"AAPL": make_bars("AAPL", 50), "MSFT": make_bars("MSFT", 0)}
+            shared = SharedBars.create(bars)
+            try:
+                attached = SharedBars.attach(shared.name, shared.layout)
+                candles = attached.candles("AAPL")
+                self.assertEqual(list(candles.close), list(bars["AAPL"].close))
+                self.assertEqual(len(attached.candles("MSFT")), 0)
+                result = TDReplay(attached.all_candles()).run(Recorder())
+                self.assertEqual((result.events, result.result), (50, 0))
+                del candles, result
+            finally:
+                shared.close()
+                shared.unlink()
+
+
+if __name__ == '__main__':
+    unittest.main()
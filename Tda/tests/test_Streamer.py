@@ -0,0 +1,139 @@
+import asyncio
+import json
+import unittest
+from aiohttp import web
+from Tda.TDStreamer import TDStreamer
+from Tda.TDTransport import TDTransport
+from Tda.TDUserSettings import TDUserSettings
+from Tda.tests.helpers import LocalAPIServer
+
+PRINCIPALS = {
+    "accounts": [{"accountId": "123", "company": "AMER", "segment": "AMER", "accountCdDomainId": "A000"}],
+    "streamerInfo": {
+        "streamerSocketUrl": "unused", "token": "tok", "tokenTimestamp": "2023-10-02T14:30:00+0000",
+        "userGroup": "ACCT", "accessLevel": "ACCT", "acl": "AK", "appId": "APP",
+    },
+    "streamerSubscriptionKeys": {"keys": [{"key": "acctkey"}]},
+}
+
+
+class StandInStreamer:
+    """A local stand-in for the TD Ameritrade streaming server."""
+
+    def __init__(self):
+        self.logins = 0
+        self.commands = []
+        self.sockets = []
+        app = web.Application()
+        app.router.add_get("/ws", self.handle)
+        self.runner = web.AppRunner(app)
+
+    async def start(self):
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"ws://127.0.0.1:{port}/ws"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def drop_all(self):
+        for ws in list(self.sockets):
+            await ws.close()
+
+    async def handle(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.sockets.append(ws)
+        async for message in ws:
+            for req in json.loads(message.data)["requests"]:
+                self.commands.append((req["service"], req["command"], req["parameters"].get("keys")))
+                if req["command"] == "LOGIN":
+                    self.logins += 1
+                    await ws.send_json({"response": [{"service": "ADMIN", "command": "LOGIN",
+                                                      "requestid": req["requestid"], "content": {"code": 0}}]})
+                elif req["command"] in ("SUBS", "ADD"):
+                    content = [{"key": key, "1": 10.0, "2": 10.5, "3": 10.25} for key in req["parameters"]["keys"].split(",")]
+                    await ws.send_json({"data": [{"service": req["service"], "timestamp": 1, "command": "SUBS",
+                                                  "content": content}]})
+        self.sockets.remove(ws)
+        return ws
+
+
+class TestTDStreamer(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.api = LocalAPIServer({("GET", r"/v1/userprincipals"): self.principals}).start()
+        self.user_settings = TDUserSettings("token", transport=TDTransport(max_retries=0))
+        self.user_settings.BASE_URL = f"{self.api.url}/v1"
+        self.server = StandInStreamer()
+        self.ws_url = await self.server.start()
+
+    def principals(self, request):
+        # 每次取得 principals 都換發新的帳戶活動 key
+        keys = {"keys": [{"key": f"acctkey{len(self.api.requests)}"}]}
+        return 200, dict(PRINCIPALS, streamerSubscriptionKeys=keys)
+
+    async def asyncTearDown(self):
+        await self.server.stop()
+        self.api.stop()
+
+    async def test_subscribe_and_iterate_quotes(self):
+        received = []
+        async with TDStreamer(self.user_settings, socket_url=self.ws_url) as streamer:
+            streamer.add_handler("QUOTE", received.append)
+            await streamer.subscribe_quotes(["aapl", "msft"])
+            message = await asyncio.wait_for(streamer.__anext__(), 2)
+            await streamer.unsubscribe_quotes(["msft"])
+
+        self.assertEqual(message["service"], "QUOTE")
+        self.assertEqual(message["content"][0], {"key": "AAPL", "bidPrice": 10.0, "askPrice": 10.5, "lastPrice": 10.25})
+        self.assertEqual(received, [message])
+        self.assertEqual(streamer.subscriptions["QUOTE"][0], ["AAPL"])
+        self.assertIn(("QUOTE", "UNSUBS", "MSFT"), self.server.commands)
+        self.assertEqual(self.api.requests[0].query["fields"], TDStreamer.PRINCIPAL_FIELDS)
+
+    async def test_reconnect_resubscribes(self):
+        async with TDStreamer(self.user_settings, socket_url=self.ws_url) as streamer:
+            await streamer.subscribe_chart_equity(["SPY"])
+            await streamer.subscribe_account_activity()
+            await asyncio.wait_for(streamer.__anext__(), 2)
+            await asyncio.wait_for(streamer.__anext__(), 2)
+
+            await self.server.drop_all()
+            replayed = [await asyncio.wait_for(streamer.__anext__(), 5) for _ in range(2)]
+
+        self.assertEqual(self.server.logins, 2)
+        self.assertEqual(streamer.reconnects, 1)
+        self.assertEqual(sorted(m["service"] for m in replayed), ["ACCT_ACTIVITY", "CHART_EQUITY"])
+        self.assertEqual(self.server.commands.count(("CHART_EQUITY", "SUBS", "SPY")), 2)
+        # 重新連線後以新的 key 訂閱帳戶活動
+        subscribed = [keys for service, command, keys in self.server.commands if service == "ACCT_ACTIVITY"]
+        self.assertEqual(subscribed, ["acctkey1", "acctkey2"])
+        self.assertEqual(streamer.subscriptions["ACCT_ACTIVITY"][0], ["acctkey2"])
+
+    async def test_coroutine_handlers_are_tracked(self):
+        finished = []
+
+        async def slow(message):
+            await asyncio.sleep(0.05)
+            finished.append(message)
+
+        async def failing(message):
+            raise ValueError("handler failed")
+
+        with self.assertLogs("Tda.TDStreamer", level="ERROR") as logs:
+            async with TDStreamer(self.user_settings, socket_url=self.ws_url) as streamer:
+                streamer.add_handler("QUOTE", slow)
+                streamer.add_handler("QUOTE", failing)
+                await streamer.subscribe_quotes(["AAPL"])
+                message = await asyncio.wait_for(streamer.__anext__(), 2)
+        # close() 等待進行中的 handler 完成
+        self.assertEqual(finished, [message])
+        self.assertEqual(streamer._callbacks, set())
+        self.assertIn("handler failed", "\n".join(logs.output))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,87 +1,74 @@
-import sys
-sys.path.append("D:/SRC/TD_LINETRADE")
-
 import unittest
-import os
-from datetime import datetime, timedelta
-from dotenv import load_dotenv
-from Tda.TDAAuthentication import TDAAuthentication
 from Tda.TDDataQuery import TDDataQuery
+from Tda.TDModels import OptionContract
+from Tda.TDTransport import TDTransport
+from Tda.tests.mock_td_server import MockTDServer, cusip
+
 
 class TestTDDataQuery(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        # Load environment variables from .env file
-        load_dotenv(os.path.join(os.path.dirname(__file__), '..', 'config', '.env'))
-
-        # Authenticate and get access token
-        CLIENT_ID = os.getenv("TDA_CLIENT_ID")
-        REDIRECT_URI = os.getenv("TDA_REDIRECT_URI")
-        TD_ACCOUNT_ID = os.getenv("TDA_ACCOUNT_ID")
-        TD_PASSWORD = os.getenv("TDA_PASSWORD")
-
-        auth = TDAAuthentication(CLIENT_ID, REDIRECT_URI)
-        
-        # Check if the access token is expired or about to expire
-        if auth.is_access_token_expired():
-            print("Refreshing access token...")
-            auth.refresh_access_token()
-        else:
-            print("Getting new tokens...")
-            auth_code = auth.get_authentication_code(TD_ACCOUNT_ID, TD_PASSWORD)
-            auth.get_tokens(auth_code)
+        # 離線執行：所有請求都送到本機的模擬 TD API
+        cls.server = MockTDServer().start()
+        cls.transport = TDTransport(max_retries=0)
+        cls.data_query = TDDataQuery("token", "CLIENT_ID", transport=cls.transport)
+        cls.server.attach(cls.data_query)
 
-        cls.access_token = auth.access_token
-
-        # Initialize TDDataQuery instance with access_token and client_id
-        cls.data_query = TDDataQuery(cls.access_token, CLIENT_ID)
+    @classmethod
+    def tearDownClass(cls):
+        cls.transport.close()
+        cls.server.stop()
 
     def test_search_instruments(self):
-        result = self.data_query.search_instruments(symbol="AAPL")
+        result = self.data_query.search_instruments(symbol="AAPL", projection="symbol-search")
         self.assertIsInstance(result, dict)  # 確保返回的是一個字典
-        self.assertIn('AAPL', result.get('symbols', {}))  # 檢查字典中的內容
+        self.assertIn('AAPL', result)  # 檢查字典中的內容
+        self.assertEqual(self.server.requests[-1].query["apikey"], "CLIENT_ID")
+        self.assertEqual(self.data_query.search_instruments("AAPL", "bogus"), {"error": "無效的'projection'值"})
 
     def test_get_instrument_by_cusip(self):
-        # Replace with a valid CUSIP for your test
-        cusip = "YOUR_VALID_CUSIP"
-        result = self.data_query.get_instrument_by_cusip(cusip)
-        self.assertIsInstance(result, dict)
+        result = self.data_query.get_instrument_by_cusip(cusip("MSFT"))
+        self.assertEqual(result[0]["symbol"], "MSFT")
 
     def test_get_market_hours(self):
-        markets = "EQUITY"
-        result = self.data_query.get_market_hours(markets)
-        self.assertIsInstance(result, dict)
+        result = self.data_query.get_market_hours("EQUITY,OPTION", date="2024-01-02")
+        self.assertEqual(set(result), {"equity", "option"})
+        self.assertTrue(result["equity"]["EQ"]["isOpen"])
 
     def test_get_market_hours_for_specific_market(self):
-        market = "EQUITY"
-        result = self.data_query.get_market_hours_for_specific_market(market)
-        self.assertIsInstance(result, dict)
+        result = self.data_query.get_market_hours_for_specific_market("EQUITY", date="2024-01-06")
+        self.assertFalse(result["equity"]["EQ"]["isOpen"])
 
     def test_get_movers_for_index(self):
-        index = "SPX.X"
-        result = self.data_query.get_movers_for_index(index)
-        self.assertIsInstance(result, dict)
+        result = self.data_query.get_movers_for_index("$SPX.X", direction="down")
+        self.assertTrue(all(mover["change"] < 0 for mover in result))
 
     def test_get_option_chain(self):
-        symbol = "AAPL"
-        result = self.data_query.get_option_chain(symbol)
-        self.assertIsInstance(result, dict)
+        result = self.data_query.get_option_chain("AAPL", strikeCount=6)
+        self.assertEqual(result["numberOfContracts"], 2 * 4 * 6)
+        contracts = self.data_query.get_option_chain("AAPL", typed=True, contractType="CALL", strikeCount=4)
+        self.assertEqual(len(contracts), 4 * 4)
+        self.assertTrue(all(isinstance(c, OptionContract) and c.put_call == "CALL" for c in contracts))
 
     def test_get_price_history(self):
-        symbol = "AAPL"
-        result = self.data_query.get_price_history(symbol)
-        self.assertIsInstance(result, dict)
+        result = self.data_query.get_price_history("AAPL", periodType="day", period=2, frequencyType="minute",
+                                                   frequency=5)
+        self.assertEqual(len(result["candles"]), 2 * 390 // 5)
+        self.assertEqual(result, self.data_query.get_price_history("AAPL", periodType="day", period=2,
+                                                                   frequencyType="minute", frequency=5,
+                                                                   endDate=result["candles"][-1]["datetime"]))
 
     def test_get_quotes(self):
-        symbols = ["AAPL", "MSFT"]
-        result = self.data_query.get_quotes(symbols)
-        self.assertIsInstance(result, dict)
+        result = self.data_query.get_quotes(["AAPL", "MSFT"])
+        self.assertEqual(set(result), {"AAPL", "MSFT"})
+        self.assertEqual(self.server.requests[-1].query["symbol"], "AAPL,MSFT")
 
     def test_get_quote(self):
-        symbol = "AAPL"
-        result = self.data_query.get_quote(symbol)
-        self.assertIsInstance(result, dict)
+        quote = self.data_query.get_quote("AAPL", typed=True)
+        self.assertEqual(quote.symbol, "AAPL")
+        self.assertLess(quote.bid_price, quote.ask_price)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,85 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from Tda.TDTokenStore import EnvTokenStore, JsonTokenStore, EPOCH
+
+ENV_TEMPLATE = """CLIENT_ID=abc
+REDIRECT_URI=https://localhost
+TDA_ACCESS_TOKEN=old
+TDA_REFRESH_TOKEN=None
+TDA_ACCESS_TOKEN_EXPIRY=2023-01-01T00:00:00
+"""
+
+
+def increment_counter(path, times):
+    """Read-modify-write the refresh token as a counter, as a peer process would."""
+    store = JsonTokenStore(path)
+    for _ in range(times):
+        with store.lock():
+            tokens = store.load()
+            tokens["refresh_token"] = str(int(tokens["refresh_token"] or 0) + 1)
+            store.save(tokens)
+
+
+class TestTDTokenStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env_path = os.path.join(self.tmp.name, ".env")
+        with open(self.env_path, "w") as f:
+            f.write(ENV_TEMPLATE)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_env_round_trip_preserves_other_lines(self):
+        store = EnvTokenStore(self.env_path)
+        tokens = store.load()
+        self.assertEqual(tokens["access_token"], "old")
+        self.assertIsNone(tokens["refresh_token"])
+        self.assertEqual(tokens["refresh_token_expiry"], EPOCH)
+
+        expiry = datetime(2030, 1, 1, 12, 30)
+        store.save(dict(tokens, access_token="new", refresh_token="r1", refresh_token_expiry=expiry))
+        with open(self.env_path) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[:2], ["CLIENT_ID=abc", "REDIRECT_URI=https://localhost"])
+        self.assertIn("TDA_ACCESS_TOKEN=new", lines)
+        self.assertIn(f"TDA_REFRESH_TOKEN_EXPIRY={expiry.isoformat()}", lines)
+        self.assertEqual(EnvTokenStore(self.env_path).load()["refresh_token_expiry"], expiry)
+        # 不應殘留暫存檔
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), [".env", ".env.lock"])
+
+    def test_peer_write_invalidates_cache(self):
+        ours, peer = EnvTokenStore(self.env_path), EnvTokenStore(self.env_path)
+        ours.load()
+        self.assertFalse(ours.changed())
+        peer.save(dict(peer.load(), access_token="from-peer",
+                       access_token_expiry=datetime.now() + timedelta(minutes=30)))
+        self.assertTrue(ours.changed())
+        self.assertEqual(ours.load()["access_token"], "from-peer")
+        self.assertFalse(ours.changed())
+
+    def test_missing_file_loads_empty_and_save_creates_it(self):
+        path = os.path.join(self.tmp.name, "accounts", "123.json")
+        store = JsonTokenStore(path)
+        self.assertIsNone(store.load()["access_token"])
+        store.save({"access_token": "a"})
+        with open(path) as f:
+            self.assertEqual(json.load(f)["access_token"], "a")
+
+    def test_lock_serialises_processes(self):
+        path = os.path.join(self.tmp.name, "tokens.json")
+        workers = [multiprocessing.Process(target=increment_counter, args=(path, 25)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+        self.assertEqual(JsonTokenStore(path).load()["refresh_token"], "100")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date, timedelta
+from Tda.AsyncTDAccountsAndTrading import AsyncTDAccountsAndTrading
+from Tda.TDAccountsAndTrading import TDAccountsAndTrading, TransactionCheckpoint, transaction_windows
+from Tda.TDAsyncTransport import TDAsyncTransport
+from Tda.TDTransport import TDTransport
+from Tda.tests.helpers import LocalAPIServer
+
+
+class TestTransactionWindows(unittest.TestCase):
+
+    def test_windows_cover_range_without_overlap(self):
+        self.assertEqual(transaction_windows("2023-01-01", date(2023, 1, 25), window_days=10), [
+            ("2023-01-01", "2023-01-10"), ("2023-01-11", "2023-01-20"), ("2023-01-21", "2023-01-25")])
+        self.assertEqual(transaction_windows("2023-01-02", "2023-01-01"), [])
+
+
+class TestIterTransactions(unittest.TestCase):
+
+    def setUp(self):
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        self.server = LocalAPIServer({
+            ("GET", r"/v1/accounts/(\w+)/transactions"): self._transactions,
+        }).start()
+        self.transport = TDTransport(max_retries=0)
+        self.trading = TDAccountsAndTrading("token", transport=self.transport)
+        self.trading.base_url = f"{self.server.url}/v1"
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def _transactions(self, request, account_id):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(0.02)
+        with self.lock:
+            self.in_flight -= 1
+        # 每天一筆交易
+        day = date.fromisoformat(request.query["startDate"])
+        end = date.fromisoformat(request.query["endDate"])
+        result = []
+        while day <= end:
+            result.append({"transactionDate": day.isoformat(), "type": request.query.get("type")})
+            day += timedelta(days=1)
+        return 200, result
+
+    def test_yields_every_day_once_with_bounded_prefetch(self):
+        days = [t["transactionDate"] for t in self.trading.iter_transactions(
+            "1", "2023-01-01", "2023-03-31", type="TRADE", window_days=7, prefetch=3)]
+        self.assertEqual(len(days), 90)
+        self.assertEqual(days, sorted(set(days)))
+        self.assertEqual(len(self.server.requests), 13)
+        self.assertGreater(self.peak, 1)
+        self.assertLessEqual(self.peak, 3)
+
+    def test_checkpoint_resumes_after_last_complete_window(self):
+        path = os.path.join(self.tmp.name, "checkpoint.json")
+        iterator = self.trading.iter_transactions("1", "2023-01-01", "2023-01-31", window_days=10, checkpoint=path)
+        first = [next(iterator)["transactionDate"] for _ in range(15)]
+        iterator.close()
+        self.assertEqual(TransactionCheckpoint(path).load(TransactionCheckpoint.key("1")), "2023-01-10")
+
+        rest = [t["transactionDate"] for t in self.trading.iter_transactions(
+            "1", "2023-01-01", "2023-01-31", window_days=10, checkpoint=path)]
+        self.assertEqual(first[0], "2023-01-01")
+        self.assertEqual(rest[0], "2023-01-11")
+        self.assertEqual(rest[-1], "2023-01-31")
+        self.assertEqual(TransactionCheckpoint(path).load(TransactionCheckpoint.key("1")), "2023-01-31")
+
+    def test_window_reaching_today_is_not_checkpointed(self):
+        path = os.path.join(self.tmp.name, "checkpoint.json")
+        start = date.today() - timedelta(days=4)
+        list(self.trading.iter_transactions("1", start, window_days=3, checkpoint=path))
+        self.assertEqual(TransactionCheckpoint(path).load(TransactionCheckpoint.key("1")),
+                         (start + timedelta(days=2)).isoformat())
+
+
+class TestAsyncIterTransactions(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.server = LocalAPIServer({
+            ("GET", r"/v1/accounts/(\w+)/transactions"):
+                lambda req, account_id: (200, [{"transactionDate": req.query["startDate"]}]),
+        }).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    async def test_async_iterator_matches_windows(self):
+        async with AsyncTDAccountsAndTrading("token", transport=TDAsyncTransport()) as trading:
+            trading.base_url = f"{self.server.url}/v1"
+            starts = [t["transactionDate"] async for t in trading.iter_transactions(
+                "1", "2023-01-01", "2023-01-31", window_days=10)]
+        self.assertEqual(starts, ["2023-01-01", "2023-01-11", "2023-01-21", "2023-01-31"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from Tda.TDTransport import TDTransport
+from Tda.TDWatchlist import TDWatchlist
+from Tda.tests.helpers import LocalAPIServer
+
+
+class TestTDTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalAPIServer({
+            ("GET", r"/v1/accounts/watchlists"): lambda req: (200, [{"name": "core"}]),
+            ("GET", r"/flaky"): self._flaky,
+        }).start()
+        self.flaky_calls = 0
+        self.transport = TDTransport(pool_maxsize=2, max_retries=2, backoff_factor=0)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def _flaky(self, request):
+        self.flaky_calls += 1
+        if self.flaky_calls < 3:
+            return 503, {"error": "busy"}
+        return 200, {"ok": True}
+
+    def test_keep_alive_reuses_connection(self):
+        for _ in range(5):
+            response = self.transport.get(f"{self.server.url}/v1/accounts/watchlists")
+            self.assertEqual(response.status_code, 200)
+
+        stats = self.transport.stats.snapshot()
+        self.assertEqual(stats["requests"], 5)
+        self.assertEqual(stats["pool_misses"], 1)
+        self.assertEqual(stats["pool_hits"], 4)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_retries_with_backoff_on_server_errors(self):
+        response = self.transport.get(f"{self.server.url}/flaky")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.flaky_calls, 3)
+
+    def test_client_routes_through_transport(self):
+        watchlist = TDWatchlist("token", transport=self.transport)
+        watchlist.BASE_URL = f"{self.server.url}/v1"
+        self.assertEqual(watchlist.get_all_watchlists(), [{"name": "core"}])
+        self.assertEqual(self.server.requests[-1].headers["Authorization"], "Bearer token")
+        self.assertEqual(self.transport.stats.snapshot()["requests"], 1)
+
+    def test_default_is_shared(self):
+        self.assertIs(TDTransport.default(), TDTransport.default())
+        self.assertIs(TDWatchlist("token").transport, TDTransport.default())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,41 +1,40 @@
-import os
 import unittest
-from dotenv import load_dotenv
+from Tda.TDTransport import TDTransport
 from Tda.TDUserSettings import TDUserSettings
-from Tda.TDAAuthentication import TDAAuthentication
+from Tda.tests.mock_td_server import MockTDServer
 
-# 載入環境變數
-load_dotenv(os.path.join(os.path.dirname(__file__), '../config/.env'))
+ACCOUNT_ID = "635067306"
 
-class TestTDUserSettings(unittest.TestCase):
 
-    @classmethod
-    def setUpClass(cls):
-        cls.auth = TDAAuthentication(os.getenv('TDA_CLIENT_ID'), os.getenv('TDA_REDIRECT_URI'))
-        if cls.auth.is_access_token_expired():
-            cls.auth.refresh_access_token()
+class TestTDUserSettings(unittest.TestCase):
 
     def setUp(self):
-        self.access_token = os.getenv('TDA_ACCESS_TOKEN')
-        self.user_settings = TDUserSettings(self.access_token)
+        # 離線執行：所有請求都送到本機的模擬 TD API
+        self.server = MockTDServer(accounts=(ACCOUNT_ID,)).start()
+        self.transport = TDTransport(max_retries=0)
+        self.user_settings = TDUserSettings("token", transport=self.transport)
+        self.server.attach(self.user_settings)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
 
     def test_get_account_preferences(self):
-        account_id = os.getenv('TDA_ACCOUNT_ID')
-        response = self.user_settings.get_account_preferences(account_id)
+        response = self.user_settings.get_account_preferences(ACCOUNT_ID)
         self.assertIn('expressTrading', response)
 
     def test_get_user_principals(self):
         fields = "streamerSubscriptionKeys,streamerConnectionInfo"
         response = self.user_settings.get_user_principals(fields=fields)
         self.assertIn('streamerInfo', response)
+        self.assertIn('streamerSubscriptionKeys', response)
+        self.assertEqual(response['accounts'][0]['accountId'], ACCOUNT_ID)
 
     def test_get_streamer_subscription_keys(self):
         response = self.user_settings.get_streamer_subscription_keys()
         self.assertIn('keys', response)
 
-    # 注意: 這個測試會修改您的帳戶設定，請在運行前確認
     def test_update_account_preferences(self):
-        account_id = os.getenv('TDA_ACCOUNT_ID')
         preferences_data = {
             "expressTrading": False,
             "directOptionsRouting": False,
@@ -52,8 +51,9 @@ class TestTDUserSettings(unittest.TestCase):
             "defaultAdvancedToolLaunch": "NONE",  # 可選: 'TA', 'N', 'Y', 'TOS', 'NONE', 'CC2'
             "authTokenTimeout": "FIFTY_FIVE_MINUTES"  # 可選: 'FIFTY_FIVE_MINUTES', 'TWO_HOURS', 'FOUR_HOURS', 'EIGHT_HOURS'
         }
-        response = self.user_settings.update_account_preferences(account_id, preferences_data)
-        self.assertIn('expressTrading', response)
+        # TD 更新成功時回傳 204，沒有內容
+        self.assertIsNone(self.user_settings.update_account_preferences(ACCOUNT_ID, preferences_data))
+        self.assertEqual(self.user_settings.get_account_preferences(ACCOUNT_ID), preferences_data)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,161 @@
+import asyncio
+import copy
+import hashlib
+import json
+import unittest
+from Tda.TDTransport import TDTransport
+from Tda.TDWatchlist import TDWatchlist
+from Tda.TDWatchlistSync import TDWatchlistSync, WatchlistDiff, watchlist_patch
+from Tda.tests.helpers import LocalAPIServer
+from Tda.tests.mock_td_server import MockTDServer
+
+
+def item(sequence_id, symbol, quantity=0):
+    return {"sequenceId": sequence_id, "quantity": quantity,
+            "instrument": {"symbol": symbol, "assetType": "EQUITY"}}
+
+
+class FakeWatchlistServer(LocalAPIServer):
+    """All-watchlists endpoint with ETags, plus PUT/PATCH/DELETE that answer 204."""
+
+    def __init__(self, watchlists):
+        super().__init__()
+        self.watchlists = watchlists
+        self.route("GET", r"/v1/accounts/watchlists", self._list)
+        for method in ("PUT", "PATCH", "DELETE"):
+            self.route(method, r"/v1/accounts/(\w+)/watchlists/(\w+)", lambda req, *ids: (204, b""))
+
+    def _list(self, request):
+        etag = hashlib.sha1(json.dumps(self.watchlists).encode()).hexdigest()
+        if request.headers.get("If-None-Match") == etag:
+            return 304, b""
+        return 200, self.watchlists, {"ETag": etag}
+
+
+class TestWatchlistPatch(unittest.TestCase):
+    OLD = {"name": "Tech", "watchlistId": "1", "watchlistItems": [item(1, "AAPL"), item(2, "MSFT")]}
+
+    def test_minimal_patch(self):
+        new = copy.deepcopy(self.OLD)
+        new["watchlistItems"][1]["quantity"] = 5
+        new["watchlistItems"].append({"instrument": {"symbol": "NVDA", "assetType": "EQUITY"}})
+        method, body = watchlist_patch(self.OLD, new)
+        self.assertEqual(method, "PATCH")
+        self.assertEqual([i["instrument"]["symbol"] for i in body["watchlistItems"]], ["MSFT", "NVDA"])
+        self.assertNotIn("name", body)
+        self.assertEqual(watchlist_patch(self.OLD, copy.deepcopy(self.OLD)), (None, None))
+        self.assertEqual(watchlist_patch(self.OLD, dict(self.OLD, name="Big Tech"))[1],
+                         {"name": "Big Tech", "watchlistId": "1"})
+
+    def test_removal_needs_put(self):
+        new = dict(self.OLD, watchlistItems=[item(1, "AAPL")])
+        self.assertEqual(watchlist_patch(self.OLD, new)[0], "PUT")
+
+
+class FakeQuotes:
+    def __init__(self):
+        self.requested = []
+
+    def get_quotes_bulk(self, symbols):
+        self.requested.append(list(symbols))
+        return {symbol: {"symbol": symbol} for symbol in symbols}
+
+
+class FakeStreamer:
+    def __init__(self):
+        self.calls = []
+
+    async def subscribe_quotes(self, symbols):
+        self.calls.append(("SUBS", symbols))
+
+    async def unsubscribe_quotes(self, symbols):
+        self.calls.append(("UNSUBS", symbols))
+
+
+class TestTDWatchlistSync(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWatchlistServer([
+            {"accountId": "1", "watchlistId": "10", "name": "Tech", "watchlistItems": [item(1, "AAPL"), item(2, "MSFT")]},
+            {"accountId": "2", "watchlistId": "20", "name": "Mix", "watchlistItems": [item(1, "AAPL"), item(2, "SPY")]},
+        ]).start()
+        self.transport = TDTransport(max_retries=0)
+        client = TDWatchlist("token", transport=self.transport)
+        client.BASE_URL = f"{self.server.url}/v1"
+        self.added, self.removed = [], []
+        self.sync = TDWatchlistSync(client, on_added=self.added.extend, on_removed=self.removed.extend)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def test_diff_across_accounts(self):
+        diff = self.sync.sync()
+        self.assertEqual(diff.added, ["AAPL", "MSFT", "SPY"])
+        self.assertEqual(self.sync.sync(), WatchlistDiff([], [], []))
+        self.assertIsNotNone(self.server.requests[-1].headers.get("If-None-Match"))
+
+        # AAPL 仍在另一個帳戶的清單中，不算移除
+        self.server.watchlists[0]["watchlistItems"] = [item(2, "MSFT"), item(3, "QQQ")]
+        self.server.watchlists.pop(1)
+        diff = self.sync.sync()
+        self.assertEqual((diff.added, diff.removed), (["QQQ"], ["AAPL", "SPY"]))
+        self.assertEqual(diff.changed, [("1", "10"), ("2", "20")])
+        self.assertEqual(self.added, ["AAPL", "MSFT", "SPY", "QQQ"])
+        self.assertEqual(self.removed, ["AAPL", "SPY"])
+
+    def test_quotes_and_streamer_only_see_the_diff(self):
+        quotes = FakeQuotes()
+        streamer = FakeStreamer()
+        asyncio.run(self.sync.apply_to_streamer(streamer, self.sync.sync()))
+        self.sync.track_quotes(quotes)
+        self.server.watchlists[1]["watchlistItems"].append(item(3, "IWM"))
+        diff = self.sync.sync()
+        asyncio.run(self.sync.apply_to_streamer(streamer, diff))
+        self.assertEqual(quotes.requested, [["AAPL", "MSFT", "SPY"], ["IWM"]])
+        self.assertEqual(sorted(self.sync.quotes), ["AAPL", "IWM", "MSFT", "SPY"])
+        self.assertEqual(streamer.calls, [("SUBS", ["AAPL", "MSFT", "SPY"]), ("SUBS", ["IWM"])])
+
+    def test_update_sends_partial_patch(self):
+        self.sync.sync()
+        watchlist = copy.deepcopy(self.sync.get("1", "10"))
+        watchlist["watchlistItems"].append({"instrument": {"symbol": "AMD", "assetType": "EQUITY"}})
+        diff = self.sync.update_watchlist("1", "10", watchlist)
+        self.assertEqual(diff.added, ["AMD"])
+        request = self.server.requests[-1]
+        self.assertEqual(request.method, "PATCH")
+        self.assertEqual(request.json(), {"watchlistItems": [{"instrument": {"symbol": "AMD", "assetType": "EQUITY"}}],
+                                          "watchlistId": "10"})
+        watchlist["watchlistItems"] = watchlist["watchlistItems"][1:]
+        diff = self.sync.update_watchlist("1", "10", watchlist)
+        self.assertEqual((self.server.requests[-1].method, diff.removed), ("PUT", []))
+        self.assertEqual(self.sync.delete_watchlist("1", "10").removed, ["AMD", "MSFT"])
+
+
+class TestTDWatchlistSyncAgainstMock(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MockTDServer(accounts=("1",), symbols=("AAPL", "MSFT", "SPY")).start()
+        self.transport = TDTransport(max_retries=0)
+        client = TDWatchlist("token", transport=self.transport)
+        self.server.attach(client)
+        self.sync = TDWatchlistSync(client)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def test_removal_is_sent_as_put(self):
+        self.assertEqual(self.sync.sync().added, ["AAPL", "MSFT", "SPY"])
+        watchlist = copy.deepcopy(self.sync.get("1", "1"))
+        watchlist["watchlistItems"] = [i for i in watchlist["watchlistItems"] if i["instrument"]["symbol"] != "MSFT"]
+        diff = self.sync.update_watchlist("1", "1", watchlist)
+        self.assertEqual((self.server.requests[-1].method, diff.removed), ("PUT", ["MSFT"]))
+        stored = self.server.watchlists[("1", "1")]["watchlistItems"]
+        self.assertEqual([(i["sequenceId"], i["instrument"]["symbol"]) for i in stored], [(1, "AAPL"), (2, "SPY")])
+        self.assertEqual(self.sync.sync().removed, [])
+        self.assertEqual(self.sync.symbols, {"AAPL", "SPY"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+"""Measure throughput and tail latency of the REST clients against the local mock TD API.
+
+Usage:
+    python -m benchmarks.bench_api [--calls 500] [--concurrency 8] [--latency 0.005] [--jitter 0.002]
+                                   [--error-rate 0] [--rate-limit N] [--scenario quote ...]
+                                   [--json results.json] [--baseline previous.json]
+
+Each scenario repeats one call pattern of TDDataQuery, TDAccountsAndTrading,
+TDWatchlist or TDUserSettings ``--calls`` times from ``--concurrency``
+threads and reports calls/s and per-call p50/p90/p99 latency, plus the
+retries and 429s seen by the transport. The mock server is seeded, so runs
+with the same options are comparable; ``--json`` saves the results and
+``--baseline`` prints the change against an earlier run.
+"""
+import argparse
+import json
+import math
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from Tda.TDAccountsAndTrading import TDAccountsAndTrading
+from Tda.TDDataQuery import TDDataQuery
+from Tda.TDMetrics import TDMetrics
+from Tda.TDOrderTemplate import equity_order
+from Tda.TDTransport import TDTransport
+from Tda.TDUserSettings import TDUserSettings
+from Tda.TDWatchlist import TDWatchlist
+from Tda.tests.mock_td_server import DEFAULT_SYMBOLS, MockTDProcess, MockTDServer
+
+ACCOUNT_ID = "1"
+BUY = equity_order("BUY")
+
+
+class Clients:
+    def __init__(self, server, transport):
+        self.data = TDDataQuery("token", "CLIENT_ID", transport=transport)
+        self.trading = TDAccountsAndTrading("token", transport=transport, order_transport=transport)
+        self.watchlist = TDWatchlist("token", transport=transport)
+        self.settings = TDUserSettings("token", transport=transport)
+        server.attach(self.data, self.trading, self.watchlist, self.settings)
+
+
+def place_and_cancel(clients, i):
+    order_id = clients.trading.place_order(ACCOUNT_ID, BUY, symbol=DEFAULT_SYMBOLS[i % 10], quantity=1,
+                                           price=100.0 + i / 100)
+    clients.trading.cancel_order(ACCOUNT_ID, order_id)
+
+
+def watchlist_add(clients, i):
+    clients.watchlist.partial_update_watchlist(ACCOUNT_ID, "1", {"watchlistItems": [
+        {"instrument": {"symbol": f"T{i}", "assetType": "EQUITY"}}]})
+
+
+# 名稱 -> (說明, 呼叫)；每次呼叫是一個完整的使用模式，可能包含多個請求
+SCENARIOS = {
+    "quote": ("TDDataQuery.get_quote", lambda c, i: c.data.get_quote(DEFAULT_SYMBOLS[i % 10])),
+    "quotes_100": ("TDDataQuery.get_quotes, 100 symbols",
+                   lambda c, i: c.data.get_quotes([f"S{n}" for n in range(i, i + 100)])),
+    "price_history": ("TDDataQuery.get_price_history, 1 day of 1-minute bars",
+                      lambda c, i: c.data.get_price_history(DEFAULT_SYMBOLS[i % 10], periodType="day", period=1,
+                                                            frequencyType="minute", frequency=1)),
+    "option_chain": ("TDDataQuery.get_option_chain, 20 strikes",
+                     lambda c, i: c.data.get_option_chain(DEFAULT_SYMBOLS[i % 10], strikeCount=20)),
+    "account": ("TDAccountsAndTrading.get_account with positions and orders",
+                lambda c, i: c.trading.get_account(ACCOUNT_ID, fields="positions,orders")),
+    "orders": ("TDAccountsAndTrading.place_order + cancel_order", place_and_cancel),
+    "transactions": ("TDAccountsAndTrading.get_transactions, 30 days",
+                     lambda c, i: c.trading.get_transactions(ACCOUNT_ID, startDate="2024-01-01",
+                                                             endDate="2024-01-30")),
+    "watchlists": ("TDWatchlist.get_all_watchlists", lambda c, i: c.watchlist.get_all_watchlists()),
+    "watchlist_patch": ("TDWatchlist.partial_update_watchlist, one item", watchlist_add),
+    "principals": ("TDUserSettings.get_user_principals with streamer info",
+                   lambda c, i: c.settings.get_user_principals(fields="streamerSubscriptionKeys,streamerConnectionInfo")),
+    "preferences": ("TDUserSettings.get_account_preferences",
+                    lambda c, i: c.settings.get_account_preferences(ACCOUNT_ID)),
+}
+
+
+def latency_stats(samples):
+    """Exact nearest-rank percentiles of the per-call latencies (seconds).
+
+    TDMetrics' histogram buckets are sqrt(2) wide, too coarse to compare
+    runs, so the benchmark keeps every sample.
+    """
+    samples = sorted(samples)
+    if not samples:
+        return {"count": 0, "mean": None, "min": None, "max": None, "p50": None, "p90": None, "p99": None}
+
+    def percentile(p):
+        return samples[max(0, math.ceil(len(samples) * p / 100) - 1)]
+
+    return {"count": len(samples), "mean": sum(samples) / len(samples), "min": samples[0], "max": samples[-1],
+            "p50": percentile(50), "p90": percentile(90), "p99": percentile(99)}
+
+
+def run_scenario(clients, call, calls, concurrency, metrics):
+    latencies = []  # list.append 是執行緒安全的
+    errors = 0
+
+    def one(i):
+        started = time.perf_counter()
+        try:
+            call(clients, i)
+            return None
+        except Exception as e:
+            return e
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    metrics.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for error in executor.map(one, range(calls)):
+            errors += error is not None
+    elapsed = time.perf_counter() - started
+    endpoints = metrics.snapshot().values()
+    return {
+        "calls": calls,
+        "errors": errors,
+        "elapsed": elapsed,
+        "calls_per_second": calls / elapsed,
+        "requests": sum(e["requests"] for e in endpoints),
+        "retries": sum(e["retries"] for e in endpoints),
+        "throttles": sum(e["throttles"] for e in endpoints),
+        "latency": latency_stats(latencies),
+    }
+
+
+def ms(value):
+    return f"{value * 1000:8.2f}" if value is not None else "       -"
+
+
+def change(new, old):
+    return f"{(new - old) / old * 100:+6.1f}%" if old else "      -"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.005, help="mock server delay per request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.002, help="mean extra exponential delay (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None, help="mock server requests/second before 429")
+    parser.add_argument("--retries", type=int, default=3, help="transport max_retries")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--in-process", action="store_true", help="run the mock server in this process")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="repeatable; default all")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare with results written by an earlier --json run")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    config = {key: value for key, value in vars(args).items() if key not in ("json", "baseline")}
+    results = {}
+    metrics = TDMetrics()
+    print(f"{'scenario':<16}{'calls/s':>10}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'errors':>8}{'retries':>8}{'429s':>6}" + ("  vs baseline (calls/s, p99)" if baseline else ""))
+    # 預設在子行程執行模擬伺服器，避免它和被測的用戶端搶 GIL
+    server_class = MockTDServer if args.in_process else MockTDProcess
+    with server_class(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                      rate_limit=args.rate_limit, seed=args.seed, record_requests=False) as server, \
+            TDTransport(pool_maxsize=max(16, args.concurrency), max_retries=args.retries, backoff_factor=0,
+                        metrics=metrics) as transport:
+        clients = Clients(server, transport)
+        for name in args.scenario or SCENARIOS:
+            description, call = SCENARIOS[name]
+            call(clients, 0)  # 預熱連線
+            result = run_scenario(clients, call, args.calls, args.concurrency, metrics)
+            results[name] = dict(result, description=description)
+            stats = result["latency"]
+            line = (f"{name:<16}{result['calls_per_second']:>10.1f}{ms(stats['p50'])}{ms(stats['p90'])}"
+                    f"{ms(stats['p99'])}{ms(stats['max'])}{result['errors']:>8}{result['retries']:>8}"
+                    f"{result['throttles']:>6}")
+            if name in baseline:
+                previous = baseline[name]
+                line += (f"  {change(result['calls_per_second'], previous['calls_per_second'])}"
+                         f"  {change(stats['p99'], previous['latency']['p99'])}")
+            print(line)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"timestamp": time.time(), "config": config, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Measure how long importing the Tda modules takes in a fresh interpreter.
+
+Usage:
+    python -m benchmarks.bench_import_time [--runs 7] [--budget-ms 400]
+
+Each module is imported ``--runs`` times in a new ``python -X importtime``
+process; the median cumulative time is reported together with the most
+expensive dependencies. The exit status is non-zero when a module exceeds
+``--budget-ms`` or pulls in a module that should only load lazily.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    "Tda.TDAAuthentication",
+    "Tda.TDDataQuery",
+    "Tda.TDAccountsAndTrading",
+    "Tda.TDUserSettings",
+    "Tda.TDWatchlist",
+]
+# 這些模組只能在真正需要時才載入
+LAZY_ONLY = ("selenium", "pyvirtualdisplay")
+LINE_PATTERN = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def profile_import(module):
+    """Return ({module: (self_us, cumulative_us)}, loaded top-level packages) for one fresh import."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if match:
+            timings[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return timings, {name.split(".")[0] for name in timings}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        cumulative, last = [], None
+        for _ in range(args.runs):
+            last, packages = profile_import(module)
+            cumulative.append(last[module][1] / 1000)
+        median = statistics.median(cumulative)
+        eager = sorted(set(LAZY_ONLY) & packages)
+        over_budget = args.budget_ms is not None and median > args.budget_ms
+        status = "FAIL" if eager or over_budget else "ok"
+        print(f"{module:<28} median {median:8.1f} ms  min {min(cumulative):8.1f} ms  [{status}]")
+        for name, (self_us, _) in sorted(last.items(), key=lambda item: -item[1][0])[:args.top]:
+            print(f"    {self_us / 1000:8.1f} ms  {name}")
+        if eager:
+            print(f"    eagerly imported: {', '.join(eager)}")
+        failed = failed or status == "FAIL"
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
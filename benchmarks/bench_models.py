@@ -0,0 +1,104 @@
+"""Compare raw quote dicts with the typed Quote models.
+
+Usage:
+    python -m benchmarks.bench_models [--quotes 5000] [--rounds 20]
+
+Reports the JSON decode time (json vs orjson when installed), the memory
+retained by the decoded quotes and by the models, and the time for a hot
+loop that reads bid/ask/last from every quote.
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from Tda.TDModels import LazyModels, Quote, orjson
+
+RAW_FIELDS = ["bidPrice", "bidSize", "askPrice", "askSize", "lastPrice", "lastSize", "openPrice", "highPrice",
+              "lowPrice", "closePrice", "netChange", "totalVolume", "quoteTimeInLong", "tradeTimeInLong", "mark",
+              "volatility", "52WkHigh", "52WkLow", "peRatio", "divAmount", "divYield", "nAV", "regularMarketLastPrice",
+              "regularMarketNetChange", "regularMarketTradeTimeInLong", "netPercentChangeInDouble",
+              "markChangeInDouble", "markPercentChangeInDouble", "regularMarketPercentChangeInDouble"]
+
+
+def make_payload(count, seed=7):
+    rng = random.Random(seed)
+    payload = {}
+    for i in range(count):
+        symbol = f"SYM{i:05d}"
+        quote = {name: round(rng.uniform(1, 500), 2) for name in RAW_FIELDS}
+        quote.update(symbol=symbol, assetType="EQUITY", assetMainType="EQUITY", cusip=f"{i:09d}",
+                     description=f"Company {i} Common Stock", exchange="q", exchangeName="NASD",
+                     marginable=True, shortable=True, delayed=False, securityStatus="Normal",
+                     divDate="2023-11-10 00:00:00.000")
+        payload[symbol] = quote
+    return json.dumps(payload).encode()
+
+
+def best_of(rounds, func):
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def retained(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return obj, size
+
+
+def hot_loop_dict(quotes):
+    total = 0.0
+    for quote in quotes:
+        total += quote["bidPrice"] + quote["askPrice"] + quote["lastPrice"]
+    return total
+
+
+def hot_loop_model(quotes):
+    total = 0.0
+    for quote in quotes:
+        total += quote.bid_price + quote.ask_price + quote.last_price
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quotes", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    body = make_payload(args.quotes)
+    print(f"{args.quotes} quotes, {len(body) / 1024:.0f} KiB of JSON")
+    print(f"decode  json     {best_of(args.rounds, lambda: json.loads(body)) * 1000:8.2f} ms")
+    if orjson is not None:
+        print(f"decode  orjson   {best_of(args.rounds, lambda: orjson.loads(body)) * 1000:8.2f} ms")
+
+    raw, raw_size = retained(lambda: json.loads(body))
+    models, model_size = retained(lambda: [Quote.from_json(q) for q in json.loads(body).values()])
+    print(f"memory  dicts    {raw_size / 1024:8.0f} KiB")
+    print(f"memory  models   {model_size / 1024:8.0f} KiB  ({model_size / raw_size:.0%} of dicts)")
+    print(f"build   models   {best_of(args.rounds, lambda: [Quote.from_json(q) for q in raw.values()]) * 1000:8.2f} ms")
+
+    lazy = LazyModels(raw, Quote)
+    print(f"lazy    1 lookup {best_of(args.rounds, lambda: LazyModels(raw, Quote)['SYM00000']) * 1e6:8.1f} us")
+    del lazy
+
+    per_quote = 1e9 / args.quotes
+    rows = list(raw.values())
+    print(f"access  dicts    {best_of(args.rounds, lambda: hot_loop_dict(rows)) * per_quote:8.1f} ns/quote")
+    print(f"access  models   {best_of(args.rounds, lambda: hot_loop_model(models)) * per_quote:8.1f} ns/quote")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Measure order serialization and place/cancel round trips against a local server.
+
+Usage:
+    python -m benchmarks.bench_orders [--orders 500] [--rounds 20]
+
+Compares building each order body from a dict (validate + json.dumps) with
+rendering a pre-built OrderTemplate, then places and cancels ``--orders``
+orders through the dedicated order transport and prints the per-call
+latency histograms.
+"""
+import argparse
+import sys
+import time
+from Tda.TDAccountsAndTrading import TDAccountsAndTrading
+from Tda.TDOrderTemplate import equity_order, serialize_order
+from Tda.TDTransport import TDTransport
+from Tda.tests.helpers import FakeOrderServer
+
+
+def order_dict(symbol, quantity, price):
+    return {
+        "orderType": "LIMIT", "session": "NORMAL", "duration": "DAY", "orderStrategyType": "SINGLE", "price": price,
+        "orderLegCollection": [{"instruction": "BUY", "quantity": quantity,
+                                "instrument": {"symbol": symbol, "assetType": "EQUITY"}}],
+    }
+
+
+def best_of(rounds, func):
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    template = equity_order("BUY")
+    per_order = 1e6 / args.orders
+    dict_time = best_of(args.rounds, lambda: [serialize_order(order_dict("AAPL", 10, 100.0 + i / 100))
+                                              for i in range(args.orders)])
+    template_time = best_of(args.rounds, lambda: [template.render(symbol="AAPL", quantity=10, price=100.0 + i / 100)
+                                                  for i in range(args.orders)])
+    print(f"serialize dict      {dict_time * per_order:8.2f} us/order")
+    print(f"serialize template  {template_time * per_order:8.2f} us/order")
+
+    with FakeOrderServer() as server, TDTransport(max_retries=0) as transport:
+        trading = TDAccountsAndTrading("token", transport=transport, order_transport=transport)
+        trading.base_url = f"{server.url}/v1"
+        for i in range(args.orders):
+            order_id = trading.place_order("1", template, symbol="AAPL", quantity=10, price=100.0 + i / 100)
+            trading.cancel_order("1", order_id)
+        for name, stats in trading.order_latency_snapshot().items():
+            print(f"{name:<13} n={stats['count']:<5} p50={stats['p50'] * 1000:6.2f} ms  "
+                  f"p90={stats['p90'] * 1000:6.2f} ms  p99={stats['p99'] * 1000:6.2f} ms")
+        print(f"connections opened: {transport.stats.snapshot()['pool_misses']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())